@@ -0,0 +1,12 @@
+from __future__ import unicode_literals, print_function
+from libraries.lambda_handlers.complete_job_handler import CompleteJobHandler
+
+
+def handle(event, context):
+    """
+    Called by a converter that was started asynchronously, to finish its job
+    :param dict event:
+    :param context:
+    :return dict:
+    """
+    return CompleteJobHandler().handle(event, context)
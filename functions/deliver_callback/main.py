@@ -0,0 +1,12 @@
+from __future__ import unicode_literals, print_function
+from libraries.lambda_handlers.deliver_callback_handler import DeliverCallbackHandler
+
+
+def handle(event, context):
+    """
+    Called by tx-manager to post a job's result to its callback URL without making the job wait for it
+    :param dict event:
+    :param context:
+    :return bool:
+    """
+    return DeliverCallbackHandler().handle(event, context)
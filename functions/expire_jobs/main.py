@@ -0,0 +1,12 @@
+from __future__ import unicode_literals, print_function
+from libraries.lambda_handlers.expire_jobs_handler import ExpireJobsHandler
+
+
+def handle(event, context):
+    """
+    Called on a schedule to fail the jobs whose converter died without reporting back
+    :param dict event:
+    :param context:
+    :return list:
+    """
+    return ExpireJobsHandler().handle(event, context)
@@ -1,12 +1,23 @@
 from __future__ import unicode_literals, print_function
 import boto3
+import json
 import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 from six import iteritems
+from six.moves.queue import Queue
 from boto3 import Session
-from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Attr, Key
 
 
 class DynamoDBHandler(object):
+    BATCH_WRITE_LIMIT = 25  # max requests per batch_write_item call
+    BATCH_GET_LIMIT = 100  # max keys per batch_get_item call
+    BATCH_MAX_RETRIES = 8
+    BATCH_BACKOFF_SECONDS = 0.05  # doubles for each retry of unprocessed items
+    use_list_append = True  # models send only the new elements of lists that grew, with list_append()
 
     def __init__(self, table_name, aws_access_key_id=None, aws_secret_access_key=None, aws_region_name='us-west-2'):
         self.table_name = table_name
@@ -15,6 +26,7 @@ class DynamoDBHandler(object):
         self.aws_region_name = aws_region_name
         self.resource = None
         self.table = None
+        self.key_schemas = None
         self.logger = logging.getLogger()
         self.setup_resources()
 
@@ -28,9 +40,24 @@ class DynamoDBHandler(object):
             self.resource = boto3.resource('dynamodb')
         self.table = self.resource.Table(self.table_name)
 
-    def get_item(self, keys):
+    def new_table(self):
+        """
+        boto3 resources aren't thread safe, so every thread that reads the table needs a session and resource of its
+        own
+        :return: the table resource
+        """
+        if self.aws_access_key_id and self.aws_secret_access_key:
+            session = Session(aws_access_key_id=self.aws_access_key_id,
+                              aws_secret_access_key=self.aws_secret_access_key,
+                              region_name=self.aws_region_name)
+        else:
+            session = Session()
+        return session.resource('dynamodb').Table(self.table_name)
+
+    def get_item(self, keys, fields=None):
         response = self.table.get_item(
-            Key=keys
+            Key=keys,
+            **self.get_projection(fields)
         )
         if 'Item' in response:
             return response['Item']
@@ -42,7 +69,14 @@ class DynamoDBHandler(object):
             Item=data
         )
 
-    def update_item(self, keys, data):
+    def update_item(self, keys, data, appends=None):
+        """
+        sets the given fields of an item
+        :param dict keys:
+        :param dict data: fields to set
+        :param dict appends: list fields mapped to the elements to add to the end of the stored list
+        :return:
+        """
         expressions = []
         names = {}
         values = {}
@@ -56,6 +90,15 @@ class DynamoDBHandler(object):
                 expressions.append('{0} = :{1}'.format(name, field))
                 values[':{0}'.format(field)] = value
 
+        if appends:
+            for field, value in iteritems(appends):
+                name = field
+                if name.upper() in RESERVED_WORDS:
+                    name = '#item_'+name
+                    names[name] = field
+                expressions.append('{0} = list_append({0}, :{1})'.format(name, field))
+                values[':{0}'.format(field)] = value
+
         self.logger.debug('UPDATING WITH:')
         self.logger.debug('SET {0}'.format(', '.join(expressions)))
         self.logger.debug("VALUES:")
@@ -77,11 +120,195 @@ class DynamoDBHandler(object):
                 ExpressionAttributeValues=values
             )
 
+    def increment_item(self, keys, field, amount=1):
+        """
+        atomically adds `amount` to a number field of an existing item in a single write, without reading the item
+        :param dict keys:
+        :param string field:
+        :param int amount:
+        :return: the new value of the field, None if there is no item with these keys
+        """
+        try:
+            response = self.table.update_item(
+                Key=keys,
+                AttributeUpdates={field: {'Action': 'ADD', 'Value': amount}},
+                Expected=dict((key, {'ComparisonOperator': 'NOT_NULL'}) for key in keys),
+                ReturnValues='UPDATED_NEW'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return None
+            raise
+        if 'Attributes' in response and field in response['Attributes']:
+            return response['Attributes'][field]
+        else:
+            return None
+
+    def add_to_item(self, keys, amounts):
+        """
+        atomically adds to several number fields of an item in a single write, creating the item if needed
+        :param dict keys:
+        :param dict amounts: fields mapped to the amount to add to them
+        :return:
+        """
+        return self.table.update_item(
+            Key=keys,
+            AttributeUpdates=dict((field, {'Action': 'ADD', 'Value': amount})
+                                  for field, amount in iteritems(amounts))
+        )
+
+    def update_item_if(self, keys, data, expected):
+        """
+        sets the given fields of an item only if its current values match, in a single write
+        :param dict keys:
+        :param dict data: fields to set
+        :param dict expected: fields mapped to the values they must have now, None if they must not be set
+        :return bool: True if the item was updated, False if it didn't match
+        """
+        try:
+            self.table.update_item(
+                Key=keys,
+                AttributeUpdates=dict((field, {'Action': 'PUT', 'Value': value})
+                                      for field, value in iteritems(data) if field not in keys),
+                Expected=self.get_expected(expected)
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    @staticmethod
+    def get_expected(expected):
+        """
+        :param dict expected: fields mapped to the values they must have, None if they must not be set
+        :return dict: the Expected conditions of a conditional write
+        """
+        conditions = {}
+        for field, value in iteritems(expected):
+            if value is None:
+                conditions[field] = {'ComparisonOperator': 'NULL'}
+            else:
+                conditions[field] = {'ComparisonOperator': 'EQ', 'AttributeValueList': [value]}
+        return conditions
+
     def delete_item(self, keys):
         return self.table.delete_item(
             Key=keys
         )
 
+    def delete_item_if(self, keys, expected):
+        """
+        deletes an item only if its current values match, in a single write
+        :param dict keys:
+        :param dict expected: fields mapped to the values they must have now, None if they must not be set
+        :return bool: True if the item was deleted, False if it didn't match
+        """
+        try:
+            self.table.delete_item(
+                Key=keys,
+                Expected=self.get_expected(expected)
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+    def batch_insert(self, items):
+        """
+        inserts items with as few requests as possible
+        :param list items:
+        """
+        self.batch_write([{'PutRequest': {'Item': item}} for item in items])
+
+    def batch_delete(self, keys_list):
+        """
+        deletes items with as few requests as possible
+        :param list keys_list: the keys of each item to delete
+        """
+        self.batch_write([{'DeleteRequest': {'Key': keys}} for keys in keys_list])
+
+    def batch_write(self, requests):
+        """
+        sends put and delete requests in chunks of BATCH_WRITE_LIMIT, retrying unprocessed requests with backoff
+        :param list requests: PutRequest or DeleteRequest dicts
+        """
+        # DynamoDB rejects a batch with two requests for the same item, the last one is what would stick anyway
+        requests = self.unique_by_key(requests, lambda request: request.get('PutRequest', {}).get('Item') or
+                                      request['DeleteRequest']['Key'], keep_last=True)
+        for i in range(0, len(requests), DynamoDBHandler.BATCH_WRITE_LIMIT):
+            unprocessed = {self.table_name: requests[i:i+DynamoDBHandler.BATCH_WRITE_LIMIT]}
+            retries = 0
+            while unprocessed:
+                if retries:
+                    self.batch_backoff(retries, 'write')
+                response = self.resource.batch_write_item(RequestItems=unprocessed)
+                unprocessed = response.get('UnprocessedItems')
+                retries += 1
+
+    def batch_get(self, keys_list, fields=None):
+        """
+        gets items with as few requests as possible, in chunks of BATCH_GET_LIMIT, retrying unprocessed keys with
+        backoff
+        :param list keys_list: the keys of each item to get
+        :param list fields: only get these attributes of each item (all attributes if not given)
+        :return list: the items that were found, in no particular order
+        """
+        items = []
+        # DynamoDB rejects a batch that asks for the same item twice
+        keys_list = self.unique_by_key(keys_list, lambda keys: keys)
+        for i in range(0, len(keys_list), DynamoDBHandler.BATCH_GET_LIMIT):
+            request = self.get_projection(fields)
+            request['Keys'] = keys_list[i:i+DynamoDBHandler.BATCH_GET_LIMIT]
+            unprocessed = {self.table_name: request}
+            retries = 0
+            while unprocessed:
+                if retries:
+                    self.batch_backoff(retries, 'get')
+                response = self.resource.batch_get_item(RequestItems=unprocessed)
+                if 'Responses' in response and self.table_name in response['Responses']:
+                    items += response['Responses'][self.table_name]
+                unprocessed = response.get('UnprocessedKeys')
+                retries += 1
+        return items
+
+    def unique_by_key(self, entries, get_item, keep_last=False):
+        """
+        drops the entries that are for the same item as another one
+        :param list entries:
+        :param callable get_item: gets the item, or just its keys, an entry is for
+        :param bool keep_last: keep the last entry for each item instead of the first
+        :return list: the remaining entries, in their order
+        """
+        positions = {}
+        for position, entry in enumerate(entries):
+            key = self.get_item_key(get_item(entry))
+            if keep_last or key not in positions:
+                positions[key] = position
+        if len(positions) == len(entries):
+            return entries
+        return [entries[position] for position in sorted(positions.values())]
+
+    def get_item_key(self, item):
+        """
+        :param dict item: an item, or just its keys
+        :return: what tells the item apart from the others in the table
+        """
+        key_schemas = self.get_key_schemas()
+        if key_schemas and key_schemas[0][0] is None:
+            _, hash_key, range_key = key_schemas[0]
+            return repr((item.get(hash_key), item.get(range_key)))
+        # without the key schema, only identical items are known to be the same
+        return json.dumps(item, sort_keys=True, default=str)
+
+    def batch_backoff(self, retries, action):
+        if retries > DynamoDBHandler.BATCH_MAX_RETRIES:
+            raise Exception('Batch {0} on {1} still has unprocessed items after {2} retries'
+                            .format(action, self.table_name, DynamoDBHandler.BATCH_MAX_RETRIES))
+        self.logger.debug('Retrying unprocessed items of batch {0} on {1}'.format(action, self.table_name))
+        time.sleep(DynamoDBHandler.BATCH_BACKOFF_SECONDS * 2 ** (retries - 1))
+
     def get_item_count(self):
         """
         get number of items in table - one caveat is that this value may be off since AWS only updates it every 6 hours
@@ -89,16 +316,52 @@ class DynamoDBHandler(object):
         """
         return self.table.item_count
 
-    def query_items(self, query=None, only_fields_with_values=True, queryChunkLimit=-1):
+    def get_key_schemas(self):
         """
-        gets items from database
-        :param query: 
-        :param only_fields_with_values: 
-        :param queryChunkLimit: not an absolute count, but a threshold where we stop fetching more chunks
-                        (if negative then no limit, but will read all chunks)
-        :return: 
+        gets the keys of the table and of each of its indexes that project all attributes (so a query on the index
+        returns whole items). Read once from the table description and then cached.
+        :return list: tuples of (index_name, hash_key, range_key), the table itself first with an index_name of None
+        """
+        if self.key_schemas is None:
+            self.key_schemas = []
+            try:
+                hash_key, range_key = self._parse_key_schema(self.table.key_schema)
+                if hash_key:
+                    self.key_schemas.append((None, hash_key, range_key))
+                for indexes in (self.table.global_secondary_indexes, self.table.local_secondary_indexes):
+                    if not isinstance(indexes, list):
+                        continue
+                    for index in indexes:
+                        if index.get('Projection', {}).get('ProjectionType') != 'ALL':
+                            continue
+                        hash_key, range_key = self._parse_key_schema(index.get('KeySchema'))
+                        if hash_key:
+                            self.key_schemas.append((index['IndexName'], hash_key, range_key))
+            except Exception as e:
+                self.logger.debug('Could not read key schema of {0}: {1}'.format(self.table_name, e))
+        return self.key_schemas
+
+    @staticmethod
+    def _parse_key_schema(key_schema):
+        hash_key = None
+        range_key = None
+        if isinstance(key_schema, list):
+            for key in key_schema:
+                if key['KeyType'] == 'HASH':
+                    hash_key = key['AttributeName']
+                elif key['KeyType'] == 'RANGE':
+                    range_key = key['AttributeName']
+        return hash_key, range_key
+
+    @staticmethod
+    def get_conditions(query=None, only_fields_with_values=True):
+        """
+        parses a query into conditions
+        :param dict query: field names mapped to a value (for equality) or to a dict with 'condition' and 'value'
+        :param bool only_fields_with_values: skip fields with an empty value
+        :return list: tuples of (field, condition, value, value2)
         """
-        filter_expression = None
+        conditions = []
         if query and len(query) >= 1:
             for field, value in iteritems(query):
                 value2 = None
@@ -113,69 +376,295 @@ class DynamoDBHandler(object):
                 if not value and only_fields_with_values:
                     continue
 
-                if condition_str == 'eq':
-                    condition = Attr(field).eq(value)
-                elif condition_str == 'ne':
-                    condition = Attr(field).ne(value)
-                elif condition_str == 'lt':
-                    condition = Attr(field).lt(value)
-                elif condition_str == 'lte':
-                    condition = Attr(field).lte(value)
-                elif condition_str == 'gt':
-                    condition = Attr(field).gt(value)
-                elif condition_str == 'gte':
-                    condition = Attr(field).gte(value)
-                elif condition_str == 'begins_with':
-                    condition = Attr(field).begins_with(value)
-                elif condition_str == 'between':
-                    condition = Attr(field).between(value, value2)
-                elif condition_str == 'is_in':
-                    condition = Attr(field).is_in(value)
-                elif condition_str == 'contains':
-                    condition = Attr(field).contains(value)
-                else:
+                if condition_str not in FILTER_CONDITIONS:
                     raise Exception('Invalid filter condition: {0}'.format(condition_str))
 
-                if filter_expression is None:
-                    filter_expression = condition
-                else:
-                    filter_expression &= condition
+                conditions.append((field, condition_str, value, value2))
+        return conditions
+
+    @staticmethod
+    def build_expression(conditions, condition_class=Attr):
+        """
+        ANDs conditions together
+        :param list conditions: tuples of (field, condition, value, value2)
+        :param condition_class: Attr for filter expressions, Key for key condition expressions
+        :return: the condition expression, None if there are no conditions
+        """
+        expression = None
+        for field, condition_str, value, value2 in conditions:
+            if condition_str == 'between':
+                condition = condition_class(field).between(value, value2)
+            else:
+                condition = getattr(condition_class(field), condition_str)(value)
+
+            if expression is None:
+                expression = condition
+            else:
+                expression &= condition
+        return expression
+
+    def plan_query(self, conditions):
+        """
+        finds the table or index whose keys best match the conditions. The hash key needs an equality condition, a
+        matching range key condition is a bonus.
+        :param list conditions: tuples of (field, condition, value, value2)
+        :return tuple: (index_name, key_conditions, filter_conditions), key_conditions is empty if we need to scan
+        """
+        best = None
+        for index_name, hash_key, range_key in self.get_key_schemas():
+            hash_condition = None
+            range_condition = None
+            for condition in conditions:
+                field, condition_str = condition[0:2]
+                if field == hash_key and condition_str == 'eq' and not hash_condition:
+                    hash_condition = condition
+                elif field == range_key and condition_str in KEY_CONDITIONS and not range_condition:
+                    range_condition = condition
+            if not hash_condition:
+                continue
+            key_conditions = [hash_condition]
+            if range_condition:
+                key_conditions.append(range_condition)
+            if best is None or len(key_conditions) > len(best[1]):
+                best = (index_name, key_conditions)
+
+        if best is None:
+            return None, [], conditions
+        index_name, key_conditions = best
+        filter_conditions = [condition for condition in conditions if condition not in key_conditions]
+        return index_name, key_conditions, filter_conditions
+
+    @staticmethod
+    def get_projection(fields=None):
+        """
+        gets the arguments that limit the attributes DynamoDB sends back to the given fields
+        :param list fields:
+        :return dict: ProjectionExpression (and ExpressionAttributeNames for reserved words), empty if no fields
+        """
+        if not fields:
+            return {}
+        projection = []
+        names = {}
+        for field in fields:
+            name = field
+            if name.upper() in RESERVED_WORDS:
+                name = '#item_'+name
+                names[name] = field
+            projection.append(name)
+        kwargs = {'ProjectionExpression': ', '.join(projection)}
+        if names:
+            kwargs['ExpressionAttributeNames'] = names
+        return kwargs
+
+    def iter_pages(self, query=None, fields=None, page_size=None, only_fields_with_values=True):
+        """
+        gets items from database one page (response) at a time. If a condition matches the keys of the table or of
+        one of its indexes we do a query on that, otherwise we have to scan the whole table.
+        :param query:
+        :param list fields: only get these attributes of each item (all attributes if not given)
+        :param int page_size: max number of items read for each page
+        :param only_fields_with_values:
+        :return: generator of lists of items
+        """
+        conditions = self.get_conditions(query, only_fields_with_values)
+        index_name, key_conditions, filter_conditions = self.plan_query(conditions)
 
+        kwargs = self.get_projection(fields)
+        if page_size:
+            kwargs['Limit'] = page_size
+        filter_expression = self.build_expression(filter_conditions)
         if filter_expression is not None:
-            response = self.table.scan(
-                FilterExpression=filter_expression
-            )
+            kwargs['FilterExpression'] = filter_expression
+        if key_conditions:
+            self.logger.debug('Querying {0} on {1}'.format(self.table_name, index_name or 'primary key'))
+            read = self.table.query
+            kwargs['KeyConditionExpression'] = self.build_expression(key_conditions, Key)
+            if index_name:
+                kwargs['IndexName'] = index_name
         else:
-            response = self.table.scan()
+            read = self.table.scan
 
-        if not response or not('Items' in response):
-            return None
+        response = read(**kwargs)
+        while response and ('Items' in response):
+            yield response['Items']
 
-        # finished if there is no more data to read
-        if not('LastEvaluatedKey' in response):
-            return response['Items']
+            # finished if there is no more data to read
+            if not('LastEvaluatedKey' in response):
+                break
+            response = read(ExclusiveStartKey=response['LastEvaluatedKey'], **kwargs)
 
-        items = response['Items']
+    def iter_items(self, query=None, fields=None, page_size=None, only_fields_with_values=True):
+        """
+        gets items from database one at a time, reading the next page only when needed, so we never hold more than
+        one page in memory
+        :param query:
+        :param list fields: only get these attributes of each item (all attributes if not given)
+        :param int page_size: max number of items read for each page
+        :param only_fields_with_values:
+        :return: generator of items
+        """
+        for page in self.iter_pages(query, fields, page_size, only_fields_with_values):
+            for item in page:
+                yield item
 
-        # read chunks until end or threshold is reached
-        while 'LastEvaluatedKey' in response:
-            if filter_expression is not None:
-                response = self.table.scan(
-                    FilterExpression=filter_expression,
-                    ExclusiveStartKey = response['LastEvaluatedKey']
-                )
+    def query_items(self, query=None, only_fields_with_values=True, queryChunkLimit=-1, fields=None):
+        """
+        gets items from database. If a condition matches the keys of the table or of one of its indexes we do a
+        query on that, otherwise we have to scan the whole table.
+        :param query: 
+        :param only_fields_with_values: 
+        :param queryChunkLimit: not an absolute count, but a threshold where we stop fetching more chunks
+                        (if negative then no limit, but will read all chunks)
+        :param list fields: only get these attributes of each item (all attributes if not given)
+        :return: 
+        """
+        items = None
+        for page in self.iter_pages(query, fields, only_fields_with_values=only_fields_with_values):
+            if items is None:
+                items = page
             else:
-                response = self.table.scan(ExclusiveStartKey = response['LastEvaluatedKey'])
+                items += page
 
-            if response and ('Items' in response):
-                items += response['Items']
-
-            itemCount = len(items)
-            if (queryChunkLimit >= 0) and (itemCount >= queryChunkLimit):
+            # read chunks until end or threshold is reached
+            if (queryChunkLimit >= 0) and (len(items) >= queryChunkLimit):
                 break
 
         return items
 
+    def parallel_scan(self, query=None, segments=4, only_fields_with_values=True, queryChunkLimit=-1, fields=None):
+        """
+        scans the whole table with the table split into segments that are read at the same time, one thread per
+        segment. For when a scan can't be avoided, e.g. exports and audits.
+        :param query: same as for query_items, but only ever used as a filter
+        :param int segments: number of segments (and threads) to split the table into
+        :param only_fields_with_values:
+        :param queryChunkLimit: not an absolute count, but a threshold over all segments where we stop fetching more
+                        chunks (if negative then no limit, but will read all chunks)
+        :param list fields: only get these attributes of each item (all attributes if not given)
+        :return list: items of all segments, in segment order
+        """
+        filter_expression = self.build_expression(self.get_conditions(query, only_fields_with_values))
+        progress = {'count': 0, 'lock': threading.Lock()}
+        pool = ThreadPool(segments)
+        try:
+            results = pool.map(lambda segment: self.scan_segment(segment, segments, filter_expression,
+                                                                 queryChunkLimit, progress, fields),
+                               range(segments))
+        finally:
+            pool.close()
+            pool.join()
+
+        items = []
+        for segment_items in results:
+            items += segment_items
+        return items
+
+    def iter_parallel_scan(self, query=None, segments=4, only_fields_with_values=True, fields=None):
+        """
+        same as parallel_scan, but yields the items as the pages of the segments come in, so only a few pages are
+        ever held in memory
+        :param query: same as for query_items, but only ever used as a filter
+        :param int segments: number of segments (and threads) to split the table into
+        :param only_fields_with_values:
+        :param list fields: only get these attributes of each item (all attributes if not given)
+        :return: generator of items, in no particular order
+        """
+        filter_expression = self.build_expression(self.get_conditions(query, only_fields_with_values))
+        # the threads wait while the caller is more than a couple of pages behind
+        pages = Queue(segments * 2)
+        stopped = threading.Event()
+
+        def read_segment(segment):
+            try:
+                for page in self.iter_segment_pages(segment, segments, filter_expression, fields=fields):
+                    if stopped.is_set():
+                        break
+                    pages.put(page)
+            except Exception as e:
+                pages.put(e)
+            finally:
+                pages.put(None)
+
+        threads = [threading.Thread(target=read_segment, args=(segment,)) for segment in range(segments)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        running = segments
+        try:
+            while running:
+                page = pages.get()
+                if page is None:
+                    running -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    for item in page:
+                        yield item
+        finally:
+            # if the caller stopped early, let the threads finish the page they are putting and stop
+            stopped.set()
+            while running:
+                if pages.get() is None:
+                    running -= 1
+
+    def scan_segment(self, segment, total_segments, filter_expression=None, queryChunkLimit=-1, progress=None,
+                     fields=None):
+        """
+        reads all chunks of one segment of a parallel scan
+        :param int segment:
+        :param int total_segments:
+        :param filter_expression:
+        :param queryChunkLimit: threshold on the item count in `progress` where we stop fetching more chunks
+        :param dict progress: item count shared by all segments of the scan, with the lock that guards it
+        :param list fields: only get these attributes of each item (all attributes if not given)
+        :return list:
+        """
+        items = []
+        for page in self.iter_segment_pages(segment, total_segments, filter_expression, queryChunkLimit, progress,
+                                            fields):
+            items += page
+        return items
+
+    def iter_segment_pages(self, segment, total_segments, filter_expression=None, queryChunkLimit=-1, progress=None,
+                           fields=None):
+        """
+        reads the chunks of one segment of a parallel scan one at a time, through a table resource of its own since
+        boto3 resources can't be shared by threads
+        :param int segment:
+        :param int total_segments:
+        :param filter_expression:
+        :param queryChunkLimit: threshold on the item count in `progress` where we stop fetching more chunks
+        :param dict progress: item count shared by all segments of the scan, with the lock that guards it
+        :param list fields: only get these attributes of each item (all attributes if not given)
+        :return: generator of lists of items
+        """
+        table = self.new_table()
+        kwargs = self.get_projection(fields)
+        kwargs['Segment'] = segment
+        kwargs['TotalSegments'] = total_segments
+        if filter_expression is not None:
+            kwargs['FilterExpression'] = filter_expression
+        if progress is None:
+            progress = {'count': 0, 'lock': threading.Lock()}
+
+        while True:
+            response = table.scan(**kwargs)
+            if not response:
+                break
+            if 'Items' in response:
+                with progress['lock']:
+                    progress['count'] += len(response['Items'])
+                yield response['Items']
+            if 'LastEvaluatedKey' not in response:
+                break
+            if (queryChunkLimit >= 0) and (progress['count'] >= queryChunkLimit):
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+FILTER_CONDITIONS = ['eq', 'ne', 'lt', 'lte', 'gt', 'gte', 'begins_with', 'between', 'is_in', 'contains']
+
+KEY_CONDITIONS = ['eq', 'lt', 'lte', 'gt', 'gte', 'begins_with', 'between']
+
 RESERVED_WORDS = [
     'ABORT',
     'ABSOLUTE',
@@ -17,10 +17,23 @@ class LambdaHandler(object):
     def setup_resources(self):
         self.client = boto3.client('lambda')
 
-    def invoke(self, function_name, payload):
+    def invoke(self, function_name, payload, invocation_type='RequestResponse'):
+        """
+        :param string function_name:
+        :param dict payload:
+        :param string invocation_type: 'RequestResponse' waits for the function to return, 'Event' doesn't
+        :return dict:
+        """
+        if invocation_type == 'Event':
+            # Logs can only be tailed when waiting for the response
+            return self.client.invoke(
+                FunctionName=function_name,
+                InvocationType=invocation_type,
+                Payload=json.dumps(payload)
+            )
         return self.client.invoke(
             FunctionName=function_name,
-            InvocationType='RequestResponse',
+            InvocationType=invocation_type,
             LogType='Tail',
             Payload = json.dumps(payload)
         )
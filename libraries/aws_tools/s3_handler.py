@@ -108,12 +108,13 @@ class S3Handler(object):
             return self.resource.Object(bucket_name=self.bucket_name, key=key).copy_from(
                 CopySource='{0}/{1}'.format(self.bucket_name, key), MetadataDirective='REPLACE')
 
-    def upload_file(self, path, key, cache_time=600):
+    def upload_file(self, path, key, cache_time=600, metadata=None):
         """
         Upload file to S3 storage. Similar to the s3.upload_file, however, that
         does not work nicely with moto, whereas this function does.
         :param string path: file to upload
         :param string key: name of the object in the bucket
+        :param dict metadata: user metadata to store with the object
         """
         with open(path, 'rb') as f:
             binary = f.read()
@@ -121,6 +122,20 @@ class S3Handler(object):
             Key=key,
             Body=binary,
             ContentType=get_mime_type(path),
+            CacheControl='max-age={0}'.format(cache_time),
+            Metadata=metadata or {}
+        )
+
+    def upload_fileobj(self, fileobj, key, cache_time=600):
+        """
+        Upload the rest of an open file to S3 storage without reading it all into memory first
+        :param file fileobj: file to upload, e.g. a SpooledTemporaryFile
+        :param string key: name of the object in the bucket
+        """
+        self.bucket.put_object(
+            Key=key,
+            Body=fileobj,
+            ContentType=get_mime_type(key),
             CacheControl='max-age={0}'.format(cache_time)
         )
 
@@ -0,0 +1,417 @@
+from __future__ import print_function, unicode_literals
+import os
+import time
+import logging
+import multiprocessing
+from libraries.aws_tools.s3_handler import S3Handler
+from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
+from libraries.client.client_webhook import ClientWebhook
+from libraries.client.client_callback import ClientCallback
+from libraries.general_tools.file_utils import write_file, load_json_object
+from libraries.general_tools.timer import StageTimer
+from libraries.manager.manager import TxManager
+from libraries.manager.converter_executor import LocalConverterExecutor
+from libraries.models.manifest import TxManifest
+
+
+class BulkReconverter(object):
+    """
+    Reconverts the latest commit of many repos in a pool of worker processes, e.g. after a converter or template
+    change. Each repo goes through the same pipeline as a push, the webhook, tx-manager and the callback, but all of
+    it runs right here with the converters in this process, without any Lambda functions, and always in full. The
+    jobs are in the 'bulk' lane of the scheduler. Like after a push, the build log the callback writes has the
+    door43.org deployer deploy the commit.
+
+    The jobs are kept in a table of their own, which must not have a stream, or it would start each of them in
+    tx_start_job as well, like the one of tx-job does. It needs the same keys as tx-job.
+
+    The repos that were reconverted are kept in a checkpoint file, so an interrupted run picks up where it left off.
+    Repos that failed are tried again.
+    """
+    CHECKPOINT_FILE = 'reconvert_checkpoint.json'
+    PRE_CONVERT_BUCKET = 'tx-webhook-client'
+    API_URL = 'https://api.door43.org'
+    JOB_TABLE_NAME = 'tx-reconvert-job'
+
+    def __init__(self, cdn_bucket, gogs_url, manifest_table_name=None, workers=0, rate=0,
+                 checkpoint_file=None, pre_convert_bucket=None, gogs_user_token=None, api_url=None,
+                 job_table_name=None, module_table_name=None):
+        """
+        :param string cdn_bucket:
+        :param string gogs_url:
+        :param string manifest_table_name: where the repos are listed
+        :param int workers: how many repos are reconverted at once, 0 for one per core
+        :param float rate: the most repos started per minute, 0 for no limit
+        :param string checkpoint_file:
+        :param string pre_convert_bucket: where the webhook puts the preprocessed files
+        :param string gogs_user_token: the token of the Gogs user the jobs are requested as
+        :param string api_url: the tx-manager API the jobs link to
+        :param string job_table_name: a table without a stream for the jobs
+        :param string module_table_name: where the converter modules are registered
+        """
+        self.cdn_bucket = cdn_bucket
+        self.gogs_url = gogs_url
+        self.manifest_table_name = manifest_table_name
+        self.workers = workers
+        self.rate = rate
+        self.checkpoint_file = checkpoint_file
+        self.pre_convert_bucket = pre_convert_bucket
+        self.gogs_user_token = gogs_user_token
+        self.api_url = api_url
+        self.job_table_name = job_table_name
+        self.module_table_name = module_table_name
+        self.finished = {}  # owner/repo mapped to the results of the repos in the checkpoint
+        self.logger = logging.getLogger()
+
+        if not self.manifest_table_name:
+            self.manifest_table_name = ClientWebhook.MANIFEST_TABLE_NAME
+        if not self.checkpoint_file:
+            self.checkpoint_file = BulkReconverter.CHECKPOINT_FILE
+        if not self.pre_convert_bucket:
+            self.pre_convert_bucket = BulkReconverter.PRE_CONVERT_BUCKET
+        if not self.api_url:
+            self.api_url = BulkReconverter.API_URL
+        if not self.job_table_name:
+            self.job_table_name = BulkReconverter.JOB_TABLE_NAME
+        if not self.module_table_name:
+            self.module_table_name = TxManager.MODULE_TABLE_NAME
+
+    def get_settings(self):
+        """
+        :return dict: what reconvert_repo() needs to know, for the worker processes
+        """
+        return {
+            'cdn_bucket': self.cdn_bucket,
+            'gogs_url': self.gogs_url,
+            'manifest_table_name': self.manifest_table_name,
+            'pre_convert_bucket': self.pre_convert_bucket,
+            'gogs_user_token': self.gogs_user_token,
+            'api_url': self.api_url,
+            'job_table_name': self.job_table_name,
+            'module_table_name': self.module_table_name
+        }
+
+    def check_job_table(self):
+        """
+        Makes sure the jobs are only converted here
+        """
+        stream = DynamoDBHandler(self.job_table_name).table.stream_specification
+        if stream and stream.get('StreamEnabled'):
+            raise Exception('The stream of {0} starts its jobs in tx_start_job, use a job table without one'
+                            .format(self.job_table_name))
+
+    def get_repos(self, prefix=''):
+        """
+        :param string prefix: only the repos whose owner/repo starts with this
+        :return list: the owner/repo of the repos in the manifest table
+        """
+        manifests = TxManifest(db_handler=DynamoDBHandler(self.manifest_table_name))\
+            .iter_query(fields=['user_name', 'repo_name'])
+        repos = ('{0}/{1}'.format(manifest.user_name, manifest.repo_name) for manifest in manifests)
+        return sorted(repo for repo in repos if repo.startswith(prefix))
+
+    def load_checkpoint(self):
+        self.finished = {}
+        if os.path.isfile(self.checkpoint_file):
+            self.finished = load_json_object(self.checkpoint_file) or {}
+
+    def save_checkpoint(self):
+        # write a new file and move it over the old one, so an interruption can't leave half a checkpoint
+        temp_file = self.checkpoint_file + '.tmp'
+        write_file(temp_file, self.finished)
+        os.rename(temp_file, self.checkpoint_file)
+
+    def get_worker_count(self, count):
+        """
+        :param int count: how many repos there are to reconvert
+        :return int:
+        """
+        workers = self.workers
+        if not workers:
+            try:
+                workers = multiprocessing.cpu_count()
+            except NotImplementedError:
+                workers = 1
+        return max(min(workers, count), 1)
+
+    def throttle(self, items):
+        """
+        Yields the items no faster than the rate
+        :param list items:
+        """
+        interval = 60.0 / self.rate if self.rate else 0
+        next_start = time.time()
+        for item in items:
+            wait = next_start - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            next_start = max(next_start, time.time()) + interval
+            yield item
+
+    def map_in_workers(self, items):
+        """
+        Yields the results of reconverting the items as they finish
+        :param list items: see reconvert_item()
+        """
+        workers = self.get_worker_count(len(items))
+        pool = None
+        if workers > 1:
+            try:
+                pool = multiprocessing.Pool(workers)
+            except (OSError, ImportError) as e:
+                self.logger.debug('Reconverting in this process, could not start workers: {0}'.format(e))
+        if not pool:
+            for item in self.throttle(items):
+                yield reconvert_item(item)
+            return
+        self.logger.debug('Reconverting {0} repos in {1} workers'.format(len(items), workers))
+        finished = False
+        try:
+            for result in pool.imap_unordered(reconvert_item, self.throttle(items)):
+                yield result
+            finished = True
+        finally:
+            if finished:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+    def run(self, repos):
+        """
+        :param list repos: the owner/repo of the repos to reconvert
+        :return dict: the summary, see get_summary()
+        """
+        self.check_job_table()
+        self.load_checkpoint()
+        todo = [repo for repo in repos if not self.finished.get(repo, {}).get('success')]
+        skipped = len(repos) - len(todo)
+        if skipped:
+            self.logger.info('Skipping {0} repos that were reconverted before'.format(skipped))
+        settings = self.get_settings()
+        items = [(repo, settings) for repo in todo]
+        start = time.time()
+        results = []
+        for result in self.map_in_workers(items):
+            results.append(result)
+            self.finished[result['repo']] = result
+            self.save_checkpoint()
+            if result['success']:
+                self.logger.info('{0}/{1}: reconverted {2} in {3:.1f}s'.format(
+                    len(results), len(items), result['repo'], result['seconds']))
+            else:
+                self.logger.error('{0}/{1}: failed to reconvert {2}: {3}'.format(
+                    len(results), len(items), result['repo'], '; '.join(result['errors'])))
+        return self.get_summary(results, skipped, time.time() - start)
+
+    @staticmethod
+    def get_summary(results, skipped, seconds):
+        """
+        :param list results: the results of reconvert_item()
+        :param int skipped: how many repos were reconverted by an earlier run
+        :param float seconds: how long the run took
+        :return dict: the counts, throughput and errors of the run, and the total time each stage took
+        """
+        timings = {}
+        for result in results:
+            for stage, milliseconds in result.get('timings', {}).items():
+                timings[stage] = timings.get(stage, 0) + milliseconds
+        failed = [result for result in results if not result['success']]
+        return {
+            'reconverted': len(results) - len(failed),
+            'failed': len(failed),
+            'skipped': skipped,
+            'seconds': seconds,
+            'repos_per_minute': len(results) * 60.0 / seconds if seconds else 0,
+            'timings': timings,
+            'errors': dict((result['repo'], result['errors']) for result in failed)
+        }
+
+
+def reconvert_item(item):
+    """
+    Reconverts a repo, in a worker process if there are any
+    :param tuple item: the owner/repo and the settings of the BulkReconverter
+    :return dict: the owner/repo, whether it succeeded, its errors, how long it took and the time of each stage
+    """
+    repo, settings = item
+    timer = StageTimer()
+    start = time.time()
+    try:
+        owner_name, repo_name = repo.split('/', 1)
+        errors = reconvert_repo(owner_name, repo_name, settings, timer)
+    except Exception as e:
+        logging.getLogger().exception(e)
+        errors = ['{0}'.format(e)]
+    return {
+        'repo': repo,
+        'success': not errors,
+        'errors': errors,
+        'seconds': time.time() - start,
+        'timings': timer.timings
+    }
+
+
+class ReconvertWebhook(ClientWebhook):
+    """
+    The webhook of a push of a commit that's reconverted: it requests its jobs straight from a TxManager, which
+    converts them before returning, instead of through the API, and it leaves the files of the commit in the cdn
+    bucket until the reconversion has replaced them, see ReconvertCallback
+    """
+
+    def __init__(self, tx_manager, *args, **kwargs):
+        """
+        :param TxManager tx_manager:
+        :param args: see ClientWebhook
+        :param kwargs: see ClientWebhook
+        """
+        ClientWebhook.__init__(self, *args, **kwargs)
+        self.tx_manager = tx_manager
+        self.jobs = []
+        self.s3_commit_key = None
+        self.old_files = {}  # the keys of the files the commit had mapped to their ETag and when they were modified
+
+    def clear_commit_directory_in_cdn(self, s3_commit_key):
+        self.s3_commit_key = s3_commit_key
+        for obj in self.cdn_handler.get_objects(prefix=s3_commit_key + '/'):
+            if obj.key.endswith('.finished'):
+                # the parts of the last conversion mustn't count as finished parts of this one
+                self.cdn_handler.delete_file(obj.key)
+            else:
+                self.old_files[obj.key] = (obj.e_tag, obj.last_modified)
+
+    def add_payload_to_tx_converter(self, callback_url, identifier, payload, rc, source_url, tx_manager_job_url):
+        # the callback is processed by reconvert_repo() once the webhook is done, like it would be after a push
+        payload['callback'] = None
+        job = self.tx_manager.setup_job(payload)['job']
+        job = self.tx_manager.start_job(job['job_id'])
+        self.jobs.append(dict(job))  # the webhook makes the job it gets back into the build log
+        return identifier, job
+
+    def remove_stale_files(self):
+        """
+        Deletes the files of the commit that the reconversion didn't write again
+        :return int: how many were deleted
+        """
+        if not self.s3_commit_key:
+            return 0
+        stale_keys = [obj.key for obj in self.cdn_handler.get_objects(prefix=self.s3_commit_key + '/')
+                      if self.old_files.get(obj.key) == (obj.e_tag, obj.last_modified)]
+        for key in stale_keys:
+            self.cdn_handler.delete_file(key)
+        return len(stale_keys)
+
+
+class ReconvertCallback(ClientCallback):
+    """
+    The callback of a job of a reconversion. It deletes the files of the commit that the reconversion didn't write
+    again before it writes the build log of the commit, which deploys the commit to door43.org
+    """
+
+    def __init__(self, webhook, *args, **kwargs):
+        """
+        :param ReconvertWebhook webhook: the one that requested the job
+        :param args: see ClientCallback
+        :param kwargs: see ClientCallback
+        """
+        ClientCallback.__init__(self, *args, **kwargs)
+        self.webhook = webhook
+
+    def upload_build_log(self, build_log_json, s3_base_key, part=''):
+        # the build log of a part of the job doesn't deploy anything, and a failed job keeps the files it had
+        if not part and not self.job.errors:
+            with self.timer.stage('cleanup'):
+                self.webhook.remove_stale_files()
+        return ClientCallback.upload_build_log(self, build_log_json, s3_base_key, part)
+
+
+def reconvert_repo(owner_name, repo_name, settings, timer):
+    """
+    Pushes the latest commit of a repo through the webhook, the converters and the callback again. The files of the
+    commit in the cdn bucket are replaced before the ones the reconversion didn't write are deleted
+    :param string owner_name:
+    :param string repo_name:
+    :param dict settings: see BulkReconverter.get_settings()
+    :param StageTimer timer:
+    :return list: the errors of the conversion
+    """
+    cdn_handler = S3Handler(settings['cdn_bucket'])
+    project_json = cdn_handler.get_json('u/{0}/{1}/project.json'.format(owner_name, repo_name))
+    if not project_json.get('commits'):
+        raise Exception('No commits of {0}/{1} have been converted'.format(owner_name, repo_name))
+    commit_id = project_json['commits'][-1]['id']
+    s3_commit_key = 'u/{0}/{1}/{2}'.format(owner_name, repo_name, commit_id)
+    build_log_key = '{0}/build_log.json'.format(s3_commit_key)
+    old_build_log = cdn_handler.get_json(build_log_key)
+
+    # the converters run in this process, which may be a worker of the pool already
+    tx_manager = TxManager(api_url=settings['api_url'], gogs_url=settings['gogs_url'],
+                           cdn_url='https://{0}'.format(settings['cdn_bucket']), cdn_bucket=settings['cdn_bucket'],
+                           job_table_name=settings['job_table_name'],
+                           module_table_name=settings['module_table_name'],
+                           converter_executor=LocalConverterExecutor(workers=1))
+    webhook = ReconvertWebhook(tx_manager, commit_data=get_commit_data(owner_name, repo_name, commit_id,
+                                                                       old_build_log, settings['gogs_url']),
+                               api_url=settings['api_url'], pre_convert_bucket=settings['pre_convert_bucket'],
+                               cdn_bucket=settings['cdn_bucket'], gogs_url=settings['gogs_url'],
+                               gogs_user_token=settings['gogs_user_token'],
+                               manifest_table_name=settings['manifest_table_name'], priority='bulk',
+                               save_file_hashes=True)
+    webhook.cdn_handler = cdn_handler
+    try:
+        try:
+            webhook.process_webhook()
+        finally:
+            add_timings(timer, webhook.timer.timings)
+            for job in webhook.jobs:
+                add_timings(timer, job.get('timings') or {}, 'convert_')
+    except Exception as e:
+        return ['{0}'.format(e)]
+    finally:
+        tx_manager.converter_executor.close()
+
+    for job in webhook.jobs:
+        callback = ReconvertCallback(webhook, job_data=job, cdn_bucket=settings['cdn_bucket'],
+                                     gogs_url=settings['gogs_url'])
+        callback.cdn_handler = cdn_handler
+        try:
+            callback.process_callback()
+        finally:
+            add_timings(timer, callback.timer.timings, 'callback_')
+    return cdn_handler.get_json(build_log_key).get('errors') or []
+
+
+def add_timings(timer, timings, prefix=''):
+    """
+    :param StageTimer timer:
+    :param dict timings: stage names mapped to milliseconds, which are Decimals if they're from a DynamoDB table
+    :param string prefix: put before the stage names
+    """
+    for stage, milliseconds in timings.items():
+        timer.add(prefix + stage, int(milliseconds))
+
+
+def get_commit_data(owner_name, repo_name, commit_id, build_log, gogs_url):
+    """
+    :param string owner_name:
+    :param string repo_name:
+    :param string commit_id:
+    :param dict build_log: the build log of the last conversion of the commit, if it has one
+    :param string gogs_url:
+    :return dict: the webhook payload of a push of the commit, with what the last build log knows about it
+    """
+    repo_url = '{0}/{1}/{2}'.format(gogs_url, owner_name, repo_name)
+    pusher = build_log.get('committed_by') or owner_name
+    return {
+        'after': commit_id,
+        'commits': [{
+            'id': commit_id,
+            # the archives of the short commit IDs we keep are the same as those of the full ones
+            'url': build_log.get('commit_url') or '{0}/commit/{1}'.format(repo_url, commit_id),
+            'message': build_log.get('commit_message') or 'Reconverted',
+            'author': {'username': pusher}
+        }],
+        'repository': {'name': repo_name, 'owner': {'username': owner_name}},
+        'compare_url': build_log.get('compare_url') or repo_url,
+        'pusher': {'username': pusher}
+    }
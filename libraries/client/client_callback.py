@@ -5,6 +5,7 @@ import tempfile
 import logging
 from libraries.general_tools.file_utils import unzip, write_file, remove_tree, remove
 from libraries.general_tools.url_utils import download_file
+from libraries.general_tools.timer import StageTimer
 from libraries.aws_tools.s3_handler import S3Handler
 from libraries.models.job import TxJob
 
@@ -23,6 +24,7 @@ class ClientCallback(object):
         self.gogs_url = gogs_url
         self.temp_dir = tempfile.mkdtemp(suffix="", prefix="client_callback_")
         self.cdn_handler = None
+        self.timer = StageTimer()
 
     def process_callback(self):
         if not self.cdn_handler:
@@ -51,7 +53,8 @@ class ClientCallback(object):
         download_success = True
         self.logger.debug('Downloading converted zip file from {0}...'.format(converted_zip_url))
         try:
-            download_file(converted_zip_url, converted_zip_file)
+            with self.timer.stage('download'):
+                download_file(converted_zip_url, converted_zip_file)
         except:
             download_success = False  # if multiple project we note fail and move on
             if not multiple_project:
@@ -64,10 +67,12 @@ class ClientCallback(object):
 
         if download_success:
             # Unzip the archive
-            unzip_dir = self.unzip_converted_files(converted_zip_file)
+            with self.timer.stage('unzip'):
+                unzip_dir = self.unzip_converted_files(converted_zip_file)
 
             # Upload all files to the cdn_bucket with the key of <user>/<repo_name>/<commit> of the repo
-            self.upload_converted_files(s3_commit_key, unzip_dir)
+            with self.timer.stage('upload'):
+                self.upload_converted_files(s3_commit_key, unzip_dir)
 
         if multiple_project:
             # Now download the existing build_log.json file, update it and upload it back to S3
@@ -111,6 +116,7 @@ class ClientCallback(object):
             self.job.log = []
             self.job.warnings = []
             self.job.errors = []
+            self.job.timings = {}
             for i in range(0, count):
                 self.logger.debug('Merging part {0}'.format(i))
 
@@ -136,6 +142,9 @@ class ClientCallback(object):
                     self.job.success = build_log_json['success']
                 if ('message' in build_log_json) and (build_log_json['message'] is not None):
                     self.job.message = build_log_json['message']
+                # the conversion took as long as all of its parts
+                for stage, milliseconds in (build_log_json.get('timings') or {}).get('convert', {}).items():
+                    self.job.timings[stage] = self.job.timings.get(stage, 0) + milliseconds
 
             # Now upload the merged build_log.json file, update it and upload it back to S3
             master_build_log_json['build_logs'] = build_logs_json  # add record of all the parts
@@ -260,6 +269,12 @@ class ClientCallback(object):
             build_log_json['errors'] = self.job.errors
         else:
             build_log_json['errors'] = []
+        # timings of the webhook are already in the build log, add the ones of the converter and this callback
+        timings = build_log_json.get('timings') or {}
+        if self.job.timings:
+            timings['convert'] = self.job.timings
+        timings['callback'] = self.timer.timings
+        build_log_json['timings'] = timings
         build_log_key = self.get_build_log_key(s3_base_key, part)
         self.logger.debug('Writing build log to ' + build_log_key)
         # self.logger.debug('build_log contents: ' + json.dumps(build_log_json))
@@ -9,8 +9,11 @@ import json
 from datetime import datetime
 from libraries.general_tools.file_utils import unzip, write_file, add_contents_to_zip, remove_tree
 from libraries.general_tools.url_utils import download_file
+from libraries.general_tools.timer import StageTimer
 from libraries.resource_container.ResourceContainer import RC
 from libraries.client.preprocessors import do_preprocess
+from libraries.client.file_hashes import FileHashes
+from libraries.manager.conversion_cache import ConversionCache
 from libraries.aws_tools.s3_handler import S3Handler
 from libraries.models.manifest import TxManifest
 from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
@@ -20,7 +23,8 @@ class ClientWebhook(object):
     MANIFEST_TABLE_NAME = 'tx-manifest'
 
     def __init__(self, commit_data=None, api_url=None, pre_convert_bucket=None, cdn_bucket=None,
-                 gogs_url=None, gogs_user_token=None, manifest_table_name=None):
+                 gogs_url=None, gogs_user_token=None, manifest_table_name=None, incremental=False, priority=None,
+                 save_file_hashes=False):
         """
         :param dict commit_data:
         :param string api_url:
@@ -28,6 +32,12 @@ class ClientWebhook(object):
         :param string cdn_bucket:
         :param string gogs_url:
         :param string gogs_user_token:
+        :param bool incremental: only convert the files that changed since the last commit of the repo, and copy the
+                                 outputs of the others from it
+        :param string priority: the scheduler lane of the jobs, 'bulk' for redeploys and reconversions (default is
+                                interactive), see JobScheduler
+        :param bool save_file_hashes: save the hashes of the preprocessed files even if not incremental, so the next
+                                      incremental conversion of the repo can reuse the outputs of this one
         """
         self.commit_data = commit_data
         self.api_url = api_url
@@ -36,7 +46,11 @@ class ClientWebhook(object):
         self.gogs_url = gogs_url
         self.gogs_user_token = gogs_user_token
         self.manifest_table_name = manifest_table_name
+        self.incremental = incremental
+        self.priority = priority
+        self.save_file_hashes = save_file_hashes
         self.logger = logging.getLogger()
+        self.timer = StageTimer()
 
         if self.pre_convert_bucket:
             # we use us-west-2 for our s3 buckets
@@ -122,24 +136,48 @@ class ClientWebhook(object):
 
         # Preprocess the files
         output_dir = tempfile.mkdtemp(dir=self.base_temp_dir, prefix='output_')
-        results, preprocessor = do_preprocess(rc, repo_dir, output_dir)
+        with self.timer.stage('preprocess'):
+            results, preprocessor = do_preprocess(rc, repo_dir, output_dir)
 
         # 3) Zip up the massaged files
         # commit_id is a unique ID for this lambda call, so using it to not conflict with other requests
         zip_filepath = tempfile.mktemp(dir=self.base_temp_dir, suffix='.zip')
         self.logger.debug('Zipping files from {0} to {1}...'.format(output_dir, zip_filepath))
-        add_contents_to_zip(zip_filepath, output_dir)
+        with self.timer.stage('zip'):
+            add_contents_to_zip(zip_filepath, output_dir)
         self.logger.debug('finished.')
 
+        # The zip has the files' modification times in it, so identify its content by the hashes of the files
+        with self.timer.stage('hash'):
+            file_hashes = FileHashes.from_dir(output_dir)
+
         # 4) Upload zipped file to the S3 bucket
-        file_key = self.upload_zip_file(commit_id, zip_filepath)
+        with self.timer.stage('upload'):
+            file_key = self.upload_zip_file(commit_id, zip_filepath, file_hashes.get_content_hash())
 
-        if not preprocessor.isMultipleJobs():
-            # Send job request to tx-manager
-            identifier, job = self.send_job_request_to_tx_manager(commit_id, file_key, rc, repo_name, repo_owner)
+        # clear out the commit directory before any conversion can put files in it
+        master_identifier = self.create_new_job_id(repo_owner, repo_name, commit_id)
+        master_s3_commit_key = 'u/{0}'.format(master_identifier)
+        self.clear_commit_directory_in_cdn(master_s3_commit_key)
 
+        changed = None
+        if self.incremental:
+            with self.timer.stage('reuse'):
+                changed = self.reuse_unchanged_outputs(file_hashes, repo_owner, repo_name, commit_id,
+                                                       master_s3_commit_key)
+        elif self.save_file_hashes:
+            file_hashes.save(self.cdn_handler, master_s3_commit_key)
+
+        books = preprocessor.getBookList() if preprocessor.isMultipleJobs() else []
+        if changed is not None:
+            books = [book for book in books if book in changed]
+
+        if not preprocessor.isMultipleJobs() or (changed is not None and len(books) < 2):
+            # Send job request to tx-manager, which still copies the files that aren't converted if none changed
+            if changed is not None:
+                file_key = self.build_convert_only_source(file_key, changed)
+            identifier, job = self.send_job_request_to_tx_manager(commit_id, file_key, rc, repo_name, repo_owner)
             s3_commit_key = 'u/{0}'.format(identifier)
-            self.clear_commit_directory_in_cdn(s3_commit_key)
 
             # Download the project.json file for this repo (create it if doesn't exist) and update it
             self.update_project_json(commit_id, job, repo_name, repo_owner)
@@ -147,6 +185,7 @@ class ClientWebhook(object):
             # Compile data for build_log.json
             build_log_json = self.create_build_log(commit_id, commit_message, commit_url, compare_url, job,
                                                    pusher_username, repo_name, repo_owner)
+            build_log_json['timings'] = {'webhook': self.timer.timings}
 
             # Upload build_log.json to S3:
             self.upload_build_log_to_s3(build_log_json, s3_commit_key)
@@ -160,16 +199,11 @@ class ClientWebhook(object):
         # multiple book project
         # -------------------------
 
-        books = preprocessor.getBookList()
         self.logger.debug('Splitting job into separate parts for books: ' + ','.join(books))
         errors = []
         build_logs = []
         jobs = []
 
-        master_identifier = self.create_new_job_id(repo_owner, repo_name, commit_id)
-        master_s3_commit_key = 'u/{0}'.format(master_identifier)
-        self.clear_commit_directory_in_cdn(master_s3_commit_key)
-
         book_count = len(books)
         last_job_id = 0
         for i in range(0, book_count):
@@ -213,6 +247,7 @@ class ClientWebhook(object):
             build_log = build_logs[i]
             errors += build_log['errors']
         build_logs_json['errors'] = errors
+        build_logs_json['timings'] = {'webhook': self.timer.timings}
 
         # Upload build_log.json to S3:
         self.upload_build_log_to_s3(build_logs_json, master_s3_commit_key)
@@ -223,10 +258,57 @@ class ClientWebhook(object):
             return build_logs_json
 
     def build_multipart_source(self, file_key, book):
-        params = urllib.urlencode({'convert_only': book})
+        return self.build_convert_only_source(file_key, [book])
+
+    def build_convert_only_source(self, file_key, filenames):
+        """
+        :param string file_key:
+        :param list filenames: the names of the only files to convert, none if it's empty
+        :return string:
+        """
+        params = urllib.urlencode({'convert_only': ','.join(filenames)})
         source_url = '{0}?{1}'.format(file_key, params)
         return source_url
 
+    def reuse_unchanged_outputs(self, file_hashes, repo_owner, repo_name, commit_id, s3_commit_key):
+        """
+        Saves the hashes of the preprocessed files of the commit, and copies the outputs of the files that are the same
+        as in the last commit of the repo over from it
+        :param FileHashes file_hashes: the hashes of the preprocessed files
+        :param string repo_owner:
+        :param string repo_name:
+        :param string commit_id:
+        :param string s3_commit_key:
+        :return list: the names of the files that still have to be converted, None if all of them do
+        """
+        file_hashes.save(self.cdn_handler, s3_commit_key)
+
+        project_json = self.cdn_handler.get_json('u/{0}/{1}/project.json'.format(repo_owner, repo_name))
+        previous_commit_ids = [c['id'] for c in project_json.get('commits', []) if c['id'] != commit_id]
+        if not previous_commit_ids:
+            return None
+        previous_s3_commit_key = 'u/{0}'.format(self.create_new_job_id(repo_owner, repo_name,
+                                                                      previous_commit_ids[-1]))
+        previous_file_hashes = FileHashes.load(self.cdn_handler, previous_s3_commit_key)
+        if not previous_file_hashes:
+            return None
+
+        prefix = previous_s3_commit_key + '/'
+        previous_outputs = set(obj.key[len(prefix):] for obj in self.cdn_handler.get_objects(prefix=prefix))
+        unchanged = file_hashes.get_unchanged(previous_file_hashes, previous_outputs)
+        changed = file_hashes.get_changed(unchanged)
+        copied = 0
+        for path in unchanged:
+            for output in file_hashes.files[path]['outputs']:
+                if not self.cdn_handler.copy(prefix + output, to_key='{0}/{1}'.format(s3_commit_key, output)):
+                    changed.append(path)  # convert it after all
+                    break
+            else:
+                copied += 1
+        self.logger.debug('Copied the outputs of {0} unchanged files from {1}, converting {2} files'.format(
+            copied, previous_s3_commit_key, len(changed)))
+        return sorted(set(os.path.basename(path) for path in changed))
+
     def clear_commit_directory_in_cdn(self, s3_commit_key):
         # clear out the commit directory in the cdn bucket for this project revision
         for obj in self.cdn_handler.get_objects(prefix=s3_commit_key):
@@ -279,11 +361,18 @@ class ClientWebhook(object):
         write_file(project_file, project_json)
         self.cdn_handler.upload_file(project_file, project_json_key)
 
-    def upload_zip_file(self, commit_id, zip_filepath):
+    def upload_zip_file(self, commit_id, zip_filepath, content_hash=None):
+        """
+        :param string commit_id:
+        :param string zip_filepath:
+        :param string content_hash: see FileHashes.get_content_hash(), kept with the zip for the conversion cache
+        :return string: the key of the zip in the pre-convert bucket
+        """
         file_key = 'preconvert/{0}.zip'.format(commit_id)
         self.logger.debug('Uploading {0} to {1}/{2}...'.format(zip_filepath, self.pre_convert_bucket, file_key))
+        metadata = {ConversionCache.CONTENT_HASH_METADATA: content_hash} if content_hash else None
         try:
-            self.preconvert_handler.upload_file(zip_filepath, file_key)
+            self.preconvert_handler.upload_file(zip_filepath, file_key, metadata=metadata)
         except Exception as e:
             self.logger.error('Failed to upload zipped repo up to server')
             self.logger.exception(e)
@@ -318,6 +407,8 @@ class ClientWebhook(object):
             "source": source_url,
             "callback": callback_url
         }
+        if self.priority:
+            payload["priority"] = self.priority
         return self.add_payload_to_tx_converter(callback_url, identifier, payload, rc, source_url, tx_manager_job_url)
 
     def create_new_job_id(self, repo_owner, repo_name, commit_id, count=0, part=0, book=None):
@@ -402,13 +493,15 @@ class ClientWebhook(object):
             if os.path.isfile(repo_zip_file):
                 os.remove(repo_zip_file)
 
-            download_file(repo_zip_url, repo_zip_file)
+            with self.timer.stage('download'):
+                download_file(repo_zip_url, repo_zip_file)
         finally:
             self.logger.debug('finished.')
 
         try:
             self.logger.debug('Unzipping {0}...'.format(repo_zip_file))
-            unzip(repo_zip_file, repo_dir)
+            with self.timer.stage('unzip'):
+                unzip(repo_zip_file, repo_dir)
         finally:
             self.logger.debug('finished.')
 
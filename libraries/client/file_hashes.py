@@ -0,0 +1,123 @@
+from __future__ import print_function, unicode_literals
+import hashlib
+import json
+import os
+from libraries.converters.converter import Converter
+
+
+class FileHashes(object):
+    """
+    The hashes of the preprocessed files of a commit, mapped to the files converting them puts in the cdn bucket.
+    They are kept in u/<owner>/<repo>/<commit>/file_hashes.json, so the next commit of the repo only has to convert
+    the files that changed and can copy the output of the others.
+
+    Only the files the converters turn into HTML have outputs, every other file is copied to the output of each
+    conversion anyway. A change to a converter or the preprocessors isn't noticed, reconvert everything after one.
+    """
+    FILE_NAME = 'file_hashes.json'
+    VERSION = 1
+    CONVERTED_EXTENSIONS = ['.md', '.usfm']
+    BLOCK_SIZE = 65536
+
+    def __init__(self, files=None):
+        """
+        :param dict files: paths relative to the preprocessed dir mapped to a dict of their `hash` and `outputs`
+        """
+        self.files = files or {}
+
+    @staticmethod
+    def get_key(s3_commit_key):
+        """
+        :param string s3_commit_key: e.g. u/<owner>/<repo>/<commit>
+        :return string:
+        """
+        return '{0}/{1}'.format(s3_commit_key, FileHashes.FILE_NAME)
+
+    @staticmethod
+    def hash_file(path):
+        """
+        :param string path:
+        :return string: the SHA-1 of the file's content
+        """
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as in_file:
+            for block in iter(lambda: in_file.read(FileHashes.BLOCK_SIZE), b''):
+                sha1.update(block)
+        return sha1.hexdigest()
+
+    @staticmethod
+    def get_outputs(path):
+        """
+        :param string path: a preprocessed file
+        :return list: the names of the files converting it gives, like the converters name them
+        """
+        filename = os.path.basename(path)
+        base_name, extension = os.path.splitext(filename)
+        if extension not in FileHashes.CONVERTED_EXTENSIONS or filename.lower() in Converter.EXCLUDED_FILES:
+            return []
+        return [base_name + '.html']
+
+    @classmethod
+    def from_dir(cls, directory):
+        """
+        :param string directory: the preprocessed files
+        :return FileHashes:
+        """
+        files = {}
+        for root, dirs, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, directory).replace(os.sep, '/')
+                files[name] = {'hash': cls.hash_file(path), 'outputs': cls.get_outputs(name)}
+        return cls(files)
+
+    @classmethod
+    def load(cls, cdn_handler, s3_commit_key):
+        """
+        :param S3Handler cdn_handler:
+        :param string s3_commit_key:
+        :return FileHashes: None if the commit has no file hashes, or ones of another version
+        """
+        data = cdn_handler.get_json(cls.get_key(s3_commit_key))
+        if not data or data.get('version') != cls.VERSION:
+            return None
+        return cls(data['files'])
+
+    def save(self, cdn_handler, s3_commit_key):
+        """
+        :param S3Handler cdn_handler:
+        :param string s3_commit_key:
+        """
+        cdn_handler.put_contents(self.get_key(s3_commit_key), json.dumps({'version': self.VERSION, 'files': self.files}))
+
+    def get_content_hash(self):
+        """
+        :return string: the SHA-1 of the names and hashes of all the files, which unlike a zip of them doesn't change
+                        with their modification times
+        """
+        sha1 = hashlib.sha1()
+        for path in sorted(self.files):
+            sha1.update('{0}:{1}\n'.format(path, self.files[path]['hash']).encode('utf-8'))
+        return sha1.hexdigest()
+
+    def get_unchanged(self, previous, previous_outputs):
+        """
+        :param FileHashes previous: the file hashes of an earlier commit
+        :param set previous_outputs: the names of the files in the cdn bucket for the earlier commit
+        :return list: the files with outputs that are the same as in the earlier commit, whose outputs it still has
+        """
+        unchanged = []
+        for path, entry in self.files.items():
+            previous_entry = previous.files.get(path)
+            if entry['outputs'] and previous_entry and previous_entry['hash'] == entry['hash'] and \
+                    all(output in previous_outputs for output in entry['outputs']):
+                unchanged.append(path)
+        return sorted(unchanged)
+
+    def get_changed(self, unchanged):
+        """
+        :param list unchanged: see get_unchanged()
+        :return list: the other files with outputs
+        """
+        unchanged = set(unchanged)
+        return sorted(path for path, entry in self.files.items() if entry['outputs'] and path not in unchanged)
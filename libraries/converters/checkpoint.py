@@ -0,0 +1,100 @@
+from __future__ import print_function, unicode_literals
+import json
+from libraries.aws_tools.s3_handler import S3Handler
+
+
+class ConversionPaused(Exception):
+    """
+    Raised by a converter that ran out of time, after its finished units have been kept in its checkpoint
+    """
+    pass
+
+
+class Checkpoint(object):
+    """
+    Keeps the units (books, files) a converter has finished in S3, so that when a Lambda function runs out of time
+    another invocation can pick up where it stopped instead of starting over.
+
+    The finished units are only kept in memory until the converter pauses, then `<prefix>/output.zip` gets the
+    output so far and `<prefix>/state.json` lists the units along with the converter's log and timings, so each
+    invocation writes the checkpoint once however many units it converts.
+    """
+    PREFIX = 'tx/checkpoint'
+    CHUNK_BYTES = 1024 * 1024
+
+    def __init__(self, bucket, prefix):
+        """
+        :param string bucket:
+        :param string prefix: where to keep the checkpoint, see get_prefix()
+        """
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/')
+        self.state = {'units': [], 'logs': None, 'timings': {}}
+        self.s3_handler = None
+        self.setup_resources()
+
+    def setup_resources(self):
+        self.s3_handler = S3Handler(self.bucket)
+
+    @staticmethod
+    def get_prefix(job_id):
+        """
+        :param string job_id:
+        :return string:
+        """
+        return '{0}/{1}'.format(Checkpoint.PREFIX, job_id)
+
+    def get_state_key(self):
+        return '{0}/state.json'.format(self.prefix)
+
+    def get_output_key(self):
+        return '{0}/output.zip'.format(self.prefix)
+
+    def load(self):
+        """
+        :return bool: True if an earlier invocation left a checkpoint
+        """
+        state = self.s3_handler.get_json(self.get_state_key())
+        if not state:
+            return False
+        self.state = state
+        return True
+
+    def is_done(self, unit):
+        """
+        :param string unit:
+        :return bool:
+        """
+        return unit in self.state['units']
+
+    def restore(self, output_file):
+        """
+        Downloads the output of the finished units
+        :param file output_file: open file to write the output zip to
+        """
+        body = self.s3_handler.get_object(self.get_output_key()).get()['Body']
+        for chunk in iter(lambda: body.read(Checkpoint.CHUNK_BYTES), b''):
+            output_file.write(chunk)
+
+    def add_unit(self, unit):
+        """
+        Counts a unit as finished, it's kept with the next save()
+        :param string unit:
+        """
+        self.state['units'].append(unit)
+
+    def save(self, logs, timings, output_file):
+        """
+        :param dict logs: the converter's log so far
+        :param dict timings: the converter's timings so far
+        :param file output_file: the output zip of the finished units, open at its start
+        """
+        self.s3_handler.upload_fileobj(output_file, self.get_output_key(), 0)
+        self.state['logs'] = logs
+        self.state['timings'] = timings
+        self.s3_handler.put_contents(self.get_state_key(), json.dumps(self.state), catch_exception=False)
+
+    def clear(self):
+        for obj in self.s3_handler.get_objects(prefix=self.prefix + '/'):
+            self.s3_handler.delete_file(obj.key)
+        self.state = {'units': [], 'logs': None, 'timings': {}}
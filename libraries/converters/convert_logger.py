@@ -24,3 +24,12 @@ class ConvertLogger(object):
 
     def info(self, msg):
         self.log("info", msg)
+
+    def add_logs(self, logs):
+        """
+        Adds the messages of another logger, e.g. of a worker process
+        :param dict logs: the other logger's logs
+        """
+        for type in ["error", "info", "warning"]:
+            for msg in logs.get(type, []):
+                self.log(type, msg)
@@ -1,10 +1,17 @@
 from __future__ import print_function, unicode_literals
 import os
+import time
+import urlparse
+import multiprocessing
+import codecs
 import tempfile
+import zipfile
 from libraries.aws_tools.s3_handler import S3Handler
 from libraries.general_tools.url_utils import download_file
-from libraries.general_tools.file_utils import unzip, add_contents_to_zip, remove_tree, remove
-from shutil import copy
+from libraries.general_tools.file_utils import unzip, add_contents_to_zip, remove_tree, remove, write_file
+from libraries.general_tools.timer import StageTimer
+from libraries.converters.checkpoint import ConversionPaused
+from shutil import copy, copyfile, copyfileobj
 import logging
 from convert_logger import ConvertLogger
 from abc import ABCMeta, abstractmethod
@@ -14,8 +21,27 @@ class Converter(object):
     __metaclass__ = ABCMeta
 
     EXCLUDED_FILES = ["license.md", "package.json", "project.json", 'readme.md']
+    # Sources with more bytes than this once unzipped are converted on disk, even if in_memory is set
+    MAX_IN_MEMORY_BYTES = 200 * 1024 * 1024
+    # The output zip moves from memory to a temp file once it gets bigger than this
+    SPOOL_BYTES = 100 * 1024 * 1024
+    MAX_WORKERS = 8
 
-    def __init__(self, source, resource, cdn_bucket=None, cdn_file=None, options=None):
+    def __init__(self, source, resource, cdn_bucket=None, cdn_file=None, options=None, checkpoint=None,
+                 deadline=None, in_memory=False, workers=1):
+        """
+        :param string source: URL of the source zip, which only asks for some of its files to be converted if it
+                              ends with ?convert_only=<file name>,<file name>...
+        :param string resource:
+        :param string cdn_bucket:
+        :param string cdn_file:
+        :param dict options:
+        :param Checkpoint checkpoint: if set, keeps the finished units so another invocation can resume the conversion
+        :param float deadline: the time.time() by which the conversion pauses, if it has a checkpoint
+        :param bool in_memory: if set, reads the source straight from its zip and writes the output to a zip in
+                               memory instead of going through files_dir and output_dir, see open_zips()
+        :param int workers: how many processes convert files at once, up to MAX_WORKERS, 0 for one per core
+        """
         self.log = ConvertLogger()
         self.options = {}
         self.source = source
@@ -24,10 +50,27 @@ class Converter(object):
         self.cdn_file = cdn_file
         self.options = options
         self.logger = logging.getLogger()
+        self.timer = StageTimer()
+        self.checkpoint = checkpoint
+        self.deadline = deadline
+        self.units_converted = 0
+        self.in_memory = in_memory
+        self.input_zip = None  # the source ZipFile when converting in memory
+        self.input_members = {}  # paths in files_dir mapped to their members of input_zip
+        self.output_zip = None  # the output ZipFile when converting in memory
+        self.output_buffer = None
+        self.workers = workers
+        self.convert_only = None  # the names of the only files to convert, if the source asks for some
 
         if not self.options:
             self.options = {}
 
+        parsed = urlparse.urlparse(source or '')
+        params = dict(urlparse.parse_qsl(parsed.query, keep_blank_values=True))
+        if 'convert_only' in params:
+            self.convert_only = [name for name in params['convert_only'].split(',') if name]
+            self.source = urlparse.urlunparse((parsed.scheme, parsed.netloc, parsed.path, '', '', ''))
+
         self.download_dir = tempfile.mkdtemp(prefix='download_')
         self.files_dir = tempfile.mkdtemp(prefix='files_')
         self.input_zip_file = None  # If set, won't download the repo archive. Used for testing
@@ -36,6 +79,7 @@ class Converter(object):
 
     def close(self):
         """delete temp files"""
+        self.close_zips()
         remove_tree(self.download_dir)
         remove_tree(self.files_dir)
         remove_tree(self.output_dir)
@@ -56,42 +100,300 @@ class Converter(object):
         Call the converters
         """
         success = False
+        paused = False
         try:
+            if self.checkpoint:
+                self.load_checkpoint()
             if not self.input_zip_file or not os.path.exists(self.input_zip_file):
                 # No input zip file yet, so we need to download the archive
-                self.download_archive()
-            # unzip the input archive
-            self.logger.debug("Unzipping {0} to {1}".format(self.input_zip_file, self.files_dir))
-            unzip(self.input_zip_file, self.files_dir)
-            remove(self.input_zip_file)
+                with self.timer.stage('download'):
+                    self.download_archive()
+            if self.in_memory and self.fits_in_memory():
+                self.logger.debug("Converting {0} in memory".format(self.input_zip_file))
+                with self.timer.stage('unzip'):
+                    self.open_zips()
+            else:
+                # unzip the input archive
+                self.logger.debug("Unzipping {0} to {1}".format(self.input_zip_file, self.files_dir))
+                with self.timer.stage('unzip'):
+                    unzip(self.input_zip_file, self.files_dir)
+                    remove(self.input_zip_file)
+            if self.checkpoint and self.checkpoint.state['units']:
+                self.restore_output()
             # convert method called
             self.logger.debug("Converting files...")
-            if self.convert():
+            with self.timer.stage('convert'):
+                converted = self.convert()
+            if converted:
                 self.logger.debug("Was able to convert {0}".format(self.resource))
-                # zip the output dir to the output archive
-                self.logger.debug("Adding files in {0} to {1}".format(self.output_dir, self.output_zip_file))
-                add_contents_to_zip(self.output_zip_file, self.output_dir)
-                remove_tree(self.output_dir)
+                if self.output_zip:
+                    # the output archive only needs finishing
+                    with self.timer.stage('zip'):
+                        self.output_zip.close()
+                        self.output_zip = None
+                        self.input_zip.close()
+                        self.input_zip = None
+                        remove(self.input_zip_file)
+                else:
+                    # zip the output dir to the output archive
+                    self.logger.debug("Adding files in {0} to {1}".format(self.output_dir, self.output_zip_file))
+                    with self.timer.stage('zip'):
+                        add_contents_to_zip(self.output_zip_file, self.output_dir)
+                        remove_tree(self.output_dir)
                 # upload the output archive either to cdn_bucket or to a file (no cdn_bucket)
                 self.logger.debug("Uploading archive to {0}/{1}".format(self.cdn_bucket, self.cdn_file))
-                self.upload_archive()
-                remove(self.output_zip_file)
+                with self.timer.stage('upload'):
+                    self.upload_archive()
+                    remove(self.output_zip_file)
+                    self.close_zips()
                 self.logger.debug("Uploaded")
                 success = True
             else:
                 self.log.error('Resource {0} currently not supported.'.format(self.resource))
+        except ConversionPaused:
+            self.logger.debug('Out of time after converting {0} units'.format(self.units_converted))
+            self.save_checkpoint()
+            paused = True
         except Exception as e:
                 self.log.error('Conversion process ended abnormally: {0}'.format(e.message))
 
+        if self.checkpoint and not paused:
+            try:
+                self.checkpoint.clear()
+            except Exception as e:
+                self.logger.warning('Could not clear the checkpoint: {0}'.format(e))
+
         result = {
             'success': success and len(self.log.logs['error']) == 0,
             'info': self.log.logs['info'],
             'warnings': self.log.logs['warning'],
-            'errors': self.log.logs['error']
+            'errors': self.log.logs['error'],
+            'timings': self.timer.timings
         }
+        if paused:
+            # the rest of the conversion is up to another invocation with the same checkpoint
+            result['paused'] = True
         self.logger.debug(result)
         return result
 
+    def load_checkpoint(self):
+        """
+        Picks up the finished units, log and timings of earlier invocations
+        """
+        with self.timer.stage('checkpoint'):
+            if not self.checkpoint.load():
+                return
+        self.log.logs = self.checkpoint.state['logs'] or self.log.logs
+        for name, milliseconds in self.checkpoint.state['timings'].items():
+            self.timer.add(name, milliseconds)
+        self.logger.debug('Resuming after {0} units'.format(len(self.checkpoint.state['units'])))
+
+    def restore_output(self):
+        """
+        Puts the output of the units earlier invocations finished in the output dir, or when converting in memory
+        continues the output zip from it
+        """
+        with self.timer.stage('checkpoint'):
+            if self.output_zip:
+                self.output_zip.close()
+                self.output_buffer.seek(0)
+                self.output_buffer.truncate()
+                self.checkpoint.restore(self.output_buffer)
+                self.output_zip = zipfile.ZipFile(self.output_buffer, 'a')
+                return
+            with open(self.output_zip_file, 'wb') as output_file:
+                self.checkpoint.restore(output_file)
+            unzip(self.output_zip_file, self.output_dir)
+            remove(self.output_zip_file)
+
+    def save_checkpoint(self):
+        """
+        Keeps the output of the finished units in the checkpoint for the next invocation, which when converting in
+        memory is the output zip so far
+        """
+        with self.timer.stage('checkpoint'):
+            if self.output_zip:
+                self.output_zip.close()
+                self.output_zip = None
+                self.output_buffer.seek(0)
+                self.checkpoint.save(self.log.logs, self.timer.timings, self.output_buffer)
+                return
+            add_contents_to_zip(self.output_zip_file, self.output_dir)
+            with open(self.output_zip_file, 'rb') as output_file:
+                self.checkpoint.save(self.log.logs, self.timer.timings, output_file)
+            remove(self.output_zip_file)
+
+    def is_converted(self, unit):
+        """
+        :param string unit: e.g. the book or file name
+        :return bool: True if an earlier invocation converted the unit, whose output is already in the output dir
+        """
+        return bool(self.checkpoint) and self.checkpoint.is_done(unit)
+
+    def should_convert(self, path):
+        """
+        :param string path: a file from get_files()
+        :return bool: False if the source only asks for other files to be converted
+        """
+        return self.convert_only is None or os.path.basename(path) in self.convert_only
+
+    def check_time(self):
+        """
+        Pauses the conversion once it's out of time, as long as it got something done
+        """
+        if self.checkpoint and self.deadline and self.units_converted and time.time() > self.deadline:
+            raise ConversionPaused()
+
+    def finish_unit(self, unit):
+        """
+        :param string unit: one whose output is all written
+        """
+        self.units_converted += 1
+        if self.checkpoint:
+            self.checkpoint.add_unit(unit)
+
+    def fits_in_memory(self):
+        """
+        :return bool: True if the unzipped source isn't too big to convert in memory
+        """
+        try:
+            with zipfile.ZipFile(self.input_zip_file) as zf:
+                size = sum(info.file_size for info in zf.infolist())
+        except zipfile.BadZipfile:
+            return False  # let unzip() complain about it
+        if size > Converter.MAX_IN_MEMORY_BYTES:
+            self.logger.debug('{0} bytes unzipped is too big to convert in memory'.format(size))
+            return False
+        return True
+
+    def open_zips(self):
+        """
+        Converts in memory from here on: the source is read straight from its zip, and the output is written to a zip
+        spooled in memory, which is streamed to S3. get_files() returns where the files would be in files_dir, which
+        subclasses read through read_file() and extract_file(), and they write through write_output() and
+        copy_to_output() instead of to the output_dir.
+        """
+        self.input_zip = zipfile.ZipFile(self.input_zip_file)
+        for info in self.input_zip.infolist():
+            name = info.filename
+            if not isinstance(name, unicode):
+                name = name.decode('utf-8')
+            if not name.endswith('/'):
+                self.input_members[os.path.join(self.files_dir, name)] = info
+        self.output_buffer = tempfile.SpooledTemporaryFile(max_size=Converter.SPOOL_BYTES, prefix='output_')
+        self.output_zip = zipfile.ZipFile(self.output_buffer, 'w')
+
+    def close_zips(self):
+        if self.input_zip:
+            self.input_zip.close()
+            self.input_zip = None
+            self.input_members = {}
+        if self.output_zip:
+            self.output_zip.close()
+            self.output_zip = None
+        if self.output_buffer:
+            self.output_buffer.close()
+            self.output_buffer = None
+
+    def read_file(self, path):
+        """
+        :param string path: a file from get_files()
+        :return unicode: the contents of the file
+        """
+        if self.input_zip:
+            return self.input_zip.read(self.input_members[path]).decode('utf-8-sig')
+        with codecs.open(path, 'r', 'utf-8-sig') as in_file:
+            return in_file.read()
+
+    def extract_file(self, path, directory):
+        """
+        Copies a file from get_files() to a directory, for tools that only read files
+        :param string path:
+        :param string directory:
+        :return string: the path of the copy
+        """
+        destination = os.path.join(directory, os.path.basename(path))
+        if self.input_zip:
+            with open(destination, 'wb') as out_file:
+                copyfileobj(self.input_zip.open(self.input_members[path]), out_file)
+        else:
+            copyfile(path, destination)
+        return destination
+
+    def write_output(self, filename, contents):
+        """
+        :param string filename: the name of the file in the output
+        :param unicode contents:
+        :return string: the path of the file in the output_dir, None if converting in memory
+        """
+        if self.output_zip:
+            self.output_zip.writestr(filename, contents.encode('utf-8'))
+            return None
+        output_file = os.path.join(self.output_dir, filename)
+        write_file(output_file, contents)
+        return output_file
+
+    def copy_to_output(self, path):
+        """
+        Copies a file from get_files() to the output as it is, unless there already is one with the same name
+        :param string path:
+        """
+        filename = os.path.basename(path)
+        if self.output_zip:
+            try:
+                self.output_zip.getinfo(filename)
+            except KeyError:
+                self.output_zip.writestr(filename, self.input_zip.read(self.input_members[path]))
+            return
+        output_file = os.path.join(self.output_dir, filename)
+        if not os.path.exists(output_file):
+            copyfile(path, output_file)
+
+    def get_worker_count(self, count):
+        """
+        :param int count: how many files there are to convert
+        :return int: how many worker processes to convert them in
+        """
+        workers = self.workers
+        if not workers:
+            try:
+                workers = multiprocessing.cpu_count()
+            except NotImplementedError:
+                workers = 1
+        return max(min(workers, Converter.MAX_WORKERS, count), 1)
+
+    def map_in_workers(self, function, items):
+        """
+        Yields function(item) for each of the items, in their order, calling it in a pool of worker processes if
+        there are workers and falling back to this process where there can't be a pool, like on AWS Lambda
+        :param function: a module level function, so it can be pickled
+        :param list items:
+        """
+        workers = self.get_worker_count(len(items))
+        pool = None
+        if workers > 1:
+            try:
+                pool = multiprocessing.Pool(workers)
+            except (OSError, ImportError) as e:
+                self.logger.debug('Converting in this process, could not start workers: {0}'.format(e))
+        if not pool:
+            for item in items:
+                yield function(item)
+            return
+        self.logger.debug('Converting {0} files in {1} workers'.format(len(items), workers))
+        finished = False
+        try:
+            chunk_size = max(len(items) // (workers * 4), 1)
+            for result in pool.imap(function, items, chunk_size):
+                yield result
+            finished = True
+        finally:
+            if finished:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
     def download_archive(self):
         archive_url = self.source
         filename = self.source.rpartition('/')[2]
@@ -104,13 +406,24 @@ class Converter(object):
                     raise Exception("Failed to download {0}".format(archive_url))
 
     def upload_archive(self):
-        if self.cdn_bucket:
+        if self.output_buffer:
+            self.output_buffer.seek(0)
+            if self.cdn_bucket:
+                cdn_handler = S3Handler(self.cdn_bucket)
+                cdn_handler.upload_fileobj(self.output_buffer, self.cdn_file)
+            elif self.cdn_file and os.path.isdir(os.path.dirname(self.cdn_file)):
+                with open(self.cdn_file, 'wb') as out_file:
+                    copyfileobj(self.output_buffer, out_file)
+        elif self.cdn_bucket:
             cdn_handler = S3Handler(self.cdn_bucket)
             cdn_handler.upload_file(self.output_zip_file, self.cdn_file)
         elif self.cdn_file and os.path.isdir(os.path.dirname(self.cdn_file)):
             copy(self.output_zip_file, self.cdn_file)
 
     def get_files(self):
+        if self.input_zip:
+            return [path for path in sorted(self.input_members)
+                    if os.path.basename(path).lower() not in Converter.EXCLUDED_FILES]
         files = []
         for root, dirs, filenames in os.walk(self.files_dir):
             for filename in filenames:
@@ -2,11 +2,9 @@ from __future__ import print_function, unicode_literals
 import os
 import string
 import markdown2
-import codecs
-from shutil import copyfile
 from bs4 import BeautifulSoup
-from libraries.general_tools.file_utils import write_file
 from converter import Converter
+from convert_logger import ConvertLogger
 from libraries.door43_tools.obs_handler import OBSInspection
 from libraries.door43_tools.obs_data import obs_data
 
@@ -29,40 +27,38 @@ class Md2HtmlConverter(Converter):
 
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, 'templates', 'template.html')) as template_file:
-            html_template = string.Template(template_file.read())
+            template = template_file.read()
 
         found_chapters = {}
+        md_files = []
 
         for filename in files:
             if filename.endswith('.md'):
-                # Convert files that are markdown files
-                with codecs.open(filename, 'r', 'utf-8-sig') as md_file:
-                    md = md_file.read()
-                html = markdown2.markdown(md)
-                html = html_template.safe_substitute(title=self.resource.upper(), content=html)
                 base_name = os.path.splitext(os.path.basename(filename))[0]
                 found_chapters[base_name] = True
-                html_filename = base_name + ".html"
-                output_file = os.path.join(self.output_dir, html_filename)
-                write_file(output_file, html)
-                self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename), os.path.basename(html_filename)))
-
-                # Do the OBS inspection (this now operates on a single file instead of folder)
-                # QUESTION: Should this be done separately after conversion????
-                inspector = OBSInspection(output_file, self.log)
-                try:
-                    inspector.run()
-                except Exception as e:
-                    self.log.warning('Chapter {0}: failed to run OBS inspector: {1}'.format(base_name, e.message))
+                if not self.should_convert(filename):
+                    continue
+                if self.is_converted(os.path.relpath(filename, self.files_dir)):
+                    continue  # an earlier invocation converted this file
+                md_files.append(filename)
             else:
                 # Directly copy over files that are not markdown files
                 try:
-                    output_file = os.path.join(self.output_dir, os.path.basename(filename))
-                    if not os.path.exists(output_file):
-                        copyfile(filename, output_file)
+                    self.copy_to_output(filename)
                 except:
                     pass
 
+        # Convert files that are markdown files, in worker processes if there are any
+        items = [(self.read_file(filename), self.resource.upper(), template, os.path.basename(filename))
+                 for filename in md_files]
+        for filename, (html, logs) in zip(md_files, self.map_in_workers(convert_obs_file, items)):
+            self.check_time()
+            html_filename = os.path.splitext(os.path.basename(filename))[0] + ".html"
+            self.write_output(html_filename, html)
+            self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename), os.path.basename(html_filename)))
+            self.log.add_logs(logs)
+            self.finish_unit(os.path.relpath(filename, self.files_dir))
+
         for chapter in sorted(obs_data['chapters']): # verify all expected chapters are present
             found_chapter = found_chapters.get(chapter)
             if not found_chapter:
@@ -77,39 +73,74 @@ class Md2HtmlConverter(Converter):
 
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, 'templates', 'template.html')) as template_file:
-            html_template = string.Template(template_file.read())
+            template = template_file.read()
 
-        found_chapters = {}
+        md_files = []
 
         for filename in files:
             if filename.endswith('.md'):
-                # Convert files that are markdown files
-                with codecs.open(filename, 'r', 'utf-8-sig') as md_file:
-                    md = md_file.read()
-                html = markdown2.markdown(md, extras=['markdown-in-html', 'tables'])
-                html = html_template.safe_substitute(title=self.resource.upper(), content=html)
-
-                # Change headers like <h1><a id="verbs"/>Verbs</h1> to <h1 id="verbs">Verbs</h1>
-                soup = BeautifulSoup(html, 'html.parser')
-                for tag in soup.findAll('a', {'id': True}):
-                    if tag.parent and tag.parent.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                        tag.parent['id'] = tag['id']
-                        tag.parent['class'] = tag.parent.get('class', []) + ['section-header']
-                        tag.extract()
-                html = unicode(soup)
-
-                base_name = os.path.splitext(os.path.basename(filename))[0]
-                found_chapters[base_name] = True
-                html_filename = base_name + ".html"
-                output_file = os.path.join(self.output_dir, html_filename)
-                write_file(output_file, html)
-                self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename), os.path.basename(html_filename)))
+                if not self.should_convert(filename):
+                    continue
+                if self.is_converted(os.path.relpath(filename, self.files_dir)):
+                    continue  # an earlier invocation converted this file
+                md_files.append(filename)
             else:
                 # Directly copy over files that are not markdown files
                 try:
-                    output_file = os.path.join(self.output_dir, os.path.basename(filename))
-                    if not os.path.exists(output_file):
-                        copyfile(filename, output_file)
+                    self.copy_to_output(filename)
                 except:
                     pass
+
+        # Convert files that are markdown files, in worker processes if there are any
+        items = [(self.read_file(filename), self.resource.upper(), template) for filename in md_files]
+        for filename, (html, logs) in zip(md_files, self.map_in_workers(convert_markdown_file, items)):
+            self.check_time()
+            html_filename = os.path.splitext(os.path.basename(filename))[0] + ".html"
+            self.write_output(html_filename, html)
+            self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename), os.path.basename(html_filename)))
+            self.log.add_logs(logs)
+            self.finish_unit(os.path.relpath(filename, self.files_dir))
         self.log.info('Finished processing Markdown files.')
+
+
+def convert_obs_file(item):
+    """
+    Converts an OBS chapter and inspects it, in a worker process if there are any
+    :param tuple item: the markdown, the title, the HTML template and the name of the markdown file
+    :return tuple: the HTML and the logs of the inspection
+    """
+    md, title, template, md_filename = item
+    log = ConvertLogger()
+    html = markdown2.markdown(md)
+    html = string.Template(template).safe_substitute(title=title, content=html)
+
+    # Do the OBS inspection (this now operates on a single file instead of folder)
+    # QUESTION: Should this be done separately after conversion????
+    base_name = os.path.splitext(md_filename)[0]
+    inspector = OBSInspection(base_name + '.html', log, html=html)
+    try:
+        inspector.run()
+    except Exception as e:
+        log.warning('Chapter {0}: failed to run OBS inspector: {1}'.format(base_name, e.message))
+    return html, log.logs
+
+
+def convert_markdown_file(item):
+    """
+    Converts a markdown file, in a worker process if there are any
+    :param tuple item: the markdown, the title and the HTML template
+    :return tuple: the HTML and the logs, which are empty
+    """
+    md, title, template = item
+    log = ConvertLogger()
+    html = markdown2.markdown(md, extras=['markdown-in-html', 'tables'])
+    html = string.Template(template).safe_substitute(title=title, content=html)
+
+    # Change headers like <h1><a id="verbs"/>Verbs</h1> to <h1 id="verbs">Verbs</h1>
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup.findAll('a', {'id': True}):
+        if tag.parent and tag.parent.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+            tag.parent['id'] = tag['id']
+            tag.parent['class'] = tag.parent.get('class', []) + ['section-header']
+            tag.extract()
+    return unicode(soup), log.logs
@@ -1,15 +1,14 @@
 from __future__ import print_function, unicode_literals
-import urlparse
 import os
-import tempfile
-import codecs
 from bs4 import BeautifulSoup
-from shutil import copyfile
-from libraries.general_tools.file_utils import write_file, remove_tree
 from converter import Converter
-from usfm_tools.transform import UsfmTransform
+from convert_logger import ConvertLogger
+from usfm_tools.support import books
+from usfm_renderer import render_usfm
 from libraries.resource_container.ResourceContainer import BIBLE_RESOURCE_TYPES
 
+CONTENT_PLACEHOLDER = '@@content@@'
+
 
 class Usfm2HtmlConverter(Converter):
 
@@ -26,63 +25,44 @@ class Usfm2HtmlConverter(Converter):
         # find the first directory that has usfm files.
         files = self.get_files()
 
-        exclusive_convert = False
-        convert_only = []
-        if self.source and len(self.source) > 0:
-            parsed = urlparse.urlparse(self.source)
-            params = urlparse.parse_qsl(parsed.query)
-            if params and len(params) > 0:
-                for i in range(0, len(params)):
-                    item = params[i]
-                    if item[0] == 'convert_only':
-                        convert_only = item[1].split(',')
-                        exclusive_convert = True
-                        self.source = urlparse.urlunparse((parsed.scheme, parsed.netloc, parsed.path, '', '', ''))
-                        break
-
         current_dir = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(current_dir, 'templates', 'template.html')) as template_file:
             template_html = template_file.read()
+        # the template is the same for every book, so it's only parsed once
+        before, after, indent_level = get_template_halves(template_html, self.resource.upper())
+
+        usfm_files = []
 
         for filename in files:
             if filename.endswith('.usfm'):
-                if exclusive_convert:
-                    base_name = os.path.basename(filename)
-                    if base_name not in convert_only:  # see if this is a file we are to convert
-                        continue
-
-                # Covert the USFM file
-                scratch_dir = tempfile.mkdtemp(prefix='scratch_')
-                copyfile(filename, os.path.join(scratch_dir, os.path.basename(filename)))
-                filebase = os.path.splitext(os.path.basename(filename))[0]
-                UsfmTransform.buildSingleHtml(scratch_dir, scratch_dir, filebase)
-                html_filename = filebase+".html"
-                with codecs.open(os.path.join(scratch_dir, html_filename), 'r', 'utf-8-sig') as html_file:
-                    converted_html = html_file.read()
-                template_soup = BeautifulSoup(template_html, 'html.parser')
-                template_soup.head.title.string = self.resource.upper()
-                converted_soup = BeautifulSoup(converted_html, 'html.parser')
-                content_div = template_soup.find('div', id='content')
-                content_div.clear()
-                content_div.append(converted_soup.body)
-                content_div.body.unwrap()
-                output_file = os.path.join(self.output_dir, html_filename)
-                write_file(output_file, template_soup.prettify())
-                self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename),
-                                                             os.path.basename(html_filename)))
-                remove_tree(scratch_dir)
-
-                # TODO 3/30/17 BLM - should be an inspection here like OBS has?
+                if not self.should_convert(filename):
+                    continue
 
+                filebase = os.path.splitext(os.path.basename(filename))[0]
+                if self.is_converted(filebase):
+                    continue  # an earlier invocation converted this book
+                usfm_files.append(filename)
             else:
                 # Directly copy over files that are not USFM files
                 try:
-                    output_file = os.path.join(self.output_dir, os.path.basename(filename))
-                    if not os.path.exists(output_file):
-                        copyfile(filename, output_file)
+                    self.copy_to_output(filename)
                 except:
                     pass
 
+        # Convert the USFM files, in worker processes if there are any
+        items = [(self.read_file(filename), before, after, indent_level) for filename in usfm_files]
+        for filename, (html, logs) in zip(usfm_files, self.map_in_workers(convert_usfm_book, items)):
+            self.check_time()
+            filebase = os.path.splitext(os.path.basename(filename))[0]
+            html_filename = filebase + ".html"
+            self.write_output(html_filename, html)
+            self.log.info('Converted {0} to {1}.'.format(os.path.basename(filename),
+                                                         os.path.basename(html_filename)))
+            self.log.add_logs(logs)
+            self.finish_unit(filebase)
+
+            # TODO 3/30/17 BLM - should be an inspection here like OBS has?
+
         # Do the Bible inspection HERE
         #        inspector = BibleInspection(self.output_dir, self.log)
         #        inspector.run()
@@ -91,3 +71,50 @@ class Usfm2HtmlConverter(Converter):
         #        self.log_message('Made one HTML of all bibles in all.html.')
         #        self.log_message('Finished processing Markdown files.')
         self.log.info('Finished processing Bible USFM files.')
+
+
+def get_template_halves(template_html, title):
+    """
+    Prettifies the template around where the content of the books goes, so they can be put in between without
+    parsing the template again
+    :param string template_html:
+    :param string title:
+    :return tuple: the template up to the content, the rest of it, and the indent level of the content
+    """
+    template_soup = BeautifulSoup(template_html, 'html.parser')
+    template_soup.head.title.string = title
+    content_div = template_soup.find('div', id='content')
+    content_div.clear()
+    content_div.append(CONTENT_PLACEHOLDER)
+    html = template_soup.prettify()
+    start = html.index(CONTENT_PLACEHOLDER)
+    line_start = html.rindex('\n', 0, start) + 1
+    # prettify() indents the children of a tag one more space than the tag, like the placeholder
+    return html[:line_start], html[start + len(CONTENT_PLACEHOLDER) + 1:], start - line_start + 1
+
+
+def transform_usfm(usfm):
+    """
+    Renders a book with the same markup UsfmTransform.buildSingleHtml() gives a directory holding just that book
+    :param unicode usfm: the USFM of a book
+    :return unicode: the HTML of the book
+    """
+    usfm = usfm.replace('\r\n', '\n').replace('\r', '\n').lstrip()
+    if usfm[:4] != '\\id ' or usfm[4:7] not in books.silNames:
+        return '</body></html>'  # UsfmTransform skips files that don't start with a book id
+    return render_usfm(usfm)
+
+
+def convert_usfm_book(item):
+    """
+    Converts a book and puts it in the template, in a worker process if there are any
+    :param tuple item: the USFM, the template halves and the indent level of the content, see get_template_halves()
+    :return tuple: the HTML and the logs, which are empty
+    """
+    usfm, before, after, indent_level = item
+    log = ConvertLogger()
+    converted_soup = BeautifulSoup(transform_usfm(usfm), 'html.parser')
+    content = converted_soup.body.decode_contents(indent_level=indent_level)
+    if content and not content.endswith('\n'):
+        content += '\n'
+    return before + content + after, log.logs
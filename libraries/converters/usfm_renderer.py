@@ -0,0 +1,451 @@
+from __future__ import print_function, unicode_literals
+import re
+from six import string_types
+from usfm_tools.support import books
+
+TEXT = 'text'
+UNKNOWN = 'unknown'
+
+# markers followed by a number, like \c 1 and \v 1-2
+NUMBER_MARKERS = {'c', 'v'}
+# markers followed by the rest of their line, which may be on the next line when theirs is empty
+VALUE_MARKERS = {
+    'id', 'ide', 'sts', 'h', 'toc', 'toc1', 'toc2', 'toc3', 'mt', 'mt1', 'mt2', 'mt3', 'ms', 'ms1', 'ms2', 'mr',
+    's', 's1', 's2', 's3', 's4', 's5', 'r', 'cl', 'fr', 'fk', 'ft', 'fq', 'fqa', 'fqb', 'd', 'rem', 'is', 'is1',
+    'imt', 'imt1', 'imt2', 'imt3', 'xo', 'xt'
+}
+# markers that may be followed by a +, like \f + and \x +
+PLUS_MARKERS = {'f', 'x'}
+PLAIN_MARKERS = {
+    'p', 'pi', 'pi2', 'b', 'ca', 'wj', 'q', 'q1', 'q2', 'q3', 'q4', 'qa', 'qac', 'qc', 'qm', 'qm1', 'qm2', 'qm3',
+    'qr', 'qs', 'qt', 'nb', 'm', 'fp', 'xdc', 'tl', 'sc', 'it', 'bd', 'bdit', 'li', 'li1', 'li2', 'li3', 'li4', 'sp',
+    'add', 'nd', 'mi', 'tr', 'th1', 'th2', 'th3', 'th4', 'th5', 'th6', 'thr1', 'thr2', 'thr3', 'thr4', 'thr5',
+    'thr6', 'tc1', 'tc2', 'tc3', 'tc4', 'tc5', 'tc6', 'tcr1', 'tcr2', 'tcr3', 'tcr4', 'tcr5', 'tcr6', 'ip', 'iot',
+    'io', 'io1', 'io2', 'ior', 'bk'
+}
+END_MARKERS = {
+    'ca*', 'wj*', 'qs*', 'qt*', 'fr*', 'fqa*', 'f*', 'xdc*', 'x*', 'tl*', 'sc*', 'it*', 'bd*', 'bdit*', 'add*',
+    'nd*', 'ior*', 'bk*'
+}
+
+WHITESPACE = re.compile(r'[ \t\r\n]*')
+MARKER_NAME = re.compile(r'[^ \t\r\n\\]*')
+UNKNOWN_NAME = re.compile(r'[^ \t\n\\]*')
+NUMBER = re.compile(r'[0-9()-]*')
+PHRASE = re.compile(r'[^\n\\]*')
+READ_SIZE = 65536
+
+
+class NeedMoreInput(Exception):
+    """
+    Raised by UsfmTokenizer.scan() when the token at the end of what it has read so far could still grow
+    """
+    pass
+
+
+class UsfmTokenizer(object):
+    """
+    Splits USFM into (marker, value) tokens as it is fed, so a book can be read from a stream without holding all
+    of it. The markers are the ones usfm_tools knows, split the same way: text comes as (TEXT, text) and markers
+    usfm_tools doesn't know come as (UNKNOWN, name), the value of the rest is None when they don't have one.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.line = ''  # the end of the input after its last newline
+
+    def feed(self, chunk):
+        """
+        :param unicode chunk: the next part of the USFM
+        :return list: the tokens that chunk completed
+        """
+        self.line += chunk
+        newline = self.line.rfind('\n') + 1
+        if not newline:
+            return []
+        # tabs are expanded like usfm_tools does, which needs whole lines
+        self.buffer += self.line[:newline].expandtabs().replace('\xa0', ' ')
+        self.line = self.line[newline:]
+        return self.tokenize(False)
+
+    def close(self):
+        """
+        :return list: the tokens left at the end of the USFM
+        """
+        self.buffer += self.line.expandtabs().replace('\xa0', ' ')
+        self.line = ''
+        return self.tokenize(True)
+
+    def tokenize(self, final):
+        """
+        :param bool final: whether there is no more input
+        :return list:
+        """
+        tokens = []
+        pos = 0
+        try:
+            while True:
+                pos = WHITESPACE.match(self.buffer, pos).end()
+                if pos >= len(self.buffer):
+                    break
+                token, pos = self.scan(pos, final)
+                tokens.append(token)
+        except NeedMoreInput:
+            pass
+        self.buffer = self.buffer[pos:]
+        return tokens
+
+    def scan(self, pos, final):
+        """
+        Reads the token that starts at pos, which isn't whitespace
+        :param int pos:
+        :param bool final: whether there is no more input
+        :return tuple: the token and where the next one starts
+        """
+        buf = self.buffer
+        end = len(buf)
+        if buf[pos] != '\\':
+            stop = PHRASE.match(buf, pos).end()
+            self.check_end(stop, final)
+            return (TEXT, buf[pos:stop]), stop
+        start = pos + 1
+        self.check_end(start, final)
+        if start == end or buf[start] in ' \t\r\n\\':
+            # a backslash on its own, or two of them, is the text of a backslash
+            return (TEXT, '\\'), (start + 1 if start < end and buf[start] == '\\' else start)
+        stop = MARKER_NAME.match(buf, start).end()
+        self.check_end(stop, final)
+        star = buf.find('*', start, stop)
+        if star >= 0:
+            if buf[start:star + 1] in END_MARKERS:
+                return (buf[start:star + 1], None), star + 1
+        else:
+            token = self.scan_marker(buf[start:stop], stop, final)
+            if token:
+                return token
+        stop = UNKNOWN_NAME.match(buf, start).end()
+        self.check_end(stop, final)
+        return (UNKNOWN, buf[start:stop]), stop
+
+    def scan_marker(self, name, pos, final):
+        """
+        :param unicode name: the marker, which needs whitespace after it
+        :param int pos: where the marker ends
+        :param bool final: whether there is no more input
+        :return tuple: the token and where the next one starts, None if it is no marker usfm_tools knows
+        """
+        buf = self.buffer
+        if pos == len(buf):
+            return None  # there's no more input, so no whitespace after the marker
+        after = WHITESPACE.match(buf, pos).end()
+        if after == pos:
+            return None
+        self.check_end(after, final)
+        if name in PLAIN_MARKERS:
+            return (name, None), after
+        if name in VALUE_MARKERS:
+            stop = PHRASE.match(buf, after).end()
+            self.check_end(stop, final)
+            return (name, buf[after:stop]), stop
+        if name in PLUS_MARKERS:
+            if buf[after:after + 1] == '+':
+                return (name, '+'), after + 1
+            return (name, ''), after
+        if name in NUMBER_MARKERS:
+            stop = NUMBER.match(buf, after).end()
+            self.check_end(stop, final)
+            if stop == after:
+                return None
+            next_pos = WHITESPACE.match(buf, stop).end()
+            if next_pos == stop:
+                return None
+            self.check_end(next_pos, final)
+            return (name, buf[after:stop]), next_pos
+        return None
+
+    def check_end(self, pos, final):
+        """
+        :param int pos: where a run of characters stopped
+        :param bool final: whether there is no more input
+        """
+        if pos >= len(self.buffer) and not final:
+            raise NeedMoreInput()
+
+
+def tokenize_usfm(source):
+    """
+    :param source: the USFM as a unicode string, a file object opened as text or an iterable of unicode chunks
+    :return generator: the tokens, see UsfmTokenizer
+    """
+    if isinstance(source, string_types):
+        chunks = [source]
+    elif hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(READ_SIZE), '')
+    else:
+        chunks = source
+    tokenizer = UsfmTokenizer()
+    for chunk in chunks:
+        for token in tokenizer.feed(chunk):
+            yield token
+    for token in tokenizer.close():
+        yield token
+
+
+class UsfmHtmlRenderer(object):
+    """
+    Writes the HTML of USFM tokens as it gets them, with the same markup as the single HTML renderer of usfm_tools:
+    an h1 with the book name, h2.c-num chapter headings with ids like `<book number>-ch-<chapter>`, verse numbers
+    in span.v-num with ids like `<book number>-ch-<chapter>-v-<verse>`, span.chunk-break for \\s5 and the footnotes
+    of a chapter in a div.footnotes after it.
+
+    Markers usfm_tools renders nothing for are left out along with their values.
+    """
+    HEADER = '\n<html>\n<head>\n<meta charset="utf-8"/>\n<title>{0}</title>\n</head>\n<body>\n<h1>{0}</h1>\n'
+    # marker: (method name, argument)
+    HANDLERS = {
+        TEXT: ('render_text', None),
+        UNKNOWN: ('render_unknown', None),
+        'id': ('render_id', None),
+        'h': ('render_h', None),
+        'toc2': ('render_toc2', None),
+        'mt2': ('render_heading', 'h2'),
+        'mt3': ('render_heading', 'h2'),
+        'ms2': ('render_heading', 'h4'),
+        'imt': ('render_heading', 'h2'),
+        'imt1': ('render_heading', 'h2'),
+        'imt2': ('render_heading', 'h3'),
+        'imt3': ('render_heading', 'h4'),
+        'p': ('render_p', None),
+        'pi': ('render_pi', None),
+        'm': ('render_m', None),
+        's2': ('render_s2', None),
+        's5': ('render_s5', None),
+        'c': ('render_c', None),
+        'cl': ('render_cl', None),
+        'v': ('render_v', None),
+        'q': ('render_q', 1),
+        'q1': ('render_q', 1),
+        'q2': ('render_q', 2),
+        'q3': ('render_q', 3),
+        'nb': ('render_nb', None),
+        'b': ('render_b', None),
+        'li': ('render_li', None),
+        'li1': ('render_li', None),
+        'li2': ('render_li', None),
+        'li3': ('render_li', None),
+        'wj': ('render_tag', '<span class="woc">'),
+        'wj*': ('render_tag', '</span>'),
+        'nd': ('render_tag', '<span class="tetragrammaton">'),
+        'nd*': ('render_tag', '</span>'),
+        'it': ('render_tag', '<i>'),
+        'it*': ('render_tag', '</i>'),
+        'qs': ('render_tag', '<i>'),
+        'qs*': ('render_tag', '</i>'),
+        'sc': ('render_tag', '<b>'),
+        'sc*': ('render_tag', '</b>'),
+        'fp': ('render_tag', '<br />'),
+        'f': ('render_f', None),
+        'ft': ('render_ft', None),
+        'fqa': ('render_fqa', None),
+        'fqa*': ('render_fqa_end', None),
+        'fqb': ('render_fqa_end', None),
+        'f*': ('render_f_end', None),
+    }
+
+    def __init__(self, write):
+        """
+        :param callable write: called with each piece of the HTML
+        """
+        self.write = write
+        self.book = ''
+        self.chapter = '001'
+        self.verse = '001'
+        self.book_name = ''
+        self.chapter_label = 'Chapter'
+        self.indent_flag = False
+        self.line_indent = 0
+        self.footnote_flag = False
+        self.fqa_flag = False
+        self.footnotes = {}
+        self.footnote_id = ''
+        self.footnote_num = 1
+        self.footnote_text = ''
+        self.unknown_markers = set()
+        self.handlers = dict((marker, (getattr(self, name), argument))
+                             for marker, (name, argument) in self.HANDLERS.items())
+
+    def render(self, tokens):
+        """
+        :param iterable tokens: see tokenize_usfm()
+        """
+        handlers = self.handlers
+        for marker, value in tokens:
+            handler = handlers.get(marker)
+            if handler:
+                function, argument = handler
+                if argument is None:
+                    function(value)
+                else:
+                    function(value, argument)
+
+    def close(self):
+        self.write_footnotes()
+        self.write('</body></html>')
+
+    def stop_indent(self):
+        if self.indent_flag:
+            self.indent_flag = False
+            return '\n</p>\n'
+        return ''
+
+    def write_indent(self, level):
+        if self.indent_flag:
+            self.write(self.stop_indent())
+        self.indent_flag = True
+        self.write('\n<p class="indent-{0}">\n{1}'.format(level, '&nbsp;' * (level * 4)))
+
+    def start_li(self):
+        self.line_indent += 1
+        return '<ul> '
+
+    def stop_li(self):
+        if self.line_indent < 1:
+            return ''
+        self.line_indent -= 1
+        return '</ul>'
+
+    def render_text(self, value):
+        self.write(' ' + value.replace('~', '&nbsp;') + ' ')
+
+    def render_unknown(self, value):
+        self.unknown_markers.add(value)
+
+    def render_id(self, value):
+        self.write_footnotes()
+        code = value.split(' ', 1)[0]
+        self.book = books.bookKeys.get(code, code)
+        self.chapter_label = 'Chapter'
+        self.write(self.stop_indent())
+
+    def render_h(self, value):
+        self.book_name = value
+        self.write(self.HEADER.format(value))
+
+    def render_toc2(self, value):
+        if not self.book_name:
+            self.render_h(value)
+
+    def render_heading(self, value, tag):
+        self.write('\n\n<{0}>{1}</{0}>'.format(tag, value.replace('~', ' ')))
+
+    def render_p(self, value):
+        self.write(self.stop_indent() + self.stop_li() + '\n\n<p>')
+
+    def render_pi(self, value):
+        self.write(self.stop_indent() + self.stop_li())
+        self.write_indent(2)
+
+    def render_m(self, value):
+        self.write(self.stop_indent() + '\n\n<p>')
+
+    def render_s2(self, value):
+        self.write(self.stop_indent() + '\n\n<p align="center">----</p>')
+
+    def render_s5(self, value):
+        self.write('\n<span class="chunk-break"></span>\n')
+
+    def render_c(self, value):
+        self.write(self.stop_indent())
+        self.close_footnote()
+        self.write_footnotes()
+        self.footnote_num = 1
+        self.chapter = value.zfill(3)
+        self.write('{0}\n\n<h2 id="{1}-ch-{2}" class="c-num">{3} {4}</h2>'.format(
+            self.stop_li(), self.book, self.chapter, self.chapter_label.replace('~', ' '), value))
+
+    def render_cl(self, value):
+        self.chapter_label = value
+
+    def render_v(self, value):
+        self.close_footnote()
+        self.verse = value.zfill(3)
+        self.write(' <span id="{0}-ch-{1}-v-{2}" class="v-num"><sup><b>{3}</b></sup></span>'.format(
+            self.book, self.chapter, self.verse, value))
+
+    def render_q(self, value, level):
+        self.write_indent(level)
+
+    def render_nb(self, value):
+        self.write(self.stop_indent())
+
+    def render_b(self, value):
+        self.write(self.stop_li() + '\n\n<p class="indent-0">&nbsp;</p>')
+
+    def render_li(self, value):
+        self.write(self.start_li())
+
+    def render_tag(self, value, html):
+        self.write(html)
+
+    def render_f(self, value):
+        self.close_footnote()
+        self.footnote_id = 'fn-{0}-{1}-{2}-{3}'.format(self.book, self.chapter, self.verse, self.footnote_num)
+        self.write('<span id="ref-{0}"><sup><i>[<a href="#{0}">{1}</a>]</i></sup></span>'.format(
+            self.footnote_id, self.footnote_num))
+        self.footnote_flag = True
+        self.footnote_text = value[2:] if value.startswith('+ ') else value[1:] if value.startswith('+') else value
+
+    def render_ft(self, value):
+        self.footnote_text += value
+
+    def render_fqa(self, value):
+        self.footnote_text += '<i>' + value
+        self.fqa_flag = True
+
+    def render_fqa_end(self, value):
+        self.footnote_text += '</i>' + (value or '')
+        self.fqa_flag = False
+
+    def render_f_end(self, value):
+        self.close_footnote()
+
+    def close_footnote(self):
+        if self.footnote_flag:
+            self.footnote_flag = False
+            if self.fqa_flag:
+                self.render_fqa_end('')
+            self.footnotes[self.footnote_id] = (self.chapter, self.verse, self.footnote_num, self.footnote_text)
+            self.footnote_num += 1
+            self.footnote_text = ''
+            self.footnote_id = ''
+
+    def write_footnotes(self):
+        if self.footnotes:
+            html = ['<div class="footnotes"><hr class="footnotes-hr"></hr>']
+            for footnote_id in sorted(self.footnotes):
+                chapter, verse, num, text = self.footnotes[footnote_id]
+                html.append('<div id="{0}" class="footnote">{1}:{2} <sup><i>[<a href="#ref-{0}">{3}</a>]</i></sup>'
+                            '<span class="text">{4}</span></div>'.format(footnote_id, chapter.lstrip('0'),
+                                                                         verse.lstrip('0'), num,
+                                                                         text.replace('~', ' ')))
+            html.append('</div>')
+            self.write(''.join(html))
+        self.footnotes = {}
+
+
+def render_usfm(source, write=None):
+    """
+    Renders USFM as an HTML page, see UsfmHtmlRenderer
+    :param source: see tokenize_usfm()
+    :param callable write: called with each piece of the HTML, if not given the HTML is returned
+    :return unicode: the HTML if write isn't given
+    """
+    parts = None
+    if write is None:
+        parts = []
+        write = parts.append
+    renderer = UsfmHtmlRenderer(write)
+    renderer.render(tokenize_usfm(source))
+    renderer.close()
+    if parts is not None:
+        return ''.join(parts)
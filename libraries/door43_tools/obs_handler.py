@@ -6,14 +6,16 @@ from obs_data import obs_data
 
 
 class OBSInspection(object):
-    def __init__(self, filename, log=None, chapter=None):
+    def __init__(self, filename, log=None, chapter=None, html=None):
         """
         Takes a path to an OBS chapter and the chapter of the given file.
 
         :param string filename: Path to the OBS chapter file
         :param string chapter: Chapter being processed
+        :param string html: The contents of the chapter file, if it's only in memory
         """
         self.filename = filename
+        self.html = html
         if not chapter:
             try:
                 chapter = int(os.path.splitext(os.path.basename(filename))[0])
@@ -28,12 +30,14 @@ class OBSInspection(object):
         if not self.chapter:  # skip over files that are not chapters
             return
 
-        if not os.path.isfile(self.filename):
+        if self.html is not None:
+            chapter_html = self.html
+        elif not os.path.isfile(self.filename):
             self.log.warning('Chapter {0} does not exist!'.format(self.chapter))
             return
-
-        with open(self.filename) as chapter_file:
-            chapter_html = chapter_file.read()
+        else:
+            with open(self.filename) as chapter_file:
+                chapter_html = chapter_file.read()
 
         soup = BeautifulSoup(chapter_html, 'html.parser')
 
@@ -5,7 +5,6 @@ import tempfile
 import urlparse
 from decimal import Decimal
 from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
-from libraries.models.manifest import TxManifest
 
 
 class PageMetrics(object):
@@ -50,21 +49,21 @@ class PageMetrics(object):
 
         self.logger.debug("Valid repo url: " + path)
         try:
-            # First see record already exists in DB
-            tx_manifest = TxManifest({'repo_name': repo_name, 'user_name': repo_owner},
-                                     db_handler=self.manifest_db_handler)
-            if tx_manifest.repo_name:
-                if increment:
-                    tx_manifest.views += 1
-                    self.logger.debug('Incrementing view count to {0}'.format(tx_manifest.views))
-                    tx_manifest.update()
-                else:
-                    self.logger.debug('Returning stored view count of {0}'.format(tx_manifest.views))
-            else:  # table is not present
-                tx_manifest.views = 0
+            keys = {'repo_name': repo_name, 'user_name': repo_owner}
+            if increment:
+                # Single atomic write that only touches the view count, returns None if the record doesn't exist
+                view_count = self.manifest_db_handler.increment_item(keys, 'views')
+                self.logger.debug('Incremented view count to {0}'.format(view_count))
+            else:
+                item = self.manifest_db_handler.get_item(keys, fields=['repo_name', 'views'])
+                view_count = None
+                if item:
+                    view_count = item.get('views', 0)
+                    self.logger.debug('Returning stored view count of {0}'.format(view_count))
+            if view_count is None:  # record is not present
+                view_count = 0
                 self.logger.debug('No entries for page in manifest table')
 
-            view_count = tx_manifest.views
             if type(view_count) is Decimal:
                 view_count = int(view_count.to_integral_value())
             response['view_count'] = view_count
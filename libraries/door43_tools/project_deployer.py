@@ -8,6 +8,7 @@ from glob import glob
 from shutil import copyfile
 from libraries.aws_tools.s3_handler import S3Handler
 from libraries.general_tools.file_utils import write_file, remove_tree
+from libraries.general_tools.timer import StageTimer
 from libraries.door43_tools.templaters import do_template
 from datetime import datetime, timedelta
 
@@ -19,6 +20,9 @@ class ProjectDeployer(object):
     Read from the project's user dir in the cdn.door43.org bucket
     by applying the door43.org template to the raw html files
     """
+    DEFAULT_RELOAD_SECONDS = 10
+    MIN_RELOAD_SECONDS = 10
+    MAX_RELOAD_SECONDS = 60
 
     def __init__(self, cdn_bucket, door43_bucket):
         """
@@ -67,13 +71,16 @@ class ProjectDeployer(object):
         output_dir = tempfile.mkdtemp(prefix='output_', dir=self.temp_dir)
         template_dir = tempfile.mkdtemp(prefix='template_', dir=self.temp_dir)
 
-        self.cdn_handler.download_dir(s3_commit_key, source_dir)
+        timer = StageTimer()
+        with timer.stage('download'):
+            self.cdn_handler.download_dir(s3_commit_key, source_dir)
         source_dir = os.path.join(source_dir, s3_commit_key)
         resource_type = build_log['resource_type']
         template_key = 'templates/project-page.html'
         template_file = os.path.join(template_dir, 'project-page.html')
         self.logger.debug("Downloading {0} to {1}...".format(template_key, template_file))
-        self.door43_handler.download_file(template_key, template_file)
+        with timer.stage('download'):
+            self.door43_handler.download_file(template_key, template_file)
 
         html_files = sorted(glob(os.path.join(source_dir, '*.html')))
         if len(html_files) < 1:
@@ -102,8 +109,8 @@ class ProjectDeployer(object):
                 content += '<h1 class="conversion-requested">{0}</h1>'.format(build_log['message'])
                 content += '<p><i>No content is available to show for {0} yet.</i></p>'.format(repo_name)
                 content += """
-                <script type="text/javascript">setTimeout(function(){window.location.reload(1);}, 10000);</script>
-                """
+                <script type="text/javascript">setTimeout(function(){{window.location.reload(1);}}, {0});</script>
+                """.format(self.get_reload_milliseconds(build_log))
             html = """
                 <html lang="en">
                     <head>
@@ -117,7 +124,8 @@ class ProjectDeployer(object):
             write_file(repo_index_file, html)
 
         # merge the source files with the template
-        do_template(resource_type, source_dir, output_dir, template_file)
+        with timer.stage('template'):
+            do_template(resource_type, source_dir, output_dir, template_file)
 
         # Copy first HTML file to index.html if index.html doesn't exist
         html_files = sorted(glob(os.path.join(output_dir, '*.html')))
@@ -133,26 +141,56 @@ class ProjectDeployer(object):
                 copyfile(filename, output_file)
 
         # Upload all files to the door43.org bucket
-        for root, dirs, files in os.walk(output_dir):
-            for f in sorted(files):
-                path = os.path.join(root, f)
-                if os.path.isdir(path):
-                    continue
-                key = s3_commit_key + path.replace(output_dir, '')
-                self.logger.debug("Uploading {0} to {1}".format(path, key))
-                self.door43_handler.upload_file(path, key, 0)
-
-        # Now we place json files and make an index.html file for the whole repo
-        try:
-            self.door43_handler.copy(from_key='{0}/project.json'.format(s3_repo_key), from_bucket=self.cdn_bucket)
-            self.door43_handler.copy(from_key='{0}/manifest.json'.format(s3_commit_key), to_key='{0}/manifest.json'.format(s3_repo_key))
-            self.door43_handler.redirect(s3_repo_key, '/' + s3_commit_key)
-            self.door43_handler.redirect(s3_repo_key + '/index.html', '/' + s3_commit_key)
-        except Exception:
-            pass
+        with timer.stage('deploy'):
+            for root, dirs, files in os.walk(output_dir):
+                for f in sorted(files):
+                    path = os.path.join(root, f)
+                    if os.path.isdir(path):
+                        continue
+                    key = s3_commit_key + path.replace(output_dir, '')
+                    self.logger.debug("Uploading {0} to {1}".format(path, key))
+                    self.door43_handler.upload_file(path, key, 0)
+
+            # Now we place json files and make an index.html file for the whole repo
+            try:
+                self.door43_handler.copy(from_key='{0}/project.json'.format(s3_repo_key), from_bucket=self.cdn_bucket)
+                self.door43_handler.copy(from_key='{0}/manifest.json'.format(s3_commit_key), to_key='{0}/manifest.json'.format(s3_repo_key))
+                self.door43_handler.redirect(s3_repo_key, '/' + s3_commit_key)
+                self.door43_handler.redirect(s3_repo_key + '/index.html', '/' + s3_commit_key)
+            except Exception:
+                pass
+        self.upload_deploy_log(s3_commit_key, timer.timings)
         remove_tree(self.temp_dir) # cleanup temp files
         return True
 
+    @staticmethod
+    def get_reload_milliseconds(build_log):
+        """
+        How long the placeholder page waits before reloading, so it checks again about when the job should be done
+        :param dict build_log:
+        :return int:
+        """
+        try:
+            eta = datetime.strptime(build_log['eta'], "%Y-%m-%dT%H:%M:%SZ")
+        except (KeyError, TypeError, ValueError):
+            return ProjectDeployer.DEFAULT_RELOAD_SECONDS * 1000
+        seconds = (eta - datetime.utcnow()).total_seconds()
+        seconds = min(max(seconds, ProjectDeployer.MIN_RELOAD_SECONDS), ProjectDeployer.MAX_RELOAD_SECONDS)
+        return int(seconds * 1000)
+
+    def upload_deploy_log(self, s3_commit_key, timings):
+        """
+        Saves how long the deploy took next to the build log, which we can't update since adding it deploys again
+        :param string s3_commit_key:
+        :param dict timings:
+        """
+        deploy_log = {
+            'deployed_at': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            'timings': timings
+        }
+        self.logger.debug("Deploy timings: " + json.dumps(timings))
+        self.cdn_handler.put_contents('{0}/deploy_log.json'.format(s3_commit_key), json.dumps(deploy_log))
+
     def redeploy_all_projects(self, deploy_function):
         i = 0
         one_day_ago = datetime.utcnow() - timedelta(hours=24)
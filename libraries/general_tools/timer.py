@@ -0,0 +1,60 @@
+from __future__ import print_function, unicode_literals
+import math
+import time
+from contextlib import contextmanager
+
+
+class StageTimer(object):
+    """
+    Adds up how many milliseconds each stage of a process takes, e.g.
+
+        timer = StageTimer()
+        with timer.stage('download'):
+            download_file(url, file_name)
+        timer.timings  # {'download': 1234}
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the block, even if it raises an exception
+        :param string name:
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, (time.time() - start) * 1000)
+
+    def add(self, name, milliseconds):
+        self.timings[name] = self.timings.get(name, 0) + int(round(milliseconds))
+
+
+def get_percentile(values, percent):
+    """
+    :param list values: numbers, in any order
+    :param int percent:
+    :return: the nearest-rank percentile of the values, None if there are none
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def get_percentiles(samples, percents=(50, 95)):
+    """
+    :param dict samples: stage names mapped to lists of milliseconds
+    :param tuple percents:
+    :return dict: stage names mapped to dicts of e.g. `p50` and `p95`
+    """
+    percentiles = {}
+    for stage, values in samples.items():
+        if values:
+            percentiles[stage] = dict(('p{0}'.format(percent), get_percentile(values, percent))
+                                      for percent in percents)
+    return percentiles
@@ -1,19 +1,31 @@
 from __future__ import unicode_literals, print_function
 from gogs_client import GogsApi
 from gogs_client import Token
+from libraries.gogs_tools.user_cache import UserCache
 
 
 class GogsHandler(object):
-    def __init__(self, gogs_url):
+    def __init__(self, gogs_url, user_cache_dir=None):
+        """
+        :param string gogs_url:
+        :param string user_cache_dir: also keep the users of tokens in this directory, see UserCache
+        """
         self.gogs_url = gogs_url
         self.gogs_api = GogsApi(gogs_url)
+        self.user_cache = UserCache(user_cache_dir)
 
     def authenticate_user_token(self, user_token):
         return self.gogs_api.valid_authentication(Token(user_token))
 
     def get_user(self, user_token):
+        key = UserCache.get_key(self.gogs_url, user_token)
+        found, user = self.user_cache.get(key)
+        if found:
+            return user
         valid = self.authenticate_user_token(user_token)
         if valid:
-            return self.gogs_api.authenticated_user(Token(user_token))
+            user = self.gogs_api.authenticated_user(Token(user_token))
         else:
-            return None
+            user = None
+        self.user_cache.put(key, user)
+        return user
@@ -0,0 +1,111 @@
+from __future__ import unicode_literals, print_function
+import os
+import time
+import hashlib
+import logging
+from gogs_client import GogsUser
+from libraries.general_tools.file_utils import load_json_object, write_file
+
+
+class UserCache(object):
+    """
+    Remembers which Gogs user a token belongs to, so a warm container doesn't ask Gogs again for every request.
+
+    Entries are kept in the process, and in `cache_dir` if given, so they also survive to the next container that
+    gets the same /tmp. Tokens are only stored as hashes. Invalid tokens are remembered too, but only for
+    NEGATIVE_TTL_SECONDS, so a token that was just created soon works.
+    """
+    TTL_SECONDS = 300
+    NEGATIVE_TTL_SECONDS = 30
+    CACHE_DIR = '/tmp/gogs-users'
+
+    entries = {}  # keys mapped to (expires_at, user), user is None for invalid tokens
+    hits = 0
+    misses = 0
+
+    def __init__(self, cache_dir=None):
+        """
+        :param string cache_dir: also keep the entries in files in this directory
+        """
+        self.cache_dir = cache_dir
+        self.logger = logging.getLogger()
+
+    @classmethod
+    def clear(cls):
+        cls.entries = {}
+        cls.hits = 0
+        cls.misses = 0
+
+    @classmethod
+    def get_stats(cls):
+        return {
+            'hits': cls.hits,
+            'misses': cls.misses,
+            'size': len(cls.entries)
+        }
+
+    @staticmethod
+    def get_key(gogs_url, user_token):
+        """
+        :param string gogs_url:
+        :param string user_token:
+        :return string:
+        """
+        return hashlib.sha256('{0}-{1}'.format(gogs_url, user_token).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        :param string key:
+        :return tuple: whether the key was found, and its user, None for an invalid token
+        """
+        entry = UserCache.entries.get(key)
+        if not entry and self.cache_dir:
+            entry = self.read(key)
+            if entry:
+                UserCache.entries[key] = entry
+        if entry and entry[0] > time.time():
+            UserCache.hits += 1
+            return True, entry[1]
+        UserCache.misses += 1
+        return False, None
+
+    def put(self, key, user):
+        """
+        :param string key:
+        :param GogsUser user: None if the token is invalid
+        """
+        ttl_seconds = UserCache.TTL_SECONDS if user else UserCache.NEGATIVE_TTL_SECONDS
+        entry = (time.time() + ttl_seconds, user)
+        UserCache.entries[key] = entry
+        if self.cache_dir:
+            self.write(key, entry)
+
+    def get_file_name(self, key):
+        return os.path.join(self.cache_dir, '{0}.json'.format(key))
+
+    def read(self, key):
+        try:
+            data = load_json_object(self.get_file_name(key))
+            if not data:
+                return None
+            user = GogsUser.from_json(data['user']) if data['user'] else None
+            return data['expires_at'], user
+        except Exception as e:
+            self.logger.debug('Could not read the cached Gogs user {0}: {1}'.format(key, e))
+            return None
+
+    def write(self, key, entry):
+        expires_at, user = entry
+        user_data = None
+        if user:
+            user_data = {
+                'id': user.user_id,
+                'username': user.username,
+                'full_name': user.full_name,
+                'email': user.email,
+                'avatar_url': user.avatar_url
+            }
+        try:
+            write_file(self.get_file_name(key), {'expires_at': expires_at, 'user': user_data})
+        except Exception as e:
+            self.logger.debug('Could not cache the Gogs user {0}: {1}'.format(key, e))
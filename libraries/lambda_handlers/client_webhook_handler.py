@@ -1,4 +1,5 @@
 from __future__ import unicode_literals, print_function
+import os
 from libraries.lambda_handlers.handler import Handler
 from libraries.client.client_webhook import ClientWebhook
 
@@ -25,5 +26,12 @@ class ClientWebhookHandler(Handler):
             'gogs_user_token': self.retrieve(event['vars'], 'gogs_user_token', 'Environment Vars'),
             'commit_data': self.retrieve(event, 'data', 'payload'),
             'manifest_table_name': self.retrieve(event['vars'], 'manifest_table_name', 'Environment Vars'),
+            'incremental': os.environ.get('INCREMENTAL_CONVERSIONS', '').lower() == 'true',
         }
+        try:
+            # Hooks that redeploy or reconvert many repos can add ?priority=bulk to leave the scheduler's
+            # interactive slots to people's pushes
+            env_vars['priority'] = event['api-gateway']['params']['querystring']['priority']
+        except (KeyError, TypeError):
+            pass
         return ClientWebhook(**env_vars).process_webhook()
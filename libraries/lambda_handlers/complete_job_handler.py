@@ -0,0 +1,25 @@
+from __future__ import unicode_literals, print_function
+from libraries.lambda_handlers.tx_manager_handler import TxManagerHandler
+
+
+class CompleteJobHandler(TxManagerHandler):
+
+    def _handle(self, event, context):
+        """
+        :param dict event:
+        :param context:
+        :return dict:
+        """
+        data = self.retrieve(event, 'data', 'event')
+        job_id = self.retrieve(data, 'job_id', 'data')
+        result = self.retrieve(data, 'result', 'data')
+        # Set required env_vars
+        tx_manager = self.get_tx_manager(
+            self.retrieve(event['vars'], 'prefix', 'Environment Vars'),
+            job_table_name=self.retrieve(event['vars'], 'job_table_name', 'Environment Vars'),
+            module_table_name=self.retrieve(event['vars'], 'module_table_name', 'Environment Vars'))
+        job_data = tx_manager.complete_job(job_id, result)
+        if self.schedules_jobs():
+            # Give the job's slot to the next one in the queue
+            self.get_scheduler(tx_manager).job_finished(job_id)
+        return job_data
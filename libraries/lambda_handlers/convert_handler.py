@@ -1,8 +1,15 @@
 from __future__ import unicode_literals, print_function
+import os
+import time
 from libraries.lambda_handlers.handler import Handler
+from libraries.aws_tools.lambda_handler import LambdaHandler
+from libraries.converters.checkpoint import Checkpoint
 
 
 class ConvertHandler(Handler):
+    MAX_CONTINUATIONS = 10
+    # Left over for zipping and uploading the output, or handing the rest of the conversion over
+    RESERVED_SECONDS = 60
 
     def __init__(self, *args, **kwargs):
         """
@@ -36,6 +43,94 @@ class ConvertHandler(Handler):
         options = {}
         if 'options' in job:
             options = job['options']
+        checkpoint, deadline = self.get_checkpoint(data, job, context)
+        # Set IN_MEMORY_CONVERSIONS=true to convert zip to zip in memory, unless the source is huge
+        in_memory = os.environ.get('IN_MEMORY_CONVERSIONS', '').lower() == 'true'
+        # Set CONVERT_WORKERS to convert files in that many processes, 0 for one per core
+        workers = int(os.environ.get('CONVERT_WORKERS') or 1)
         converter = self.converter_class(source=source, resource=resource, cdn_bucket=cdn_bucket, cdn_file=cdn_file,
-                                         options=options)
-        return converter.run()
+                                         options=options, checkpoint=checkpoint, deadline=deadline,
+                                         in_memory=in_memory, workers=workers)
+        if 'completion' not in data:
+            result = converter.run()
+            if result and result.get('paused'):
+                self.continue_conversion(event, context, data['continuation'])
+            return result
+
+        # tx-manager didn't wait for us, so we have to tell it how the conversion went
+        completion = data['completion']
+        try:
+            result = converter.run()
+            if result and result.get('paused'):
+                self.continue_conversion(event, context, completion)
+                return result
+        except Exception as e:
+            # not raised, so Lambda doesn't retry the whole conversion for an event it has reported on
+            self.logger.error(e.message, exc_info=1)
+            result = {'errorMessage': e.message}
+        self.report_completion(completion, job, result)
+        return result
+
+    def get_checkpoint(self, data, job, context):
+        """
+        Conversions that can report back to tx-manager themselves get a checkpoint, so they can hand what they don't
+        get done in time over to another invocation
+        :param dict data:
+        :param dict job:
+        :param context:
+        :return tuple: the Checkpoint and the time.time() to pause at, both None if the conversion can't pause
+        """
+        continuations = data.get('continuations', 0)
+        can_continue = ('completion' in data or 'continuation' in data) and \
+            hasattr(context, 'get_remaining_time_in_millis') and continuations < ConvertHandler.MAX_CONTINUATIONS
+        if not can_continue and not continuations:
+            return None, None
+        checkpoint = Checkpoint(self.retrieve(job, 'cdn_bucket', 'job'),
+                                Checkpoint.get_prefix(self.retrieve(job, 'job_id', 'job')))
+        deadline = None
+        if can_continue:
+            deadline = time.time() + context.get_remaining_time_in_millis() / 1000.0 - ConvertHandler.RESERVED_SECONDS
+        return checkpoint, deadline
+
+    def continue_conversion(self, event, context, completion):
+        """
+        Invokes this function again to finish the conversion from its checkpoint, which then reports back to
+        tx-manager since nobody is waiting for it
+        :param dict event:
+        :param context:
+        :param dict completion: the function name and tables to report to
+        """
+        data = dict(event.get('data') or {})
+        data.update(event.get('body-json') or {})
+        data.pop('continuation', None)
+        data['completion'] = completion
+        data['continuations'] = data.get('continuations', 0) + 1
+        payload = {
+            'data': data,
+            'vars': event.get('vars', {})
+        }
+        self.logger.debug('Continuing job {0} in invocation {1} of {2}'.format(
+            data['job']['job_id'], data['continuations'], context.function_name))
+        LambdaHandler().invoke(context.function_name, payload, invocation_type='Event')
+
+    def report_completion(self, completion, job, result):
+        """
+        Invokes the tx-manager function that finishes the job
+        :param dict completion: the function name and tables to report to
+        :param dict job:
+        :param dict result:
+        """
+        payload = {
+            'data': {
+                'job_id': self.retrieve(job, 'job_id', 'job'),
+                'result': result
+            },
+            'vars': {
+                'job_table_name': self.retrieve(completion, 'job_table_name', 'completion'),
+                'module_table_name': self.retrieve(completion, 'module_table_name', 'completion'),
+                'prefix': self.retrieve(completion, 'prefix', 'completion')
+            }
+        }
+        function_name = self.retrieve(completion, 'function_name', 'completion')
+        self.logger.debug('Reporting completion of job {0} to {1}'.format(payload['data']['job_id'], function_name))
+        LambdaHandler().invoke(function_name, payload, invocation_type='Event')
@@ -1,4 +1,5 @@
 from __future__ import unicode_literals, print_function
+import os
 from libraries.manager.manager import TxManager
 from libraries.lambda_handlers.handler import Handler
 
@@ -22,7 +23,10 @@ class DashboardHandler(Handler):
             'gogs_url': self.retrieve(event['vars'], 'gogs_url', 'Environment Vars'),
             'cdn_url': self.retrieve(event['vars'], 'cdn_url', 'Environment Vars'),
             'job_table_name': self.retrieve(event['vars'], 'job_table_name', 'Environment Vars'),
-            'module_table_name': self.retrieve(event['vars'], 'module_table_name', 'Environment Vars')
+            'module_table_name': self.retrieve(event['vars'], 'module_table_name', 'Environment Vars'),
+            'stats_table_name': event['vars'].get('stats_table_name'),
+            # Set DASHBOARD_SCAN_SEGMENTS to scan the job table in that many segments at once when there are no stats
+            'scan_segments': int(os.environ.get('DASHBOARD_SCAN_SEGMENTS') or 1)
         }
 
         max_failures = TxManager.MAX_FAILURES
@@ -0,0 +1,18 @@
+from __future__ import unicode_literals, print_function
+from libraries.manager.callback_dispatcher import CallbackDispatcher
+from libraries.lambda_handlers.handler import Handler
+
+
+class DeliverCallbackHandler(Handler):
+
+    def _handle(self, event, context):
+        """
+        :param dict event:
+        :param context:
+        :return bool: whether the callback was delivered
+        """
+        data = self.retrieve(event, 'data', 'event')
+        url = self.retrieve(data, 'url', 'data')
+        payload = self.retrieve(data, 'payload', 'data')
+        failed_callbacks_table_name = event.get('vars', {}).get('failed_callbacks_table_name')
+        return CallbackDispatcher(failed_callbacks_table_name).deliver(url, payload)
@@ -0,0 +1,24 @@
+from __future__ import unicode_literals, print_function
+import os
+from libraries.manager.manager import TxManager
+from libraries.lambda_handlers.tx_manager_handler import TxManagerHandler
+
+
+class ExpireJobsHandler(TxManagerHandler):
+
+    def _handle(self, event, context):
+        """
+        :param dict event:
+        :param context:
+        :return list: the IDs of the jobs that were failed
+        """
+        tx_manager = self.get_tx_manager(event.get('vars', {}).get('prefix', ''))
+        # Set STALE_JOB_SECONDS to fail jobs sooner or later than TxManager.STALE_JOB_SECONDS
+        max_seconds = int(os.environ.get('STALE_JOB_SECONDS') or TxManager.STALE_JOB_SECONDS)
+        job_ids = [job_data['job_id'] for job_data in tx_manager.expire_stale_jobs(max_seconds)]
+        if job_ids and self.schedules_jobs():
+            # Give their slots to the next jobs in the queue
+            scheduler = self.get_scheduler(tx_manager, stale_seconds=max_seconds)
+            for job_id in job_ids:
+                scheduler.job_finished(job_id)
+        return job_ids
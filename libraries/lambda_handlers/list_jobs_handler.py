@@ -1,5 +1,7 @@
 from __future__ import unicode_literals, print_function
+import os
 from libraries.manager.manager import TxManager
+from libraries.gogs_tools.user_cache import UserCache
 from libraries.lambda_handlers.handler import Handler
 
 
@@ -25,4 +27,7 @@ class ListJobsHandler(Handler):
             'job_table_name': self.retrieve(event['vars'], 'job_table_name', 'Environment Vars'),
             'module_table_name': self.retrieve(event['vars'], 'module_table_name', 'Environment Vars')
         }
+        # Set CACHE_GOGS_USERS=true to also keep the users of tokens in /tmp across warm invocations
+        if os.environ.get('CACHE_GOGS_USERS', '').lower() == 'true':
+            env_vars['gogs_user_cache_dir'] = UserCache.CACHE_DIR
         return TxManager(**env_vars).list_jobs(data)
@@ -1,9 +1,8 @@
 from __future__ import unicode_literals, print_function
-from libraries.manager.manager import TxManager
-from libraries.lambda_handlers.handler import Handler
+from libraries.lambda_handlers.tx_manager_handler import TxManagerHandler
 
 
-class RequestJobHandler(Handler):
+class RequestJobHandler(TxManagerHandler):
 
     def _handle(self, event, context):
         """
@@ -18,12 +17,13 @@ class RequestJobHandler(Handler):
         if 'body-json' in event and event['body-json'] and isinstance(event['body-json'], dict):
             data.update(event['body-json'])
         # Set required env_vars
-        env_vars = {
-            'api_url': self.retrieve(event['vars'], 'api_url', 'Environment Vars'),
-            'gogs_url': self.retrieve(event['vars'], 'gogs_url', 'Environment Vars'),
-            'cdn_url': self.retrieve(event['vars'], 'cdn_url', 'Environment Vars'),
-            'job_table_name': self.retrieve(event['vars'], 'job_table_name', 'Environment Vars'),
-            'module_table_name': self.retrieve(event['vars'], 'module_table_name', 'Environment Vars'),
-            'cdn_bucket': self.retrieve(event['vars'], 'cdn_bucket', 'Environment Vars')
-        }
-        return TxManager(**env_vars).setup_job(data)
+        job_table_name = self.retrieve(event['vars'], 'job_table_name', 'Environment Vars')
+        tx_manager = self.get_tx_manager(
+            self.get_prefix(job_table_name),
+            api_url=self.retrieve(event['vars'], 'api_url', 'Environment Vars'),
+            gogs_url=self.retrieve(event['vars'], 'gogs_url', 'Environment Vars'),
+            cdn_url=self.retrieve(event['vars'], 'cdn_url', 'Environment Vars'),
+            job_table_name=job_table_name,
+            module_table_name=self.retrieve(event['vars'], 'module_table_name', 'Environment Vars'),
+            cdn_bucket=self.retrieve(event['vars'], 'cdn_bucket', 'Environment Vars'))
+        return tx_manager.setup_job(data)
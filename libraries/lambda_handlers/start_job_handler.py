@@ -1,15 +1,21 @@
 from __future__ import unicode_literals, print_function
-from libraries.manager.manager import TxManager
-from libraries.lambda_handlers.handler import Handler
+from functools import partial
+from libraries.aws_tools.lambda_handler import LambdaHandler
+from libraries.lambda_handlers.tx_manager_handler import TxManagerHandler
 
 
-class StartJobHandler(Handler):
+class StartJobHandler(TxManagerHandler):
 
     def _handle(self, event, context):
         """
         :param dict event:
         :param context:
         """
+        if 'dispatch' in event:
+            # Handed over by an invocation that started as many jobs as it could wait for
+            prefix = event['dispatch'].get('prefix', '')
+            self.get_dispatching_scheduler(self.get_tx_manager(prefix), context).dispatch()
+            return
         for record in event['Records']:
             if record['eventName'] == 'INSERT' and 'job_id' in record['dynamodb']['Keys']:
                 # Get the job table name
@@ -17,12 +23,30 @@ class StartJobHandler(Handler):
                 ddbTable = ddbARN.split(':')[5].split('/')[1]
                 job_table_name = ddbTable
                 # Get the prefix of the job table name and add it to tx-module
-                prefix = job_table_name[:-(len('tx-job'))]
-                module_table_name = '{0}tx-module'.format(prefix)
-                env_vars = {
-                    'job_table_name': job_table_name,
-                    'module_table_name': module_table_name,
-                    'prefix': prefix
-                }
+                prefix = self.get_prefix(job_table_name)
                 job_id = record['dynamodb']['Keys']['job_id']['S']
-                TxManager(**env_vars).start_job(job_id)
+                tx_manager = self.get_tx_manager(prefix, job_table_name=job_table_name)
+                if self.schedules_jobs():
+                    self.get_dispatching_scheduler(tx_manager, context).submit(job_id)
+                else:
+                    tx_manager.start_job(job_id)
+
+    def get_dispatching_scheduler(self, tx_manager, context):
+        """
+        :param TxManager tx_manager:
+        :param context:
+        :return JobScheduler: one that hands the jobs it can't wait for over to another invocation
+        """
+        on_waiting = None
+        if hasattr(context, 'function_name'):
+            on_waiting = partial(self.continue_dispatch, context.function_name, tx_manager.prefix)
+        return self.get_scheduler(tx_manager, on_waiting=on_waiting)
+
+    def continue_dispatch(self, function_name, prefix):
+        """
+        Invokes this function again to start the jobs that are still waiting
+        :param string function_name:
+        :param string prefix:
+        """
+        self.logger.debug('Continuing the dispatch of waiting jobs in {0}'.format(function_name))
+        LambdaHandler().invoke(function_name, {'dispatch': {'prefix': prefix}}, invocation_type='Event')
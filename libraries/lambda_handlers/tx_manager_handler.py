@@ -0,0 +1,80 @@
+from __future__ import unicode_literals, print_function
+import os
+from libraries.manager.manager import TxManager
+from libraries.manager.scheduler import JobScheduler
+from libraries.manager.job_stats import JobStats
+from libraries.manager.callback_dispatcher import CallbackDispatcher
+from libraries.gogs_tools.user_cache import UserCache
+from libraries.lambda_handlers.handler import Handler
+
+
+class TxManagerHandler(Handler):
+    """
+    A handler of the jobs of tx-manager. They all configure their TxManager and JobScheduler from the environment of
+    their Lambda function the same way, see get_tx_manager()
+    """
+
+    @staticmethod
+    def is_enabled(name):
+        """
+        :param string name: a variable in the environment of the Lambda function
+        :return bool: whether it's set to true
+        """
+        return os.environ.get(name, '').lower() == 'true'
+
+    @staticmethod
+    def get_prefix(job_table_name):
+        """
+        :param string job_table_name:
+        :return string: the prefix of the names of the tables and functions, e.g. 'dev-' of 'dev-tx-job'
+        """
+        if job_table_name.endswith(TxManager.JOB_TABLE_NAME):
+            return job_table_name[:-len(TxManager.JOB_TABLE_NAME)]
+        return ''
+
+    def get_tx_manager(self, prefix='', **kwargs):
+        """
+        :param string prefix: of the names of the tables and functions
+        :param kwargs: any other arguments of the TxManager, e.g. its api_url
+        :return TxManager:
+        """
+        env_vars = {
+            'job_table_name': '{0}{1}'.format(prefix, TxManager.JOB_TABLE_NAME),
+            'module_table_name': '{0}{1}'.format(prefix, TxManager.MODULE_TABLE_NAME),
+            'prefix': prefix,
+            # Set ASYNC_DISPATCH=true to not wait for the converters
+            'async_dispatch': self.is_enabled('ASYNC_DISPATCH'),
+            # Set CACHE_CONVERSIONS=true to copy the output of identical sources instead of converting
+            'cache_conversions': self.is_enabled('CACHE_CONVERSIONS'),
+            # Set ASYNC_CALLBACKS=true to leave the callbacks to tx_deliver_callback
+            'async_callbacks': self.is_enabled('ASYNC_CALLBACKS')
+        }
+        # Set JOB_STATS=true to count finished jobs for the dashboard, and estimate ETAs from them
+        if self.is_enabled('JOB_STATS'):
+            env_vars['stats_table_name'] = '{0}{1}'.format(prefix, JobStats.STATS_TABLE_NAME)
+        # Set KEEP_FAILED_CALLBACKS=true to save the callbacks that couldn't be delivered for redelivery
+        if self.is_enabled('KEEP_FAILED_CALLBACKS'):
+            env_vars['failed_callbacks_table_name'] = '{0}{1}'.format(
+                prefix, CallbackDispatcher.FAILED_CALLBACKS_TABLE_NAME)
+        # Set CACHE_GOGS_USERS=true to also keep the users of tokens in /tmp across warm invocations
+        if self.is_enabled('CACHE_GOGS_USERS'):
+            env_vars['gogs_user_cache_dir'] = UserCache.CACHE_DIR
+        env_vars.update(kwargs)
+        return TxManager(**env_vars)
+
+    def schedules_jobs(self):
+        """
+        Set SCHEDULE_JOBS=true to queue jobs and start them within the per module limits
+        :return bool:
+        """
+        return self.is_enabled('SCHEDULE_JOBS')
+
+    @staticmethod
+    def get_scheduler(tx_manager, **kwargs):
+        """
+        :param TxManager tx_manager:
+        :param kwargs: any other arguments of the JobScheduler
+        :return JobScheduler: one with the queue table of the tx_manager's prefix
+        """
+        queue_table_name = '{0}{1}'.format(tx_manager.prefix, JobScheduler.QUEUE_TABLE_NAME)
+        return JobScheduler(tx_manager, queue_table_name=queue_table_name, **kwargs)
@@ -0,0 +1,175 @@
+from __future__ import unicode_literals, print_function
+import json
+import time
+import hashlib
+import logging
+import requests
+from datetime import datetime
+from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
+from libraries.aws_tools.lambda_handler import LambdaHandler
+
+
+class CallbackDispatcher(object):
+    """
+    Posts the result of a job to the callback URL the job was requested with.
+
+    Connections are kept alive in a session shared by all the dispatchers of a warm container, each post has a
+    timeout. Posts that can't connect, time out or get a server error are retried with exponential backoff, and
+    callbacks that still fail are saved in the failed callbacks table, if one is given, so redeliver() can try them
+    again later. A callback the receiver rejects, e.g. because its URL isn't found, fails right away.
+
+    With `async_delivery`, dispatch() leaves the delivery to the DELIVER_FUNCTION_NAME function and returns right away.
+    """
+    FAILED_CALLBACKS_TABLE_NAME = 'tx-failed-callbacks'
+    DELIVER_FUNCTION_NAME = 'tx_deliver_callback'
+    TIMEOUT = (3.05, 10)  # seconds to connect, and to wait for the response
+    MAX_ATTEMPTS = 3
+    BACKOFF_SECONDS = 1
+    RETRY_STATUS_CODES = [408, 429]  # the client errors that are worth trying again, besides the server errors
+
+    session = None
+
+    def __init__(self, failed_callbacks_table_name=None, async_delivery=False, prefix='', lambda_handler=None):
+        """
+        :param string failed_callbacks_table_name: save callbacks that couldn't be delivered in this table
+        :param bool async_delivery:
+        :param string prefix: prefix of the deliver function's name
+        :param LambdaHandler lambda_handler:
+        """
+        self.failed_callbacks_table_name = failed_callbacks_table_name
+        self.async_delivery = async_delivery
+        self.prefix = prefix
+        self.lambda_handler = lambda_handler
+        self.failed_db_handler = None
+        self.logger = logging.getLogger()
+
+        self.setup_resources()
+
+    def setup_resources(self):
+        if self.failed_callbacks_table_name:
+            self.failed_db_handler = DynamoDBHandler(self.failed_callbacks_table_name)
+        if not self.lambda_handler:
+            self.lambda_handler = LambdaHandler()
+
+    @classmethod
+    def get_session(cls):
+        """
+        :return requests.Session: the session of this container, created on first use
+        """
+        if not cls.session:
+            cls.session = requests.Session()
+        return cls.session
+
+    @staticmethod
+    def get_callback_id(url, payload):
+        return hashlib.sha256('{0}-{1}'.format(url, payload.get('job_id'))).hexdigest()
+
+    @staticmethod
+    def can_retry(error):
+        """
+        :param Exception error: what a post raised
+        :return bool: whether the callback might get through if it's tried again
+        """
+        if isinstance(error, requests.HTTPError):
+            status_code = error.response.status_code if error.response is not None else None
+            return status_code >= 500 or status_code in CallbackDispatcher.RETRY_STATUS_CODES
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def dispatch(self, url, payload):
+        """
+        Delivers the payload, or has it delivered asynchronously if `async_delivery` is set
+        :param string url:
+        :param dict payload:
+        """
+        if not url.startswith('http'):
+            return
+        if not self.async_delivery:
+            self.deliver(url, payload)
+            return
+        event = {
+            'data': {
+                'url': url,
+                'payload': payload
+            },
+            'vars': {
+                'failed_callbacks_table_name': self.failed_callbacks_table_name
+            }
+        }
+        function_name = '{0}{1}'.format(self.prefix, CallbackDispatcher.DELIVER_FUNCTION_NAME)
+        self.logger.debug('Leaving the callback to {0} to {1}'.format(url, function_name))
+        try:
+            self.lambda_handler.invoke(function_name, event, invocation_type='Event')
+        except Exception as e:
+            self.logger.warning('Could not invoke {0}, delivering the callback now: {1}'.format(function_name, e))
+            self.deliver(url, payload)
+
+    def deliver(self, url, payload, attempts=0):
+        """
+        Posts the payload, retrying with backoff, and saves it as failed if it couldn't be delivered. A callback
+        that was rejected isn't tried again, now or later
+        :param string url:
+        :param dict payload:
+        :param int attempts: how many times the callback failed before
+        :return bool: whether it was delivered
+        """
+        error = None
+        for attempt in range(CallbackDispatcher.MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(CallbackDispatcher.BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                self.post(url, payload)
+                return True
+            except Exception as e:
+                error = e
+                self.logger.debug('Callback to {0} failed on attempt {1}: {2}'.format(url, attempt + 1, e))
+                if not self.can_retry(e):
+                    self.logger.warning('The callback to {0} was rejected: {1}'.format(url, e))
+                    self.remove_failure(url, payload)
+                    return False
+        self.logger.warning('Could not make the callback to {0}: {1}'.format(url, error))
+        self.save_failure(url, payload, attempts + CallbackDispatcher.MAX_ATTEMPTS, error)
+        return False
+
+    def post(self, url, payload):
+        """
+        :param string url:
+        :param dict payload:
+        """
+        headers = {"content-type": "application/json"}
+        self.logger.debug('Making callback to {0} with payload:'.format(url))
+        self.logger.debug(payload)
+        response = self.get_session().post(url, json=payload, headers=headers, timeout=CallbackDispatcher.TIMEOUT)
+        response.raise_for_status()
+        self.logger.debug('finished.')
+
+    def save_failure(self, url, payload, attempts, error):
+        if not self.failed_db_handler:
+            return
+        self.failed_db_handler.insert_item({
+            'callback_id': self.get_callback_id(url, payload),
+            'url': url,
+            'payload': json.dumps(payload),
+            'attempts': attempts,
+            'error': '{0}'.format(error),
+            'failed_at': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        })
+
+    def remove_failure(self, url, payload):
+        if not self.failed_db_handler:
+            return
+        self.failed_db_handler.delete_item({'callback_id': self.get_callback_id(url, payload)})
+
+    def redeliver(self):
+        """
+        Tries the saved failed callbacks again, the ones that are delivered or rejected are removed from the table
+        :return tuple: the number of callbacks delivered and the number that failed again
+        """
+        delivered = 0
+        failed = 0
+        for item in self.failed_db_handler.iter_items():
+            if self.deliver(item['url'], json.loads(item['payload']), int(item['attempts'])):
+                self.failed_db_handler.delete_item({'callback_id': item['callback_id']})
+                delivered += 1
+            else:
+                failed += 1
+        return delivered, failed
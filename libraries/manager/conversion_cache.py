@@ -0,0 +1,171 @@
+from __future__ import unicode_literals, print_function
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from datetime import timedelta
+from six.moves.urllib.parse import urlparse
+from libraries.aws_tools.s3_handler import S3Handler
+
+
+class ConversionCache(object):
+    """
+    Keeps the output of conversions in the cdn bucket, keyed by the content of the source zip, the name and
+    version of the converter module and the converter code, so a source that was converted before is just copied.
+
+    The content of the source is identified by the hash of its files the webhook keeps in the zip's metadata, or
+    else by the ETag S3 has for it, so it doesn't have to be downloaded. The converter code is identified by the
+    hash of libraries/converters, which is deployed with tx-manager, so a changed converter doesn't reuse old output.
+    Each entry is a <key>.zip of the output and a <key>.json of the converter's result.
+    """
+    CACHE_PREFIX = 'tx/cache/'
+    TTL_DAYS = 30
+    CONTENT_HASH_METADATA = 'content-hash'
+    CONVERTERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'converters')
+    converter_version = None
+
+    def __init__(self, cdn_bucket, cache_prefix=CACHE_PREFIX):
+        """
+        :param string cdn_bucket:
+        :param string cache_prefix:
+        """
+        self.cdn_bucket = cdn_bucket
+        self.cache_prefix = cache_prefix
+        self.cdn_handler = None
+        self.logger = logging.getLogger()
+        self.setup_resources()
+
+    def setup_resources(self):
+        self.cdn_handler = S3Handler(self.cdn_bucket)
+
+    @staticmethod
+    def parse_s3_url(url):
+        """
+        :param string url: e.g. https://s3-us-west-2.amazonaws.com/bucket/key or https://bucket.s3.amazonaws.com/key
+        :return tuple: (bucket, key), or (None, None) if it isn't an S3 URL
+        """
+        parsed = urlparse(url)
+        host = parsed.netloc
+        path = parsed.path.lstrip('/')
+        if not host.endswith('.amazonaws.com') or not path:
+            return None, None
+        if host.startswith('s3.') or host.startswith('s3-'):
+            bucket, _, key = path.partition('/')
+        else:
+            bucket, key = host.partition('.s3')[0], path
+        if not bucket or not key:
+            return None, None
+        return bucket, key
+
+    @classmethod
+    def get_converter_version(cls):
+        """
+        :return string: the SHA-1 of the converter code and templates
+        """
+        if cls.converter_version is None:
+            sha1 = hashlib.sha1()
+            for root, dirs, filenames in os.walk(cls.CONVERTERS_DIR):
+                dirs.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith('.pyc'):
+                        continue
+                    path = os.path.join(root, filename)
+                    sha1.update(os.path.relpath(path, cls.CONVERTERS_DIR).replace(os.sep, '/').encode('utf-8'))
+                    with open(path, 'rb') as in_file:
+                        sha1.update(in_file.read())
+            cls.converter_version = sha1.hexdigest()
+        return cls.converter_version
+
+    def get_source_hash(self, source):
+        """
+        :param string source: URL of the source zip
+        :return string: the content hash or else the ETag of the source, None if it can't be found without
+                        downloading it
+        """
+        bucket, key = self.parse_s3_url(source)
+        if not bucket:
+            return None
+        obj = S3Handler(bucket).get_object(key)
+        content_hash = (obj.metadata or {}).get(self.CONTENT_HASH_METADATA)
+        if content_hash:
+            return content_hash
+        e_tag = obj.e_tag
+        if not e_tag:
+            return None
+        return e_tag.strip('"')
+
+    def get_key(self, source, tx_module):
+        """
+        :param string source: URL of the source zip
+        :param TxModule tx_module: the converter module
+        :return string: the cache key of converting the source, with its query, by the module, None if it can't be
+                        cached
+        """
+        source_hash = self.get_source_hash(source)
+        if not source_hash:
+            return None
+        key = '{0}/{1}/{2}/{3}'.format(source_hash, tx_module.name, tx_module.version, self.get_converter_version())
+        query = urlparse(source).query
+        if query:
+            # e.g. ?convert_only=<file name>, which only converts part of the source
+            key += '?' + query
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get_zip_key(self, key):
+        return '{0}{1}.zip'.format(self.cache_prefix, key)
+
+    def get_result_key(self, key):
+        return '{0}{1}.json'.format(self.cache_prefix, key)
+
+    def fetch(self, key, cdn_file):
+        """
+        Copies the cached output to where the job wants it
+        :param string key: cache key
+        :param string cdn_file: key of the job's output in the cdn bucket
+        :return dict: the converter's result, None if nothing was cached
+        """
+        zip_key = self.get_zip_key(key)
+        if not self.cdn_handler.key_exists(zip_key):
+            return None
+        self.cdn_handler.copy(zip_key, to_key=cdn_file, catch_exception=False)
+        result = self.cdn_handler.get_json(self.get_result_key(key))
+        if not result:
+            result = {'success': True, 'info': [], 'warnings': [], 'errors': []}
+        # Touch the entry so eviction sees it as recently used
+        self.cdn_handler.replace(zip_key)
+        self.cdn_handler.replace(self.get_result_key(key))
+        self.logger.debug('Copied cached conversion {0} to {1}'.format(zip_key, cdn_file))
+        return result
+
+    def store(self, key, cdn_file, result):
+        """
+        Copies the output of a job into the cache
+        :param string key: cache key
+        :param string cdn_file: key of the job's output in the cdn bucket
+        :param dict result: the converter's result
+        """
+        self.cdn_handler.copy(cdn_file, to_key=self.get_zip_key(key), catch_exception=False)
+        self.cdn_handler.put_contents(self.get_result_key(key), json.dumps(result), catch_exception=False)
+        self.logger.debug('Cached conversion {0} as {1}'.format(cdn_file, key))
+
+    def evict(self, ttl_days=TTL_DAYS, max_bytes=None):
+        """
+        Deletes the entries that haven't been used for `ttl_days`, then the least recently used ones until the
+        cache is no bigger than `max_bytes`
+        :param int ttl_days:
+        :param int max_bytes:
+        :return int: the number of files deleted
+        """
+        expires = datetime.utcnow() - timedelta(days=ttl_days)
+        objects = sorted(self.cdn_handler.get_objects(prefix=self.cache_prefix), key=lambda o: o.last_modified)
+        total_bytes = sum(obj.size for obj in objects)
+        deleted = 0
+        for obj in objects:
+            if obj.last_modified.replace(tzinfo=None) >= expires and (max_bytes is None or total_bytes <= max_bytes):
+                break
+            self.cdn_handler.delete_file(obj.key)
+            total_bytes -= obj.size
+            deleted += 1
+        self.logger.debug('Evicted {0} files from {1}'.format(deleted, self.cache_prefix))
+        return deleted
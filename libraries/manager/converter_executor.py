@@ -0,0 +1,202 @@
+from __future__ import unicode_literals, print_function
+import json
+import logging
+import multiprocessing
+from libraries.lambda_handlers.convert_handler import ConvertHandler
+from libraries.converters.md2html_converter import Md2HtmlConverter
+from libraries.converters.usfm2html_converter import Usfm2HtmlConverter
+
+
+class LambdaConverterExecutor(object):
+    """
+    Runs each converter module as its {prefix}tx_convert_{module} Lambda function.
+
+    Converters that are dispatched without waiting for them report back to tx-manager's completion function
+    themselves, see ConvertHandler.
+    """
+
+    def __init__(self, lambda_handler, prefix=''):
+        """
+        :param LambdaHandler lambda_handler:
+        :param string prefix:
+        """
+        self.lambda_handler = lambda_handler
+        self.prefix = prefix
+
+    def get_name(self, module_name):
+        """
+        :param string module_name:
+        :return string: what runs the module, for the job log
+        """
+        return '{0}tx_convert_{1}'.format(self.prefix, module_name)
+
+    def invoke(self, module_name, payload):
+        """
+        Runs the converter and waits for it
+        :param string module_name:
+        :param dict payload: the event for the ConvertHandler of the module
+        :return dict: the return value of the converter's run(), {'errorMessage': ...} if it failed, None if the
+                      function didn't say
+        """
+        response = self.lambda_handler.invoke(self.get_name(module_name), payload)
+        if 'errorMessage' in response:
+            return {'errorMessage': response['errorMessage']}
+        if 'Payload' in response:
+            return json.loads(response['Payload'].read())
+        return None
+
+    def dispatch(self, module_name, payload, on_result):
+        """
+        Starts the converter without waiting for it
+        :param string module_name:
+        :param dict payload: the event for the ConvertHandler of the module, with the 'completion' to report to
+        :param callable on_result: not called, the function reports to the completion function instead
+        """
+        self.lambda_handler.invoke(self.get_name(module_name), payload, invocation_type='Event')
+
+
+def run_converter(item):
+    """
+    Runs a converter like its Lambda function does, in a worker process if there are any
+    :param tuple item: the converter class and the event for its ConvertHandler
+    :return dict: the return value of the converter's run(), {'errorMessage': ...} if it failed
+    """
+    converter_class, payload = item
+    try:
+        return ConvertHandler(converter_class).handle(payload, None)
+    except Exception as e:
+        return {'errorMessage': e.message}
+
+
+class LocalConverterExecutor(object):
+    """
+    Runs the converters in a pool of worker processes on this machine through the same ConvertHandler as their
+    Lambda functions, for when tx-manager runs next to them, like when reconverting many repos on one machine.
+
+    Converters that are dispatched without waiting for them report back through the given function, which is called
+    in this thread, the one the executor's jobs and their boto3 resources belong to, either by a later dispatch()
+    once they're done or by close(), which waits for them. Where there can't be a pool, like on AWS Lambda, they run
+    in this process.
+    """
+    CONVERTER_CLASSES = {
+        'md2html': Md2HtmlConverter,
+        'usfm2html': Usfm2HtmlConverter
+    }
+
+    def __init__(self, workers=0, converter_classes=None):
+        """
+        :param int workers: how many conversions can run at once, 0 for one per core
+        :param dict converter_classes: converter module names mapped to their classes, which have to be importable
+                                       by the worker processes
+        """
+        self.workers = workers
+        self.converter_classes = converter_classes if converter_classes else LocalConverterExecutor.CONVERTER_CLASSES
+        self.pool = None
+        self.pending = []  # (AsyncResult, on_result) of the dispatched converters that haven't reported back
+        self.logger = logging.getLogger()
+
+    def get_name(self, module_name):
+        """
+        :param string module_name:
+        :return string: what runs the module, for the job log
+        """
+        return 'local {0}'.format(module_name)
+
+    def get_item(self, module_name, payload):
+        """
+        :param string module_name:
+        :param dict payload:
+        :return tuple: the converter class and the event for its ConvertHandler
+        """
+        if module_name not in self.converter_classes:
+            raise Exception('No local converter for module {0}'.format(module_name))
+        # the result comes back to this process, so the converter doesn't report it or hand over to a Lambda function
+        data = dict((key, value) for key, value in payload['data'].items()
+                    if key not in ['completion', 'continuation'])
+        return self.converter_classes[module_name], {'data': data, 'vars': payload.get('vars', {})}
+
+    def get_pool(self):
+        """
+        :return multiprocessing.Pool: None if there can't be one
+        """
+        if self.pool is None:
+            workers = self.workers
+            if not workers:
+                try:
+                    workers = multiprocessing.cpu_count()
+                except NotImplementedError:
+                    workers = 1
+            # a worker of another pool, e.g. of the BulkReconverter, can't start processes of its own
+            try:
+                self.pool = multiprocessing.Pool(workers)
+                self.logger.debug('Converting in {0} workers'.format(workers))
+            except (OSError, ImportError, AssertionError) as e:
+                self.logger.debug('Converting in this process, could not start workers: {0}'.format(e))
+                self.pool = False
+        return self.pool or None
+
+    def invoke(self, module_name, payload):
+        """
+        Runs the converter and waits for it
+        :param string module_name:
+        :param dict payload: the event for the ConvertHandler of the module
+        :return dict: the return value of the converter's run(), {'errorMessage': ...} if it failed
+        """
+        item = self.get_item(module_name, payload)
+        pool = self.get_pool()
+        if not pool:
+            return run_converter(item)
+        return pool.apply(run_converter, (item,))
+
+    def dispatch(self, module_name, payload, on_result):
+        """
+        Starts the converter without waiting for it
+        :param string module_name:
+        :param dict payload: the event for the ConvertHandler of the module
+        :param callable on_result: called with what invoke() would return once the converter has finished
+        """
+        item = self.get_item(module_name, payload)
+        pool = self.get_pool()
+        if not pool:
+            self.report(on_result, run_converter(item))
+            return
+        self.pending.append((pool.apply_async(run_converter, (item,)), on_result))
+        self.report_finished()
+
+    def report(self, on_result, result):
+        """
+        :param callable on_result:
+        :param dict result:
+        """
+        try:
+            on_result(result)
+        except Exception as e:
+            # the other converters still have to report back
+            self.logger.error('Could not report the result of a converter: {0}'.format(e), exc_info=1)
+
+    def report_finished(self, wait=False):
+        """
+        Passes the results of the dispatched converters that have finished on
+        :param bool wait: wait for the ones that haven't finished yet
+        """
+        pending = []
+        for async_result, on_result in self.pending:
+            if not wait and not async_result.ready():
+                pending.append((async_result, on_result))
+                continue
+            try:
+                result = async_result.get()
+            except Exception as e:
+                result = {'errorMessage': '{0}'.format(e)}
+            self.report(on_result, result)
+        self.pending = pending
+
+    def close(self):
+        """
+        Waits for the dispatched converters to finish, reports their results and stops the workers
+        """
+        if self.pool:
+            self.pool.close()
+            self.report_finished(wait=True)
+            self.pool.join()
+        self.pool = None
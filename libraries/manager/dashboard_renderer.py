@@ -0,0 +1,152 @@
+from __future__ import unicode_literals, print_function
+import json
+from xml.sax.saxutils import escape
+from six import string_types
+
+
+class DashboardRenderer(object):
+    """
+    Renders the tX-Manager dashboard from string templates in a single pass.
+
+    The element ids and classes are the same as the ones the old BeautifulSoup renderer produced (it's kept in
+    scripts/benchmark_dashboard_renderer.py), every value is escaped before it goes into the page.
+    """
+    ESCAPE_ENTITIES = {'"': '&quot;', "'": '&#39;'}
+
+    PAGE_START = '<h1>TX-Manager Dashboard</h1>\n<h2>Module Attributes</h2>\n<br/>\n<table id="status">\n'
+    MODULE_HEADER = '<tr id="{id}"><td class="hdr" colspan="2">{name}</td></tr>\n'
+    ROW = '<tr id="{id}" class="{cls}"><td class="lbl">{label}:</td><td>{value}</td></tr>\n'
+    TOTALS_HEADER = '<tr id="totals"><td class="hdr" colspan="2">Total Jobs</td></tr>\n'
+    FAILURES_START = '</table>\n<h2>Failed Jobs</h2>\n' \
+                     '<table id="failed" cellpadding="4" border="1" style="border-collapse:collapse">\n' \
+                     '<tr id="header"><th class="hdr">Time</th><th class="hdr">Errors</th><th class="hdr">Repo</th>' \
+                     '<th class="hdr">PreConvert</th><th class="hdr">Converted</th><th class="hdr">Destination</th>' \
+                     '</tr>\n'
+    FAILURE_ROW = '<tr id="failure-{index}" class="module-job-id"><td>{created_at}</td><td>{errors}</td>' \
+                  '<td><a href="{repo_url}">{repo}</a></td>' \
+                  '<td><a href="{preconverted_url}">{preconverted_name}</a></td>' \
+                  '<td><a href="{converted_url}">{job_id}.zip</a></td>' \
+                  '<td><a href="{destination_url}">Build Log</a></td></tr>\n'
+    PAGE_END = '</table>\n'
+
+    # (id suffix, class, label, item key, whether the value is JSON, whether the row is left out when empty)
+    MODULE_ATTRIBUTES = [
+        ('type', 'module-type', 'Type', 'type', False, False),
+        ('input', 'module-input', 'Input Format', 'input_format', True, False),
+        ('output', 'module-output', 'Output Format', 'output_format', True, False),
+        ('resource', 'module-resource', 'Resource Types', 'resource_types', True, False),
+        ('version', 'module-version', 'Version', 'version', False, False),
+        ('options', 'module-options', 'Options', 'options', True, True),
+        ('private-links', 'module-private-links', 'Private Links', 'private_links', True, True),
+        ('public-links', 'module-public-links', 'Public Links', 'public_links', True, True),
+    ]
+    # stages in the order they happen, other stages go after them
+    STAGES = ['cache', 'download', 'unzip', 'preprocess', 'convert', 'zip', 'upload', 'template', 'deploy']
+    MODULE_COUNTS = [
+        ('job-success', 'Job Successes', 'success'),
+        ('job-warning', 'Job Warnings', 'warnings'),
+        ('job-failure', 'Job Failures', 'failures'),
+        ('job-total', 'Jobs Total', 'total'),
+    ]
+
+    @staticmethod
+    def escape(value):
+        """
+        :param value:
+        :return string: the value as text that is safe inside an element or a quoted attribute
+        """
+        if not isinstance(value, string_types):
+            value = '{0}'.format(value)
+        return escape(value, DashboardRenderer.ESCAPE_ENTITIES)
+
+    def render_row(self, row_id, cls, label, value):
+        return self.ROW.format(id=self.escape(row_id), cls=cls, label=label, value=self.escape(value))
+
+    def render_module(self, item, counts, timings=None):
+        """
+        :param dict item: the module's db data
+        :param dict counts: the module's job counts
+        :param dict timings: stage names mapped to the `p50` and `p95` milliseconds of the module's jobs
+        :return list: html of the module's rows
+        """
+        module_name = item['name']
+        rows = [self.MODULE_HEADER.format(id=self.escape(module_name), name=self.escape(module_name))]
+        for suffix, cls, label, key, is_json, optional in self.MODULE_ATTRIBUTES:
+            value = item[key]
+            if optional and not len(value):
+                continue
+            rows.append(self.render_row(module_name + '-' + suffix, cls, label,
+                                        json.dumps(value) if is_json else value))
+        for suffix, label, counter in self.MODULE_COUNTS:
+            rows.append(self.render_row(module_name + '-' + suffix, 'module-public-links', label, counts[counter]))
+        if timings:
+            stages = sorted(timings, key=lambda s: (self.STAGES.index(s) if s in self.STAGES else len(self.STAGES), s))
+            for stage in stages:
+                rows.append(self.render_row(module_name + '-timing-' + stage, 'module-timing',
+                                            self.escape(stage.title()) + ' p50 / p95',
+                                            '{0} / {1} ms'.format(timings[stage]['p50'], timings[stage]['p95'])))
+        return rows
+
+    def render_totals(self, totals, total_job_count):
+        return [
+            self.TOTALS_HEADER,
+            self.render_row('totals-job-success', 'module-public-links', 'Success', totals['success']),
+            self.render_row('totals-job-warning', 'module-public-links', 'Warnings', totals['warnings']),
+            self.render_row('totals-job-failure', 'module-public-links', 'Failures', totals['failures']),
+            self.render_row('totals-job-unregistered', 'module-public-links', 'Unregistered',
+                            total_job_count - totals['total']),
+            self.render_row('totals-job-total', 'module-public-links', 'Total', total_job_count),
+        ]
+
+    def render_failure(self, index, item, gogs_url):
+        """
+        :param int index:
+        :param dict item: the failed job's data
+        :param string gogs_url:
+        :return string: html of the failure's row, None if the job data is incomplete
+        """
+        try:
+            owner_name, repo_name, commit_id = item['identifier'].split('/')
+            source_sub_path = '{0}/{1}'.format(owner_name, repo_name)
+            destination_url = 'https://{0}/u/{1}/{2}/{3}/build_log.json'.format(item['cdn_bucket'], owner_name,
+                                                                              repo_name, commit_id)
+            return self.FAILURE_ROW.format(
+                index=index,
+                created_at=self.escape(item['created_at']),
+                errors=self.escape(','.join(item['errors'])),
+                repo_url=self.escape(gogs_url + '/' + source_sub_path),
+                repo=self.escape(source_sub_path),
+                preconverted_url=self.escape(item['source']),
+                preconverted_name=self.escape(item['source'].rsplit('/', 1)[1]),
+                converted_url=self.escape(item['output']),
+                job_id=self.escape(item['job_id']),
+                destination_url=self.escape(destination_url))
+        except:
+            return None
+
+    def render(self, modules, module_counts, totals, total_job_count, job_failures, max_failures, gogs_url,
+               module_timings=None):
+        """
+        :param list modules: db data of the modules, in the order they are shown
+        :param dict module_counts: module names mapped to their job counts
+        :param dict totals: job counts of all the registered modules
+        :param int total_job_count: number of jobs in the job table
+        :param list job_failures: data of the failed jobs, newest first
+        :param int max_failures: the most failed jobs to show
+        :param string gogs_url:
+        :param dict module_timings: module names mapped to the percentiles of their stage timings
+        :return string: the dashboard's html, UTF-8 encoded
+        """
+        module_timings = module_timings or {}
+        html = [self.PAGE_START]
+        for item in modules:
+            html.extend(self.render_module(item, module_counts[item['name']], module_timings.get(item['name'])))
+        html.extend(self.render_totals(totals, total_job_count))
+        html.append(self.FAILURES_START)
+        for i, item in enumerate(job_failures[:max_failures]):
+            row = self.render_failure(i, item, gogs_url)
+            if row:
+                html.append(row)
+        html.append(self.PAGE_END)
+        return ''.join(html).encode('utf-8')
+
@@ -0,0 +1,158 @@
+from __future__ import unicode_literals, print_function
+import json
+import logging
+from datetime import datetime
+from libraries.aws_tools.s3_handler import S3Handler
+from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
+from libraries.manager.conversion_cache import ConversionCache
+
+
+class EtaEstimator(object):
+    """
+    Learns how long the jobs of each converter module take, from requesting them to finishing them, to estimate
+    when a new job will be done.
+
+    The model of a module is a least squares line of seconds over megabytes of the source zip, kept as decayed sums
+    so newer jobs count more, plus the decayed mean for jobs whose source size isn't known, and how many jobs it
+    learned from. It is kept in the job stats table as an item named MODEL_PREFIX + the module name, whose `model`
+    is JSON.
+    """
+    MODEL_PREFIX = '_eta_'
+    DEFAULT_SECONDS = 20
+    MIN_SECONDS = 5
+    MAX_SECONDS = 3600
+    MIN_SAMPLES = 3  # don't trust the model before this many jobs
+    DECAY = 0.98  # the weight of all the earlier jobs when adding a new one
+    MAX_RETRIES = 5
+    SUMS = ['count', 'total', 'n', 'sx', 'sy', 'sxx', 'sxy']
+
+    def __init__(self, stats_table_name):
+        """
+        :param string stats_table_name:
+        """
+        self.stats_table_name = stats_table_name
+        self.stats_db_handler = None
+        self.logger = logging.getLogger()
+        self.setup_resources()
+
+    def setup_resources(self):
+        self.stats_db_handler = DynamoDBHandler(self.stats_table_name)
+
+    def get_source_size(self, source):
+        """
+        :param string source: URL of the source zip
+        :return float: megabytes of the source, None if it can't be found without downloading it
+        """
+        bucket, key = ConversionCache.parse_s3_url(source)
+        if not bucket:
+            return None
+        try:
+            size = S3Handler(bucket).get_object(key).content_length
+        except Exception as e:
+            self.logger.debug('Could not get the size of {0}: {1}'.format(source, e))
+            return None
+        if size is None:
+            return None
+        return size / 1048576.0
+
+    @staticmethod
+    def get_duration(job_data):
+        """
+        :param dict job_data:
+        :return float: seconds from requesting the job to finishing it, None if it isn't known
+        """
+        try:
+            created_at = datetime.strptime(job_data['created_at'], "%Y-%m-%dT%H:%M:%SZ")
+            ended_at = datetime.strptime(job_data['ended_at'], "%Y-%m-%dT%H:%M:%SZ")
+        except (KeyError, TypeError, ValueError):
+            return None
+        seconds = (ended_at - created_at).total_seconds()
+        if seconds < 0:
+            return None
+        return seconds
+
+    def get_model(self, module_name):
+        """
+        :param string module_name:
+        :return tuple: the model and its version, ({}, None) if there isn't one yet
+        """
+        item = self.stats_db_handler.get_item({'name': EtaEstimator.MODEL_PREFIX + module_name})
+        if not item:
+            return {}, None
+        return json.loads(item['model']), item['version']
+
+    @staticmethod
+    def add_sample(model, seconds, size=None):
+        """
+        :param dict model:
+        :param float seconds:
+        :param float size: megabytes of the source
+        :return dict: the model with the sample added
+        """
+        jobs = model.get('jobs', 0) + 1
+        sized_jobs = model.get('sized_jobs', 0) + (1 if size is not None else 0)
+        model = dict((name, model.get(name, 0) * EtaEstimator.DECAY) for name in EtaEstimator.SUMS)
+        model['jobs'] = jobs
+        model['sized_jobs'] = sized_jobs
+        model['count'] += 1
+        model['total'] += seconds
+        if size is not None:
+            model['n'] += 1
+            model['sx'] += size
+            model['sy'] += seconds
+            model['sxx'] += size * size
+            model['sxy'] += size * seconds
+        return model
+
+    @staticmethod
+    def predict(model, size=None):
+        """
+        :param dict model:
+        :param float size: megabytes of the source
+        :return int: estimated seconds, DEFAULT_SECONDS if the model has seen too few jobs
+        """
+        if model.get('jobs', 0) < EtaEstimator.MIN_SAMPLES:
+            return EtaEstimator.DEFAULT_SECONDS
+        seconds = model['total'] / model['count']
+        if size is not None and model['sized_jobs'] >= EtaEstimator.MIN_SAMPLES:
+            n, sx, sy, sxx, sxy = [model[name] for name in ['n', 'sx', 'sy', 'sxx', 'sxy']]
+            variance = n * sxx - sx * sx
+            if variance > 1e-9 * n * n:
+                # bigger sources don't convert faster
+                slope = max((n * sxy - sx * sy) / variance, 0)
+                seconds = (sy - slope * sx) / n + slope * size
+            else:
+                seconds = sy / n
+        return int(round(min(max(seconds, EtaEstimator.MIN_SECONDS), EtaEstimator.MAX_SECONDS)))
+
+    def estimate(self, module_name, source):
+        """
+        :param string module_name:
+        :param string source: URL of the source zip
+        :return int: seconds the job is estimated to take
+        """
+        model, _ = self.get_model(module_name)
+        size = None
+        if model.get('sized_jobs', 0) >= EtaEstimator.MIN_SAMPLES:
+            size = self.get_source_size(source)
+        return self.predict(model, size)
+
+    def record(self, job_data):
+        """
+        Learns from a job that just finished
+        :param dict job_data:
+        """
+        seconds = self.get_duration(job_data)
+        if seconds is None or not job_data.get('convert_module') or job_data.get('status') == 'failed':
+            return
+        size = self.get_source_size(job_data['source']) if job_data.get('source') else None
+        keys = {'name': EtaEstimator.MODEL_PREFIX + job_data['convert_module']}
+        for _ in range(EtaEstimator.MAX_RETRIES):
+            model, version = self.get_model(job_data['convert_module'])
+            data = {
+                'model': json.dumps(self.add_sample(model, seconds, size)),
+                'version': (version or 0) + 1
+            }
+            if self.stats_db_handler.update_item_if(keys, data, {'version': version}):
+                return
+        self.logger.warning('Could not learn the duration of job {0}'.format(job_data.get('job_id')))
@@ -0,0 +1,151 @@
+from __future__ import unicode_literals, print_function
+import heapq
+import random
+import itertools
+from libraries.general_tools.timer import get_percentiles
+
+
+class JobAggregator(object):
+    """
+    Counts jobs per converter module and in total, and keeps the newest failed jobs, in a single pass over a stream
+    of job data, so the jobs never have to be held in memory all at once.
+
+    A job that failed or has errors counts as a failure, one with warnings but no errors as a warning, any other as
+    a success. The job stats count jobs as they finish with the same get_outcome().
+
+    The stage timings of each module are sampled, keeping at most MAX_TIMING_SAMPLES per stage, for their percentiles.
+    The timings of the newest `max_recent_timings` jobs of each module can be kept as well.
+    """
+    COUNTERS = ['success', 'warnings', 'failures', 'total']
+    FINISHED_STATUSES = ['success', 'warnings', 'failed']
+    MAX_TIMING_SAMPLES = 1000
+
+    def __init__(self, module_names, max_failures, max_recent_timings=0):
+        """
+        :param list module_names: modules to count the jobs of, the jobs of other modules only go in the totals, None
+                                  to count the jobs of every module
+        :param int max_failures: how many of the newest failed jobs to keep
+        :param int max_recent_timings: how many of the newest stage timings of each module to keep
+        """
+        self.max_failures = max_failures
+        self.max_recent_timings = max_recent_timings
+        self.all_modules = module_names is None
+        self.module_counts = dict((name, self.new_counts()) for name in module_names or [])
+        self.totals = self.new_counts()
+        # min-heaps of (created_at, -sequence, data), so the oldest kept entry, and of equally old ones the last
+        # added, is on top
+        self.failures = []
+        self.recent_timings = {}
+        self.sequence = itertools.count()
+        # module names mapped to stage names mapped to [number of timings seen, sampled milliseconds]
+        self.timing_samples = dict((name, {}) for name in module_names or [])
+        self.random = random.Random(0)
+
+    @staticmethod
+    def new_counts():
+        return dict((counter, 0) for counter in JobAggregator.COUNTERS)
+
+    @staticmethod
+    def get_outcome(job_data):
+        """
+        :param dict job_data:
+        :return string: the counter the job goes in
+        """
+        if job_data.get('status') == 'failed' or job_data.get('errors'):
+            return 'failures'
+        if job_data.get('status') == 'warnings' or job_data.get('warnings'):
+            return 'warnings'
+        return 'success'
+
+    @staticmethod
+    def is_finished(job_data):
+        """
+        :param dict job_data:
+        :return bool:
+        """
+        return job_data.get('status') in JobAggregator.FINISHED_STATUSES
+
+    def add(self, job_data):
+        """
+        :param dict job_data:
+        """
+        outcome = self.get_outcome(job_data)
+        counts_list = [self.totals]
+        module_name = job_data.get('convert_module')
+        if self.all_modules and module_name and module_name not in self.module_counts:
+            self.module_counts[module_name] = self.new_counts()
+            self.timing_samples[module_name] = {}
+        if module_name in self.module_counts:
+            counts_list.append(self.module_counts[module_name])
+        for counts in counts_list:
+            counts[outcome] += 1
+            counts['total'] += 1
+        if job_data.get('timings') and module_name in self.timing_samples:
+            self.add_timings(self.timing_samples[module_name], job_data['timings'])
+            if self.max_recent_timings > 0:
+                self.keep_newest(self.recent_timings.setdefault(module_name, []), job_data, job_data['timings'],
+                                 self.max_recent_timings)
+        if outcome == 'failures' and self.max_failures > 0:
+            self.keep_newest(self.failures, job_data, job_data, self.max_failures)
+
+    def keep_newest(self, heap, job_data, data, limit):
+        """
+        :param list heap: see __init__()
+        :param dict job_data: the job the data is of
+        :param data: what to keep of the job
+        :param int limit: how many entries the heap keeps
+        """
+        entry = (job_data.get('created_at') or '', -next(self.sequence), data)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry[0] > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+
+    def add_timings(self, samples, timings):
+        """
+        Reservoir samples the milliseconds of each stage, so every job has the same chance to be kept
+        :param dict samples:
+        :param dict timings: stage names mapped to milliseconds
+        """
+        for stage, milliseconds in timings.items():
+            sample = samples.setdefault(stage, [0, []])
+            sample[0] += 1
+            values = sample[1]
+            if len(values) < JobAggregator.MAX_TIMING_SAMPLES:
+                values.append(int(milliseconds))
+            else:
+                index = self.random.randint(0, sample[0] - 1)
+                if index < JobAggregator.MAX_TIMING_SAMPLES:
+                    values[index] = int(milliseconds)
+
+    def add_all(self, jobs):
+        """
+        :param jobs: iterable of job data dicts, e.g. from iterating over the job table
+        :return JobAggregator: self
+        """
+        for job_data in jobs:
+            self.add(job_data)
+        return self
+
+    @staticmethod
+    def get_newest(heap):
+        return [entry[2] for entry in sorted(heap, key=lambda e: e[:2], reverse=True)]
+
+    def get_failures(self):
+        """
+        :return list: data of the newest failed jobs, newest first
+        """
+        return self.get_newest(self.failures)
+
+    def get_recent_timings(self):
+        """
+        :return dict: module names mapped to the stage timings of their newest jobs, newest first
+        """
+        return dict((name, self.get_newest(heap)) for name, heap in self.recent_timings.items())
+
+    def get_timing_percentiles(self):
+        """
+        :return dict: module names mapped to stage names mapped to the `p50` and `p95` milliseconds of the stage
+        """
+        return dict((name, get_percentiles(dict((stage, sample[1]) for stage, sample in samples.items())))
+                    for name, samples in self.timing_samples.items())
@@ -0,0 +1,190 @@
+from __future__ import unicode_literals, print_function
+import json
+import logging
+from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
+from libraries.general_tools.timer import get_percentiles
+from libraries.manager.eta_estimator import EtaEstimator
+from libraries.manager.job_aggregator import JobAggregator
+
+
+class JobStats(object):
+    """
+    Job counts per converter module and the most recent failed jobs, kept up to date as jobs finish so the dashboard
+    doesn't have to read the whole job table.
+
+    The table has an item per module, named after it, with `success`, `warnings`, `failures` and `total` counters,
+    a RECENT_FAILURES item whose `failures` is a JSON list of the newest failed jobs, and an item per module named
+    RECENT_TIMINGS + the module name whose `timings` is a JSON list of the stage timings of its newest jobs.
+    """
+    STATS_TABLE_NAME = 'tx-job-stats'
+    RECENT_FAILURES = '_recent_failures'
+    RECENT_TIMINGS = '_recent_timings_'
+    MAX_RECENT_FAILURES = 50
+    MAX_RECENT_TIMINGS = 100
+    MAX_ERRORS_PER_FAILURE = 10
+    MAX_RETRIES = 5
+    FAILURE_FIELDS = ['job_id', 'identifier', 'created_at', 'cdn_bucket', 'source', 'output', 'errors']
+
+    def __init__(self, stats_table_name=None):
+        """
+        :param string stats_table_name:
+        """
+        self.stats_table_name = stats_table_name
+        self.stats_db_handler = None
+        self.logger = logging.getLogger()
+
+        if not self.stats_table_name:
+            self.stats_table_name = JobStats.STATS_TABLE_NAME
+
+        self.setup_resources()
+
+    def setup_resources(self):
+        self.stats_db_handler = DynamoDBHandler(self.stats_table_name)
+
+    @staticmethod
+    def get_failure(job_data):
+        failure = dict((field, job_data.get(field)) for field in JobStats.FAILURE_FIELDS)
+        failure['errors'] = (failure['errors'] or [])[:JobStats.MAX_ERRORS_PER_FAILURE]
+        return failure
+
+    @staticmethod
+    def get_timings(job_data):
+        """
+        :param dict job_data:
+        :return dict: stage names mapped to milliseconds, None if the job has no timings
+        """
+        if not job_data.get('timings'):
+            return None
+        return dict((stage, int(milliseconds)) for stage, milliseconds in job_data['timings'].items())
+
+    def record(self, job_data):
+        """
+        Counts a job that just finished
+        :param dict job_data:
+        """
+        if not JobAggregator.is_finished(job_data) or not job_data.get('convert_module'):
+            return
+        outcome = JobAggregator.get_outcome(job_data)
+        self.stats_db_handler.add_to_item({'name': job_data['convert_module']}, {outcome: 1, 'total': 1})
+        if outcome == 'failures':
+            self.add_failure(job_data)
+        if job_data.get('timings'):
+            self.add_timings(job_data)
+
+    def add_failure(self, job_data):
+        """
+        Puts a failed job at the top of the recent failures
+        :param dict job_data:
+        """
+        if not self.add_recent(JobStats.RECENT_FAILURES, 'failures', self.get_failure(job_data),
+                               JobStats.MAX_RECENT_FAILURES):
+            self.logger.warning('Could not add job {0} to the recent failures'.format(job_data.get('job_id')))
+
+    def add_timings(self, job_data):
+        """
+        Puts the stage timings of a job at the top of the recent timings of its module
+        :param dict job_data:
+        """
+        name = JobStats.RECENT_TIMINGS + job_data['convert_module']
+        if not self.add_recent(name, 'timings', self.get_timings(job_data), JobStats.MAX_RECENT_TIMINGS):
+            self.logger.warning('Could not add the timings of job {0}'.format(job_data.get('job_id')))
+
+    def add_recent(self, name, field, entry, limit):
+        """
+        Puts an entry at the top of the JSON list in `field` of the named item, retrying if another job finished at
+        the same time
+        :param string name:
+        :param string field:
+        :param entry:
+        :param int limit: the most entries the list keeps
+        :return bool: whether the entry was added
+        """
+        keys = {'name': name}
+        for _ in range(JobStats.MAX_RETRIES):
+            item = self.stats_db_handler.get_item(keys)
+            version = item['version'] if item else None
+            entries = json.loads(item[field]) if item else []
+            entries.insert(0, entry)
+            data = {
+                field: json.dumps(entries[:limit]),
+                'version': (version or 0) + 1
+            }
+            if self.stats_db_handler.update_item_if(keys, data, {'version': version}):
+                return True
+        return False
+
+    def get_module_counts(self, module_names):
+        """
+        :param list module_names:
+        :return dict: module names mapped to dicts of their `success`, `warnings`, `failures` and `total` counts
+        """
+        counts = {}
+        items = self.stats_db_handler.batch_get([{'name': name} for name in module_names])
+        for name in module_names:
+            counts[name] = {'success': 0, 'warnings': 0, 'failures': 0, 'total': 0}
+        for item in items:
+            for counter in counts[item['name']]:
+                counts[item['name']][counter] = int(item.get(counter, 0))
+        return counts
+
+    def get_module_timings(self, module_names):
+        """
+        :param list module_names:
+        :return dict: module names mapped to stage names mapped to the `p50` and `p95` milliseconds of their recent
+                      jobs
+        """
+        timings = dict((name, {}) for name in module_names)
+        items = self.stats_db_handler.batch_get([{'name': JobStats.RECENT_TIMINGS + name} for name in module_names])
+        for item in items:
+            samples = {}
+            for job_timings in json.loads(item['timings']):
+                for stage, milliseconds in job_timings.items():
+                    samples.setdefault(stage, []).append(milliseconds)
+            timings[item['name'][len(JobStats.RECENT_TIMINGS):]] = get_percentiles(samples)
+        return timings
+
+    def get_recent_failures(self, limit=MAX_RECENT_FAILURES):
+        """
+        :param int limit:
+        :return list: data of the newest failed jobs, newest first
+        """
+        item = self.stats_db_handler.get_item({'name': JobStats.RECENT_FAILURES})
+        if not item:
+            return []
+        return json.loads(item['failures'])[:limit]
+
+    def rebuild(self, jobs):
+        """
+        Replaces the stats with those of the finished ones of the given jobs. The new items are written over the old
+        ones before the items of modules without jobs are deleted, so the dashboard never sees empty stats.
+        :param jobs: iterable of job data dicts, e.g. from iterating over the job table
+        :return dict: module names mapped to their counts
+        """
+        aggregator = JobAggregator(None, JobStats.MAX_RECENT_FAILURES, JobStats.MAX_RECENT_TIMINGS)
+        aggregator.add_all(job_data for job_data in jobs if JobAggregator.is_finished(job_data))
+        counts = aggregator.module_counts
+
+        # the ETA models aren't stats, they learn from the jobs as they finish
+        old_items = dict((item['name'], item) for item in self.stats_db_handler.query_items(fields=['name', 'version'])
+                         if not item['name'].startswith(EtaEstimator.MODEL_PREFIX))
+
+        def next_version(name):
+            # so that adding to a recent list that was read before the rebuild has to read it again
+            return int(old_items.get(name, {}).get('version') or 0) + 1
+
+        items = [dict(counts[name], name=name) for name in counts]
+        items.append({
+            'name': JobStats.RECENT_FAILURES,
+            'failures': json.dumps([self.get_failure(job_data) for job_data in aggregator.get_failures()]),
+            'version': next_version(JobStats.RECENT_FAILURES)
+        })
+        for name, job_timings in aggregator.get_recent_timings().items():
+            items.append({
+                'name': JobStats.RECENT_TIMINGS + name,
+                'timings': json.dumps([self.get_timings({'timings': timings}) for timings in job_timings]),
+                'version': next_version(JobStats.RECENT_TIMINGS + name)
+            })
+        self.stats_db_handler.batch_insert(items)
+        new_names = set(item['name'] for item in items)
+        self.stats_db_handler.batch_delete([{'name': name} for name in old_items if name not in new_names])
+        return counts
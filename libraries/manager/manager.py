@@ -1,26 +1,44 @@
 from __future__ import unicode_literals, print_function
 import json
 import hashlib
-import requests
 import logging
+from functools import partial
 from datetime import datetime
 from datetime import timedelta
 from libraries.aws_tools.lambda_handler import LambdaHandler
-from bs4 import BeautifulSoup
 from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
 from libraries.gogs_tools.gogs_handler import GogsHandler
 from libraries.models.job import TxJob
 from libraries.models.module import TxModule
+from libraries.manager.module_registry import ModuleRegistry
+from libraries.manager.scheduler import JobScheduler
+from libraries.manager.conversion_cache import ConversionCache
+from libraries.manager.job_stats import JobStats
+from libraries.manager.eta_estimator import EtaEstimator
+from libraries.manager.dashboard_renderer import DashboardRenderer
+from libraries.manager.job_aggregator import JobAggregator
+from libraries.manager.callback_dispatcher import CallbackDispatcher
+from libraries.manager.converter_executor import LambdaConverterExecutor
+from libraries.general_tools.timer import StageTimer
 
 
 class TxManager(object):
     JOB_TABLE_NAME = 'tx-job'
     MODULE_TABLE_NAME = 'tx-module'
     MAX_FAILURES = 10
+    COMPLETION_FUNCTION_NAME = 'tx_complete_job'
+    # Longer than a conversion can take with all its continuations, see ConvertHandler.MAX_CONTINUATIONS
+    STALE_JOB_SECONDS = 2 * 60 * 60
+    # The only job fields the dashboard needs, so we don't read the log of every job
+    DASHBOARD_JOB_FIELDS = ['job_id', 'identifier', 'convert_module', 'created_at', 'cdn_bucket', 'source', 'output',
+                            'status', 'errors', 'warnings', 'timings']
 
     def __init__(self, api_url=None, gogs_url=None, cdn_url=None, cdn_bucket=None,
                  aws_access_key_id=None, aws_secret_access_key=None,
-                 job_table_name=None, module_table_name=None, prefix=''):
+                 job_table_name=None, module_table_name=None, prefix='', async_dispatch=False,
+                 cache_conversions=False, stats_table_name=None, async_callbacks=False,
+                 failed_callbacks_table_name=None, gogs_user_cache_dir=None, converter_executor=None,
+                 scan_segments=1):
         """
         :param string api_url:
         :param string gogs_url:
@@ -31,6 +49,16 @@ class TxManager(object):
         :param string job_table_name:
         :param string module_table_name:
         :param string prefix:
+        :param bool async_dispatch: invoke converters without waiting for them, see complete_job()
+        :param bool cache_conversions: reuse the output of earlier conversions of the same source, see ConversionCache
+        :param string stats_table_name: keep job counts in this table for the dashboard, see JobStats
+        :param bool async_callbacks: don't wait for the callbacks to be delivered, see CallbackDispatcher
+        :param string failed_callbacks_table_name: save callbacks that couldn't be delivered in this table
+        :param string gogs_user_cache_dir: also keep the users of Gogs tokens in this directory, see UserCache
+        :param converter_executor: what runs the converters, defaults to their Lambda functions, see
+                                   LambdaConverterExecutor and LocalConverterExecutor
+        :param int scan_segments: when the dashboard or a stats rebuild has to scan the job table, read it in this
+                                  many segments at once
         """
         self.api_url = api_url
         self.gogs_url = gogs_url
@@ -41,6 +69,14 @@ class TxManager(object):
         self.job_table_name = job_table_name
         self.module_table_name = module_table_name
         self.prefix = prefix
+        self.async_dispatch = async_dispatch
+        self.cache_conversions = cache_conversions
+        self.stats_table_name = stats_table_name
+        self.async_callbacks = async_callbacks
+        self.failed_callbacks_table_name = failed_callbacks_table_name
+        self.gogs_user_cache_dir = gogs_user_cache_dir
+        self.converter_executor = converter_executor
+        self.scan_segments = scan_segments
 
         if not self.job_table_name:
             self.job_table_name = TxManager.JOB_TABLE_NAME
@@ -51,6 +87,9 @@ class TxManager(object):
         self.module_db_handler = None
         self.gogs_handler = None
         self.lambda_handler = None
+        self.job_stats = None
+        self.eta_estimator = None
+        self.callback_dispatcher = None
 
         self.jobs_total = 0
         self.jobs_warnings = 0
@@ -67,20 +106,23 @@ class TxManager(object):
         if self.module_table_name:
             self.module_db_handler = DynamoDBHandler(self.module_table_name)
         if self.gogs_url:
-            self.gogs_handler = GogsHandler(self.gogs_url)
+            self.gogs_handler = GogsHandler(self.gogs_url, user_cache_dir=self.gogs_user_cache_dir)
         self.lambda_handler = LambdaHandler(self.aws_access_key_id, self.aws_secret_access_key)
+        if self.stats_table_name:
+            self.job_stats = JobStats(self.stats_table_name)
+            self.eta_estimator = EtaEstimator(self.stats_table_name)
+        self.callback_dispatcher = CallbackDispatcher(self.failed_callbacks_table_name,
+                                                      async_delivery=self.async_callbacks, prefix=self.prefix,
+                                                      lambda_handler=self.lambda_handler)
+        if not self.converter_executor:
+            self.converter_executor = LambdaConverterExecutor(self.lambda_handler, self.prefix)
 
     def get_user(self, user_token):
         return self.gogs_handler.get_user(user_token)
 
     def get_converter_module(self, job):
-        tx_modules = TxModule(db_handler=self.module_db_handler).query()
-        for tx_module in tx_modules:
-            if job.resource_type in tx_module.resource_types:
-                if job.input_format in tx_module.input_format:
-                    if job.output_format in tx_module.output_format:
-                        return tx_module
-        return None
+        registry = ModuleRegistry.get_registry(self.module_db_handler)
+        return registry.get_module(job.resource_type, job.input_format, job.output_format)
 
     def setup_job(self, data):
         if 'gogs_user_token' not in data:
@@ -109,6 +151,8 @@ class TxManager(object):
             raise Exception('"input_format" not given.')
         if not job.output_format:
             raise Exception('"output_format" not given.')
+        if job.priority and job.priority not in JobScheduler.LANES:
+            raise Exception('"priority" must be one of: {0}'.format(', '.join(JobScheduler.LANES)))
 
         tx_module = self.get_converter_module(job)
 
@@ -119,7 +163,7 @@ class TxManager(object):
         job.convert_module = tx_module.name
         created_at = datetime.utcnow()
         expires_at = created_at + timedelta(days=1)
-        eta = created_at + timedelta(seconds=20)
+        eta = created_at + timedelta(seconds=self.estimate_job_seconds(job, tx_module))
         job.created_at = created_at.strftime("%Y-%m-%dT%H:%M:%SZ")
         job.expires_at = expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")
         job.eta = eta.strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -156,6 +200,20 @@ class TxManager(object):
             ],
         }
 
+    def estimate_job_seconds(self, job, tx_module):
+        """
+        :param TxJob job:
+        :param TxModule tx_module:
+        :return int: how many seconds the job will probably take, learned from earlier jobs of the module if job
+                     stats are kept
+        """
+        if self.eta_estimator:
+            try:
+                return self.eta_estimator.estimate(tx_module.name, job.source)
+            except Exception as e:
+                self.logger.warning('Could not estimate the duration of the job: {0}'.format(e))
+        return EtaEstimator.DEFAULT_SECONDS
+
     def get_job_count(self):
         """
         get number of jobs in database - one caveat is that this value may be off since AWS only updates it every 6 hours
@@ -209,7 +267,13 @@ class TxManager(object):
         if job.status != 'requested' or job.started_at:
             return job.get_db_data()  # Job already started, return
 
-        job.started_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        started_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        # Claim the job in a single write, so two invocations that both read it as requested can't both convert it
+        if not self.job_db_handler.update_item_if({'job_id': job_id}, {'status': 'started', 'started_at': started_at},
+                                                  {'status': 'requested'}):
+            return TxJob(job_id, db_handler=self.job_db_handler).get_db_data()  # Job started meanwhile, return
+
+        job.started_at = started_at
         job.status = 'started'
         job.message = 'Conversion started...'
         job.log_message('Started job {0} at {1}'.format(job_id, job.started_at))
@@ -222,66 +286,225 @@ class TxManager(object):
                 raise Exception('No converter was found to convert {0} from {1} to {2}'
                                 .format(job.resource_type, job.input_format, job.output_format))
 
-            job.converter_module = tx_module.name
+            job.convert_module = tx_module.name
             job.update()
 
+            cached_result = self.fetch_cached_conversion(job, tx_module)
+            if cached_result:
+                success = self.apply_converter_result(job, tx_module.name, cached_result)
+                return self.finish_job(job, success)
+
             payload = {
                 'data': {
                     'job': job.get_db_data()
                 }
             }
 
-            converter_function = '{0}tx_convert_{1}'.format(self.prefix, tx_module.name)
-            job.log_message('Telling module {0} to convert {1} and put at {2}'.format(converter_function,
+            converter_name = self.converter_executor.get_name(tx_module.name)
+            job.log_message('Telling module {0} to convert {1} and put at {2}'.format(converter_name,
                                                                                       job.source,
                                                                                       job.output))
 
-            self.logger.debug("Payload to {0}:".format(converter_function))
+            completion = {
+                'function_name': '{0}{1}'.format(self.prefix, TxManager.COMPLETION_FUNCTION_NAME),
+                'job_table_name': self.job_table_name,
+                'module_table_name': self.module_table_name,
+                'prefix': self.prefix
+            }
+            if self.async_dispatch:
+                # The converter reports back through complete_job(), so we don't wait for it to finish. The job is
+                # saved first, since a local converter can report back before dispatch() returns
+                payload['data']['completion'] = completion
+                self.logger.debug("Payload to {0}:".format(converter_name))
+                self.logger.debug(json.dumps(payload))
+                job.log_message('Dispatched job {0} to {1}'.format(job.job_id, converter_name))
+                job.update()
+                job_data = job.get_db_data()
+                self.converter_executor.dispatch(tx_module.name, payload, partial(self.complete_job, job.job_id))
+                return job_data
+
+            # A converter that runs out of time hands the rest over to another invocation, which reports back
+            # through complete_job()
+            payload['data']['continuation'] = completion
+            self.logger.debug("Payload to {0}:".format(converter_name))
             self.logger.debug(json.dumps(payload))
-            response = self.lambda_handler.invoke(converter_function, payload)
+            json_data = self.converter_executor.invoke(tx_module.name, payload)
             self.logger.debug('finished.')
 
-            if 'errorMessage' in response:
-                error = response['errorMessage']
+            if json_data and 'errorMessage' in json_data:
+                error = json_data['errorMessage']
                 if error.startswith('Bad Request: '):
                     error = error[len('Bad Request: '):]
                 job.error_message(error)
-                self.logger.debug('Received error message from {0}: {1}'.format(converter_function, error))
-            elif 'Payload' in response:
-                json_data = json.loads(response['Payload'].read())
-                self.logger.debug("Payload from {0}: {1}".format(converter_function, json_data))
-                # The 'Payload' of the response could result in a few different formats:
+                self.logger.debug('Received error message from {0}: {1}'.format(converter_name, error))
+            elif json_data is not None:
+                self.logger.debug("Payload from {0}: {1}".format(converter_name, json_data))
+                # The result of the converter could be in a few different formats:
                 # 1) It could be that an exception was thrown in the converter code, which the API Gateway puts
                 #    into a json array with "errorMessage" containing the exception message, which we handled above.
                 # 2) If a "success" key is in the payload, that means our code finished with
                 #    the expected results (see converters/converter.py's run() return value).
-                # 3) The other possibility is for the Lambda function to not finish executing
-                #    (e.g. exceeds its 5 minute execution limit). We don't currently handle this possibility.
-                # Todo: Handle lambda function returning due to exceeding 5 minutes execution limit
-                if 'success' in json_data:
-                    success = json_data['success']
-                    for message in json_data['info']:
-                        if message:
-                            job.log_message(message)
-                    for message in json_data['errors']:
-                        if message:
-                            job.error_message(message)
-                    for message in json_data['warnings']:
-                        if message:
-                            job.warning_message(message)
-                    if len(json_data['errors']):
-                        job.log_message('{0} function returned with errors.'.format(tx_module.name))
-                    elif len(json_data['warnings']):
-                        job.log_message('{0} function returned with warnings.'.format(tx_module.name))
-                    else:
-                        job.log_message('{0} function returned successfully.'.format(tx_module.name))
-                else:
-                    job.error_message('Conversion failed for unknown reason.')
+                # 3) If "paused" is set, the converter was running out of time, so it kept what it had converted
+                #    and invoked itself again to finish, which reports back through complete_job().
+                if json_data.get('paused'):
+                    job.log_message('{0} ran out of time, continuing the conversion in another invocation'
+                                    .format(converter_name))
+                    job.update()
+                    return job.get_db_data()
+                success = self.apply_converter_result(job, tx_module.name, json_data)
+                if success and not len(json_data['errors']):
+                    self.cache_conversion(job, tx_module, json_data)
             else:
                 job.error_message('Conversion failed for unknown reason.')
         except Exception as e:
             job.error_message('Failed with message: {0}'.format(e.message))
 
+        return self.finish_job(job, success)
+
+    def complete_job(self, job_id, result):
+        """
+        Finalizes a job that was dispatched asynchronously, once its converter has finished
+        :param string job_id:
+        :param dict result: the return value of the converter's run(), or {'errorMessage': ...} if it failed
+        :return dict: the job data
+        """
+        job = TxJob(job_id, db_handler=self.job_db_handler)
+
+        if not job.job_id:
+            job.job_id = job_id
+            job.success = False
+            job.message = 'No job with ID {} has been requested'.format(job_id)
+            return job.get_db_data()  # Job doesn't exist, return
+
+        # Lambda can deliver an event more than once, so only finish jobs that are still running
+        if job.status != 'started' or job.ended_at:
+            return job.get_db_data()
+
+        success = False
+        try:
+            if 'errorMessage' in result:
+                error = result['errorMessage']
+                if error.startswith('Bad Request: '):
+                    error = error[len('Bad Request: '):]
+                job.error_message(error)
+            else:
+                success = self.apply_converter_result(job, job.convert_module, result)
+                if success and not len(result['errors']):
+                    self.cache_conversion(job, TxModule(job.convert_module, db_handler=self.module_db_handler),
+                                          result)
+        except Exception as e:
+            job.error_message('Failed with message: {0}'.format(e.message))
+
+        return self.finish_job(job, success)
+
+    def expire_stale_jobs(self, max_seconds=STALE_JOB_SECONDS):
+        """
+        Fails the jobs that have been started for longer than any conversion takes. Their converter died without
+        reporting back, e.g. it hit the Lambda timeout or ran out of memory, so complete_job() was never called.
+        :param int max_seconds:
+        :return list: the data of the jobs that were failed
+        """
+        cutoff = (datetime.utcnow() - timedelta(seconds=max_seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        query = {
+            'status': 'started',
+            'started_at': {'condition': 'lt', 'value': cutoff}
+        }
+        expired = []
+        for job in TxJob(db_handler=self.job_db_handler).iter_query(query, fields=['job_id']):
+            job = TxJob(job.job_id, db_handler=self.job_db_handler)
+            if job.status != 'started' or job.ended_at or not job.started_at or job.started_at >= cutoff:
+                continue  # finished since the scan
+            # only if the converter still hasn't reported back, and complete_job() then leaves it alone
+            ended_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+            if not self.job_db_handler.update_item_if({'job_id': job.job_id}, {'ended_at': ended_at},
+                                                      {'status': 'started', 'ended_at': None}):
+                continue
+            job.error_message('{0} did not finish within {1} minutes, it may have run out of time or memory'
+                              .format(job.convert_module or 'The converter', max_seconds // 60))
+            expired.append(self.finish_job(job, False))
+        return expired
+
+    def fetch_cached_conversion(self, job, tx_module):
+        """
+        Copies the output of an earlier conversion of the same source by the same module to the job's output
+        :param TxJob job:
+        :param TxModule tx_module:
+        :return dict: the converter result of the earlier conversion, None if there isn't one
+        """
+        if not self.cache_conversions:
+            return None
+        timer = StageTimer()
+        try:
+            with timer.stage('cache'):
+                cache = ConversionCache(job.cdn_bucket)
+                cache_key = cache.get_key(job.source, tx_module)
+                if not cache_key:
+                    return None
+                result = cache.fetch(cache_key, job.cdn_file)
+        except Exception as e:
+            self.logger.warning('Could not read the conversion cache: {0}'.format(e))
+            return None
+        if result:
+            job.log_message('{0} already converted this source, reusing its output'.format(tx_module.name))
+            # the stages of the earlier conversion didn't happen this time
+            result['timings'] = timer.timings
+        return result
+
+    def cache_conversion(self, job, tx_module, result):
+        """
+        Keeps the output of a successful conversion for jobs with the same source
+        :param TxJob job:
+        :param TxModule tx_module:
+        :param dict result: the converter's result
+        """
+        if not self.cache_conversions:
+            return
+        try:
+            cache = ConversionCache(job.cdn_bucket)
+            cache_key = cache.get_key(job.source, tx_module)
+            if cache_key:
+                cache.store(cache_key, job.cdn_file, result)
+        except Exception as e:
+            self.logger.warning('Could not cache the conversion: {0}'.format(e))
+
+    @staticmethod
+    def apply_converter_result(job, module_name, json_data):
+        """
+        Copies the messages returned by a converter into the job
+        :param TxJob job:
+        :param string module_name:
+        :param dict json_data: the return value of the converter's run()
+        :return bool: whether the converter succeeded
+        """
+        if not json_data or 'success' not in json_data:
+            job.error_message('Conversion failed for unknown reason.')
+            return False
+        for message in json_data['info']:
+            if message:
+                job.log_message(message)
+        for message in json_data['errors']:
+            if message:
+                job.error_message(message)
+        for message in json_data['warnings']:
+            if message:
+                job.warning_message(message)
+        if len(json_data['errors']):
+            job.log_message('{0} function returned with errors.'.format(module_name))
+        elif len(json_data['warnings']):
+            job.log_message('{0} function returned with warnings.'.format(module_name))
+        else:
+            job.log_message('{0} function returned successfully.'.format(module_name))
+        if json_data.get('timings'):
+            job.timings = json_data['timings']
+        return json_data['success']
+
+    def finish_job(self, job, success):
+        """
+        Sets the final status of the job, saves it and makes the callback
+        :param TxJob job:
+        :param bool success:
+        :return dict: the job data
+        """
         job.ended_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
         if not success or len(job.errors):
@@ -304,6 +527,17 @@ class TxManager(object):
 
         job.update()
 
+        if self.job_stats:
+            try:
+                self.job_stats.record(job.get_db_data())
+            except Exception as e:
+                self.logger.warning('Could not update the job stats: {0}'.format(e))
+        if self.eta_estimator:
+            try:
+                self.eta_estimator.record(job.get_db_data())
+            except Exception as e:
+                self.logger.warning('Could not update the ETA model: {0}'.format(e))
+
         callback_payload = job.get_db_data()
 
         callback_payload["message"] = message
@@ -314,12 +548,7 @@ class TxManager(object):
         return job.get_db_data()
 
     def do_callback(self, url, payload):
-        if url.startswith('http'):
-            headers = {"content-type": "application/json"}
-            self.logger.debug('Making callback to {0} with payload:'.format(url))
-            self.logger.debug(payload)
-            requests.post(url, json=payload, headers=headers)
-            self.logger.debug('finished.')
+        self.callback_dispatcher.dispatch(url, payload)
 
     def make_api_gateway_for_module(self, module):
         # lambda_func_name = module['name']
@@ -421,6 +650,7 @@ class TxManager(object):
 
         tx_module.public_links.append("{0}/tx/convert/{1}".format(self.api_url, tx_module.name))
         tx_module.insert()
+        ModuleRegistry.get_registry(self.module_db_handler).invalidate()
         self.make_api_gateway_for_module(tx_module)  # Todo: develop this function
         return tx_module.get_db_data()
 
@@ -443,202 +673,59 @@ class TxManager(object):
             for item in items:
                 module_names.append(item["name"])
 
-            registered_jobs = self.list_jobs({ "convert_module" : { "condition" : "is_in", "value" : module_names}
-                                    }, False)
+            if self.job_stats:
+                module_counts = self.job_stats.get_module_counts(module_names)
+                totals = dict((counter, sum(counts[counter] for counts in module_counts.values()))
+                              for counter in ['success', 'warnings', 'failures', 'total'])
+                job_failures = self.job_stats.get_recent_failures(max_failures)
+                module_timings = self.job_stats.get_module_timings(module_names)
+            else:
+                module_counts, totals, job_failures, module_timings = self.get_dashboard_counts(module_names,
+                                                                                                max_failures)
             total_job_count = self.get_job_count()
-            registered_job_count = len(registered_jobs)
+            registered_job_count = totals['total']
             if registered_job_count > total_job_count: # sanity check since AWS can be slow to update job count reported in table (every 6 hours)
                 total_job_count = registered_job_count
 
             self.logger.debug("Found: " + str(len(items)) + " item[s] in tx-module")
 
-            body = BeautifulSoup('<h1>TX-Manager Dashboard</h1><h2>Module Attributes</h2><br><table id="status"></table>',
-                                 'html.parser')
-            for item in items:
-                module_name = item["name"]
-                self.logger.debug(module_name)
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '"><td class="hdr" colspan="2">' + str(module_name) + '</td></tr>',
-                    'html.parser'))
-
-                jobs = self.get_jobs_for_module(registered_jobs, module_name)
-                self.get_jobs_counts(jobs)
-
-                # TBD the following code almosts walks the db record replacing next 11 lines
-                # for attr, val in item:
-                #    if (attr != 'name') and (len(attr) > 0):
-                #       rec += '            <tr><td class="lbl">' + attr.replace("_", " ").title() + ':</td><td>' + "lst(val)" + "</td></tr>\n"
-                # rec += '<tr><td colspan="2"></td></tr>'
-
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-type" class="module-type"><td class="lbl">Type:</td><td>' +
-                    str(item["type"]) + '</td></tr>',
-                    'html.parser'))
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-input" class="module-input"><td class="lbl">Input Format:</td><td>' +
-                    json.dumps(item["input_format"]) + '</td></tr>',
-                    'html.parser'))
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-output" class="module-output"><td class="lbl">Output Format:</td><td>' +
-                    json.dumps(item["output_format"]) + '</td></tr>',
-                    'html.parser'))
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-resource" class="module-resource"><td class="lbl">Resource Types:</td><td>' +
-                    json.dumps(item["resource_types"]) + '</td></tr>',
-                    'html.parser'))
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-version" class="module-version"><td class="lbl">Version:</td><td>' +
-                    str(item["version"]) + '</td></tr>',
-                    'html.parser'))
-
-                if len(item["options"]) > 0:
-                    body.table.append(BeautifulSoup(
-                        '<tr id="' + module_name + '-options" class="module-options"><td class="lbl">Options:</td><td>' +
-                        json.dumps(item["options"]) + '</td></tr>',
-                        'html.parser'))
-
-                if len(item["private_links"]) > 0:
-                    body.table.append(BeautifulSoup(
-                        '<tr id="' + module_name + '-private-links" class="module-private-links"><td class="lbl">Private Links:</td><td>' +
-                        json.dumps(item["private_links"]) + '</td></tr>',
-                        'html.parser'))
-
-                if len(item["public_links"]) > 0:
-                    body.table.append(BeautifulSoup(
-                        '<tr id="' + module_name + '-public-links" class="module-public-links"><td class="lbl">Public Links:</td><td>' +
-                        json.dumps(item["public_links"]) + '</td></tr>',
-                        'html.parser'))
-
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-job-success" class="module-public-links"><td class="lbl">Job Successes:</td><td>' +
-                    str(self.jobs_success) + '</td></tr>',
-                    'html.parser'))
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-job-warning" class="module-public-links"><td class="lbl">Job Warnings:</td><td>' +
-                    str(self.jobs_warnings) + '</td></tr>',
-                    'html.parser'))
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-job-failure" class="module-public-links"><td class="lbl">Job Failures:</td><td>' +
-                    str(self.jobs_failures) + '</td></tr>',
-                    'html.parser'))
-                body.table.append(BeautifulSoup(
-                    '<tr id="' + module_name + '-job-total" class="module-public-links"><td class="lbl">Jobs Total:</td><td>' +
-                    str(self.jobs_total) + '</td></tr>',
-                    'html.parser'))
-
-            self.get_jobs_counts(registered_jobs)
-            body.table.append(BeautifulSoup(
-                '<tr id="totals"><td class="hdr" colspan="2">Total Jobs</td></tr>',
-                'html.parser'))
-            body.table.append(BeautifulSoup(
-                '<tr id="totals-job-success" class="module-public-links"><td class="lbl">Success:</td><td>' +
-                str(self.jobs_success) + '</td></tr>',
-                'html.parser'))
-            body.table.append(BeautifulSoup(
-                '<tr id="totals-job-warning" class="module-public-links"><td class="lbl">Warnings:</td><td>' +
-                str(self.jobs_warnings) + '</td></tr>',
-                'html.parser'))
-            body.table.append(BeautifulSoup(
-                '<tr id="totals-job-failure" class="module-public-links"><td class="lbl">Failures:</td><td>' +
-                str(self.jobs_failures) + '</td></tr>',
-                'html.parser'))
-            body.table.append(BeautifulSoup(
-                '<tr id="totals-job-unregistered" class="module-public-links"><td class="lbl">Unregistered:</td><td>' +
-                str(total_job_count - self.jobs_total) + '</td></tr>',
-                'html.parser'))
-            body.table.append(BeautifulSoup(
-                '<tr id="totals-job-total" class="module-public-links"><td class="lbl">Total:</td><td>' +
-                str(total_job_count) + '</td></tr>',
-                'html.parser'))
-
-            # build job failures table
-
-            job_failures = self.get_job_failures(registered_jobs)
-            body.append(BeautifulSoup('<h2>Failed Jobs</h2>', 'html.parser'))
-            failure_table = BeautifulSoup('<table id="failed" cellpadding="4" border="1" style="border-collapse:collapse"></table>','html.parser')
-            failure_table.table.append(BeautifulSoup('''
-                <tr id="header">
-                <th class="hdr">Time</th>
-                <th class="hdr">Errors</th>
-                <th class="hdr">Repo</th>
-                <th class="hdr">PreConvert</th>
-                <th class="hdr">Converted</th>
-                <th class="hdr">Destination</th>''',
-                'html.parser'))
+            self.jobs_success = totals['success']
+            self.jobs_warnings = totals['warnings']
+            self.jobs_failures = totals['failures']
+            self.jobs_total = totals['total']
 
             gogs_url = self.gogs_url
             if gogs_url == None :
                 gogs_url = 'https://git.door43.org'
 
-            for i in range(0, max_failures):
-                if i >= len(job_failures):
-                    break
-
-                item = job_failures[i]
-
-                try :
-                    identifier = item['identifier']
-                    owner_name, repo_name, commit_id = identifier.split('/')
-                    source_sub_path = '{0}/{1}'.format(owner_name, repo_name)
-                    cdn_bucket = item['cdn_bucket']
-                    destination_url = 'https://{0}/u/{1}/{2}/{3}/build_log.json'.format(cdn_bucket, owner_name, repo_name, commit_id)
-                    repoUrl = gogs_url + "/" + source_sub_path
-                    preconverted_url = item['source']
-                    converted_url = item['output']
-                    failure_table.table.append(BeautifulSoup(
-                        '<tr id="failure-' + str(i) + '" class="module-job-id">'
-                        + '<td>' + item['created_at'] + '</td>'
-                        + '<td>' + ','.join(item['errors']) + '</td>'
-                        + '<td><a href="' + repoUrl + '">' + source_sub_path + '</a></td>'
-                        + '<td><a href="' + preconverted_url + '">' + preconverted_url.rsplit('/', 1)[1] + '</a></td>'
-                        + '<td><a href="' + converted_url + '">' + item['job_id'] + '.zip</a></td>'
-                        + '<td><a href="' + destination_url + '">Build Log</a></td>'
-                        + '</tr>',
-                        'html.parser'))
-                except:
-                    pass
-
-            body.append(failure_table)
-            dashboard['body'] = body.prettify('UTF-8')
+            dashboard['body'] = DashboardRenderer().render(items, module_counts, totals, total_job_count,
+                                                           job_failures, max_failures, gogs_url, module_timings)
         else:
             self.logger.debug("No modules found.")
 
         return dashboard
 
-    def get_jobs_for_module(self, jobs, moduleName):
-        jobs_in_module = []
-        for job in jobs:
-            if "convert_module" in job:
-                name = job["convert_module"]
-                if name == moduleName:
-                    jobs_in_module.append(job)
-
-        return jobs_in_module
-
-    def get_jobs_counts(self, jobs):
-        self.jobs_total = len(jobs)
-        self.jobs_warnings = 0
-        self.jobs_failures = 0
-        self.jobs_success = 0
-        for job in jobs:
-            errors = job['errors']
-            if len(errors) > 0:
-                self.jobs_failures+=1
-                continue
-
-            warnings = job['warnings']
-            if len(warnings) > 0:
-                self.jobs_warnings+=1
-                continue
-
-            self.jobs_success+=1
-
-    def get_job_failures(self, jobs):
-        failed_jobs = []
-        for job in jobs:
-            errors = job['errors']
-            if len(errors) > 0:
-                failed_jobs.append(job)
-
-        failed_jobs = sorted(failed_jobs, key=lambda k: k['created_at'], reverse=True)
-        return failed_jobs
+    def get_dashboard_counts(self, module_names, max_failures=MAX_FAILURES):
+        """
+        Counts the jobs of the given modules in a single pass while reading them page by page
+        :param list module_names:
+        :param int max_failures:
+        :return tuple: module names mapped to their counts, the counts of all the jobs read, the newest
+                       `max_failures` failed jobs, newest first, and module names mapped to their stage timing
+                       percentiles
+        """
+        query = {"convert_module": {"condition": "is_in", "value": module_names}}
+        jobs = TxJob(db_handler=self.job_db_handler).iter_query(query, fields=TxManager.DASHBOARD_JOB_FIELDS,
+                                                                segments=self.scan_segments)
+        aggregator = JobAggregator(module_names, max_failures).add_all(job.get_db_data() for job in jobs)
+        return (aggregator.module_counts, aggregator.totals, aggregator.get_failures(),
+                aggregator.get_timing_percentiles())
+
+    def rebuild_job_stats(self):
+        """
+        Recounts the jobs in the stats table from the job table
+        :return dict: module names mapped to their counts
+        """
+        jobs = TxJob(db_handler=self.job_db_handler).iter_query(fields=TxManager.DASHBOARD_JOB_FIELDS,
+                                                                segments=self.scan_segments)
+        return self.job_stats.rebuild(job.get_db_data() for job in jobs)
@@ -0,0 +1,92 @@
+from __future__ import unicode_literals, print_function
+import time
+import logging
+from six import string_types
+from libraries.models.module import TxModule
+
+
+class ModuleRegistry(object):
+    """
+    In-memory index of a tx-module table by (resource_type, input_format, output_format).
+
+    Registries are kept per table name at the class level, so the table is only scanned once per warm Lambda
+    container and again when the TTL runs out or a module is registered.
+    """
+    TTL_SECONDS = 300
+
+    registries = {}
+
+    def __init__(self, db_handler, ttl_seconds=TTL_SECONDS):
+        """
+        :param DynamoDBHandler db_handler: handler of the tx-module table
+        :param int ttl_seconds:
+        """
+        self.db_handler = db_handler
+        self.ttl_seconds = ttl_seconds
+        self.modules = []
+        self.index = {}
+        self.loaded_at = None
+        self.logger = logging.getLogger()
+
+    @classmethod
+    def get_registry(cls, db_handler):
+        """
+        Gets the shared registry of the table of the given handler
+        :param DynamoDBHandler db_handler:
+        :return ModuleRegistry:
+        """
+        if db_handler.table_name not in cls.registries:
+            cls.registries[db_handler.table_name] = cls(db_handler)
+        registry = cls.registries[db_handler.table_name]
+        registry.db_handler = db_handler
+        return registry
+
+    @classmethod
+    def clear(cls):
+        """
+        Forgets all registries
+        """
+        cls.registries = {}
+
+    def is_stale(self):
+        return self.loaded_at is None or time.time() - self.loaded_at >= self.ttl_seconds
+
+    def invalidate(self):
+        """
+        Makes the next lookup reload the table
+        """
+        self.loaded_at = None
+
+    def load(self):
+        """
+        Scans the table and rebuilds the index. When more than one module can do a conversion, the first one
+        found wins, the same as when the table was searched on every lookup.
+        """
+        self.modules = TxModule(db_handler=self.db_handler).query()
+        self.index = {}
+        for tx_module in self.modules:
+            for resource_type in self.as_list(tx_module.resource_types):
+                for input_format in self.as_list(tx_module.input_format):
+                    for output_format in self.as_list(tx_module.output_format):
+                        self.index.setdefault((resource_type, input_format, output_format), tx_module)
+        self.loaded_at = time.time()
+        self.logger.debug('Loaded {0} modules from {1}'.format(len(self.modules), self.db_handler.table_name))
+
+    def get_module(self, resource_type, input_format, output_format):
+        """
+        :param string resource_type:
+        :param string input_format:
+        :param string output_format:
+        :return TxModule: the module that converts the resource type from the input to the output format, or None
+        """
+        if self.is_stale():
+            self.load()
+        return self.index.get((resource_type, input_format, output_format))
+
+    @staticmethod
+    def as_list(value):
+        if not value:
+            return []
+        if isinstance(value, string_types):
+            return [value]
+        return value
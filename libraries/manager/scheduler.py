@@ -0,0 +1,271 @@
+from __future__ import unicode_literals, print_function
+import logging
+from datetime import datetime
+from datetime import timedelta
+from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
+from libraries.models.job import TxJob
+from libraries.models.queued_job import TxQueuedJob
+
+
+class InProcessExecutor(object):
+    """
+    Runs each job in this process by calling the given function with its job ID.
+
+    The function returns the job data like TxManager.start_job() does. A job whose status is still 'started'
+    is taken to be running elsewhere until JobScheduler.job_finished() is called for it.
+    """
+
+    def __init__(self, run_job):
+        """
+        :param callable run_job:
+        """
+        self.run_job = run_job
+
+    def execute(self, job_id):
+        """
+        :param string job_id:
+        :return dict: the job data
+        """
+        return self.run_job(job_id)
+
+
+class JobScheduler(object):
+    """
+    Queues jobs instead of starting them right away, and only starts as many jobs per converter module as its
+    limit allows. Interactive jobs always go before bulk jobs, and bulk jobs can't take the last
+    `reserved_interactive` slots of a module, so a redeploy can't starve people's pushes.
+
+    The queue is kept in DynamoDB, so jobs survive the Lambda that queued them. Each module has `limit` slot items
+    in the queue table, named SLOT_PREFIX + the module name + '/' + the slot number, whose `holder` is the job that
+    has them. A job only starts once it took a slot with a conditional write, so dispatchers running at the same
+    time can't start more jobs than the limit between them.
+    """
+    QUEUE_TABLE_NAME = 'tx-job-queue'
+    INTERACTIVE = 'interactive'
+    BULK = 'bulk'
+    LANES = [INTERACTIVE, BULK]  # highest priority first
+    DEFAULT_LIMIT = 10
+    RESERVED_INTERACTIVE = 2
+    SLOT_PREFIX = '_slot_'
+    # How many jobs that run to the end one dispatch waits for, more would risk the timeout of its Lambda function
+    MAX_SYNC_JOBS = 1
+
+    def __init__(self, tx_manager, queue_table_name=None, limits=None, executor=None,
+                 reserved_interactive=RESERVED_INTERACTIVE, max_sync_jobs=MAX_SYNC_JOBS, on_waiting=None,
+                 stale_seconds=None):
+        """
+        :param TxManager tx_manager:
+        :param string queue_table_name:
+        :param dict limits: converter module names mapped to the number of their jobs that can run at once
+        :param executor: something with an execute(job_id) method, defaults to running tx_manager.start_job()
+        :param int reserved_interactive: slots of each module that bulk jobs can't use
+        :param int max_sync_jobs: how many jobs that run to the end a dispatch waits for
+        :param callable on_waiting: called when a dispatch stopped at max_sync_jobs with jobs still waiting, to
+                                    dispatch again somewhere else
+        :param int stale_seconds: a running job older than this has died without telling us, so its slot is freed.
+                                  Defaults to when tx-manager fails it, a conversion can go on across many
+                                  invocations of its converter, see TxManager.STALE_JOB_SECONDS
+        """
+        self.tx_manager = tx_manager
+        self.queue_table_name = queue_table_name
+        self.limits = limits if limits else {}
+        self.executor = executor
+        self.reserved_interactive = reserved_interactive
+        self.max_sync_jobs = max_sync_jobs
+        self.on_waiting = on_waiting
+        self.stale_seconds = stale_seconds
+        self.queue_db_handler = None
+        self.logger = logging.getLogger()
+
+        if not self.queue_table_name:
+            self.queue_table_name = JobScheduler.QUEUE_TABLE_NAME
+        if not self.executor:
+            self.executor = InProcessExecutor(self.tx_manager.start_job)
+        if not self.stale_seconds:
+            self.stale_seconds = self.tx_manager.STALE_JOB_SECONDS
+
+        self.setup_resources()
+
+    def setup_resources(self):
+        self.queue_db_handler = DynamoDBHandler(self.queue_table_name)
+
+    def get_limit(self, module_name, lane):
+        """
+        :param string module_name:
+        :param string lane:
+        :return int: how many of the module's slots a job of the lane can take
+        """
+        limit = self.limits.get(module_name, JobScheduler.DEFAULT_LIMIT)
+        if lane != JobScheduler.INTERACTIVE:
+            limit = max(limit - self.reserved_interactive, 1)
+        return limit
+
+    @staticmethod
+    def get_slot_name(module_name, number):
+        return '{0}{1}/{2}'.format(JobScheduler.SLOT_PREFIX, module_name, number)
+
+    @staticmethod
+    def lane_for(job):
+        """
+        :param TxJob job:
+        :return string:
+        """
+        if job.priority in JobScheduler.LANES:
+            return job.priority
+        return JobScheduler.INTERACTIVE
+
+    def submit(self, job_id):
+        """
+        Queues a job and starts whatever jobs can be started
+        :param string job_id:
+        :return list: IDs of the jobs that were started
+        """
+        job = TxJob(job_id, db_handler=self.tx_manager.job_db_handler)
+        if not job.job_id:
+            self.logger.debug('No job with ID {0} has been requested'.format(job_id))
+            return []
+        queued_job = TxQueuedJob({
+            'job_id': job.job_id,
+            'lane': self.lane_for(job),
+            'convert_module': job.convert_module,
+            'queued_at': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        }, db_handler=self.queue_db_handler)
+        queued_job.insert()
+        self.logger.debug('Queued job {0} in the {1} lane'.format(job_id, queued_job.lane))
+        return self.dispatch()
+
+    def job_finished(self, job_id):
+        """
+        Frees the slot of a job that ran elsewhere and starts whatever jobs can be started
+        :param string job_id:
+        :return list: IDs of the jobs that were started
+        """
+        queued_job = TxQueuedJob(job_id, db_handler=self.queue_db_handler)
+        if queued_job.job_id:
+            self.remove(queued_job)
+        return self.dispatch()
+
+    def dispatch(self):
+        """
+        Starts queued jobs, in lane and then queue order, as long as their modules have free slots
+        :return list: IDs of the jobs that were started
+        """
+        stale_before = (datetime.utcnow() - timedelta(seconds=self.stale_seconds))\
+            .strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        slots = {}  # slot names mapped to their items
+        waiting = []
+        for item in self.queue_db_handler.query_items() or []:
+            if item['job_id'].startswith(JobScheduler.SLOT_PREFIX):
+                slots[item['job_id']] = item
+                continue
+            queued_job = TxQueuedJob(item)
+            if queued_job.status == 'queued':
+                waiting.append(queued_job)
+            elif queued_job.started_at and queued_job.started_at < stale_before:
+                self.logger.warning('Job {0} never finished, freeing its slot'.format(queued_job.job_id))
+                self.remove(queued_job)
+                slots.pop(queued_job.slot, None)
+        waiting.sort(key=lambda q: (self.lane_index(q.lane), q.queued_at))
+
+        started = []
+        sync_jobs = 0
+        # A job that finishes while we wait for it frees its slot, so go around until nothing more can start
+        progress = True
+        while progress and waiting and sync_jobs < self.max_sync_jobs:
+            progress = False
+            for queued_job in list(waiting):
+                if sync_jobs >= self.max_sync_jobs:
+                    break
+                slot = self.take_slot(queued_job, slots, stale_before)
+                if not slot:
+                    continue
+                waiting.remove(queued_job)
+                if not self.claim(queued_job, slot):
+                    self.release_slot(queued_job.job_id, slot)  # another dispatcher got the job first
+                    slots.pop(slot, None)
+                    continue
+                started.append(queued_job.job_id)
+                progress = True
+                if self.run(queued_job):
+                    slots.pop(slot, None)
+                    sync_jobs += 1
+        if waiting and sync_jobs >= self.max_sync_jobs and self.on_waiting:
+            self.logger.debug('{0} jobs are still waiting, dispatching again elsewhere'.format(len(waiting)))
+            self.on_waiting()
+        return started
+
+    @staticmethod
+    def lane_index(lane):
+        if lane in JobScheduler.LANES:
+            return JobScheduler.LANES.index(lane)
+        return 0
+
+    def take_slot(self, queued_job, slots, stale_before):
+        """
+        Takes a free slot of the job's module, that its lane can use, unless another dispatcher takes it first
+        :param TxQueuedJob queued_job:
+        :param dict slots: the slots that were taken, updated with the one we take
+        :param string stale_before: slots taken before this are free again
+        :return string: the name of the slot, None if there is none
+        """
+        for number in range(self.get_limit(queued_job.convert_module, queued_job.lane)):
+            name = self.get_slot_name(queued_job.convert_module, number)
+            slot = slots.get(name)
+            if slot and slot.get('taken_at', '') >= stale_before:
+                continue
+            taken_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            if self.queue_db_handler.update_item_if({'job_id': name},
+                                                    {'holder': queued_job.job_id, 'taken_at': taken_at},
+                                                    {'holder': slot['holder'] if slot else None}):
+                slots[name] = {'job_id': name, 'holder': queued_job.job_id, 'taken_at': taken_at}
+                return name
+        return None
+
+    def release_slot(self, job_id, slot):
+        """
+        :param string job_id:
+        :param string slot: the name of the slot the job took
+        """
+        if slot and not self.queue_db_handler.delete_item_if({'job_id': slot}, {'holder': job_id}):
+            self.logger.debug('Slot {0} was no longer held by job {1}'.format(slot, job_id))
+
+    def claim(self, queued_job, slot):
+        """
+        Marks a queued job as running in the given slot, unless someone else already did
+        :param TxQueuedJob queued_job:
+        :param string slot:
+        :return bool: True if we get to run the job
+        """
+        started_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        claimed = self.queue_db_handler.update_item_if(queued_job.get_keys(),
+                                                       {'status': 'running', 'started_at': started_at, 'slot': slot},
+                                                       {'status': 'queued'})
+        if claimed:
+            queued_job.status = 'running'
+            queued_job.started_at = started_at
+            queued_job.slot = slot
+        return claimed
+
+    def remove(self, queued_job):
+        """
+        Takes a job off the queue and frees its slot
+        :param TxQueuedJob queued_job:
+        """
+        self.queue_db_handler.delete_item(queued_job.get_keys())
+        self.release_slot(queued_job.job_id, queued_job.slot)
+
+    def run(self, queued_job):
+        """
+        :param TxQueuedJob queued_job:
+        :return bool: True if the job has already finished
+        """
+        self.logger.debug('Starting job {0} on {1}'.format(queued_job.job_id, queued_job.convert_module))
+        try:
+            job_data = self.executor.execute(queued_job.job_id)
+        except Exception as e:
+            self.logger.error('Failed to start job {0}: {1}'.format(queued_job.job_id, e))
+            job_data = None
+        if job_data and job_data.get('status') == 'started':
+            return False
+        self.remove(queued_job)
+        return True
@@ -25,6 +25,7 @@ class TxJob(Model):
         'cdn_bucket',
         'cdn_file',
         'callback',
+        'priority',
         'links',
         'status',
         'success',
@@ -32,6 +33,7 @@ class TxJob(Model):
         'log',
         'warnings',
         'errors',
+        'timings',
     ]
 
     default_values = {
@@ -60,6 +62,7 @@ class TxJob(Model):
         self.cdn_bucket = None
         self.cdn_file = None
         self.callback = None
+        self.priority = None
         self.links = []
         self.status = None
         self.success = None
@@ -69,6 +72,7 @@ class TxJob(Model):
         self.log = []
         self.warnings = []
         self.errors = []
+        self.timings = None  # milliseconds each stage of the conversion took
         super(TxJob, self).__init__(*args, **kwargs)
 
     def log_message(self, message):
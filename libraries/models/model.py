@@ -1,4 +1,5 @@
 from __future__ import unicode_literals, print_function
+import copy
 from six import iteritems, string_types
 
 
@@ -9,6 +10,7 @@ class Model(object):
 
     def __init__(self, data=None, db_handler=None):
         self.db_handler = db_handler
+        self.stored_data = None  # field values as last loaded or saved, None if unknown
         if isinstance(data, dict):
             self.populate(data)
             if self.db_handler and len(data) == len(self.db_keys) and data.keys().sort() == self.db_keys.sort():
@@ -55,28 +57,101 @@ class Model(object):
         if data:
             self.populate(data, clear_before_populate=False)
         self.db_handler.insert_item(self.get_db_data())
+        self.mark_clean()
         return self
 
     def load(self, data=None):
         if data:
             self.populate(data, clear_before_populate=False)
         self.populate(self.db_handler.get_item(self.get_keys()))
+        self.mark_clean()
         return self
 
     def update(self, data=None):
+        """
+        Saves the given data, or if not given, the fields that changed since the model was last loaded or saved
+        :param dict data:
+        """
+        appends = None
         if not data:
-            data = self.get_db_data()
-        for field in data.keys():
+            data, appends = self.get_changes()
+            if not data and not appends:
+                return self  # nothing changed
+        for field in list(data.keys()):
             if field not in self.db_fields or field in self.db_keys:
                 data.pop(field)
             else:
                 setattr(self, field, data[field])
-        self.db_handler.update_item(self.get_keys(), data)
+        self.db_handler.update_item(self.get_keys(), data, appends)
+        if self.stored_data is not None:
+            for field in list(data.keys()) + list(appends.keys() if appends else []):
+                self.stored_data[field] = copy.deepcopy(getattr(self, field))
         return self
 
+    def mark_clean(self):
+        """
+        Remembers the current field values as the ones that are stored in the database
+        """
+        self.stored_data = copy.deepcopy(self.get_db_data())
+
+    def get_changes(self):
+        """
+        Compares the fields to the ones last loaded or saved. A list that only had elements added to its end is
+        returned in appends with just the new elements, if the db handler can append to lists.
+        :return tuple: (data, appends) dicts of the fields to set and of the elements to append
+        """
+        data = {}
+        appends = {}
+        use_list_append = getattr(self.db_handler, 'use_list_append', False) is True
+        for field, value in iteritems(self.get_db_data()):
+            if field in self.db_keys:
+                continue
+            if self.stored_data is None:
+                data[field] = value
+                continue
+            stored = self.stored_data.get(field)
+            if value == stored:
+                continue
+            if use_list_append and isinstance(value, list) and isinstance(stored, list) and stored and \
+                    value[:len(stored)] == stored:
+                appends[field] = value[len(stored):]
+            else:
+                data[field] = value
+        return data, appends
+
     def delete(self):
         self.db_handler.delete_item(self.get_keys())
 
+    def bulk_insert(self, items):
+        """
+        Inserts many models with batch writes
+        :param list items: models or dicts of their data
+        :return list: the inserted models
+        """
+        models = []
+        for item in items:
+            if not isinstance(item, Model):
+                item = self.__class__(item)
+            models.append(item)
+        self.db_handler.batch_insert([model.get_db_data() for model in models])
+        return models
+
+    def load_many(self, keys_list):
+        """
+        Loads many models with batch gets
+        :param list keys_list: dicts of keys, or key values for models with a single key
+        :return list: the models that were found, in the order of keys_list
+        """
+        keys_list = [keys if isinstance(keys, dict) else {self.db_keys[0]: keys} for keys in keys_list]
+        models = {}
+        for item in self.db_handler.batch_get(keys_list):
+            model = self.__class__(item)
+            models[self.key_tuple(model.get_keys())] = model
+        return [models[self.key_tuple(keys)] for keys in keys_list if self.key_tuple(keys) in models]
+
+    def key_tuple(self, keys):
+        return tuple(keys.get(key) for key in self.db_keys)
+
     def query(self, query=None):
         items = self.db_handler.query_items(query)
         models = []
@@ -84,3 +159,20 @@ class Model(object):
             for item in items:
                 models.append(self.__class__(item))
         return models
+
+    def iter_query(self, query=None, fields=None, page_size=None, segments=1):
+        """
+        Same as query(), but yields the models one at a time while the items are read page by page
+        :param dict query:
+        :param list fields: only load these fields, the others are left at their default values
+        :param int page_size:
+        :param int segments: for queries that have to scan the table anyway, scan it in this many segments at once,
+                             see DynamoDBHandler.iter_parallel_scan
+        :return: generator of models
+        """
+        if segments > 1:
+            items = self.db_handler.iter_parallel_scan(query, segments, fields=fields)
+        else:
+            items = self.db_handler.iter_items(query, fields=fields, page_size=page_size)
+        for item in items:
+            yield self.__class__(item)
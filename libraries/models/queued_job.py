@@ -0,0 +1,33 @@
+from __future__ import unicode_literals, print_function
+from libraries.models.model import Model
+
+
+class TxQueuedJob(Model):
+    db_keys = [
+        'job_id'
+    ]
+
+    db_fields = [
+        'job_id',
+        'lane',
+        'convert_module',
+        'status',
+        'queued_at',
+        'started_at',
+        'slot',
+    ]
+
+    default_values = {
+        'status': 'queued',
+    }
+
+    def __init__(self, *args, **kwargs):
+        # Init attributes
+        self.job_id = None
+        self.lane = None
+        self.convert_module = None
+        self.status = 'queued'
+        self.queued_at = None
+        self.started_at = None
+        self.slot = None  # the name of the slot item the job holds while it runs, see JobScheduler
+        super(TxQueuedJob, self).__init__(*args, **kwargs)
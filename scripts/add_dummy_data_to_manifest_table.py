@@ -75,51 +75,57 @@ resource_map = {
 
 
 def add_dummy_data_to_manifest_table(table_name, new_rows, start):
-    manifest_table = boto3.resource('dynamodb').resource.Table(table_name)
+    manifest_table = boto3.resource('dynamodb').Table(table_name)
 
-    for i in range(start, start+new_rows):
-        print("Adding row {0} of {1}".format(i, start+new_rows-1))
-        repo_name = 'repo{0}'.format(i)
-        user_name = 'user{0}'.format(i)
+    # batch_writer sends the rows 25 at a time and resends any unprocessed ones
+    with manifest_table.batch_writer() as batch:
+        for i in range(start, start+new_rows):
+            add_dummy_row(batch, i, start+new_rows-1)
 
-        type = resource_map.keys()[random.randint(1, len(resource_map.keys()))-1]
-        resource = resource_map[type]
 
-        data = {
-            'repo_name': repo_name,
-            'user_name': user_name,
-            'lang_code': 'en',
-            'resource_id': type,
-            'resource_type': resource['type'],
-            'title': resource['title'],
-            'views': 0,
-            'last_updated': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-        }
-        data['manifest'] = json.dumps({
-            'checking': {'checking_entity': ['Wycliffe Associates'], 'checking_level': '1'},
-            'dublin_core': {
-                'conformsto': 'rc0.2',
-                'contributor': ['unfoldingWord', 'Wycliffe Associates'],
-                'creator': 'Wycliffe Associates',
-                'description': '',
-                'format': resource['format'],
-                'issued': datetime.utcnow().strftime('%Y-%m-%d'),
-                'modified': datetime.utcnow().strftime('%Y-%m-%d'),
-                'identifier': data['resource_id'],
-                'language': {'identifier': data['lang_code'], 'direction': 'ltr', 'title': 'English'},
-                'type': data['resource_type'],
-                'title': data['title']
-            },
-            'projects': [{
-                'sort': '1',
-                'identifier': data['resource_id'],
-                'title': data['title'],
-                'path': './',
-                'versification': '',
-                'categories': []
-            }]
-        })
-        manifest_table.put_item(Item=data)
+def add_dummy_row(batch, i, last):
+    print("Adding row {0} of {1}".format(i, last))
+    repo_name = 'repo{0}'.format(i)
+    user_name = 'user{0}'.format(i)
+
+    type = resource_map.keys()[random.randint(1, len(resource_map.keys()))-1]
+    resource = resource_map[type]
+
+    data = {
+        'repo_name': repo_name,
+        'user_name': user_name,
+        'lang_code': 'en',
+        'resource_id': type,
+        'resource_type': resource['type'],
+        'title': resource['title'],
+        'views': 0,
+        'last_updated': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    }
+    data['manifest'] = json.dumps({
+        'checking': {'checking_entity': ['Wycliffe Associates'], 'checking_level': '1'},
+        'dublin_core': {
+            'conformsto': 'rc0.2',
+            'contributor': ['unfoldingWord', 'Wycliffe Associates'],
+            'creator': 'Wycliffe Associates',
+            'description': '',
+            'format': resource['format'],
+            'issued': datetime.utcnow().strftime('%Y-%m-%d'),
+            'modified': datetime.utcnow().strftime('%Y-%m-%d'),
+            'identifier': data['resource_id'],
+            'language': {'identifier': data['lang_code'], 'direction': 'ltr', 'title': 'English'},
+            'type': data['resource_type'],
+            'title': data['title']
+        },
+        'projects': [{
+            'sort': '1',
+            'identifier': data['resource_id'],
+            'title': data['title'],
+            'path': './',
+            'versification': '',
+            'categories': []
+        }]
+    })
+    batch.put_item(Item=data)
 
 
 def main():
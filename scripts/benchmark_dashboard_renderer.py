@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+Times the string template dashboard renderer against the BeautifulSoup one on made up data, run from the root of
+tx-manager
+1st parameter is the number of modules (default is 20)
+2nd parameter is the number of failed jobs (default is 200)
+3rd parameter is the number of renders to time (default is 20)
+
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import json
+import timeit
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libraries.manager.dashboard_renderer import DashboardRenderer
+
+
+class SoupDashboardRenderer(object):
+    """
+    Renders the dashboard by parsing every row with BeautifulSoup, the way generate_dashboard used to.
+    Kept to compare DashboardRenderer against.
+    """
+
+    def render(self, modules, module_counts, totals, total_job_count, job_failures, max_failures, gogs_url,
+               module_timings=None):
+        """
+        Same parameters as DashboardRenderer.render, the timings were added after this renderer and aren't shown
+        """
+        body = BeautifulSoup('<h1>TX-Manager Dashboard</h1><h2>Module Attributes</h2><br><table id="status"></table>',
+                             'html.parser')
+        for item in modules:
+            module_name = item["name"]
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '"><td class="hdr" colspan="2">' + str(module_name) + '</td></tr>',
+                'html.parser'))
+
+            counts = module_counts[module_name]
+
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-type" class="module-type"><td class="lbl">Type:</td><td>' +
+                str(item["type"]) + '</td></tr>',
+                'html.parser'))
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-input" class="module-input"><td class="lbl">Input Format:</td><td>' +
+                json.dumps(item["input_format"]) + '</td></tr>',
+                'html.parser'))
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-output" class="module-output"><td class="lbl">Output Format:</td><td>' +
+                json.dumps(item["output_format"]) + '</td></tr>',
+                'html.parser'))
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-resource" class="module-resource"><td class="lbl">Resource Types:</td><td>' +
+                json.dumps(item["resource_types"]) + '</td></tr>',
+                'html.parser'))
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-version" class="module-version"><td class="lbl">Version:</td><td>' +
+                str(item["version"]) + '</td></tr>',
+                'html.parser'))
+
+            if len(item["options"]) > 0:
+                body.table.append(BeautifulSoup(
+                    '<tr id="' + module_name + '-options" class="module-options"><td class="lbl">Options:</td><td>' +
+                    json.dumps(item["options"]) + '</td></tr>',
+                    'html.parser'))
+
+            if len(item["private_links"]) > 0:
+                body.table.append(BeautifulSoup(
+                    '<tr id="' + module_name + '-private-links" class="module-private-links"><td class="lbl">Private Links:</td><td>' +
+                    json.dumps(item["private_links"]) + '</td></tr>',
+                    'html.parser'))
+
+            if len(item["public_links"]) > 0:
+                body.table.append(BeautifulSoup(
+                    '<tr id="' + module_name + '-public-links" class="module-public-links"><td class="lbl">Public Links:</td><td>' +
+                    json.dumps(item["public_links"]) + '</td></tr>',
+                    'html.parser'))
+
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-job-success" class="module-public-links"><td class="lbl">Job Successes:</td><td>' +
+                str(counts['success']) + '</td></tr>',
+                'html.parser'))
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-job-warning" class="module-public-links"><td class="lbl">Job Warnings:</td><td>' +
+                str(counts['warnings']) + '</td></tr>',
+                'html.parser'))
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-job-failure" class="module-public-links"><td class="lbl">Job Failures:</td><td>' +
+                str(counts['failures']) + '</td></tr>',
+                'html.parser'))
+            body.table.append(BeautifulSoup(
+                '<tr id="' + module_name + '-job-total" class="module-public-links"><td class="lbl">Jobs Total:</td><td>' +
+                str(counts['total']) + '</td></tr>',
+                'html.parser'))
+
+        body.table.append(BeautifulSoup(
+            '<tr id="totals"><td class="hdr" colspan="2">Total Jobs</td></tr>',
+            'html.parser'))
+        body.table.append(BeautifulSoup(
+            '<tr id="totals-job-success" class="module-public-links"><td class="lbl">Success:</td><td>' +
+            str(totals['success']) + '</td></tr>',
+            'html.parser'))
+        body.table.append(BeautifulSoup(
+            '<tr id="totals-job-warning" class="module-public-links"><td class="lbl">Warnings:</td><td>' +
+            str(totals['warnings']) + '</td></tr>',
+            'html.parser'))
+        body.table.append(BeautifulSoup(
+            '<tr id="totals-job-failure" class="module-public-links"><td class="lbl">Failures:</td><td>' +
+            str(totals['failures']) + '</td></tr>',
+            'html.parser'))
+        body.table.append(BeautifulSoup(
+            '<tr id="totals-job-unregistered" class="module-public-links"><td class="lbl">Unregistered:</td><td>' +
+            str(total_job_count - totals['total']) + '</td></tr>',
+            'html.parser'))
+        body.table.append(BeautifulSoup(
+            '<tr id="totals-job-total" class="module-public-links"><td class="lbl">Total:</td><td>' +
+            str(total_job_count) + '</td></tr>',
+            'html.parser'))
+
+        # build job failures table
+
+        body.append(BeautifulSoup('<h2>Failed Jobs</h2>', 'html.parser'))
+        failure_table = BeautifulSoup('<table id="failed" cellpadding="4" border="1" style="border-collapse:collapse"></table>','html.parser')
+        failure_table.table.append(BeautifulSoup('''
+            <tr id="header">
+            <th class="hdr">Time</th>
+            <th class="hdr">Errors</th>
+            <th class="hdr">Repo</th>
+            <th class="hdr">PreConvert</th>
+            <th class="hdr">Converted</th>
+            <th class="hdr">Destination</th>''',
+            'html.parser'))
+
+
+        for i in range(0, max_failures):
+            if i >= len(job_failures):
+                break
+
+            item = job_failures[i]
+
+            try :
+                identifier = item['identifier']
+                owner_name, repo_name, commit_id = identifier.split('/')
+                source_sub_path = '{0}/{1}'.format(owner_name, repo_name)
+                cdn_bucket = item['cdn_bucket']
+                destination_url = 'https://{0}/u/{1}/{2}/{3}/build_log.json'.format(cdn_bucket, owner_name, repo_name, commit_id)
+                repoUrl = gogs_url + "/" + source_sub_path
+                preconverted_url = item['source']
+                converted_url = item['output']
+                failure_table.table.append(BeautifulSoup(
+                    '<tr id="failure-' + str(i) + '" class="module-job-id">'
+                    + '<td>' + item['created_at'] + '</td>'
+                    + '<td>' + ','.join(item['errors']) + '</td>'
+                    + '<td><a href="' + repoUrl + '">' + source_sub_path + '</a></td>'
+                    + '<td><a href="' + preconverted_url + '">' + preconverted_url.rsplit('/', 1)[1] + '</a></td>'
+                    + '<td><a href="' + converted_url + '">' + item['job_id'] + '.zip</a></td>'
+                    + '<td><a href="' + destination_url + '">Build Log</a></td>'
+                    + '</tr>',
+                    'html.parser'))
+            except:
+                pass
+
+        body.append(failure_table)
+        return body.prettify('UTF-8')
+
+
+def make_data(module_count, failure_count):
+    modules = []
+    module_counts = {}
+    for i in range(module_count):
+        name = 'module{0:03d}'.format(i)
+        modules.append({
+            'name': name,
+            'type': 'conversion',
+            'version': '1',
+            'input_format': ['md', 'usfm'],
+            'output_format': ['html'],
+            'resource_types': ['obs', 'ulb', 'udb', 'bible'],
+            'options': {'pageSize': 'A4'},
+            'private_links': [],
+            'public_links': ['{0}/convert'.format(name)]
+        })
+        module_counts[name] = {'success': i * 10, 'warnings': i, 'failures': i, 'total': i * 12}
+    totals = dict((counter, sum(counts[counter] for counts in module_counts.values()))
+                  for counter in ['success', 'warnings', 'failures', 'total'])
+    job_failures = []
+    for i in range(failure_count):
+        job_failures.append({
+            'job_id': 'job{0}'.format(i),
+            'identifier': 'owner/repo{0}/12345678'.format(i),
+            'created_at': '2017-04-12T17:03:06Z',
+            'cdn_bucket': 'cdn.door43.org',
+            'source': 'https://s3-us-west-2.amazonaws.com/tx-webhook-client/preconvert/12345678.zip',
+            'output': 'https://cdn.door43.org/tx/job/job{0}.zip'.format(i),
+            'errors': ['Missing <title> & "front matter"', 'Bad chapter 3']
+        })
+    return modules, module_counts, totals, totals['total'] + 5, job_failures
+
+
+def main():
+    module_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    failure_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    args = make_data(module_count, failure_count) + (failure_count, 'https://git.door43.org')
+
+    print("{0} modules, {1} failed jobs, {2} renders each".format(module_count, failure_count, repeat))
+    results = []
+    for renderer in [SoupDashboardRenderer(), DashboardRenderer()]:
+        seconds = timeit.timeit(lambda: renderer.render(*args), number=repeat) / repeat
+        results.append(seconds)
+        print("{0}: {1:.2f} ms per render, {2} bytes".format(renderer.__class__.__name__, seconds * 1000,
+                                                             len(renderer.render(*args))))
+    print("Speedup: {0:.1f}x".format(results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Times rendering the USFM books of source zips with the single HTML renderer of usfm_tools against the native
+renderer, and checks that both give the same page body, run from the root of tx-manager
+Parameters are the source zips (default is every bundled test zip with USFM books in it)
+
+"""
+from __future__ import unicode_literals, print_function
+import codecs
+import os
+import sys
+import time
+from io import BytesIO
+from zipfile import ZipFile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bs4 import BeautifulSoup
+from usfm_tools.support.singlehtmlRenderer import SingleHTMLRenderer
+from libraries.converters.usfm_renderer import render_usfm
+
+
+def render_with_usfm_tools(usfm):
+    renderer = SingleHTMLRenderer(None, None)
+    renderer.booksUsfm = {usfm[4:7]: usfm}
+    output = BytesIO()
+    renderer.f = codecs.getwriter('utf_8_sig')(output)
+    renderer.run()
+    renderer.writeFootnotes()
+    renderer.f.write('</body></html>')
+    return output.getvalue().decode('utf-8-sig')
+
+
+def get_body(html):
+    return BeautifulSoup(html, 'html.parser').body.decode_contents(indent_level=1)
+
+
+def get_books(source_zip):
+    """
+    :return list: the USFM of the books in the zip
+    """
+    books = []
+    with ZipFile(source_zip) as zip_file:
+        for name in sorted(zip_file.namelist()):
+            if name.endswith('.usfm'):
+                usfm = zip_file.read(name).decode('utf-8-sig').replace('\r\n', '\n').replace('\r', '\n').lstrip()
+                if usfm.startswith('\\id '):
+                    books.append(usfm)
+    return books
+
+
+def main():
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    source_zips = sys.argv[1:]
+    if not source_zips:
+        for dir_path, _, filenames in os.walk(os.path.join(root_dir, 'tests')):
+            source_zips += [os.path.join(dir_path, filename) for filename in filenames if filename.endswith('.zip')]
+        source_zips = [path for path in sorted(source_zips) if get_books(path)]
+    totals = [0, 0]
+    for source_zip in source_zips:
+        seconds = [0, 0]
+        rendered = failed = different = 0
+        for usfm in get_books(source_zip):
+            # usfm_tools prints the markers it skips, so keep that out of the way
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, 'w')
+            start = time.time()
+            try:
+                html = render_with_usfm_tools(usfm)
+            except Exception:
+                html = None
+            finally:
+                sys.stdout = stdout
+            middle = time.time()
+            native_html = render_usfm(usfm)
+            end = time.time()
+            if html is None:
+                failed += 1
+                continue
+            rendered += 1
+            seconds[0] += middle - start
+            seconds[1] += end - middle
+            if get_body(html) != get_body(native_html):
+                different += 1
+        totals = [total + s for total, s in zip(totals, seconds)]
+        print("{0}: {1} books, usfm_tools {2:.0f} ms, native {3:.0f} ms, {4} different, {5} usfm_tools can't render"
+              .format(os.path.relpath(source_zip, root_dir), rendered, seconds[0] * 1000, seconds[1] * 1000,
+                      different, failed))
+    if totals[1]:
+        print("Total: usfm_tools {0:.0f} ms, native {1:.0f} ms, speedup {2:.1f}x".format(
+            totals[0] * 1000, totals[1] * 1000, totals[0] / totals[1]))
+
+
+if __name__ == '__main__':
+    main()
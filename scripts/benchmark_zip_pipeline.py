@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Times converting a source zip through files_dir and output_dir on disk against converting it zip to zip in memory,
+run from the root of tx-manager
+1st parameter is the source zip (default is the eight Bible books of the converter tests)
+2nd parameter is the resource type (default is udb)
+3rd parameter is the number of conversions to time (default is 5)
+
+"""
+from __future__ import unicode_literals, print_function
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libraries.converters.md2html_converter import Md2HtmlConverter
+from libraries.converters.usfm2html_converter import Usfm2HtmlConverter
+
+
+def convert(converter_class, source_zip, resource, in_memory):
+    """
+    :return float: seconds the conversion took
+    """
+    input_zip_file = tempfile.mktemp(suffix='.zip')
+    shutil.copy(source_zip, input_zip_file)
+    output_zip_file = tempfile.mktemp(suffix='.zip')
+    start = time.time()
+    with closing(converter_class('', resource, None, output_zip_file, in_memory=in_memory)) as converter:
+        converter.input_zip_file = input_zip_file
+        result = converter.run()
+    seconds = time.time() - start
+    if not result['success']:
+        raise Exception('Conversion failed: {0}'.format(result['errors']))
+    os.remove(output_zip_file)
+    return seconds
+
+
+def main():
+    resources_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests',
+                                 'converter_tests', 'resources')
+    source_zip = sys.argv[1] if len(sys.argv) > 1 else os.path.join(resources_dir, 'eight_bible_books.zip')
+    resource = sys.argv[2] if len(sys.argv) > 2 else 'udb'
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    converter_class = Usfm2HtmlConverter if resource in ['udb', 'ulb', 'bible', 'reg'] else Md2HtmlConverter
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print("{0} as {1} with {2}, {3} conversions each".format(os.path.basename(source_zip), resource,
+                                                            converter_class.__name__, repeat))
+    results = []
+    for in_memory in [False, True]:
+        # the converters print as they go, so keep that out of the way
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            seconds = sum(convert(converter_class, source_zip, resource, in_memory) for _ in range(repeat)) / repeat
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        results.append(seconds)
+        print("{0}: {1:.0f} ms per conversion".format('in memory' if in_memory else 'on disk', seconds * 1000))
+    print("Speedup: {0:.2f}x".format(results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Deletes old entries of the conversion cache in the given s3 CDN bucket, run from the root of tx-manager
+1st parameter is bucket name (required)
+2nd parameter is the number of days an unused entry is kept (default is 30)
+3rd parameter is the most megabytes the cache may use (default is no limit)
+
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libraries.manager.conversion_cache import ConversionCache
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.INFO)
+formatter = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+
+def main():
+    if len(sys.argv) < 2:
+        logger.critical('You must provide a bucket name!')
+        exit(1)
+    bucket_name = sys.argv[1]
+    ttl_days = ConversionCache.TTL_DAYS
+    max_bytes = None
+    if len(sys.argv) > 2:
+        ttl_days = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        max_bytes = int(sys.argv[3]) * 1024 * 1024
+    deleted = ConversionCache(bucket_name).evict(ttl_days, max_bytes)
+    print("Deleted {0} files from {1}/{2}".format(deleted, bucket_name, ConversionCache.CACHE_PREFIX))
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,8 @@ import tempfile
 import pickle
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
@@ -27,6 +29,9 @@ logger.addHandler(ch)
 
 already_in_db = {}
 
+SCAN_SEGMENTS = 8
+BATCH_SIZE = 100  # manifests inserted at once, then remembered in already_in_db_file
+
 keys_file = None 
 already_in_db_file = None
 
@@ -91,6 +96,18 @@ def load_obj(fname):
     with open(fname, 'rb') as f:
         return pickle.load(f)
 
+def get_already_in_db(table_name):
+    """
+    Reads when each repo in the manifest table was last updated, scanning the table in segments at once
+    :param string table_name:
+    :return dict: repo_name/user_name mapped to last_updated
+    """
+    items = DynamoDBHandler(table_name).parallel_scan(segments=SCAN_SEGMENTS,
+                                                      fields=['repo_name', 'user_name', 'last_updated'])
+    return dict(('{0}/{1}'.format(item['repo_name'], item['user_name']), item.get('last_updated', ''))
+                for item in items)
+
+
 def get_build_logs(bucket):
     build_logs = []
     objects = bucket.objects.filter(Prefix='u/')
@@ -100,10 +117,14 @@ def get_build_logs(bucket):
     return build_logs
 
 
-def add_to_manifest(resource, bucket_name, table_name, key):
+def get_manifest_data(resource, bucket_name, key, pending):
+    """
+    :return dict: the manifest table item of the project of a build log, None if the table or `pending` already has
+                  a newer one
+    """
     parts = key.split('/')
     if len(parts) != 5:
-        return
+        return None
     repo_name = parts[2]
     user_name = parts[1]
     commit = parts[3]
@@ -116,9 +137,9 @@ def add_to_manifest(resource, bucket_name, table_name, key):
 
     in_db_key = '{0}/{1}'.format(repo_name, user_name)
     if in_db_key in already_in_db and already_in_db[in_db_key] > build_log['created_at']:
-        return
-
-    dbtable = boto3.resource('dynamodb').Table(table_name)
+        return None
+    if in_db_key in pending and pending[in_db_key]['last_updated'] > build_log['created_at']:
+        return None
 
     manifest = None
     try:
@@ -211,13 +232,24 @@ def add_to_manifest(resource, bucket_name, table_name, key):
                 'categories': []
             }]
         })
-    dbtable.put_item(Item=data)
-    already_in_db[in_db_key] = build_log['created_at'] 
+    return data
+
+
+def add_to_manifest(db_handler, pending):
+    """
+    Inserts the pending manifests in batches and remembers them in already_in_db_file
+    :param DynamoDBHandler db_handler:
+    :param dict pending: repo_name/user_name mapped to the manifest table item
+    """
+    db_handler.batch_insert(list(pending.values()))
+    for in_db_key, data in pending.items():
+        already_in_db[in_db_key] = data['last_updated']
     save_obj(already_in_db, already_in_db_file)
+    pending.clear()
 
 
 def main():
-    global keys_file, already_in_db_file
+    global keys_file, already_in_db_file, already_in_db
     if len(sys.argv) < 3:
         logger.critical('You must provide a bucket name and table name.')
         logger.critical('Example: ./populate_manifest_table.py cdn.door43.org tx-manifest')
@@ -235,8 +267,19 @@ def main():
         save_obj(keys, keys_file)
     if os.path.isfile(already_in_db_file):
         already_in_db = load_obj(already_in_db_file)
+    else:
+        already_in_db = get_already_in_db(table_name)
+        save_obj(already_in_db, already_in_db_file)
+    db_handler = DynamoDBHandler(table_name)
+    pending = {}
     for k in keys:
-        add_to_manifest(resource, bucket_name, table_name, k)
+        data = get_manifest_data(resource, bucket_name, k, pending)
+        if data:
+            pending['{0}/{1}'.format(data['repo_name'], data['user_name'])] = data
+        if len(pending) >= BATCH_SIZE:
+            add_to_manifest(db_handler, pending)
+    if pending:
+        add_to_manifest(db_handler, pending)
 
 
 if __name__ == '__main__':
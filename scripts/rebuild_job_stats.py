@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Recounts the jobs in the job stats table the dashboard reads from the job table, run from the root of tx-manager
+1st parameter is the job table name (required)
+2nd parameter is the job stats table name (default is 'tx-job-stats')
+3rd parameter is how many segments of the job table are scanned at once (default is 4)
+
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libraries.manager.manager import TxManager
+from libraries.manager.job_stats import JobStats
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.INFO)
+formatter = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+
+def main():
+    if len(sys.argv) < 2:
+        logger.critical('You must provide a job table name!')
+        exit(1)
+    job_table_name = sys.argv[1]
+    stats_table_name = JobStats.STATS_TABLE_NAME
+    if len(sys.argv) > 2:
+        stats_table_name = sys.argv[2]
+    scan_segments = 4
+    if len(sys.argv) > 3:
+        scan_segments = int(sys.argv[3])
+    start = time.time()
+    counts = TxManager(job_table_name=job_table_name, stats_table_name=stats_table_name,
+                       scan_segments=scan_segments).rebuild_job_stats()
+    for module_name in sorted(counts):
+        print("{0}: {1}".format(module_name, counts[module_name]))
+    elapsed_seconds = time.time() - start
+    print("Done in '" + str(int(elapsed_seconds)) + "' seconds")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Reconverts and redeploys the latest commit of repos from the tx-manifest table on this machine, run from the root of
+tx-manager. Unlike redeploy_projects.py, which only re-templates, this runs the preprocessors and converters again,
+so use it after changing them
+Parameters are the owner/repo of the repos (default is every repo in the manifest table starting with --prefix)
+--prefix: only the repos whose owner/repo starts with this
+--workers: how many repos are reconverted at once (default is one per core)
+--rate: the most repos started per minute (default is no limit)
+--checkpoint: the file that keeps the reconverted repos, so running it again resumes (default is
+              reconvert_checkpoint.json)
+--gogs-user-token: the token of the Gogs user the conversion jobs are requested as
+--cdn-bucket, --gogs-url and --manifest-table: where the repos are (default is production)
+--pre-convert-bucket, --api-url and --module-table: where the jobs are (default is production)
+--job-table: the table the jobs are kept in, which must not have a stream (default is tx-reconvert-job)
+
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libraries.client.bulk_reconverter import BulkReconverter
+from libraries.client.client_webhook import ClientWebhook
+from libraries.manager.manager import TxManager
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.INFO)
+formatter = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconverts and redeploys repos in a pool of worker processes')
+    parser.add_argument('repos', nargs='*', help='owner/repo of the repos to reconvert')
+    parser.add_argument('--prefix', default='', help='reconvert the repos whose owner/repo starts with this')
+    parser.add_argument('--workers', type=int, default=0, help='repos reconverted at once, 0 for one per core')
+    parser.add_argument('--rate', type=float, default=0, help='most repos started per minute, 0 for no limit')
+    parser.add_argument('--checkpoint', default=BulkReconverter.CHECKPOINT_FILE)
+    parser.add_argument('--cdn-bucket', default='cdn.door43.org')
+    parser.add_argument('--gogs-url', default='https://git.door43.org')
+    parser.add_argument('--manifest-table', default=ClientWebhook.MANIFEST_TABLE_NAME)
+    parser.add_argument('--gogs-user-token', required=True, help='the Gogs user the jobs are requested as')
+    parser.add_argument('--pre-convert-bucket', default=BulkReconverter.PRE_CONVERT_BUCKET)
+    parser.add_argument('--api-url', default=BulkReconverter.API_URL)
+    parser.add_argument('--job-table', default=BulkReconverter.JOB_TABLE_NAME,
+                        help='a table like tx-job without a stream')
+    parser.add_argument('--module-table', default=TxManager.MODULE_TABLE_NAME)
+    args = parser.parse_args()
+
+    reconverter = BulkReconverter(args.cdn_bucket, args.gogs_url,
+                                  manifest_table_name=args.manifest_table, workers=args.workers, rate=args.rate,
+                                  checkpoint_file=args.checkpoint, pre_convert_bucket=args.pre_convert_bucket,
+                                  gogs_user_token=args.gogs_user_token, api_url=args.api_url,
+                                  job_table_name=args.job_table, module_table_name=args.module_table)
+    repos = args.repos or reconverter.get_repos(args.prefix)
+    print("Reconverting {0} repos".format(len(repos)))
+    summary = reconverter.run(repos)
+
+    print("Reconverted {0} repos, {1} failed, {2} skipped as done by an earlier run".format(
+        summary['reconverted'], summary['failed'], summary['skipped']))
+    print("Done in {0:.0f} seconds, {1:.1f} repos per minute".format(summary['seconds'], summary['repos_per_minute']))
+    for stage, milliseconds in sorted(summary['timings'].items()):
+        print("  {0}: {1:.0f} seconds in all".format(stage, milliseconds / 1000.0))
+    for repo, errors in sorted(summary['errors'].items()):
+        print("Failed {0}: {1}".format(repo, '; '.join(errors)))
+    if summary['failed']:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Tries the callbacks that couldn't be delivered again, run from the root of tx-manager
+1st parameter is the failed callbacks table name (default is 'tx-failed-callbacks')
+
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from libraries.manager.callback_dispatcher import CallbackDispatcher
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.INFO)
+formatter = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+
+def main():
+    failed_callbacks_table_name = CallbackDispatcher.FAILED_CALLBACKS_TABLE_NAME
+    if len(sys.argv) > 1:
+        failed_callbacks_table_name = sys.argv[1]
+    start = time.time()
+    delivered, failed = CallbackDispatcher(failed_callbacks_table_name).redeliver()
+    print("Delivered {0} callbacks, {1} failed again".format(delivered, failed))
+    elapsed_seconds = time.time() - start
+    print("Done in '" + str(int(elapsed_seconds)) + "' seconds")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from __future__ import absolute_import, unicode_literals, print_function
 import mock
 import unittest
+from botocore.exceptions import ClientError
 from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
 
 
@@ -62,6 +63,52 @@ class DynamoDBHandlerTests(unittest.TestCase):
         self.assertEqual(kwargs["ExpressionAttributeNames"],
                          {"#item_name": "name"})
 
+    def test_update_item_appends(self):
+        """Test that `update_item` appends to lists with list_append."""
+        key = {"id": 1}
+        self.handler.update_item(key, {"status": "done"}, {"log": ["finished"]})
+        _, kwargs = self.handler.table.update_item.call_args
+        expr = kwargs["UpdateExpression"].replace(" ", "")
+        self.assertIn("#item_status=:status", expr)
+        self.assertIn("#item_log=list_append(#item_log,:log)", expr)
+        self.assertEqual(kwargs["ExpressionAttributeValues"], {":status": "done", ":log": ["finished"]})
+
+    def test_increment_item(self):
+        """Test a successful invocation of `increment_item`."""
+        key = {"id": 1}
+        self.handler.table.update_item.return_value = {"Attributes": {"views": 6}}
+        self.assertEqual(self.handler.increment_item(key, "views"), 6)
+        self.handler.table.update_item.assert_called_once_with(
+            Key=key,
+            AttributeUpdates={"views": {"Action": "ADD", "Value": 1}},
+            Expected={"id": {"ComparisonOperator": "NOT_NULL"}},
+            ReturnValues="UPDATED_NEW"
+        )
+
+    def test_increment_item_missing(self):
+        """Test that `increment_item` does not create missing items."""
+        error = ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+        self.handler.table.update_item.side_effect = error
+        self.assertIsNone(self.handler.increment_item({"id": 1}, "views"))
+        self.handler.table.update_item.side_effect = None
+
+    def test_update_item_if(self):
+        """Test a successful invocation of `update_item_if`."""
+        key = {"id": 1}
+        self.assertTrue(self.handler.update_item_if(key, {"id": 1, "status": "running"}, {"status": "queued"}))
+        self.handler.table.update_item.assert_called_once_with(
+            Key=key,
+            AttributeUpdates={"status": {"Action": "PUT", "Value": "running"}},
+            Expected={"status": {"ComparisonOperator": "EQ", "AttributeValueList": ["queued"]}}
+        )
+
+    def test_update_item_if_not_matching(self):
+        """Test that `update_item_if` reports when the item did not match."""
+        error = ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+        self.handler.table.update_item.side_effect = error
+        self.assertFalse(self.handler.update_item_if({"id": 1}, {"status": "running"}, {"status": "queued"}))
+        self.handler.table.update_item.side_effect = None
+
     def test_delete_item(self):
         """Test a successful invocation of `delete_item`."""
         key = {"id": 1234}
@@ -94,3 +141,227 @@ class DynamoDBHandlerTests(unittest.TestCase):
         self.handler.table.scan.return_value = {"Items": data}
         self.assertEqual(self.handler.query_items(), data)
         self.handler.table.scan.assert_called_once_with()
+
+    def test_query_item_uses_primary_key(self):
+        """Test that `query_item` queries instead of scanning when a condition matches the hash key."""
+        handler = self.create_handler_with_indexes()
+        data = [{"job_id": "1", "user": "john"}]
+        handler.table.query.return_value = {"Items": data}
+        self.assertEqual(handler.query_items({"job_id": "1", "status": "success"}), data)
+        handler.table.scan.assert_not_called()
+        _, kwargs = handler.table.query.call_args
+        self.assertNotIn("IndexName", kwargs)
+        self.assertIn("KeyConditionExpression", kwargs)
+        self.assertIn("FilterExpression", kwargs)
+
+    def test_query_item_uses_index(self):
+        """Test that `query_item` picks the index that matches the most keys."""
+        handler = self.create_handler_with_indexes()
+        handler.table.query.side_effect = [
+            {"Items": [{"user": "john"}], "LastEvaluatedKey": "key"},
+            {"Items": [{"user": "john"}]}
+        ]
+        query = {
+            "user": "john",
+            "created_at": {
+                "condition": "gte",
+                "value": "2017-01-01"
+            }
+        }
+        self.assertEqual(len(handler.query_items(query)), 2)
+        handler.table.scan.assert_not_called()
+        self.assertEqual(handler.table.query.call_count, 2)
+        _, kwargs = handler.table.query.call_args
+        self.assertEqual(kwargs["IndexName"], "user-created_at-index")
+        self.assertEqual(kwargs["ExclusiveStartKey"], "key")
+        self.assertNotIn("FilterExpression", kwargs)
+
+    def test_query_item_falls_back_to_scan(self):
+        """Test that `query_item` scans when no condition can be used as a key condition."""
+        handler = self.create_handler_with_indexes()
+        data = [{"convert_module": "md2html"}]
+        handler.table.scan.return_value = {"Items": data}
+        # not an equality condition on a hash key, and convert_module-index only projects keys
+        query = {
+            "user": {
+                "condition": "begins_with",
+                "value": "jo"
+            },
+            "convert_module": "md2html"
+        }
+        self.assertEqual(handler.query_items(query), data)
+        handler.table.query.assert_not_called()
+        handler.table.scan.assert_called_once()
+
+    def test_iter_items(self):
+        """Test that `iter_items` reads pages only as they are needed, with a projection."""
+        self.handler.table.scan.side_effect = [
+            {"Items": [{"id": "1"}, {"id": "2"}], "LastEvaluatedKey": "key"},
+            {"Items": [{"id": "3"}]}
+        ]
+        items = self.handler.iter_items(fields=["id", "status"], page_size=2)
+        self.assertEqual(next(items), {"id": "1"})
+        self.assertEqual(self.handler.table.scan.call_count, 1)
+        self.assertEqual([item["id"] for item in items], ["2", "3"])
+        self.handler.table.scan.side_effect = None
+        self.assertEqual(self.handler.table.scan.call_count, 2)
+        _, kwargs = self.handler.table.scan.call_args
+        self.assertEqual(kwargs["ProjectionExpression"], "id, #item_status")
+        self.assertEqual(kwargs["ExpressionAttributeNames"], {"#item_status": "status"})
+        self.assertEqual(kwargs["Limit"], 2)
+        self.assertEqual(kwargs["ExclusiveStartKey"], "key")
+
+    def test_parallel_scan(self):
+        """Test that `parallel_scan` reads every segment and merges the items in segment order."""
+        def scan(**kwargs):
+            segment = kwargs["Segment"]
+            if "ExclusiveStartKey" not in kwargs:
+                return {"Items": [{"id": "{0}-0".format(segment)}], "LastEvaluatedKey": "key"}
+            return {"Items": [{"id": "{0}-1".format(segment)}]}
+
+        self.handler.table.scan.side_effect = scan
+        with mock.patch.object(self.handler, "new_table", return_value=self.handler.table) as mock_new_table:
+            items = self.handler.parallel_scan({"age": 25}, segments=3)
+        self.handler.table.scan.side_effect = None
+        self.assertEqual([item["id"] for item in items], ["0-0", "0-1", "1-0", "1-1", "2-0", "2-1"])
+        # boto3 resources aren't thread safe, so each segment reads through its own
+        self.assertEqual(mock_new_table.call_count, 3)
+        self.assertEqual(self.handler.table.scan.call_count, 6)
+        for _, kwargs in self.handler.table.scan.call_args_list:
+            self.assertEqual(kwargs["TotalSegments"], 3)
+            self.assertIn("FilterExpression", kwargs)
+
+    def test_parallel_scan_chunk_limit(self):
+        """Test that `parallel_scan` stops fetching chunks when the threshold over all segments is reached."""
+        self.handler.table.scan.return_value = {"Items": [{"id": "1"}, {"id": "2"}], "LastEvaluatedKey": "key"}
+        with mock.patch.object(self.handler, "new_table", return_value=self.handler.table):
+            items = self.handler.parallel_scan(segments=2, queryChunkLimit=3)
+        # each segment stops once the shared count reaches the threshold, so at most one extra chunk per segment
+        self.assertLessEqual(self.handler.table.scan.call_count, 3)
+        self.assertEqual(len(items), 2 * self.handler.table.scan.call_count)
+
+    def test_iter_parallel_scan(self):
+        """Test that `iter_parallel_scan` yields the items of every segment as they come in."""
+        def scan(**kwargs):
+            segment = kwargs["Segment"]
+            if "ExclusiveStartKey" not in kwargs:
+                return {"Items": [{"id": "{0}-0".format(segment)}], "LastEvaluatedKey": "key"}
+            return {"Items": [{"id": "{0}-1".format(segment)}, {"id": "{0}-2".format(segment)}]}
+
+        self.handler.table.scan.side_effect = scan
+        with mock.patch.object(self.handler, "new_table", return_value=self.handler.table):
+            items = list(self.handler.iter_parallel_scan({"age": 25}, segments=4, fields=["id"]))
+            # stopping early doesn't leave the threads waiting
+            first = next(self.handler.iter_parallel_scan(segments=4))
+        self.handler.table.scan.side_effect = None
+        self.assertEqual(sorted(item["id"] for item in items),
+                         sorted("{0}-{1}".format(segment, i) for segment in range(4) for i in range(3)))
+        self.assertIn("id", first)
+        _, kwargs = self.handler.table.scan.call_args_list[0]
+        self.assertEqual(kwargs["ProjectionExpression"], "id")
+        self.assertIn("FilterExpression", kwargs)
+
+    def test_iter_parallel_scan_error(self):
+        """Test that `iter_parallel_scan` raises the error of a segment that failed."""
+        self.handler.table.scan.side_effect = Exception("Throttled")
+        with mock.patch.object(self.handler, "new_table", return_value=self.handler.table):
+            self.assertRaises(Exception, list, self.handler.iter_parallel_scan(segments=2))
+        self.handler.table.scan.side_effect = None
+
+    def test_batch_insert(self):
+        """Test that `batch_insert` writes in chunks of 25 and retries unprocessed items."""
+        items = [{"id": i} for i in range(30)]
+        unprocessed = {"table_name": [{"PutRequest": {"Item": items[0]}}]}
+        self.handler.resource = mock.MagicMock()
+        self.handler.resource.batch_write_item.side_effect = [
+            {"UnprocessedItems": unprocessed},
+            {"UnprocessedItems": {}},
+            {}
+        ]
+        self.handler.batch_insert(items)
+        calls = self.handler.resource.batch_write_item.call_args_list
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(calls[0][1]["RequestItems"]["table_name"]), 25)
+        self.assertEqual(calls[1][1]["RequestItems"], unprocessed)
+        self.assertEqual(len(calls[2][1]["RequestItems"]["table_name"]), 5)
+
+    def test_batch_insert_duplicates(self):
+        """Test that `batch_insert` only sends the last of the items with the same keys."""
+        self.handler.resource = mock.MagicMock()
+        self.handler.resource.batch_write_item.return_value = {"UnprocessedItems": {}}
+        self.handler.key_schemas = [(None, "id", None)]
+        try:
+            self.handler.batch_insert([{"id": 1, "v": "a"}, {"id": 2, "v": "b"}, {"id": 1, "v": "c"}])
+        finally:
+            self.handler.key_schemas = None
+        self.handler.resource.batch_write_item.assert_called_once_with(RequestItems={
+            "table_name": [{"PutRequest": {"Item": {"id": 2, "v": "b"}}}, {"PutRequest": {"Item": {"id": 1, "v": "c"}}}]
+        })
+
+    def test_batch_delete(self):
+        """Test a successful invocation of `batch_delete`."""
+        self.handler.resource = mock.MagicMock()
+        self.handler.resource.batch_write_item.return_value = {"UnprocessedItems": {}}
+        self.handler.batch_delete([{"id": 1}, {"id": 2}])
+        self.handler.resource.batch_write_item.assert_called_once_with(RequestItems={
+            "table_name": [{"DeleteRequest": {"Key": {"id": 1}}}, {"DeleteRequest": {"Key": {"id": 2}}}]
+        })
+
+    def test_batch_get(self):
+        """Test that `batch_get` gets in chunks of 100 and retries unprocessed keys."""
+        keys = [{"id": i} for i in range(150)]
+        self.handler.resource = mock.MagicMock()
+        self.handler.resource.batch_get_item.side_effect = [
+            {"Responses": {"table_name": keys[0:99]}, "UnprocessedKeys": {"table_name": {"Keys": keys[99:100]}}},
+            {"Responses": {"table_name": keys[99:100]}, "UnprocessedKeys": {}},
+            {"Responses": {"table_name": keys[100:]}}
+        ]
+        self.assertEqual(self.handler.batch_get(keys, fields=["id"]), keys)
+        calls = self.handler.resource.batch_get_item.call_args_list
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(calls[0][1]["RequestItems"]["table_name"]["Keys"]), 100)
+        self.assertEqual(calls[0][1]["RequestItems"]["table_name"]["ProjectionExpression"], "id")
+        self.assertEqual(len(calls[2][1]["RequestItems"]["table_name"]["Keys"]), 50)
+
+    def test_batch_get_duplicates(self):
+        """Test that `batch_get` asks for each item once."""
+        self.handler.resource = mock.MagicMock()
+        self.handler.resource.batch_get_item.return_value = {"Responses": {"table_name": [{"id": 1}, {"id": 2}]}}
+        self.assertEqual(self.handler.batch_get([{"id": 1}, {"id": 2}, {"id": 1}]), [{"id": 1}, {"id": 2}])
+        self.handler.resource.batch_get_item.assert_called_once_with(RequestItems={
+            "table_name": {"Keys": [{"id": 1}, {"id": 2}]}
+        })
+
+    def test_batch_get_gives_up(self):
+        """Test that `batch_get` raises an exception when keys stay unprocessed."""
+        self.handler.resource = mock.MagicMock()
+        self.handler.resource.batch_get_item.return_value = {"UnprocessedKeys": {"table_name": {"Keys": [{"id": 1}]}}}
+        with mock.patch("libraries.aws_tools.dynamodb_handler.time.sleep") as mock_sleep:
+            self.assertRaises(Exception, self.handler.batch_get, [{"id": 1}])
+        self.assertEqual(mock_sleep.call_count, DynamoDBHandler.BATCH_MAX_RETRIES)
+
+    def create_handler_with_indexes(self):
+        with mock.patch("libraries.aws_tools.dynamodb_handler.boto3", mock.MagicMock()):
+            handler = DynamoDBHandler("table_name")
+        handler.table = mock.MagicMock()
+        handler.table.key_schema = [{"AttributeName": "job_id", "KeyType": "HASH"}]
+        handler.table.global_secondary_indexes = [
+            {
+                "IndexName": "user-index",
+                "KeySchema": [{"AttributeName": "user", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"}
+            },
+            {
+                "IndexName": "user-created_at-index",
+                "KeySchema": [{"AttributeName": "user", "KeyType": "HASH"},
+                              {"AttributeName": "created_at", "KeyType": "RANGE"}],
+                "Projection": {"ProjectionType": "ALL"}
+            },
+            {
+                "IndexName": "convert_module-index",
+                "KeySchema": [{"AttributeName": "convert_module", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "KEYS_ONLY"}
+            }
+        ]
+        handler.table.local_secondary_indexes = None
+        return handler
@@ -0,0 +1,224 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from mock import patch
+from moto import mock_s3, mock_dynamodb2
+from tests.manager_tests import mock_utils
+from libraries.aws_tools.s3_handler import S3Handler
+from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
+from libraries.client.bulk_reconverter import BulkReconverter, reconvert_item
+from libraries.client.file_hashes import FileHashes
+from libraries.general_tools.file_utils import load_json_object, remove_tree
+from libraries.manager.module_registry import ModuleRegistry
+from libraries.models.job import TxJob
+from libraries.models.module import TxModule
+
+
+class TestBulkReconverter(unittest.TestCase):
+    MANIFEST_TABLE_NAME = 'bulk-reconverter-test-manifest'
+    JOB_TABLE_NAME = 'bulk-reconverter-test-job'
+    MODULE_TABLE_NAME = 'bulk-reconverter-test-module'
+    resources_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'resources')
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='bulk_reconverter_')
+        self.checkpoint_file = os.path.join(self.temp_dir, 'checkpoint.json')
+        self.reconverter = BulkReconverter('test-cdn', 'https://git.door43.org',
+                                           manifest_table_name=TestBulkReconverter.MANIFEST_TABLE_NAME, workers=1,
+                                           checkpoint_file=self.checkpoint_file, pre_convert_bucket='test-preconvert',
+                                           gogs_user_token='token1',
+                                           job_table_name=TestBulkReconverter.JOB_TABLE_NAME,
+                                           module_table_name=TestBulkReconverter.MODULE_TABLE_NAME)
+
+    def tearDown(self):
+        remove_tree(self.temp_dir)
+
+    @staticmethod
+    def create_table(table_name, hash_key, range_key=None):
+        db_handler = DynamoDBHandler(table_name)
+        key_schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+        attributes = [{'AttributeName': hash_key, 'AttributeType': 'S'}]
+        if range_key:
+            key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+            attributes.append({'AttributeName': range_key, 'AttributeType': 'S'})
+        db_handler.resource.create_table(TableName=table_name, KeySchema=key_schema,
+                                         AttributeDefinitions=attributes,
+                                         ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5})
+        return db_handler
+
+    @mock_dynamodb2
+    def test_get_repos(self):
+        db_handler = self.create_table(TestBulkReconverter.MANIFEST_TABLE_NAME, 'repo_name', 'user_name')
+        for user_name, repo_name in [('door43', 'en-obs'), ('door43', 'en-ulb'), ('someone', 'en-obs')]:
+            db_handler.insert_item({'user_name': user_name, 'repo_name': repo_name, 'resource_id': 'obs'})
+
+        self.assertEqual(self.reconverter.get_repos(), ['door43/en-obs', 'door43/en-ulb', 'someone/en-obs'])
+        self.assertEqual(self.reconverter.get_repos('door43/'), ['door43/en-obs', 'door43/en-ulb'])
+        self.assertEqual(self.reconverter.get_repos('door43/en-u'), ['door43/en-ulb'])
+
+    @staticmethod
+    def mock_reconvert_item(item):
+        repo = item[0]
+        if repo == 'door43/broken':
+            return {'repo': repo, 'success': False, 'errors': ['No manifest'], 'seconds': 1.0, 'timings': {}}
+        return {'repo': repo, 'success': True, 'errors': [], 'seconds': 2.0,
+                'timings': {'download': 100, 'deploy': 200}}
+
+    @mock_dynamodb2
+    @patch('libraries.client.bulk_reconverter.reconvert_item')
+    def test_run(self, mock_reconvert_item):
+        self.create_table(TestBulkReconverter.JOB_TABLE_NAME, 'job_id')
+        mock_reconvert_item.side_effect = self.mock_reconvert_item
+        repos = ['door43/en-obs', 'door43/broken', 'door43/en-ulb']
+
+        summary = self.reconverter.run(repos)
+
+        self.assertEqual(mock_reconvert_item.call_count, 3)
+        repo, settings = mock_reconvert_item.call_args[0][0]
+        self.assertEqual(repo, 'door43/en-ulb')
+        self.assertEqual(settings, self.reconverter.get_settings())
+        self.assertEqual(settings['job_table_name'], TestBulkReconverter.JOB_TABLE_NAME)
+        self.assertEqual(summary['reconverted'], 2)
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(summary['skipped'], 0)
+        self.assertEqual(summary['errors'], {'door43/broken': ['No manifest']})
+        self.assertEqual(summary['timings'], {'download': 200, 'deploy': 400})
+        self.assertGreater(summary['repos_per_minute'], 0)
+        self.assertEqual(sorted(load_json_object(self.checkpoint_file)), sorted(repos))
+
+        # another run only tries the one that failed again
+        mock_reconvert_item.reset_mock()
+        summary = self.reconverter.run(repos)
+        self.assertEqual(mock_reconvert_item.call_count, 1)
+        self.assertEqual(mock_reconvert_item.call_args[0][0][0], 'door43/broken')
+        self.assertEqual(summary['skipped'], 2)
+        self.assertEqual(summary['failed'], 1)
+
+    @patch('libraries.client.bulk_reconverter.time')
+    def test_throttle(self, mock_time):
+        clock = [1000.0]
+        mock_time.time.side_effect = lambda: clock[0]
+        mock_sleep = mock_time.sleep
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        self.reconverter.rate = 30  # one every 2 seconds
+        self.assertEqual(list(self.reconverter.throttle([1, 2, 3])), [1, 2, 3])
+        self.assertEqual([args[0] for args, kwargs in mock_sleep.call_args_list], [2, 2])
+
+        mock_sleep.reset_mock()
+        self.reconverter.rate = 0
+        self.assertEqual(list(self.reconverter.throttle([1, 2, 3])), [1, 2, 3])
+        self.assertFalse(mock_sleep.called)
+
+    @mock_dynamodb2
+    def test_job_table_with_stream(self):
+        self.create_table(TestBulkReconverter.JOB_TABLE_NAME, 'job_id')
+        self.reconverter.check_job_table()
+        # moto leaves out the stream of a table
+        with patch('libraries.client.bulk_reconverter.DynamoDBHandler') as mock_db_handler:
+            mock_db_handler.return_value.table.stream_specification = {'StreamEnabled': True,
+                                                                       'StreamViewType': 'KEYS_ONLY'}
+            self.assertRaises(Exception, self.reconverter.run, ['door43/en-obs'])
+        self.assertFalse(os.path.isfile(self.checkpoint_file))
+
+    def mock_download_repo(self, url, target):
+        self.downloaded_urls.append(url)
+        shutil.copyfile(os.path.join(self.resources_dir, 'raw_sources', 'aab_obs_text_obs.zip'), target)
+
+    @staticmethod
+    def mock_download_from_s3(bucket):
+        def download(url, target):
+            S3Handler(bucket).download_file(url.split(bucket + '/', 1)[1], target)
+        return download
+
+    @mock_s3
+    @mock_dynamodb2
+    @patch('multiprocessing.Pool')
+    @patch('libraries.client.client_callback.download_file')
+    @patch('libraries.converters.converter.download_file')
+    @patch('libraries.client.client_webhook.download_file')
+    def test_reconvert_item(self, mock_download_repo, mock_download_source, mock_download_output, mock_pool):
+        self.downloaded_urls = []
+        mock_download_repo.side_effect = self.mock_download_repo
+        mock_download_source.side_effect = self.mock_download_from_s3('test-preconvert')
+        mock_download_output.side_effect = self.mock_download_from_s3('test-cdn')
+        mock_pool.side_effect = AssertionError('daemonic processes are not allowed to have children')
+        ModuleRegistry.clear()
+        self.create_table(TestBulkReconverter.MANIFEST_TABLE_NAME, 'repo_name', 'user_name')
+        job_db_handler = self.create_table(TestBulkReconverter.JOB_TABLE_NAME, 'job_id')
+        TxModule(db_handler=self.create_table(TestBulkReconverter.MODULE_TABLE_NAME, 'name')).insert({
+            'name': 'md2html',
+            'type': 'conversion',
+            'version': '1',
+            'resource_types': ['obs'],
+            'input_format': 'md',
+            'output_format': 'html'
+        })
+        S3Handler('test-preconvert').create_bucket()
+        cdn_handler = S3Handler('test-cdn')
+        cdn_handler.create_bucket()
+        s3_commit_key = 'u/door43/aab_obs_text_obs/1234567890'
+        cdn_handler.put_contents('u/door43/aab_obs_text_obs/project.json',
+                                 json.dumps({'commits': [{'id': '0987654321'}, {'id': '1234567890'}]}))
+        cdn_handler.put_contents(s3_commit_key + '/build_log.json',
+                                 json.dumps({'commit_message': 'Edit 01', 'errors': ['old error'], 'multiple': True}))
+        cdn_handler.put_contents(s3_commit_key + '/01.html', 'old')
+        cdn_handler.put_contents(s3_commit_key + '/old.html', '<html></html>')
+        cdn_handler.put_contents(s3_commit_key + '/0.finished', '{}')
+        writes = []
+        upload_file = S3Handler.upload_file
+        delete_file = S3Handler.delete_file
+
+        def mock_upload_file(handler, path, key, *args, **kwargs):
+            writes.append(('upload', key))
+            return upload_file(handler, path, key, *args, **kwargs)
+
+        def mock_delete_file(handler, key, *args, **kwargs):
+            writes.append(('delete', key))
+            return delete_file(handler, key, *args, **kwargs)
+
+        with patch('libraries.manager.manager.GogsHandler', return_value=mock_utils.mock_gogs_handler(['token1'])), \
+                patch.object(DynamoDBHandler, 'use_list_append', False), \
+                patch.object(S3Handler, 'upload_file', mock_upload_file), \
+                patch.object(S3Handler, 'delete_file', mock_delete_file):
+            result = reconvert_item(('door43/aab_obs_text_obs', self.reconverter.get_settings()))
+
+        self.assertEqual(result['errors'], [])
+        self.assertTrue(result['success'])
+        self.assertEqual(self.downloaded_urls,
+                         ['https://git.door43.org/door43/aab_obs_text_obs/archive/1234567890.zip'])
+        for stage in ['download', 'preprocess', 'convert_convert', 'callback_upload', 'callback_cleanup']:
+            self.assertIn(stage, result['timings'])
+        # only the file the reconversion didn't write again is deleted, after the new files are uploaded and before
+        # the build log that deploys them
+        writes = [(action, key[len(s3_commit_key) + 1:]) for action, key in writes
+                  if key.startswith(s3_commit_key + '/')]
+        self.assertEqual([key for action, key in writes if action == 'delete'], ['0.finished', 'old.html'])
+        self.assertLess(writes.index(('delete', '0.finished')), writes.index(('upload', '01.html')))
+        self.assertLess(writes.index(('upload', '01.html')), writes.index(('delete', 'old.html')))
+        self.assertEqual(writes[-1], ('upload', 'build_log.json'))
+        self.assertNotEqual(cdn_handler.get_file_contents(s3_commit_key + '/01.html'), b'old')
+        self.assertFalse(cdn_handler.key_exists(s3_commit_key + '/old.html'))
+        self.assertIsNotNone(FileHashes.load(cdn_handler, s3_commit_key))
+        build_log = cdn_handler.get_json(s3_commit_key + '/build_log.json')
+        self.assertEqual(build_log['commit_message'], 'Edit 01')
+        self.assertEqual(build_log['errors'], [])
+        self.assertEqual(build_log['resource_type'], 'obs')
+        self.assertNotIn('multiple', build_log)
+        job = TxJob(db_handler=job_db_handler).load({'job_id': build_log['job_id']})
+        self.assertEqual(job.priority, 'bulk')
+        self.assertEqual(job.status, 'success')
+        self.assertIsNone(job.callback)
+
+    @mock_s3
+    def test_reconvert_item_without_commits(self):
+        S3Handler('test-cdn').create_bucket()
+        result = reconvert_item(('door43/en-obs', self.reconverter.get_settings()))
+        self.assertFalse(result['success'])
+        self.assertEqual(result['errors'], ['No commits of door43/en-obs have been converted'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -44,6 +44,7 @@ class TestClientCallback(TestCase):
 
         # then
         self.assertIsNotNone(results)
+        self.assertEqual(sorted(results['timings']['callback']), ['download', 'unzip', 'upload'])
 
     @patch('libraries.client.client_callback.download_file')
     def test_clientCallbackMultipleJobPartial(self, mock_download_file):
@@ -1,12 +1,15 @@
 from __future__ import absolute_import, unicode_literals, print_function
+import hashlib
 import json
 import os
 import shutil
 import tempfile
 import unittest
+from zipfile import ZipFile
 from libraries.aws_tools.s3_handler import S3Handler
 from mock import patch
 from libraries.client.client_webhook import ClientWebhook
+from libraries.client.file_hashes import FileHashes
 from libraries.general_tools.file_utils import read_file
 from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
 from libraries.models.manifest import TxManifest
@@ -35,6 +38,8 @@ class TestClientWebhook(unittest.TestCase):
 
         self.temp_dir = tempfile.mkdtemp(dir=TestClientWebhook.base_temp_dir, prefix='webhookTest_')
         self.job_request_count = 0
+        self.job_sources = []
+        self.job_priorities = []
         TestClientWebhook.mock_job_return_value = \
             json.loads(json.dumps(TestClientWebhook.default_mock_job_return_value))  # do deep copy
         self.uploaded_files = []
@@ -108,6 +113,15 @@ class TestClientWebhook(unittest.TestCase):
         self.assertEqual(tx_manifest.resource_id, 'udb')
         self.assertEqual(tx_manifest.lang_code, 'kpb')
 
+    @patch('libraries.client.client_webhook.download_file')
+    def test_processWebhookBulk(self, mock_download_file):
+        client_web_hook = self.setupClientWebhookMock('kpb_mat_text_udb_repo', self.parent_resources_dir,
+                                                      mock_download_file)
+        client_web_hook.process_webhook()
+        client_web_hook.priority = 'bulk'
+        client_web_hook.process_webhook()
+        self.assertEqual(self.job_priorities, [None, 'bulk'])
+
     @patch('libraries.client.client_webhook.download_file')
     def test_processWebhookError(self, mock_download_file):
         # given
@@ -159,10 +173,110 @@ class TestClientWebhook(unittest.TestCase):
         self.assertTrue(captured_error)
         self.validateResults(self.getBuildLogJson(), expected_job_count, expected_error_count)
 
+    @patch('libraries.client.client_webhook.download_file')
+    def test_processWebhookIncremental(self, mock_download_file):
+        # given
+        client_web_hook = self.setupClientWebhookMock('raw_sources/en-ulb', self.resources_dir, mock_download_file)
+        client_web_hook.incremental = True
+        cdn_handler = client_web_hook.cdn_handler
+        self.setupPreviousCommit(cdn_handler, changed=['02-EXO.usfm'], converted=['01-GEN', '02-EXO', '03-LEV'])
+        expected_job_count = 2
+        expected_error_count = 0
+
+        # when
+        results = client_web_hook.process_webhook()
+
+        # then
+        self.validateResults(results, expected_job_count, expected_error_count)
+        self.assertEqual([source.split('?')[1] for source in self.job_sources],
+                         ['convert_only=02-EXO.usfm', 'convert_only=05-DEU.usfm'])
+        s3_commit_key = 'u/tx-manager-test-data/en-ulb/22f3d09f7a'
+        self.assertEqual(cdn_handler.get_file_contents(s3_commit_key + '/01-GEN.html'), 'GEN')
+        self.assertEqual(cdn_handler.get_file_contents(s3_commit_key + '/03-LEV.html'), 'LEV')
+        self.assertFalse(cdn_handler.key_exists(s3_commit_key + '/02-EXO.html'))
+        file_hashes = FileHashes.load(cdn_handler, s3_commit_key)
+        self.assertIn('05-DEU.usfm', file_hashes.files)
+
+    @patch('libraries.client.client_webhook.download_file')
+    def test_processWebhookIncrementalOneBook(self, mock_download_file):
+        # given
+        client_web_hook = self.setupClientWebhookMock('raw_sources/en-ulb', self.resources_dir, mock_download_file)
+        client_web_hook.incremental = True
+        self.setupPreviousCommit(client_web_hook.cdn_handler, changed=['05-DEU.usfm'],
+                                 converted=['01-GEN', '02-EXO', '03-LEV', '05-DEU'])
+        expected_job_count = 1
+        expected_error_count = 0
+
+        # when
+        results = client_web_hook.process_webhook()
+
+        # then
+        self.validateResults(results, expected_job_count, expected_error_count)
+        self.assertTrue(self.job_sources[0].endswith('/preconvert/22f3d09f7a.zip?convert_only=05-DEU.usfm'))
+
+    @patch('libraries.client.client_webhook.download_file')
+    def test_processWebhookIncrementalFirstCommit(self, mock_download_file):
+        # given
+        client_web_hook = self.setupClientWebhookMock('raw_sources/en-ulb', self.resources_dir, mock_download_file)
+        client_web_hook.incremental = True
+        del client_web_hook.cdn_handler.get_json
+        client_web_hook.cdn_handler.put_contents('u/tx-manager-test-data/en-ulb/project.json',
+                                                 json.dumps({'commits': []}))
+        expected_job_count = 4
+        expected_error_count = 0
+
+        # when
+        results = client_web_hook.process_webhook()
+
+        # then
+        self.validateResults(results, expected_job_count, expected_error_count)
+        self.assertIsNotNone(FileHashes.load(client_web_hook.cdn_handler, 'u/tx-manager-test-data/en-ulb/22f3d09f7a'))
+
+    @patch('libraries.client.client_webhook.download_file')
+    def test_processWebhookSaveFileHashes(self, mock_download_file):
+        # given
+        client_web_hook = self.setupClientWebhookMock('raw_sources/en-ulb', self.resources_dir, mock_download_file)
+        client_web_hook.save_file_hashes = True
+        cdn_handler = client_web_hook.cdn_handler
+        self.setupPreviousCommit(cdn_handler, changed=['02-EXO.usfm'], converted=['01-GEN', '02-EXO', '03-LEV'])
+        expected_job_count = 4
+        expected_error_count = 0
+
+        # when
+        results = client_web_hook.process_webhook()
+
+        # then
+        self.validateResults(results, expected_job_count, expected_error_count)
+        self.assertEqual([source.split('?')[1] for source in self.job_sources],
+                         ['convert_only=01-GEN.usfm', 'convert_only=02-EXO.usfm', 'convert_only=03-LEV.usfm',
+                          'convert_only=05-DEU.usfm'])
+        file_hashes = FileHashes.load(cdn_handler, 'u/tx-manager-test-data/en-ulb/22f3d09f7a')
+        self.assertIn('05-DEU.usfm', file_hashes.files)
+
     #
     # helpers
     #
 
+    def setupPreviousCommit(self, cdn_handler, changed, converted):
+        """
+        Puts the project.json, the file hashes and the converted books of an earlier commit of en-ulb in the cdn bucket
+        """
+        del cdn_handler.get_json  # read them from the bucket
+        s3_commit_key = 'u/tx-manager-test-data/en-ulb/1234567890'
+        cdn_handler.put_contents('u/tx-manager-test-data/en-ulb/project.json',
+                                 json.dumps({'commits': [{'id': '1234567890'}]}))
+        files = {}
+        with ZipFile(os.path.join(self.resources_dir, 'raw_sources', 'en-ulb.zip')) as zip_file:
+            for name in zip_file.namelist():
+                files[name] = {'hash': hashlib.sha1(zip_file.read(name)).hexdigest(),
+                               'outputs': FileHashes.get_outputs(name)}
+        for name in changed:
+            files[name]['hash'] = 'changed'
+        FileHashes(files).save(cdn_handler, s3_commit_key)
+        for book in converted:
+            cdn_handler.put_contents('{0}/{1}.html'.format(s3_commit_key, book), book[3:])
+
+
     def validateResults(self, results, expected_job_count, expected_error_count):
         multipleJob = expected_job_count > 1
         self.assertEqual(self.job_request_count, expected_job_count)
@@ -225,6 +339,8 @@ class TestClientWebhook(unittest.TestCase):
 
     def mock_add_payload_to_tx_converter(self, callback_url, identifier, payload, rc, source_url, tx_manager_job_url):
         self.job_request_count += 1
+        self.job_priorities.append(payload.get('priority'))
+        self.job_sources.append(source_url)
         mock_job_return_value = TestClientWebhook.mock_job_return_value
         mock_job_return_value['job_id'] = identifier
         return identifier, mock_job_return_value
@@ -233,7 +349,7 @@ class TestClientWebhook(unittest.TestCase):
         bucket_name = self.cwh.preconvert_handler.bucket.name
         return self.upload_file(bucket_name, project_file, s3_key)
 
-    def mock_s3_upload_file(self, project_file, s3_key):
+    def mock_s3_upload_file(self, project_file, s3_key, metadata=None):
         bucket_name = self.cwh.cdn_handler.bucket.name
         return self.upload_file(bucket_name, project_file, s3_key)
 
@@ -0,0 +1,73 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import os
+import tempfile
+import unittest
+from moto import mock_s3
+from libraries.aws_tools.s3_handler import S3Handler
+from libraries.client.file_hashes import FileHashes
+from libraries.general_tools.file_utils import write_file, remove_tree
+
+
+class TestFileHashes(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='file_hashes_')
+        write_file(os.path.join(self.temp_dir, '01-GEN.usfm'), '\\id GEN')
+        write_file(os.path.join(self.temp_dir, '02-EXO.usfm'), '\\id EXO')
+        write_file(os.path.join(self.temp_dir, 'content', '01.md'), '# 1')
+        write_file(os.path.join(self.temp_dir, 'README.md'), '# Readme')
+        write_file(os.path.join(self.temp_dir, 'manifest.json'), '{}')
+
+    def tearDown(self):
+        remove_tree(self.temp_dir)
+
+    def test_from_dir(self):
+        file_hashes = FileHashes.from_dir(self.temp_dir)
+        self.assertEqual(sorted(file_hashes.files),
+                         ['01-GEN.usfm', '02-EXO.usfm', 'README.md', 'content/01.md', 'manifest.json'])
+        self.assertEqual(file_hashes.files['01-GEN.usfm']['outputs'], ['01-GEN.html'])
+        self.assertEqual(file_hashes.files['content/01.md']['outputs'], ['01.html'])
+        self.assertEqual(file_hashes.files['README.md']['outputs'], [])
+        self.assertEqual(file_hashes.files['manifest.json']['outputs'], [])
+        self.assertNotEqual(file_hashes.files['01-GEN.usfm']['hash'], file_hashes.files['02-EXO.usfm']['hash'])
+
+    def test_get_unchanged(self):
+        previous = FileHashes.from_dir(self.temp_dir)
+        write_file(os.path.join(self.temp_dir, '02-EXO.usfm'), '\\id EXO\n\\h Exodus')
+        write_file(os.path.join(self.temp_dir, '03-LEV.usfm'), '\\id LEV')
+        file_hashes = FileHashes.from_dir(self.temp_dir)
+
+        # 01.html didn't convert last time
+        unchanged = file_hashes.get_unchanged(previous, {'01-GEN.html', '02-EXO.html', 'manifest.json'})
+        self.assertEqual(unchanged, ['01-GEN.usfm'])
+        self.assertEqual(file_hashes.get_changed(unchanged), ['02-EXO.usfm', '03-LEV.usfm', 'content/01.md'])
+
+    def test_get_content_hash(self):
+        content_hash = FileHashes.from_dir(self.temp_dir).get_content_hash()
+        os.utime(os.path.join(self.temp_dir, '01-GEN.usfm'), (0, 0))
+        self.assertEqual(FileHashes.from_dir(self.temp_dir).get_content_hash(), content_hash)
+        write_file(os.path.join(self.temp_dir, '01-GEN.usfm'), '\\id GEN\n\\h Genesis')
+        self.assertNotEqual(FileHashes.from_dir(self.temp_dir).get_content_hash(), content_hash)
+
+    @mock_s3
+    def test_save_and_load(self):
+        cdn_handler = S3Handler('test_cdn')
+        cdn_handler.create_bucket()
+        s3_commit_key = 'u/owner/repo/12345678'
+        self.assertIsNone(FileHashes.load(cdn_handler, s3_commit_key))
+
+        file_hashes = FileHashes.from_dir(self.temp_dir)
+        file_hashes.save(cdn_handler, s3_commit_key)
+        self.assertTrue(cdn_handler.key_exists('u/owner/repo/12345678/file_hashes.json'))
+        self.assertEqual(FileHashes.load(cdn_handler, s3_commit_key).files, file_hashes.files)
+
+    @mock_s3
+    def test_load_other_version(self):
+        cdn_handler = S3Handler('test_cdn')
+        cdn_handler.create_bucket()
+        cdn_handler.put_contents('u/owner/repo/12345678/file_hashes.json', '{"version": 0, "files": {}}')
+        self.assertIsNone(FileHashes.load(cdn_handler, 'u/owner/repo/12345678'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,10 @@ import tempfile
 import unittest
 import codecs
 import shutil
+import zipfile
 from contextlib import closing
+from mock import patch
+from libraries.converters.converter import Converter
 from libraries.converters.md2html_converter import Md2HtmlConverter
 from libraries.general_tools.file_utils import remove_tree, unzip, remove
 from bs4 import BeautifulSoup
@@ -62,10 +65,11 @@ class TestMd2HtmlConverter(unittest.TestCase):
         out_zip_file = tempfile.mktemp(prefix="en-obs", suffix=".zip")
         with closing(Md2HtmlConverter('', 'obs', None, out_zip_file)) as tx:
             tx.input_zip_file = zip_file
-            tx.run()
+            result = tx.run()
 
         # verify the output
         self.assertTrue(os.path.isfile(out_zip_file), "There was no output zip file produced.")
+        self.assertEqual(sorted(result['timings']), ['convert', 'unzip', 'upload', 'zip'])
         self.out_dir = tempfile.mkdtemp(prefix='obs_')
         unzip(out_zip_file, self.out_dir)
         remove(out_zip_file)
@@ -253,6 +257,79 @@ class TestMd2HtmlConverter(unittest.TestCase):
 
         return content
 
+    def convert(self, file_name, resource, in_memory=False, workers=1, source=''):
+        """
+        :return tuple: the result and the output zip's file names mapped to their contents
+        """
+        zip_file = self.make_duplicate_zip_that_can_be_deleted(os.path.join(self.resources_dir, file_name))
+        self.out_zip_file = tempfile.mktemp(prefix=resource, suffix='.zip')
+        with closing(Md2HtmlConverter(source, resource, None, self.out_zip_file, in_memory=in_memory,
+                                      workers=workers)) as tx:
+            tx.input_zip_file = zip_file
+            result = tx.run()
+        with zipfile.ZipFile(self.out_zip_file) as zf:
+            contents = dict((name, zf.read(name)) for name in zf.namelist())
+        remove(self.out_zip_file)
+        return result, contents
+
+    def test_in_memory_same_as_disk(self):
+        for file_name, resource in [('en-obs-broken_chapter_01.zip', 'obs'), ('en_ta.zip', 'ta')]:
+            disk_result, disk_contents = self.convert(file_name, resource, False)
+            result, contents = self.convert(file_name, resource, True)
+            self.assertTrue(result['success'])
+            self.assertEqual(sorted(contents), sorted(disk_contents))
+            for name in contents:
+                self.assertEqual(contents[name], disk_contents[name], name)
+            self.assertEqual(sorted(result['warnings']), sorted(disk_result['warnings']))
+            self.assertEqual(sorted(result['info']), sorted(disk_result['info']))
+
+    def test_workers_same_as_serial(self):
+        for file_name, resource in [('en-obs-broken_chapter_01.zip', 'obs'), ('en_ta.zip', 'ta')]:
+            serial_result, serial_contents = self.convert(file_name, resource, in_memory=True)
+            result, contents = self.convert(file_name, resource, in_memory=True, workers=3)
+            self.assertEqual(contents, serial_contents)
+            # the logs of the workers come back in the same order
+            self.assertEqual(result['info'], serial_result['info'])
+            self.assertEqual(result['warnings'], serial_result['warnings'])
+            self.assertEqual(result['errors'], serial_result['errors'])
+
+    @patch('multiprocessing.Pool')
+    def test_workers_fall_back_to_serial(self, mock_pool):
+        mock_pool.side_effect = OSError(38, 'Function not implemented')
+        result, contents = self.convert('en-obs.zip', 'obs', workers=4)
+        self.assertTrue(mock_pool.called)
+        self.assertTrue(result['success'])
+        self.assertIn('50.html', contents)
+
+    def test_convert_only(self):
+        source = 'https://test.com/preconvert/en-obs.zip?convert_only=02.md,50.md'
+        result, contents = self.convert('en-obs.zip', 'obs', source=source)
+        self.assertTrue(result['success'])
+        self.assertEqual(sorted(name for name in contents if name.endswith('.html')), ['02.html', '50.html'])
+        # none of the other chapters are missing, they just aren't converted
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(result['warnings'], [])
+
+    def test_convert_only_nothing(self):
+        with closing(Md2HtmlConverter('https://test.com/preconvert/en-obs.zip?convert_only=', 'obs')) as tx:
+            self.assertEqual(tx.source, 'https://test.com/preconvert/en-obs.zip')
+            self.assertFalse(tx.should_convert('content/01.md'))
+
+    def test_worker_count(self):
+        with closing(Md2HtmlConverter('', 'obs', workers=0)) as tx:
+            self.assertEqual(tx.get_worker_count(1), 1)
+            self.assertLessEqual(tx.get_worker_count(1000), Converter.MAX_WORKERS)
+            tx.workers = 100
+            self.assertEqual(tx.get_worker_count(1000), Converter.MAX_WORKERS)
+
+    @patch('libraries.converters.converter.Converter.open_zips')
+    def test_huge_source_converts_on_disk(self, mock_open_zips):
+        with patch.object(Converter, 'MAX_IN_MEMORY_BYTES', 1000):
+            result, contents = self.convert('en-obs.zip', 'obs', True)
+        self.assertFalse(mock_open_zips.called)
+        self.assertTrue(result['success'])
+        self.assertIn('01.html', contents)
+
     def make_duplicate_zip_that_can_be_deleted(self, zip_file):
         in_zip_file = tempfile.mktemp(prefix="test_data", suffix=".zip")
         shutil.copy(zip_file, in_zip_file)
@@ -1,10 +1,18 @@
 from __future__ import absolute_import, unicode_literals, print_function
 import codecs
+import mock
 import os
 import tempfile
 import unittest
 import shutil
+import time
 from contextlib import closing
+from moto import mock_s3
+from libraries.aws_tools.s3_handler import S3Handler
+from libraries.converters.checkpoint import Checkpoint
+from bs4 import BeautifulSoup
+from usfm_tools.transform import UsfmTransform
+from libraries.converters import usfm2html_converter
 from libraries.converters.usfm2html_converter import Usfm2HtmlConverter
 from libraries.general_tools.file_utils import remove_tree, unzip, remove
 
@@ -127,6 +135,155 @@ class TestUsfmHtmlConverter(unittest.TestCase):
             self.assertFalse(os.path.isfile(file_name), 'UDB HTML file not found: {0}'.format(file_name))
         self.assertEqual(tx.source, source_url.split('?')[0])
 
+    def convert_with_usfm_transform(self, usfm_file, title):
+        """The way books were converted one at a time, in a scratch directory each"""
+        scratch_dir = tempfile.mkdtemp(prefix='scratch_')
+        shutil.copy(usfm_file, scratch_dir)
+        filebase = os.path.splitext(os.path.basename(usfm_file))[0]
+        UsfmTransform.buildSingleHtml(scratch_dir, scratch_dir, filebase)
+        with codecs.open(os.path.join(scratch_dir, filebase + '.html'), 'r', 'utf-8-sig') as html_file:
+            converted_html = html_file.read()
+        remove_tree(scratch_dir)
+        template_file = os.path.join(os.path.dirname(os.path.realpath(usfm2html_converter.__file__)), 'templates',
+                                     'template.html')
+        with open(template_file) as template_file:
+            template_soup = BeautifulSoup(template_file.read(), 'html.parser')
+        template_soup.head.title.string = title
+        content_div = template_soup.find('div', id='content')
+        content_div.clear()
+        content_div.append(BeautifulSoup(converted_html, 'html.parser').body)
+        content_div.body.unwrap()
+        return template_soup.prettify()
+
+    def test_same_as_usfm_transform(self):
+        """Converting all the books at once gives the same HTML as converting them one at a time."""
+        compared = 0
+        for zip_name in ['eight_bible_books.zip', '51-PHP.zip', 'kpb_mat_text_udb.zip']:
+            usfm_dir = tempfile.mkdtemp(prefix='usfm_')
+            unzip(os.path.join(self.resources_dir, zip_name), usfm_dir)
+            out_zip_file = tempfile.mktemp('.zip')
+            with closing(Usfm2HtmlConverter('', 'udb', None, out_zip_file, in_memory=True, workers=2)) as tx:
+                tx.input_zip_file = self.make_duplicate_zip_that_can_be_deleted(
+                    os.path.join(self.resources_dir, zip_name))
+                results = tx.run()
+            self.assertTrue(results['success'])
+            self.out_dir = tempfile.mkdtemp(prefix='udb_')
+            unzip(out_zip_file, self.out_dir)
+            remove(out_zip_file)
+            for root, dirs, files in os.walk(usfm_dir):
+                for usfm_file in [f for f in files if f.endswith('.usfm')]:
+                    html_file = os.path.join(self.out_dir, os.path.splitext(usfm_file)[0] + '.html')
+                    with codecs.open(html_file, 'r', 'utf-8') as html_file:
+                        html = html_file.read()
+                    self.assertEqual(html, self.convert_with_usfm_transform(os.path.join(root, usfm_file), 'UDB'))
+                    compared += 1
+            remove_tree(usfm_dir)
+            remove_tree(self.out_dir)
+        self.assertEqual(compared, 10)
+
+    @mock_s3
+    def test_run_in_memory(self):
+        """Converts the books zip to zip and streams the output to S3."""
+        S3Handler().create_bucket('test-cdn')
+        zip_file = os.path.join(self.resources_dir, 'eight_bible_books.zip')
+        with closing(Usfm2HtmlConverter('', 'udb', 'test-cdn', 'tx/job/1234.zip', in_memory=True)) as tx:
+            tx.input_zip_file = self.make_duplicate_zip_that_can_be_deleted(zip_file)
+            results = tx.run()
+            self.assertEqual(os.listdir(tx.files_dir), [])
+            self.assertEqual(os.listdir(tx.output_dir), [])
+            self.assertFalse(os.path.exists(tx.input_zip_file))
+        self.assertTrue(results['success'])
+        out_zip_file = tempfile.mktemp('.zip')
+        S3Handler('test-cdn').download_file('tx/job/1234.zip', out_zip_file)
+        self.out_dir = tempfile.mkdtemp(prefix='udb_')
+        unzip(out_zip_file, self.out_dir)
+        remove(out_zip_file)
+        self.verifyFiles(['60-JAS.html', '61-1PE.html', '62-2PE.html', '63-1JN.html', '64-2JN.html', '65-3JN.html',
+                          '66-JUD.html', '67-REV.html'])
+
+    @mock_s3
+    def test_resume_from_checkpoint(self):
+        """Runs out of time after the first book, then another converter finishes from the checkpoint."""
+        S3Handler().create_bucket('test-cdn')
+        checkpoint = Checkpoint('test-cdn', Checkpoint.get_prefix('job1'))
+        out_zip_file = tempfile.mktemp('.zip')
+        zip_file = os.path.join(self.resources_dir, 'eight_bible_books.zip')
+        with closing(Usfm2HtmlConverter('', 'udb', None, out_zip_file, checkpoint=checkpoint,
+                                        deadline=time.time() - 1)) as tx:
+            tx.input_zip_file = self.make_duplicate_zip_that_can_be_deleted(zip_file)
+            results = tx.run()
+        self.assertTrue(results['paused'])
+        self.assertFalse(results['success'])
+        self.assertFalse(os.path.isfile(out_zip_file))
+        self.assertTrue(checkpoint.load())
+        self.assertEqual(len(checkpoint.state['units']), 1)
+
+        checkpoint = Checkpoint('test-cdn', Checkpoint.get_prefix('job1'))
+        with closing(Usfm2HtmlConverter('', 'udb', None, out_zip_file, checkpoint=checkpoint,
+                                        deadline=time.time() + 300)) as tx:
+            tx.input_zip_file = self.make_duplicate_zip_that_can_be_deleted(zip_file)
+            results = tx.run()
+        self.assertTrue(results['success'])
+        self.assertNotIn('paused', results)
+        self.assertEqual(tx.units_converted, 7)
+        self.assertEqual(len([message for message in results['info'] if message.startswith('Converted ')]), 8)
+        self.assertIn('checkpoint', results['timings'])
+        self.out_dir = tempfile.mkdtemp(prefix='udb_')
+        unzip(out_zip_file, self.out_dir)
+        remove(out_zip_file)
+        self.verifyFiles(['60-JAS.html', '61-1PE.html', '62-2PE.html', '63-1JN.html', '64-2JN.html', '65-3JN.html',
+                          '66-JUD.html', '67-REV.html'])
+        # the checkpoint is gone once the conversion is done
+        self.assertFalse(Checkpoint('test-cdn', Checkpoint.get_prefix('job1')).load())
+        self.assertEqual(list(S3Handler('test-cdn').get_objects(prefix=Checkpoint.PREFIX)), [])
+
+    @mock_s3
+    def test_resume_in_memory(self):
+        """Converting in memory with a checkpoint, like on Lambda, pauses and resumes from the output zip."""
+        S3Handler().create_bucket('test-cdn')
+        out_zip_file = tempfile.mktemp('.zip')
+        zip_file = os.path.join(self.resources_dir, 'eight_bible_books.zip')
+        for deadline in [time.time() - 1, time.time() + 300]:
+            checkpoint = Checkpoint('test-cdn', Checkpoint.get_prefix('job1'))
+            with closing(Usfm2HtmlConverter('', 'udb', None, out_zip_file, checkpoint=checkpoint, deadline=deadline,
+                                            in_memory=True)) as tx:
+                tx.input_zip_file = self.make_duplicate_zip_that_can_be_deleted(zip_file)
+                results = tx.run()
+                self.assertEqual(os.listdir(tx.files_dir), [])
+        self.assertTrue(results['success'])
+        self.assertEqual(tx.units_converted, 7)
+        self.out_dir = tempfile.mkdtemp(prefix='udb_')
+        unzip(out_zip_file, self.out_dir)
+        remove(out_zip_file)
+        self.verifyFiles(['60-JAS.html', '61-1PE.html', '62-2PE.html', '63-1JN.html', '64-2JN.html', '65-3JN.html',
+                          '66-JUD.html', '67-REV.html'])
+        self.assertEqual(list(S3Handler('test-cdn').get_objects(prefix=Checkpoint.PREFIX)), [])
+
+    @mock_s3
+    def test_checkpoint_saved_once_on_pause(self):
+        """Doesn't write the checkpoint for every book, only when it runs out of time."""
+        S3Handler().create_bucket('test-cdn')
+        checkpoint = Checkpoint('test-cdn', Checkpoint.get_prefix('job1'))
+        zip_file = os.path.join(self.resources_dir, 'eight_bible_books.zip')
+        with closing(Usfm2HtmlConverter('', 'udb', None, tempfile.mktemp('.zip'), checkpoint=checkpoint,
+                                        deadline=time.time() + 300)) as tx:
+            tx.input_zip_file = self.make_duplicate_zip_that_can_be_deleted(zip_file)
+            finish_unit = tx.finish_unit
+
+            def finish_unit_then_run_out_of_time(unit):
+                finish_unit(unit)
+                if tx.units_converted == 3:
+                    tx.deadline = time.time() - 1
+
+            tx.finish_unit = finish_unit_then_run_out_of_time
+            with mock.patch.object(checkpoint.s3_handler, 'put_contents',
+                                   wraps=checkpoint.s3_handler.put_contents) as mock_put_contents:
+                results = tx.run()
+        self.assertTrue(results['paused'])
+        self.assertEqual(mock_put_contents.call_count, 1)
+        self.assertTrue(checkpoint.load())
+        self.assertEqual(len(checkpoint.state['units']), 3)
+
     def test_PhpComplete(self):
         """
         Runs the converter and verifies the output
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, print_function
+import codecs
+import io
+import os
+import tempfile
+import unittest
+from bs4 import BeautifulSoup
+from usfm_tools.support.singlehtmlRenderer import SingleHTMLRenderer
+from libraries.converters.usfm_renderer import tokenize_usfm, render_usfm, TEXT, UNKNOWN
+from libraries.door43_tools.templaters import BibleTemplater
+from libraries.general_tools.file_utils import write_file, remove_tree
+
+
+class TestUsfmRenderer(unittest.TestCase):
+
+    usfm = """\\id JAS EN_ULB en_English_ltr
+\\ide UTF-8
+\\h James
+\\toc1 The Letter of James
+\\mt James
+
+\\s5
+\\c 1
+\\p
+\\v 1 James, a servant of God~and of the Lord Jesus Christ,
+\\f + \\ft Or \\fqa bond-servant\\fqa* of God \\f*
+\\v 2 Consider it all joy,
+\\q1 my brothers,
+\\q2 when you experience \\nd trials\\nd*.
+
+\\s5
+\\cl Part
+\\c 2
+\\p
+\\v 1 My brothers,\\f + \\ft a note\\f* hold the faith
+\\xyz of our Lord
+\\v 2-3 Suppose that someone comes.
+"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='usfm_renderer_')
+
+    def tearDown(self):
+        remove_tree(self.temp_dir)
+
+    @staticmethod
+    def render_with_usfm_tools(usfm):
+        renderer = SingleHTMLRenderer(None, None)
+        renderer.booksUsfm = {'JAS': usfm}
+        output = io.BytesIO()
+        renderer.f = codecs.getwriter('utf_8_sig')(output)
+        renderer.run()
+        renderer.writeFootnotes()
+        renderer.f.write('</body></html>')
+        return output.getvalue().decode('utf-8-sig')
+
+    @staticmethod
+    def get_body(html):
+        return BeautifulSoup(html, 'html.parser').body.decode_contents(indent_level=1)
+
+    def test_same_as_usfm_tools(self):
+        self.assertEqual(self.get_body(render_usfm(self.usfm)),
+                         self.get_body(self.render_with_usfm_tools(self.usfm)))
+
+    def test_tokenize(self):
+        tokens = list(tokenize_usfm(self.usfm))
+        self.assertEqual(tokens[:3], [('id', 'JAS EN_ULB en_English_ltr'), ('ide', 'UTF-8'), ('h', 'James')])
+        self.assertIn(('v', '2-3'), tokens)
+        self.assertIn(('f', '+'), tokens)
+        self.assertIn(('fqa*', None), tokens)
+        self.assertIn((UNKNOWN, 'xyz'), tokens)
+        self.assertEqual(tokens[-1], (TEXT, 'Suppose that someone comes.'))
+
+    def test_tokenize_stream(self):
+        tokens = list(tokenize_usfm(self.usfm))
+        # split everywhere a token could be split
+        self.assertEqual(list(tokenize_usfm(iter(self.usfm))), tokens)
+        self.assertEqual(list(tokenize_usfm(io.StringIO(self.usfm))), tokens)
+        self.assertEqual(list(tokenize_usfm(self.usfm.splitlines(True))), tokens)
+
+    def test_render_to_stream(self):
+        output = io.StringIO()
+        self.assertIsNone(render_usfm(io.StringIO(self.usfm), output.write))
+        self.assertEqual(output.getvalue(), render_usfm(self.usfm))
+
+    def test_markup(self):
+        soup = BeautifulSoup(render_usfm(self.usfm), 'html.parser')
+        self.assertEqual(soup.h1.text, 'James')
+        self.assertEqual([(h2['id'], h2.text) for h2 in soup.find_all('h2', {'c-num'})],
+                         [('059-ch-001', 'Chapter 1'), ('059-ch-002', 'Part 2')])
+        self.assertEqual(soup.find('span', id='059-ch-002-v-2-3').text, '2-3')
+        self.assertEqual(len(soup.find_all('span', class_='chunk-break')), 2)
+        self.assertEqual(soup.find('div', id='fn-059-001-001-1').find('span', class_='text').decode_contents(),
+                         'Or <i>bond-servant</i>')
+        self.assertIsNotNone(soup.find('a', href='#fn-059-002-001-1'))
+        self.assertIn('God\xa0and', soup.text)
+        self.assertIn('faith  of our Lord', soup.text)  # only the unknown marker is left out
+
+    def test_non_ascii_book_name(self):
+        soup = BeautifulSoup(render_usfm(self.usfm.replace('\\h James', '\\h Иаков')), 'html.parser')
+        self.assertEqual(soup.h1.text, 'Иаков')
+
+    def test_page_nav(self):
+        write_file(os.path.join(self.temp_dir, '60-JAS.html'), render_usfm(self.usfm))
+        templater = BibleTemplater('ulb', self.temp_dir, self.temp_dir, None)
+        nav = BeautifulSoup(templater.build_page_nav(), 'html.parser')
+        self.assertEqual(nav.find('a', class_='accordion-toggle').text, 'James')
+        self.assertEqual([(a['href'], a.text) for a in nav.select('li.chapter a')],
+                         [('60-JAS.html#059-ch-001', '1'), ('60-JAS.html#059-ch-002', '2')])
+
+
+if __name__ == '__main__':
+    unittest.main()
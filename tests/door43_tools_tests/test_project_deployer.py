@@ -2,6 +2,7 @@ from __future__ import absolute_import, unicode_literals, print_function
 import unittest
 import os
 import tempfile
+from datetime import datetime, timedelta
 from moto import mock_s3
 from libraries.door43_tools.project_deployer import ProjectDeployer
 from libraries.general_tools.file_utils import unzip
@@ -31,6 +32,8 @@ class ProjectDeployerTests(unittest.TestCase):
         self.assertTrue(ret)
         self.assertTrue(self.deployer.door43_handler.key_exists(build_log_key))
         self.assertTrue(self.deployer.door43_handler.key_exists('{0}/50.html'.format(self.project_key)))
+        deploy_log = self.deployer.cdn_handler.get_json('{0}/deploy_log.json'.format(self.project_key))
+        self.assertEqual(sorted(deploy_log['timings']), ['deploy', 'download', 'template'])
 
     def test_bad_deploy_revision_to_door43(self):
         bad_key = 'u/test_user/test_repo/12345678/bad_build_log.json'
@@ -42,6 +45,14 @@ class ProjectDeployerTests(unittest.TestCase):
         self.deployer.cdn_handler.put_contents('u/user2/project2/revision2/build_log.json', '{}')
         self.assertTrue(self.deployer.redeploy_all_projects('test-door43_deployer'))
 
+    def test_get_reload_milliseconds(self):
+        eta = (datetime.utcnow() + timedelta(seconds=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.assertTrue(25000 <= ProjectDeployer.get_reload_milliseconds({'eta': eta}) <= 30000)
+        self.assertEqual(ProjectDeployer.get_reload_milliseconds({'eta': '2017-04-12T17:03:06Z'}), 10000)
+        eta = (datetime.utcnow() + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.assertEqual(ProjectDeployer.get_reload_milliseconds({'eta': eta}), 60000)
+        self.assertEqual(ProjectDeployer.get_reload_milliseconds({}), 10000)
+
     def mock_s3_obs_project(self):
         zip_file = os.path.join(self.resources_dir, 'converted_projects', 'en-obs-complete.zip')
         out_dir = os.path.join(self.temp_dir, 'en-obs-complete')
@@ -47,6 +47,24 @@ class ViewCountTest(unittest.TestCase):
         # then
         self.validateResults(expected_view_count, results)
 
+    def test_validIncrementOnlyChangesViews(self):
+        # given
+        vc = PageMetrics(**ViewCountTest.env_vars)
+        expected_view_count = ViewCountTest.INITIAL_VIEW_COUNT + 2
+        self.repo_url = "https://live.door43.org/u/dummy/repo/96db55378e/"
+
+        # when
+        vc.get_view_count(self.repo_url, increment=1)
+        results = vc.get_view_count(self.repo_url, increment=1)
+
+        # then
+        self.validateResults(expected_view_count, results)
+        tx_manifest = TxManifest({'repo_name': ViewCountTest.REPO_NAME, 'user_name': ViewCountTest.USER_NAME},
+                                 db_handler=self.db_handler)
+        self.assertEqual(tx_manifest.views, expected_view_count)
+        self.assertEqual(tx_manifest.title, 'title')
+        self.assertEqual(tx_manifest.manifest, '{}')
+
     def test_invalidManifestTable(self):
         # given
         vc = PageMetrics(**{})
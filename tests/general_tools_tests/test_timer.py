@@ -0,0 +1,32 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import mock
+import unittest
+from libraries.general_tools.timer import StageTimer, get_percentile, get_percentiles
+
+
+class TimerTests(unittest.TestCase):
+
+    @mock.patch('libraries.general_tools.timer.time.time')
+    def test_stage(self, mock_time):
+        mock_time.side_effect = [10.0, 10.25, 20.0, 20.5004, 30.0, 30.1]
+        timer = StageTimer()
+        with timer.stage('download'):
+            pass
+        with timer.stage('download'):
+            pass
+        with self.assertRaises(ValueError):
+            with timer.stage('convert'):
+                raise ValueError('bad file')
+        self.assertEqual(timer.timings, {'download': 750, 'convert': 100})
+
+    def test_get_percentile(self):
+        values = [15, 20, 35, 40, 50]
+        self.assertEqual(get_percentile(values, 50), 35)
+        self.assertEqual(get_percentile(values, 95), 50)
+        self.assertEqual(get_percentile(values, 0), 15)
+        self.assertEqual(get_percentile(list(reversed(range(1, 101))), 95), 95)
+        self.assertIsNone(get_percentile([], 50))
+
+    def test_get_percentiles(self):
+        self.assertEqual(get_percentiles({'convert': [100, 300, 200], 'zip': []}),
+                         {'convert': {'p50': 200, 'p95': 300}})
@@ -3,6 +3,7 @@ import mock
 import unittest
 
 from libraries.gogs_tools.gogs_handler import GogsHandler
+from libraries.gogs_tools.user_cache import UserCache
 
 
 class GogsHandlerTests(unittest.TestCase):
@@ -13,6 +14,7 @@ class GogsHandlerTests(unittest.TestCase):
 
     def setUp(self):
         self.handler.gogs_api.reset_mock()
+        UserCache.clear()
 
     def test_authenticate_user_token(self):
         def valid_auth(token):
@@ -29,3 +31,29 @@ class GogsHandlerTests(unittest.TestCase):
         self.handler.gogs_api.authenticated_user.return_value = mock_user
         self.assertIs(self.handler.get_user("valid"), mock_user)
         self.assertIsNone(self.handler.get_user("invalid"))
+
+    def test_get_user_cached(self):
+        self.handler.gogs_api.valid_authentication = mock.MagicMock(side_effect=lambda token: token.token == "valid")
+        mock_user = mock.MagicMock()
+        self.handler.gogs_api.authenticated_user.return_value = mock_user
+        for _ in range(3):
+            self.assertIs(self.handler.get_user("valid"), mock_user)
+            self.assertIsNone(self.handler.get_user("invalid"))
+        self.assertEqual(self.handler.gogs_api.valid_authentication.call_count, 2)
+        self.assertEqual(self.handler.gogs_api.authenticated_user.call_count, 1)
+        self.assertEqual(UserCache.get_stats(), {'hits': 4, 'misses': 2, 'size': 2})
+
+    @mock.patch('libraries.gogs_tools.user_cache.time.time')
+    def test_get_user_expired(self, mock_time):
+        mock_time.return_value = 1000
+        self.handler.gogs_api.valid_authentication = mock.MagicMock(side_effect=lambda token: token.token == "valid")
+        self.handler.get_user("valid")
+        self.handler.get_user("invalid")
+        # the invalid token is asked about again sooner
+        mock_time.return_value += UserCache.NEGATIVE_TTL_SECONDS + 1
+        self.handler.get_user("valid")
+        self.handler.get_user("invalid")
+        self.assertEqual(self.handler.gogs_api.valid_authentication.call_count, 3)
+        mock_time.return_value += UserCache.TTL_SECONDS
+        self.handler.get_user("valid")
+        self.assertEqual(self.handler.gogs_api.valid_authentication.call_count, 4)
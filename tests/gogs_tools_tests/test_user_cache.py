@@ -0,0 +1,47 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import os
+import tempfile
+import unittest
+from gogs_client import GogsUser
+from libraries.general_tools.file_utils import remove_tree
+from libraries.gogs_tools.user_cache import UserCache
+
+
+class UserCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        UserCache.clear()
+        self.temp_dir = tempfile.mkdtemp(prefix='user_cache_')
+        self.cache = UserCache(self.temp_dir)
+        self.user = GogsUser(user_id=1, username='username', full_name='Full Name', email='user@example.com',
+                             avatar_url='https://git.door43.org/avatar/1')
+
+    def tearDown(self):
+        remove_tree(self.temp_dir)
+
+    def test_get_key(self):
+        key = UserCache.get_key('https://git.door43.org', 'token')
+        self.assertNotIn('token', key)
+        self.assertEqual(key, UserCache.get_key('https://git.door43.org', 'token'))
+        self.assertNotEqual(key, UserCache.get_key('https://git.door43.org', 'token2'))
+        self.assertNotEqual(key, UserCache.get_key('https://example.com', 'token'))
+
+    def test_kept_in_files(self):
+        self.cache.put('valid', self.user)
+        self.cache.put('invalid', None)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['invalid.json', 'valid.json'])
+
+        # as in a new container that got the same /tmp
+        UserCache.clear()
+        found, user = UserCache(self.temp_dir).get('valid')
+        self.assertTrue(found)
+        self.assertEqual((user.user_id, user.username, user.full_name, user.email, user.avatar_url),
+                         (1, 'username', 'Full Name', 'user@example.com', 'https://git.door43.org/avatar/1'))
+        self.assertEqual(UserCache(self.temp_dir).get('invalid'), (True, None))
+        self.assertEqual(UserCache(self.temp_dir).get('unknown'), (False, None))
+        self.assertEqual(UserCache.get_stats(), {'hits': 2, 'misses': 1, 'size': 2})
+
+    def test_bad_file(self):
+        with open(os.path.join(self.temp_dir, 'bad.json'), 'w') as f:
+            f.write('not json')
+        self.assertEqual(self.cache.get('bad'), (False, None))
@@ -26,3 +26,22 @@ class TestClientWebhookHandler(TestCase):
         }
         handler = ClientWebhookHandler()
         self.assertIsNone(handler.handle(event, None))
+
+    @mock.patch('libraries.client.client_webhook.ClientWebhook.process_webhook')
+    @mock.patch('libraries.client.client_webhook.ClientWebhook.__init__')
+    def test_handle_bulk(self, mock_init, mock_process_webhook):
+        mock_init.return_value = None
+        event = {
+            'data': {},
+            'vars': {
+                'gogs_url': 'https://git.example.com',
+                'api_url': 'https://api.example.com',
+                'cdn_bucket': 'cdn_test_bucket',
+                'pre_convert_bucket': 'pre_convert_bucket',
+                'gogs_user_token': 'token1',
+                'manifest_table_name': 'tx-manifest',
+            },
+            'api-gateway': {'params': {'querystring': {'priority': 'bulk'}}}
+        }
+        ClientWebhookHandler().handle(event, None)
+        self.assertEqual(mock_init.call_args[1]['priority'], 'bulk')
@@ -0,0 +1,32 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import mock
+from unittest import TestCase
+from libraries.lambda_handlers.complete_job_handler import CompleteJobHandler
+
+
+class TestCompleteJobHandler(TestCase):
+
+    @mock.patch('libraries.manager.manager.TxManager.setup_resources')
+    @mock.patch('libraries.manager.manager.TxManager.complete_job')
+    def test_handle(self, mock_complete_job, mock_setup_resources):
+        mock_complete_job.return_value = None
+        result = {
+            'info': [],
+            'warnings': [],
+            'errors': [],
+            'success': True
+        }
+        event = {
+            'data': {
+                'job_id': '1234',
+                'result': result
+            },
+            'vars': {
+                'job_table_name': 'test-tx-job',
+                'module_table_name': 'test-tx-module',
+                'prefix': 'test-'
+            }
+        }
+        handler = CompleteJobHandler()
+        self.assertIsNone(handler.handle(event, None))
+        mock_complete_job.assert_called_once_with('1234', result)
@@ -1,5 +1,6 @@
 from __future__ import absolute_import, unicode_literals, print_function
 import mock
+import time
 from unittest import TestCase
 from libraries.lambda_handlers.convert_handler import ConvertHandler
 from libraries.converters.md2html_converter import Md2HtmlConverter
@@ -92,3 +93,122 @@ class TestConvertHandler(TestCase):
             }
         }
         self.assertIsNone(ConvertHandler(converter_class=Usfm2HtmlConverter).handle(event, None))
+
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.setup_resources')
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('libraries.converters.converter.Converter.run')
+    def test_handle_reports_completion(self, mock_convert_run, mock_invoke, mock_setup_resources):
+        result = {'success': True, 'info': [], 'warnings': [], 'errors': []}
+        mock_convert_run.return_value = result
+        event = {
+            'data': {
+                'job': {
+                    'job_id': '1234587890',
+                    'source': 'https://cdn.example.com/preconvert/705948ab00.zip',
+                    'resource_type': 'obs',
+                    'cdn_file': 'tx/job/1234567890.zip',
+                    'cdn_bucket': 'test_cdn_bucket'
+                },
+                'completion': {
+                    'function_name': 'test-tx_complete_job',
+                    'job_table_name': 'test-tx-job',
+                    'module_table_name': 'test-tx-module',
+                    'prefix': 'test-'
+                }
+            }
+        }
+        self.assertEqual(ConvertHandler(Md2HtmlConverter).handle(event, None), result)
+        args, kwargs = mock_invoke.call_args
+        self.assertEqual(args[0], 'test-tx_complete_job')
+        self.assertEqual(args[1]['data'], {'job_id': '1234587890', 'result': result})
+        self.assertEqual(args[1]['vars']['job_table_name'], 'test-tx-job')
+        self.assertEqual(kwargs['invocation_type'], 'Event')
+
+        # a converter that blows up still finishes the job, and doesn't raise so Lambda doesn't run it again
+        mock_convert_run.side_effect = Exception('could not download')
+        self.assertEqual(ConvertHandler(Md2HtmlConverter).handle(event, None), {'errorMessage': 'could not download'})
+        args, kwargs = mock_invoke.call_args
+        self.assertEqual(args[1]['data']['result'], {'errorMessage': 'could not download'})
+
+    @mock.patch('libraries.converters.checkpoint.Checkpoint.setup_resources')
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.setup_resources')
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('libraries.converters.converter.Converter.run')
+    def test_handle_continues_paused_conversion(self, mock_convert_run, mock_invoke, mock_setup_resources,
+                                                 mock_checkpoint_setup_resources):
+        mock_convert_run.return_value = {'success': False, 'info': [], 'warnings': [], 'errors': [], 'paused': True}
+        context = mock.MagicMock()
+        context.function_name = 'test-tx_convert_md2html'
+        context.get_remaining_time_in_millis.return_value = 300000
+        completion = {
+            'function_name': 'test-tx_complete_job',
+            'job_table_name': 'test-tx-job',
+            'module_table_name': 'test-tx-module',
+            'prefix': 'test-'
+        }
+        event = {
+            'data': {
+                'job': {
+                    'job_id': '1234587890',
+                    'source': 'https://cdn.example.com/preconvert/705948ab00.zip',
+                    'resource_type': 'obs',
+                    'cdn_file': 'tx/job/1234567890.zip',
+                    'cdn_bucket': 'test_cdn_bucket'
+                },
+                'continuation': completion
+            },
+            'vars': {}
+        }
+        with mock.patch.object(Md2HtmlConverter, '__init__', return_value=None) as mock_init:
+            self.assertTrue(ConvertHandler(Md2HtmlConverter).handle(event, context)['paused'])
+        checkpoint = mock_init.call_args[1]['checkpoint']
+        self.assertEqual(checkpoint.prefix, 'tx/checkpoint/1234587890')
+        self.assertAlmostEqual(mock_init.call_args[1]['deadline'], time.time() + 240, delta=5)
+
+        # the next invocation reports back since tx-manager isn't waiting for it
+        args, kwargs = mock_invoke.call_args
+        self.assertEqual(args[0], 'test-tx_convert_md2html')
+        self.assertEqual(args[1]['data']['completion'], completion)
+        self.assertEqual(args[1]['data']['continuations'], 1)
+        self.assertNotIn('continuation', args[1]['data'])
+        self.assertEqual(kwargs['invocation_type'], 'Event')
+
+        # which doesn't report a pause, only how the conversion went in the end
+        event = args[1]
+        mock_invoke.reset_mock()
+        mock_convert_run.return_value = {'success': True, 'info': [], 'warnings': [], 'errors': []}
+        ConvertHandler(Md2HtmlConverter).handle(event, context)
+        args, kwargs = mock_invoke.call_args
+        self.assertEqual(args[0], 'test-tx_complete_job')
+        self.assertTrue(args[1]['data']['result']['success'])
+
+    @mock.patch('libraries.converters.checkpoint.Checkpoint.setup_resources')
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.setup_resources')
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('libraries.converters.converter.Converter.run')
+    def test_last_continuation_does_not_pause(self, mock_convert_run, mock_invoke, mock_setup_resources,
+                                              mock_checkpoint_setup_resources):
+        mock_convert_run.return_value = {'success': True, 'info': [], 'warnings': [], 'errors': []}
+        event = {
+            'data': {
+                'job': {
+                    'job_id': '1234587890',
+                    'source': 'https://cdn.example.com/preconvert/705948ab00.zip',
+                    'resource_type': 'obs',
+                    'cdn_file': 'tx/job/1234567890.zip',
+                    'cdn_bucket': 'test_cdn_bucket'
+                },
+                'completion': {
+                    'function_name': 'test-tx_complete_job',
+                    'job_table_name': 'test-tx-job',
+                    'module_table_name': 'test-tx-module',
+                    'prefix': 'test-'
+                },
+                'continuations': ConvertHandler.MAX_CONTINUATIONS
+            }
+        }
+        with mock.patch.object(Md2HtmlConverter, '__init__', return_value=None) as mock_init:
+            ConvertHandler(Md2HtmlConverter).handle(event, mock.MagicMock())
+        self.assertIsNotNone(mock_init.call_args[1]['checkpoint'])
+        self.assertIsNone(mock_init.call_args[1]['deadline'])
+        self.assertEqual(mock_invoke.call_args[0][0], 'test-tx_complete_job')
@@ -0,0 +1,24 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import mock
+from unittest import TestCase
+from libraries.lambda_handlers.deliver_callback_handler import DeliverCallbackHandler
+
+
+class TestDeliverCallbackHandler(TestCase):
+
+    @mock.patch('libraries.manager.callback_dispatcher.CallbackDispatcher.setup_resources')
+    @mock.patch('libraries.manager.callback_dispatcher.CallbackDispatcher.deliver')
+    def test_handle(self, mock_deliver, mock_setup_resources):
+        mock_deliver.return_value = True
+        event = {
+            'data': {
+                'url': 'https://callback.example.com/',
+                'payload': {'job_id': '1234'}
+            },
+            'vars': {
+                'failed_callbacks_table_name': 'test-tx-failed-callbacks'
+            }
+        }
+        handler = DeliverCallbackHandler()
+        self.assertTrue(handler.handle(event, None))
+        mock_deliver.assert_called_once_with('https://callback.example.com/', {'job_id': '1234'})
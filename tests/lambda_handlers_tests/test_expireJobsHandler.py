@@ -0,0 +1,25 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import mock
+from unittest import TestCase
+from libraries.lambda_handlers.expire_jobs_handler import ExpireJobsHandler
+from libraries.manager.manager import TxManager
+
+
+class TestExpireJobsHandler(TestCase):
+
+    @mock.patch('libraries.manager.manager.TxManager.setup_resources')
+    @mock.patch('libraries.manager.manager.TxManager.expire_stale_jobs')
+    def test_handle(self, mock_expire_stale_jobs, mock_setup_resources):
+        mock_expire_stale_jobs.return_value = [{'job_id': '1234'}]
+        event = {
+            'vars': {
+                'prefix': 'test-'
+            }
+        }
+        with mock.patch.dict('os.environ', {'STALE_JOB_SECONDS': '600'}):
+            self.assertEqual(ExpireJobsHandler().handle(event, None), ['1234'])
+        mock_expire_stale_jobs.assert_called_once_with(600)
+
+        mock_expire_stale_jobs.reset_mock()
+        self.assertEqual(ExpireJobsHandler().handle({}, None), ['1234'])
+        mock_expire_stale_jobs.assert_called_once_with(TxManager.STALE_JOB_SECONDS)
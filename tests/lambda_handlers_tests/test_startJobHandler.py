@@ -23,3 +23,26 @@ class TestStartJobHandler(TestCase):
         }
         handler = StartJobHandler()
         self.assertIsNone(handler.handle(event, None))
+
+    @mock.patch('libraries.manager.scheduler.JobScheduler.setup_resources')
+    @mock.patch('libraries.manager.scheduler.JobScheduler.dispatch')
+    @mock.patch('libraries.manager.manager.TxManager.setup_resources')
+    def test_handle_dispatch(self, mock_setup_resources, mock_dispatch, mock_scheduler_setup_resources):
+        context = mock.MagicMock()
+        context.function_name = 'test-tx_start_job'
+        handler = StartJobHandler()
+        self.assertIsNone(handler.handle({'dispatch': {'prefix': 'test-'}}, context))
+        mock_dispatch.assert_called_once_with()
+
+    @mock.patch('libraries.manager.scheduler.JobScheduler.setup_resources')
+    @mock.patch('libraries.manager.manager.TxManager.setup_resources')
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    def test_scheduler_hands_over(self, mock_invoke, mock_setup_resources, mock_scheduler_setup_resources):
+        context = mock.MagicMock()
+        context.function_name = 'test-tx_start_job'
+        handler = StartJobHandler()
+        scheduler = handler.get_dispatching_scheduler(handler.get_tx_manager('test-'), context)
+        self.assertEqual(scheduler.queue_table_name, 'test-tx-job-queue')
+        scheduler.on_waiting()
+        mock_invoke.assert_called_once_with('test-tx_start_job', {'dispatch': {'prefix': 'test-'}},
+                                            invocation_type='Event')
@@ -0,0 +1,60 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import mock
+from unittest import TestCase
+from libraries.lambda_handlers.tx_manager_handler import TxManagerHandler
+
+
+class MockTxManagerHandler(TxManagerHandler):
+
+    def _handle(self, event, context):
+        pass
+
+
+@mock.patch('libraries.manager.scheduler.JobScheduler.setup_resources')
+@mock.patch('libraries.manager.manager.TxManager.setup_resources')
+class TestTxManagerHandler(TestCase):
+
+    def setUp(self):
+        self.handler = MockTxManagerHandler()
+
+    def test_get_prefix(self, mock_setup_resources, mock_scheduler_setup_resources):
+        self.assertEqual(self.handler.get_prefix('test-tx-job'), 'test-')
+        self.assertEqual(self.handler.get_prefix('tx-job'), '')
+        self.assertEqual(self.handler.get_prefix('jobs'), '')
+
+    def test_get_tx_manager(self, mock_setup_resources, mock_scheduler_setup_resources):
+        with mock.patch.dict('os.environ', {}, clear=True):
+            tx_manager = self.handler.get_tx_manager('test-', api_url='https://api.example.com')
+        self.assertEqual(tx_manager.job_table_name, 'test-tx-job')
+        self.assertEqual(tx_manager.module_table_name, 'test-tx-module')
+        self.assertEqual(tx_manager.api_url, 'https://api.example.com')
+        self.assertFalse(tx_manager.async_dispatch)
+        self.assertFalse(tx_manager.async_callbacks)
+        self.assertIsNone(tx_manager.stats_table_name)
+        self.assertIsNone(tx_manager.failed_callbacks_table_name)
+
+    def test_get_tx_manager_from_environment(self, mock_setup_resources, mock_scheduler_setup_resources):
+        environment = {
+            'ASYNC_DISPATCH': 'true',
+            'CACHE_CONVERSIONS': 'True',
+            'ASYNC_CALLBACKS': 'true',
+            'JOB_STATS': 'true',
+            'KEEP_FAILED_CALLBACKS': 'true',
+            'CACHE_GOGS_USERS': 'false'
+        }
+        with mock.patch.dict('os.environ', environment, clear=True):
+            tx_manager = self.handler.get_tx_manager('test-', job_table_name='other-jobs')
+        self.assertEqual(tx_manager.job_table_name, 'other-jobs')
+        self.assertTrue(tx_manager.async_dispatch)
+        self.assertTrue(tx_manager.cache_conversions)
+        self.assertTrue(tx_manager.async_callbacks)
+        self.assertEqual(tx_manager.stats_table_name, 'test-tx-job-stats')
+        self.assertEqual(tx_manager.failed_callbacks_table_name, 'test-tx-failed-callbacks')
+        self.assertIsNone(tx_manager.gogs_user_cache_dir)
+
+    def test_get_scheduler(self, mock_setup_resources, mock_scheduler_setup_resources):
+        scheduler = self.handler.get_scheduler(self.handler.get_tx_manager('test-'), stale_seconds=600)
+        self.assertEqual(scheduler.queue_table_name, 'test-tx-job-queue')
+        self.assertEqual(scheduler.stale_seconds, 600)
+        with mock.patch.dict('os.environ', {'SCHEDULE_JOBS': 'true'}):
+            self.assertTrue(self.handler.schedules_jobs())
@@ -0,0 +1,147 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import json
+import mock
+import requests
+from unittest import TestCase
+from moto import mock_dynamodb2
+from libraries.manager.callback_dispatcher import CallbackDispatcher
+
+
+@mock_dynamodb2
+@mock.patch('libraries.manager.callback_dispatcher.time.sleep')
+@mock.patch('requests.Session.post')
+class CallbackDispatcherTests(TestCase):
+    FAILED_CALLBACKS_TABLE_NAME = 'test-failed-callbacks'
+    CALLBACK_URL = 'https://callback.example.com/'
+
+    def setUp(self):
+        self.dispatcher = CallbackDispatcher(CallbackDispatcherTests.FAILED_CALLBACKS_TABLE_NAME,
+                                             lambda_handler=mock.MagicMock())
+        self.init_table()
+        self.payload = {'job_id': 'job1', 'status': 'success'}
+
+    def init_table(self):
+        try:
+            self.dispatcher.failed_db_handler.table.delete()
+        except:
+            pass
+        self.dispatcher.failed_db_handler.resource.create_table(
+            TableName=CallbackDispatcherTests.FAILED_CALLBACKS_TABLE_NAME,
+            KeySchema=[
+                {
+                    'AttributeName': 'callback_id',
+                    'KeyType': 'HASH'
+                },
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'callback_id',
+                    'AttributeType': 'S'
+                },
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            },
+        )
+
+    def get_failures(self):
+        return self.dispatcher.failed_db_handler.query_items()
+
+    def test_deliver(self, mock_post, mock_sleep):
+        self.dispatcher.dispatch(CallbackDispatcherTests.CALLBACK_URL, self.payload)
+        mock_post.assert_called_once_with(CallbackDispatcherTests.CALLBACK_URL, json=self.payload,
+                                          headers={'content-type': 'application/json'},
+                                          timeout=CallbackDispatcher.TIMEOUT)
+        self.assertFalse(mock_sleep.called)
+        self.assertEqual(self.get_failures(), [])
+
+    def test_not_a_url(self, mock_post, mock_sleep):
+        self.dispatcher.dispatch('none', self.payload)
+        self.assertFalse(mock_post.called)
+
+    def test_retries_with_backoff(self, mock_post, mock_sleep):
+        mock_post.side_effect = [requests.ConnectionError('refused'), requests.Timeout('slow'), mock.MagicMock()]
+        self.assertTrue(self.dispatcher.deliver(CallbackDispatcherTests.CALLBACK_URL, self.payload))
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual([args[0][0] for args in mock_sleep.call_args_list], [1, 2])
+        self.assertEqual(self.get_failures(), [])
+
+    def test_saves_failure(self, mock_post, mock_sleep):
+        mock_post.return_value.raise_for_status.side_effect = requests.HTTPError(
+            '500 Server Error', response=mock.MagicMock(status_code=500))
+        self.assertFalse(self.dispatcher.deliver(CallbackDispatcherTests.CALLBACK_URL, self.payload))
+        self.assertEqual(mock_post.call_count, CallbackDispatcher.MAX_ATTEMPTS)
+        failures = self.get_failures()
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0]['url'], CallbackDispatcherTests.CALLBACK_URL)
+        self.assertEqual(json.loads(failures[0]['payload']), self.payload)
+        self.assertEqual(failures[0]['attempts'], CallbackDispatcher.MAX_ATTEMPTS)
+        self.assertEqual(failures[0]['error'], '500 Server Error')
+
+    def test_rejected(self, mock_post, mock_sleep):
+        mock_post.return_value.raise_for_status.side_effect = requests.HTTPError(
+            '404 Client Error', response=mock.MagicMock(status_code=404))
+        self.assertFalse(self.dispatcher.deliver(CallbackDispatcherTests.CALLBACK_URL, self.payload))
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+        self.assertEqual(self.get_failures(), [])
+
+    def test_rate_limited(self, mock_post, mock_sleep):
+        mock_post.return_value.raise_for_status.side_effect = requests.HTTPError(
+            '429 Client Error', response=mock.MagicMock(status_code=429))
+        self.assertFalse(self.dispatcher.deliver(CallbackDispatcherTests.CALLBACK_URL, self.payload))
+        self.assertEqual(mock_post.call_count, CallbackDispatcher.MAX_ATTEMPTS)
+        self.assertEqual(len(self.get_failures()), 1)
+
+    def test_redeliver_rejected(self, mock_post, mock_sleep):
+        mock_post.side_effect = requests.ConnectionError('refused')
+        self.dispatcher.deliver(CallbackDispatcherTests.CALLBACK_URL, self.payload)
+
+        mock_post.side_effect = None
+        mock_post.return_value.raise_for_status.side_effect = requests.HTTPError(
+            '401 Client Error', response=mock.MagicMock(status_code=401))
+        self.assertEqual(self.dispatcher.redeliver(), (0, 1))
+        self.assertEqual(self.get_failures(), [])
+
+    def test_redeliver(self, mock_post, mock_sleep):
+        mock_post.side_effect = requests.ConnectionError('refused')
+        self.dispatcher.deliver(CallbackDispatcherTests.CALLBACK_URL, self.payload)
+        self.dispatcher.deliver(CallbackDispatcherTests.CALLBACK_URL, {'job_id': 'job2'})
+
+        mock_post.side_effect = lambda url, json, **kwargs: self.fail_job2(json)
+        self.assertEqual(self.dispatcher.redeliver(), (1, 1))
+        failures = self.get_failures()
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(json.loads(failures[0]['payload']), {'job_id': 'job2'})
+        self.assertEqual(failures[0]['attempts'], CallbackDispatcher.MAX_ATTEMPTS * 2)
+
+    def fail_job2(self, payload):
+        if payload['job_id'] == 'job2':
+            raise requests.ConnectionError('refused')
+        return mock.MagicMock()
+
+    def test_async_delivery(self, mock_post, mock_sleep):
+        self.dispatcher.async_delivery = True
+        self.dispatcher.prefix = 'test-'
+        self.dispatcher.dispatch(CallbackDispatcherTests.CALLBACK_URL, self.payload)
+        self.assertFalse(mock_post.called)
+        self.dispatcher.lambda_handler.invoke.assert_called_once_with('test-tx_deliver_callback', {
+            'data': {
+                'url': CallbackDispatcherTests.CALLBACK_URL,
+                'payload': self.payload
+            },
+            'vars': {
+                'failed_callbacks_table_name': CallbackDispatcherTests.FAILED_CALLBACKS_TABLE_NAME
+            }
+        }, invocation_type='Event')
+
+    def test_async_delivery_falls_back(self, mock_post, mock_sleep):
+        self.dispatcher.async_delivery = True
+        self.dispatcher.lambda_handler.invoke.side_effect = Exception('Rate exceeded')
+        self.dispatcher.dispatch(CallbackDispatcherTests.CALLBACK_URL, self.payload)
+        self.assertTrue(mock_post.called)
+
+    def test_shares_session(self, mock_post, mock_sleep):
+        self.assertIs(CallbackDispatcher.get_session(), CallbackDispatcher(lambda_handler=mock.MagicMock())
+                      .get_session())
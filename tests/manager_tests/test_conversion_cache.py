@@ -0,0 +1,99 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import mock
+from unittest import TestCase
+from datetime import datetime
+from datetime import timedelta
+from moto import mock_s3
+from libraries.aws_tools.s3_handler import S3Handler
+from libraries.manager.conversion_cache import ConversionCache
+from libraries.models.module import TxModule
+
+
+@mock_s3
+class ConversionCacheTests(TestCase):
+    MOCK_CDN_BUCKET = 'test-cdn'
+    MOCK_PRECONVERT_BUCKET = 'test-preconvert'
+
+    def setUp(self):
+        self.preconvert_handler = S3Handler(ConversionCacheTests.MOCK_PRECONVERT_BUCKET)
+        self.preconvert_handler.create_bucket()
+        self.cache = ConversionCache(ConversionCacheTests.MOCK_CDN_BUCKET)
+        self.cache.cdn_handler.create_bucket()
+        self.cache.cdn_handler.bucket.objects.all().delete()
+        self.module = TxModule({'name': 'md2html', 'version': '1'})
+        self.result = {'success': True, 'info': ['Converted!'], 'warnings': ['Missing something'], 'errors': []}
+
+    def add_source(self, key, contents, content_hash=None):
+        if content_hash:
+            self.preconvert_handler.bucket.put_object(Key=key, Body=contents,
+                                                      Metadata={ConversionCache.CONTENT_HASH_METADATA: content_hash})
+        else:
+            self.preconvert_handler.put_contents(key, contents)
+        return 'https://s3-us-west-2.amazonaws.com/{0}/{1}'.format(ConversionCacheTests.MOCK_PRECONVERT_BUCKET, key)
+
+    def test_parse_s3_url(self):
+        self.assertEqual(ConversionCache.parse_s3_url('https://s3-us-west-2.amazonaws.com/bucket/preconvert/a.zip'),
+                         ('bucket', 'preconvert/a.zip'))
+        self.assertEqual(ConversionCache.parse_s3_url('https://bucket.s3.amazonaws.com/preconvert/a.zip'),
+                         ('bucket', 'preconvert/a.zip'))
+        self.assertEqual(ConversionCache.parse_s3_url('https://git.door43.org/a.zip'), (None, None))
+        self.assertEqual(ConversionCache.parse_s3_url('test_source'), (None, None))
+
+    def test_get_key(self):
+        key = self.cache.get_key(self.add_source('preconvert/a.zip', 'same'), self.module)
+        self.assertEqual(self.cache.get_key(self.add_source('preconvert/b.zip', 'same'), self.module), key)
+        self.assertNotEqual(self.cache.get_key(self.add_source('preconvert/c.zip', 'other'), self.module), key)
+        self.module.version = '2'
+        self.assertNotEqual(self.cache.get_key(self.add_source('preconvert/b.zip', 'same'), self.module), key)
+        self.assertIsNone(self.cache.get_key('https://git.door43.org/a.zip', self.module))
+
+    def test_get_key_by_content_hash(self):
+        # zips of the same files made at different times, so their ETags differ
+        key = self.cache.get_key(self.add_source('preconvert/a.zip', 'zipped', 'abc123'), self.module)
+        self.assertEqual(self.cache.get_key(self.add_source('preconvert/b.zip', 'rezipped', 'abc123'), self.module),
+                         key)
+        self.assertNotEqual(self.cache.get_key(self.add_source('preconvert/c.zip', 'zipped', 'def456'), self.module),
+                            key)
+
+    def test_get_key_with_query(self):
+        source = self.add_source('preconvert/a.zip', 'same')
+        key = self.cache.get_key(source, self.module)
+        self.assertNotEqual(self.cache.get_key(source + '?convert_only=01-GEN.usfm', self.module), key)
+
+    def test_get_key_converter_changed(self):
+        source = self.add_source('preconvert/a.zip', 'same')
+        key = self.cache.get_key(source, self.module)
+        with mock.patch.object(ConversionCache, 'converter_version', 'changed'):
+            self.assertNotEqual(self.cache.get_key(source, self.module), key)
+
+    def test_get_converter_version(self):
+        ConversionCache.converter_version = None
+        version = ConversionCache.get_converter_version()
+        self.assertEqual(len(version), 40)
+        self.assertEqual(ConversionCache.get_converter_version(), version)
+
+    def test_store_and_fetch(self):
+        key = self.cache.get_key(self.add_source('preconvert/a.zip', 'source'), self.module)
+        self.assertIsNone(self.cache.fetch(key, 'tx/job/1.zip'))
+
+        self.cache.cdn_handler.put_contents('tx/job/1.zip', 'converted')
+        self.cache.store(key, 'tx/job/1.zip', self.result)
+
+        self.assertEqual(self.cache.fetch(key, 'tx/job/2.zip'), self.result)
+        self.assertEqual(self.cache.cdn_handler.get_file_contents('tx/job/2.zip'), b'converted')
+
+    def test_evict_expired(self):
+        self.cache.cdn_handler.put_contents('tx/cache/old.zip', 'old')
+        self.cache.cdn_handler.put_contents('tx/cache/new.zip', 'new')
+        self.cache.cdn_handler.put_contents('tx/job/1.zip', 'not cached')
+        with mock.patch('libraries.manager.conversion_cache.datetime') as mock_datetime:
+            mock_datetime.utcnow.return_value = datetime.utcnow() + timedelta(days=ConversionCache.TTL_DAYS, seconds=1)
+            self.assertEqual(self.cache.evict(), 2)
+        self.assertTrue(self.cache.cdn_handler.key_exists('tx/job/1.zip'))
+        self.assertEqual(self.cache.evict(), 0)
+
+    def test_evict_by_size(self):
+        for i in range(4):
+            self.cache.cdn_handler.put_contents('tx/cache/{0}.zip'.format(i), '12345')
+        self.assertEqual(self.cache.evict(max_bytes=10), 2)
+        self.assertEqual(len(list(self.cache.cdn_handler.get_objects(prefix='tx/cache/'))), 2)
@@ -0,0 +1,139 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import json
+import threading
+import unittest
+import mock
+from libraries.manager.converter_executor import LambdaConverterExecutor, LocalConverterExecutor
+
+
+class MockConverter(object):
+    """
+    Stands in for a converter in the worker processes, so it has to be at module level
+    """
+
+    def __init__(self, source=None, **kwargs):
+        self.source = source
+
+    def run(self):
+        if 'broken' in self.source:
+            raise Exception('Failed to download {0}'.format(self.source))
+        return {'success': True, 'info': ['Converted {0}'.format(self.source)], 'warnings': [], 'errors': []}
+
+
+class PayloadMock(object):
+
+    def __init__(self, response):
+        self.response = response
+
+    def read(self):
+        return self.response
+
+
+class LambdaConverterExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lambda_handler = mock.MagicMock()
+        self.executor = LambdaConverterExecutor(self.lambda_handler, 'dev-')
+
+    def test_invoke(self):
+        result = {'success': True, 'info': [], 'warnings': [], 'errors': []}
+        self.lambda_handler.invoke.return_value = {'Payload': PayloadMock(json.dumps(result))}
+        self.assertEqual(self.executor.invoke('md2html', {'data': {}}), result)
+        self.lambda_handler.invoke.assert_called_once_with('dev-tx_convert_md2html', {'data': {}})
+
+    def test_invoke_error(self):
+        self.lambda_handler.invoke.return_value = {'errorMessage': 'Bad Request: oops', 'StatusCode': 200}
+        self.assertEqual(self.executor.invoke('md2html', {'data': {}}), {'errorMessage': 'Bad Request: oops'})
+        self.lambda_handler.invoke.return_value = {}
+        self.assertIsNone(self.executor.invoke('md2html', {'data': {}}))
+
+    def test_dispatch(self):
+        on_result = mock.MagicMock()
+        self.executor.dispatch('usfm2html', {'data': {}}, on_result)
+        self.lambda_handler.invoke.assert_called_once_with('dev-tx_convert_usfm2html', {'data': {}},
+                                                           invocation_type='Event')
+        self.assertFalse(on_result.called)
+
+
+class LocalConverterExecutorTest(unittest.TestCase):
+
+    @staticmethod
+    def get_payload(source, **kwargs):
+        job = {'job_id': '1', 'source': source, 'resource_type': 'obs', 'cdn_bucket': 'test_cdn',
+               'cdn_file': 'tx/job/1.zip'}
+        data = {'job': job}
+        data.update(kwargs)
+        return {'data': data}
+
+    def test_default_modules(self):
+        executor = LocalConverterExecutor()
+        self.assertEqual(sorted(executor.converter_classes), ['md2html', 'usfm2html'])
+        self.assertEqual(executor.get_name('md2html'), 'local md2html')
+
+    def test_invoke(self):
+        executor = LocalConverterExecutor(workers=2, converter_classes={'module1': MockConverter})
+        try:
+            result = executor.invoke('module1', self.get_payload('https://test.com/1.zip'))
+            error = executor.invoke('module1', self.get_payload('https://test.com/broken.zip'))
+        finally:
+            executor.close()
+        self.assertEqual(result['info'], ['Converted https://test.com/1.zip'])
+        self.assertEqual(error, {'errorMessage': 'Bad Request: Failed to download https://test.com/broken.zip'})
+
+    def test_invoke_unknown_module(self):
+        executor = LocalConverterExecutor(converter_classes={'module1': MockConverter})
+        self.assertRaises(Exception, executor.invoke, 'module2', self.get_payload('https://test.com/1.zip'))
+
+    def test_dispatch(self):
+        executor = LocalConverterExecutor(workers=2, converter_classes={'module1': MockConverter})
+        results = []
+        for i in range(5):
+            executor.dispatch('module1', self.get_payload('https://test.com/{0}.zip'.format(i)), results.append)
+        executor.close()
+        self.assertEqual(sorted(result['info'][0] for result in results),
+                         ['Converted https://test.com/{0}.zip'.format(i) for i in range(5)])
+
+    def test_dispatch_on_result_fails(self):
+        executor = LocalConverterExecutor(workers=2, converter_classes={'module1': MockConverter})
+        results = []
+        main_thread = threading.current_thread()
+
+        def on_result(result):
+            # in the thread the jobs belong to, not the pool's result handler
+            self.assertIs(threading.current_thread(), main_thread)
+            results.append(result)
+            if len(results) == 1:
+                raise Exception('Could not save the job')
+
+        for i in range(3):
+            executor.dispatch('module1', self.get_payload('https://test.com/{0}.zip'.format(i)), on_result)
+        executor.close()
+        self.assertEqual(len(results), 3)
+        self.assertEqual(executor.pending, [])
+
+    @mock.patch('libraries.lambda_handlers.convert_handler.LambdaHandler')
+    @mock.patch('multiprocessing.Pool')
+    def test_dispatch_without_pool(self, mock_pool, mock_lambda_handler):
+        mock_pool.side_effect = OSError(38, 'Function not implemented')
+        executor = LocalConverterExecutor(workers=2, converter_classes={'module1': MockConverter})
+        completion = {'function_name': 'tx_complete_job', 'job_table_name': 'tx-job',
+                      'module_table_name': 'tx-module', 'prefix': ''}
+        results = []
+        executor.dispatch('module1', self.get_payload('https://test.com/1.zip', completion=completion),
+                          results.append)
+        self.assertEqual(results[0]['info'], ['Converted https://test.com/1.zip'])
+        # the result comes back here instead of going to tx_complete_job
+        self.assertFalse(mock_lambda_handler.called)
+        executor.close()
+
+    @mock.patch('multiprocessing.Pool')
+    def test_invoke_in_daemonic_worker(self, mock_pool):
+        mock_pool.side_effect = AssertionError('daemonic processes are not allowed to have children')
+        executor = LocalConverterExecutor(workers=2, converter_classes={'module1': MockConverter})
+        result = executor.invoke('module1', self.get_payload('https://test.com/1.zip'))
+        self.assertEqual(result['info'], ['Converted https://test.com/1.zip'])
+        executor.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+from __future__ import absolute_import, unicode_literals, print_function
+from unittest import TestCase
+from bs4 import BeautifulSoup
+from libraries.manager.dashboard_renderer import DashboardRenderer
+from scripts.benchmark_dashboard_renderer import SoupDashboardRenderer
+
+
+class DashboardRendererTests(TestCase):
+
+    def setUp(self):
+        self.modules = [
+            {
+                'name': 'md2html',
+                'type': 'conversion',
+                'version': '1',
+                'input_format': ['md'],
+                'output_format': ['html'],
+                'resource_types': ['obs'],
+                'options': [],
+                'private_links': [],
+                'public_links': ['md2html/convert']
+            },
+            {
+                'name': 'usfm2html',
+                'type': 'conversion',
+                'version': '2',
+                'input_format': ['usfm'],
+                'output_format': ['html'],
+                'resource_types': ['ulb', 'udb'],
+                'options': {'pageSize': 'A4'},
+                'private_links': ['usfm2html/private'],
+                'public_links': []
+            }
+        ]
+        self.module_counts = {
+            'md2html': {'success': 3, 'warnings': 1, 'failures': 1, 'total': 5},
+            'usfm2html': {'success': 0, 'warnings': 0, 'failures': 1, 'total': 1}
+        }
+        self.totals = {'success': 3, 'warnings': 1, 'failures': 2, 'total': 6}
+        self.job_failures = [
+            self.make_failure('job1', ['Bad chapter 3']),
+            {'job_id': 'incomplete'},
+            self.make_failure('job2', ['Missing front matter'])
+        ]
+
+    def make_failure(self, job_id, errors):
+        return {
+            'job_id': job_id,
+            'identifier': 'owner/repo/{0}'.format(job_id),
+            'created_at': '2017-04-12T17:03:06Z',
+            'cdn_bucket': 'cdn.door43.org',
+            'source': 'https://s3-us-west-2.amazonaws.com/preconvert/{0}.zip'.format(job_id),
+            'output': 'https://cdn.door43.org/tx/job/{0}.zip'.format(job_id),
+            'errors': errors
+        }
+
+    def render(self, renderer, max_failures=10):
+        return BeautifulSoup(renderer.render(self.modules, self.module_counts, self.totals, 8, self.job_failures,
+                                             max_failures, 'https://git.door43.org'), 'html.parser')
+
+    def get_rows(self, soup):
+        return [(tr.get('id'), tr.get('class'), tr.get_text(' ', strip=True)) for tr in soup.find_all('tr')]
+
+    def test_same_as_soup_renderer(self):
+        soup = self.render(DashboardRenderer())
+        self.assertEqual(self.get_rows(soup), self.get_rows(self.render(SoupDashboardRenderer())))
+        self.assertEqual(soup.find('tr', id='usfm2html-options').find_all('td')[1].text, '{"pageSize": "A4"}')
+        self.assertIsNone(soup.find('tr', id='md2html-options'))
+        self.assertEqual(soup.find('tr', id='totals-job-unregistered').find_all('td')[1].text, '2')
+        self.assertEqual(soup.find('tr', id='failure-2').find('a')['href'], 'https://git.door43.org/owner/repo')
+        self.assertIsNone(soup.find('tr', id='failure-1'))
+
+    def test_max_failures(self):
+        soup = self.render(DashboardRenderer(), max_failures=1)
+        self.assertEqual(len(soup.find('table', id='failed').find_all('tr', class_='module-job-id')), 1)
+
+    def test_escaping(self):
+        self.modules[0]['type'] = '<script>alert("x")</script>'
+        self.job_failures[0]['errors'] = ['Missing <title> & "front matter"']
+        self.job_failures[0]['output'] = 'https://cdn.door43.org/tx/job/job1.zip?a=1&b="2"'
+        html = DashboardRenderer().render(self.modules, self.module_counts, self.totals, 8, self.job_failures, 10,
+                                          'https://git.door43.org')
+        self.assertNotIn(b'<script>', html)
+        soup = BeautifulSoup(html, 'html.parser')
+        self.assertEqual(soup.find('tr', id='md2html-type').find_all('td')[1].text, '<script>alert("x")</script>')
+        failure = soup.find('tr', id='failure-0')
+        self.assertEqual(failure.find_all('td')[1].text, 'Missing <title> & "front matter"')
+        self.assertEqual(failure.find_all('a')[2]['href'], 'https://cdn.door43.org/tx/job/job1.zip?a=1&b="2"')
+
+    def test_timings(self):
+        timings = {
+            'md2html': {
+                'zip': {'p50': 5, 'p95': 9},
+                'convert': {'p50': 1200, 'p95': 3400},
+                'other': {'p50': 1, 'p95': 2}
+            }
+        }
+        html = DashboardRenderer().render(self.modules, self.module_counts, self.totals, 8, self.job_failures, 10,
+                                          'https://git.door43.org', timings)
+        soup = BeautifulSoup(html, 'html.parser')
+        rows = soup.find_all('tr', class_='module-timing')
+        self.assertEqual([row['id'] for row in rows], ['md2html-timing-convert', 'md2html-timing-zip',
+                                                       'md2html-timing-other'])
+        self.assertEqual(rows[0].get_text(' ', strip=True), 'Convert p50 / p95: 1200 / 3400 ms')
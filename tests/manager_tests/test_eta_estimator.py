@@ -0,0 +1,122 @@
+from __future__ import absolute_import, unicode_literals, print_function
+from unittest import TestCase
+from mock import patch
+from moto import mock_dynamodb2
+from libraries.manager.eta_estimator import EtaEstimator
+from libraries.manager.job_stats import JobStats
+
+
+@mock_dynamodb2
+class EtaEstimatorTests(TestCase):
+    STATS_TABLE_NAME = 'test-job-stats'
+    SOURCE = 'https://s3-us-west-2.amazonaws.com/test-tx-webhook-client/preconvert/123.zip'
+
+    def setUp(self):
+        self.estimator = EtaEstimator(EtaEstimatorTests.STATS_TABLE_NAME)
+        self.init_table()
+
+    def init_table(self):
+        try:
+            self.estimator.stats_db_handler.table.delete()
+        except:
+            pass
+        self.estimator.stats_db_handler.resource.create_table(
+            TableName=EtaEstimatorTests.STATS_TABLE_NAME,
+            KeySchema=[
+                {
+                    'AttributeName': 'name',
+                    'KeyType': 'HASH'
+                },
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'name',
+                    'AttributeType': 'S'
+                },
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            },
+        )
+
+    def make_job(self, job_id, module, seconds, status='success'):
+        return {
+            'job_id': job_id,
+            'convert_module': module,
+            'status': status,
+            'source': EtaEstimatorTests.SOURCE,
+            'created_at': '2017-04-12T17:03:06Z',
+            'ended_at': '2017-04-12T17:{0:02d}:{1:02d}Z'.format(3 + (6 + seconds) // 60, (6 + seconds) % 60),
+            'errors': []
+        }
+
+    def test_get_duration(self):
+        self.assertEqual(EtaEstimator.get_duration(self.make_job('job1', 'md2html', 75)), 75)
+        self.assertIsNone(EtaEstimator.get_duration({'created_at': '2017-04-12T17:03:06Z'}))
+        self.assertIsNone(EtaEstimator.get_duration({'created_at': '2017-04-12T17:03:06Z', 'ended_at': 'never'}))
+
+    def test_predict_default(self):
+        self.assertEqual(EtaEstimator.predict({}), EtaEstimator.DEFAULT_SECONDS)
+        model = {}
+        for _ in range(EtaEstimator.MIN_SAMPLES - 1):
+            model = EtaEstimator.add_sample(model, 100)
+        self.assertEqual(EtaEstimator.predict(model), EtaEstimator.DEFAULT_SECONDS)
+        model = EtaEstimator.add_sample(model, 100)
+        self.assertEqual(EtaEstimator.predict(model), 100)
+
+    def test_predict_by_size(self):
+        model = {}
+        for size in [1, 2, 3, 4]:
+            model = EtaEstimator.add_sample(model, 10 + size * 20, size)
+        self.assertEqual(EtaEstimator.predict(model, 10), 210)
+        self.assertEqual(EtaEstimator.predict(model, 0.1), 12)
+        # without the size, it's the mean, which leans towards the newer jobs
+        self.assertEqual(EtaEstimator.predict(model), 61)
+
+    def test_predict_is_clamped(self):
+        model = {}
+        for _ in range(EtaEstimator.MIN_SAMPLES):
+            model = EtaEstimator.add_sample(model, 1)
+        self.assertEqual(EtaEstimator.predict(model), EtaEstimator.MIN_SECONDS)
+        for _ in range(EtaEstimator.MIN_SAMPLES):
+            model = EtaEstimator.add_sample(model, 100000)
+        self.assertEqual(EtaEstimator.predict(model), EtaEstimator.MAX_SECONDS)
+
+    def test_predict_never_shrinks_with_size(self):
+        model = {}
+        for size in [1, 2, 3]:
+            model = EtaEstimator.add_sample(model, 100 - size * 20, size)
+        self.assertGreaterEqual(EtaEstimator.predict(model, 100), EtaEstimator.predict(model, 1))
+
+    @patch('libraries.manager.eta_estimator.EtaEstimator.get_source_size')
+    def test_record_and_estimate(self, mock_get_source_size):
+        mock_get_source_size.return_value = None
+        self.assertEqual(self.estimator.estimate('md2html', EtaEstimatorTests.SOURCE), EtaEstimator.DEFAULT_SECONDS)
+        for i, seconds in enumerate([30, 40, 50]):
+            self.estimator.record(self.make_job('job{0}'.format(i), 'md2html', seconds))
+        self.estimator.record(self.make_job('failed', 'md2html', 3000, status='failed'))
+        self.estimator.record(self.make_job('other', 'usfm2html', 3000))
+
+        self.assertEqual(self.estimator.estimate('md2html', EtaEstimatorTests.SOURCE), 40)
+        self.assertEqual(self.estimator.estimate('usfm2html', EtaEstimatorTests.SOURCE),
+                         EtaEstimator.DEFAULT_SECONDS)
+        model, version = self.estimator.get_model('md2html')
+        self.assertEqual(model['jobs'], 3)
+        self.assertEqual(version, 3)
+
+    @patch('libraries.manager.eta_estimator.EtaEstimator.get_source_size')
+    def test_estimate_by_size(self, mock_get_source_size):
+        for size in [1, 2, 3]:
+            mock_get_source_size.return_value = size
+            self.estimator.record(self.make_job('job{0}'.format(size), 'md2html', size * 30))
+        mock_get_source_size.return_value = 4
+        self.assertEqual(self.estimator.estimate('md2html', EtaEstimatorTests.SOURCE), 120)
+
+    @patch('libraries.manager.eta_estimator.EtaEstimator.get_source_size')
+    def test_rebuilding_stats_keeps_models(self, mock_get_source_size):
+        mock_get_source_size.return_value = None
+        for i in range(EtaEstimator.MIN_SAMPLES):
+            self.estimator.record(self.make_job('job{0}'.format(i), 'md2html', 60))
+        JobStats(EtaEstimatorTests.STATS_TABLE_NAME).rebuild(iter([]))
+        self.assertEqual(self.estimator.estimate('md2html', EtaEstimatorTests.SOURCE), 60)
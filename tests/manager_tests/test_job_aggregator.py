@@ -0,0 +1,79 @@
+from __future__ import absolute_import, unicode_literals, print_function
+from unittest import TestCase
+from libraries.manager.job_aggregator import JobAggregator
+
+
+class JobAggregatorTests(TestCase):
+
+    def make_job(self, job_id, module, errors=None, warnings=None, created_at='2017-04-12T17:03:06Z'):
+        return {
+            'job_id': job_id,
+            'convert_module': module,
+            'created_at': created_at,
+            'errors': errors or [],
+            'warnings': warnings or []
+        }
+
+    def test_counts(self):
+        jobs = [
+            self.make_job('job1', 'md2html'),
+            self.make_job('job2', 'md2html', warnings=['warning']),
+            self.make_job('job3', 'md2html', errors=['error'], warnings=['warning']),
+            self.make_job('job4', 'usfm2html'),
+            self.make_job('job5', 'unregistered', errors=['error']),
+        ]
+        aggregator = JobAggregator(['md2html', 'usfm2html', 'other'], 10).add_all(iter(jobs))
+        self.assertEqual(aggregator.module_counts['md2html'], {'success': 1, 'warnings': 1, 'failures': 1, 'total': 3})
+        self.assertEqual(aggregator.module_counts['usfm2html'],
+                         {'success': 1, 'warnings': 0, 'failures': 0, 'total': 1})
+        self.assertEqual(aggregator.module_counts['other'], {'success': 0, 'warnings': 0, 'failures': 0, 'total': 0})
+        self.assertEqual(aggregator.totals, {'success': 2, 'warnings': 1, 'failures': 2, 'total': 5})
+        self.assertEqual([job['job_id'] for job in aggregator.get_failures()], ['job3', 'job5'])
+
+    def test_keeps_newest_failures(self):
+        jobs = (self.make_job('job{0}'.format(i), 'md2html', errors=['error'],
+                              created_at='2017-04-{0:02d}T00:00:00Z'.format(i % 28 + 1)) for i in range(100))
+        aggregator = JobAggregator(['md2html'], 3).add_all(jobs)
+        self.assertEqual(len(aggregator.failures), 3)
+        self.assertEqual([job['job_id'] for job in aggregator.get_failures()], ['job27', 'job55', 'job83'])
+        self.assertEqual(aggregator.module_counts['md2html']['failures'], 100)
+
+    def test_no_failures_kept(self):
+        aggregator = JobAggregator(['md2html'], 0).add_all([self.make_job('job1', 'md2html', errors=['error'])])
+        self.assertEqual(aggregator.get_failures(), [])
+        self.assertEqual(aggregator.totals['failures'], 1)
+
+    def test_timing_percentiles(self):
+        jobs = []
+        for i in range(1, 101):
+            job = self.make_job('job{0}'.format(i), 'md2html')
+            job['timings'] = {'convert': i * 10, 'zip': 5}
+            jobs.append(job)
+        jobs.append(self.make_job('job101', 'usfm2html'))
+        timings = JobAggregator(['md2html', 'usfm2html'], 10).add_all(jobs).get_timing_percentiles()
+        self.assertEqual(timings, {
+            'md2html': {'convert': {'p50': 500, 'p95': 950}, 'zip': {'p50': 5, 'p95': 5}},
+            'usfm2html': {}
+        })
+
+    def test_timing_samples_are_bounded(self):
+        jobs = []
+        for i in range(JobAggregator.MAX_TIMING_SAMPLES * 2):
+            job = self.make_job('job{0}'.format(i), 'md2html')
+            job['timings'] = {'convert': 100}
+            jobs.append(job)
+        aggregator = JobAggregator(['md2html'], 10).add_all(jobs)
+        seen, values = aggregator.timing_samples['md2html']['convert']
+        self.assertEqual(seen, JobAggregator.MAX_TIMING_SAMPLES * 2)
+        self.assertEqual(len(values), JobAggregator.MAX_TIMING_SAMPLES)
+
+    def test_all_modules_and_recent_timings(self):
+        jobs = []
+        for i in range(1, 5):
+            job = self.make_job('job{0}'.format(i), 'md2html', created_at='2017-04-1{0}T17:03:06Z'.format(i))
+            job['timings'] = {'convert': i}
+            jobs.append(job)
+        jobs.append(self.make_job('job5', 'usfm2html'))
+        aggregator = JobAggregator(None, 10, max_recent_timings=2).add_all(jobs)
+        self.assertEqual(sorted(aggregator.module_counts), ['md2html', 'usfm2html'])
+        self.assertEqual(aggregator.get_recent_timings(), {'md2html': [{'convert': 4}, {'convert': 3}]})
@@ -0,0 +1,137 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import mock
+from unittest import TestCase
+from moto import mock_dynamodb2
+from libraries.manager.job_stats import JobStats
+from libraries.manager.job_aggregator import JobAggregator
+
+
+@mock_dynamodb2
+class JobStatsTests(TestCase):
+    STATS_TABLE_NAME = 'test-job-stats'
+
+    def setUp(self):
+        self.job_stats = JobStats(JobStatsTests.STATS_TABLE_NAME)
+        self.init_table()
+
+    def init_table(self):
+        try:
+            self.job_stats.stats_db_handler.table.delete()
+        except:
+            pass
+        self.job_stats.stats_db_handler.resource.create_table(
+            TableName=JobStatsTests.STATS_TABLE_NAME,
+            KeySchema=[
+                {
+                    'AttributeName': 'name',
+                    'KeyType': 'HASH'
+                },
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'name',
+                    'AttributeType': 'S'
+                },
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            },
+        )
+
+    def make_job(self, job_id, module, status, created_at='2017-04-12T17:03:06Z'):
+        return {
+            'job_id': job_id,
+            'convert_module': module,
+            'status': status,
+            'identifier': 'owner/repo/{0}'.format(job_id),
+            'created_at': created_at,
+            'errors': ['error'] if status == 'failed' else [],
+            'log': ['not kept']
+        }
+
+    def test_record(self):
+        self.job_stats.record(self.make_job('job1', 'md2html', 'success'))
+        self.job_stats.record(self.make_job('job2', 'md2html', 'warnings'))
+        self.job_stats.record(self.make_job('job3', 'md2html', 'failed'))
+        self.job_stats.record(self.make_job('job4', 'usfm2html', 'success'))
+        self.job_stats.record(self.make_job('job5', 'usfm2html', 'started'))
+
+        counts = self.job_stats.get_module_counts(['md2html', 'usfm2html', 'other'])
+        self.assertEqual(counts['md2html'], {'success': 1, 'warnings': 1, 'failures': 1, 'total': 3})
+        self.assertEqual(counts['usfm2html'], {'success': 1, 'warnings': 0, 'failures': 0, 'total': 1})
+        self.assertEqual(counts['other'], {'success': 0, 'warnings': 0, 'failures': 0, 'total': 0})
+
+        failures = self.job_stats.get_recent_failures()
+        self.assertEqual([failure['job_id'] for failure in failures], ['job3'])
+        self.assertNotIn('log', failures[0])
+
+    def test_recent_failures_are_bounded(self):
+        for i in range(JobStats.MAX_RECENT_FAILURES + 5):
+            self.job_stats.record(self.make_job('job{0}'.format(i), 'md2html', 'failed'))
+        failures = self.job_stats.get_recent_failures()
+        self.assertEqual(len(failures), JobStats.MAX_RECENT_FAILURES)
+        self.assertEqual(failures[0]['job_id'], 'job{0}'.format(JobStats.MAX_RECENT_FAILURES + 4))
+        self.assertEqual(len(self.job_stats.get_recent_failures(2)), 2)
+
+    def test_rebuild(self):
+        self.job_stats.record(self.make_job('old', 'old_module', 'success'))
+        jobs = [
+            self.make_job('job1', 'md2html', 'success'),
+            self.make_job('job2', 'md2html', 'failed', '2017-04-12T17:03:06Z'),
+            self.make_job('job3', 'usfm2html', 'failed', '2017-05-12T17:03:06Z'),
+            self.make_job('job4', 'usfm2html', 'requested'),
+        ]
+        self.job_stats.rebuild(iter(jobs))
+
+        counts = self.job_stats.get_module_counts(['md2html', 'usfm2html', 'old_module'])
+        self.assertEqual(counts['md2html'], {'success': 1, 'warnings': 0, 'failures': 1, 'total': 2})
+        self.assertEqual(counts['usfm2html'], {'success': 0, 'warnings': 0, 'failures': 1, 'total': 1})
+        self.assertEqual(counts['old_module']['total'], 0)
+        self.assertEqual([failure['job_id'] for failure in self.job_stats.get_recent_failures()], ['job3', 'job2'])
+
+        # new failures go on top of the rebuilt ones
+        self.job_stats.record(self.make_job('job5', 'md2html', 'failed'))
+        self.assertEqual([failure['job_id'] for failure in self.job_stats.get_recent_failures()],
+                         ['job5', 'job3', 'job2'])
+
+    def test_rebuild_keeps_stats_until_replaced(self):
+        self.job_stats.record(self.make_job('job1', 'md2html', 'failed'))
+        with mock.patch.object(self.job_stats.stats_db_handler, 'batch_delete') as mock_batch_delete:
+            self.job_stats.rebuild(iter([self.make_job('job2', 'md2html', 'success')]))
+            # already replaced when the stale items would be deleted
+            self.assertEqual(self.job_stats.get_module_counts(['md2html'])['md2html']['total'], 1)
+            self.assertEqual(self.job_stats.get_recent_failures(), [])
+        mock_batch_delete.assert_called_once_with([])
+
+    def test_outcome_matches_dashboard(self):
+        # failed without any errors, like a converter that couldn't be reached
+        job = self.make_job('job1', 'md2html', 'failed')
+        job['errors'] = []
+        self.job_stats.record(job)
+        self.assertEqual(self.job_stats.get_module_counts(['md2html'])['md2html']['failures'], 1)
+        self.assertEqual(JobAggregator(['md2html'], 1).add_all([job]).module_counts['md2html']['failures'], 1)
+
+    def test_timings(self):
+        for i in range(1, JobStats.MAX_RECENT_TIMINGS + 11):
+            job = self.make_job('job{0}'.format(i), 'md2html', 'success')
+            job['timings'] = {'convert': i, 'zip': 5}
+            self.job_stats.record(job)
+        self.job_stats.record(self.make_job('job0', 'usfm2html', 'success'))
+
+        timings = self.job_stats.get_module_timings(['md2html', 'usfm2html'])
+        # only the newest jobs are kept
+        self.assertEqual(timings['md2html'], {'convert': {'p50': 60, 'p95': 105}, 'zip': {'p50': 5, 'p95': 5}})
+        self.assertEqual(timings['usfm2html'], {})
+        self.assertEqual(self.job_stats.get_module_counts(['md2html'])['md2html']['total'],
+                         JobStats.MAX_RECENT_TIMINGS + 10)
+
+    def test_rebuild_timings(self):
+        jobs = []
+        for i in range(1, 4):
+            job = self.make_job('job{0}'.format(i), 'md2html', 'success', '2017-04-1{0}T17:03:06Z'.format(i))
+            job['timings'] = {'convert': i * 100}
+            jobs.append(job)
+        self.job_stats.rebuild(iter(jobs))
+        self.assertEqual(self.job_stats.get_module_timings(['md2html'])['md2html'],
+                         {'convert': {'p50': 200, 'p95': 300}})
@@ -2,10 +2,16 @@ from __future__ import absolute_import, unicode_literals, print_function
 import json
 import unittest
 import mock
+from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
 from tests.manager_tests import mock_utils
+from tests.manager_tests.test_converter_executor import MockConverter
+from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
 from libraries.models.job import TxJob
 from libraries.manager.manager import TxManager
+from libraries.manager.module_registry import ModuleRegistry
+from libraries.manager.callback_dispatcher import CallbackDispatcher
+from libraries.manager.converter_executor import LocalConverterExecutor
 from libraries.models.module import TxModule
 from moto import mock_dynamodb2
 
@@ -40,11 +46,14 @@ class ManagerTest(unittest.TestCase):
             return_value=mock_utils.mock_gogs_handler(['token1', 'token2']))
         ManagerTest.patches = (
             mock.patch('libraries.manager.manager.GogsHandler', cls.mock_gogs),
+            # moto can't evaluate list_append() in update expressions
+            mock.patch.object(DynamoDBHandler, 'use_list_append', False),
         )
         for patch in ManagerTest.patches:
             patch.start()
 
     def setUp(self):
+        ModuleRegistry.clear()
         self.tx_manager = TxManager(**self.tx_manager_env_vars)
         ManagerTest.mock_gogs.reset_mock()
         ManagerTest.requested_urls = []
@@ -369,6 +378,21 @@ class ManagerTest(unittest.TestCase):
         bad_token['gogs_user_token'] = 'bad_token'
         self.assertRaises(Exception, tx_manager.setup_job, bad_token)
 
+    def test_setup_job_bad_priority(self):
+        """Call setup_job with a priority that isn't a scheduler lane."""
+        data = {
+            'gogs_user_token': 'token1',
+            'cdn_bucket': 'test_cdn_bucket',
+            'source': 'test_source',
+            'resource_type': 'obs',
+            'input_format': 'md',
+            'output_format': 'html',
+            'priority': 'urgent'
+        }
+        self.assertRaises(Exception, self.tx_manager.setup_job, data.copy())
+        data['priority'] = 'bulk'
+        self.assertEqual(self.tx_manager.setup_job(data)['job']['priority'], 'bulk')
+
     def test_setup_job_no_converter(self):
         """Call setup_job when there is no applicable converter."""
         tx_manager = TxManager(**self.tx_manager_env_vars)
@@ -384,7 +408,7 @@ class ManagerTest(unittest.TestCase):
 
     # noinspection PyUnusedLocal
     @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_start_job1(self, mock_request_post, mock_invoke):
         """
         Call start job in job 1 from mock data.
@@ -410,9 +434,21 @@ class ManagerTest(unittest.TestCase):
         self.assertEqual(len(job.errors), 1)
         self.assertTrue(len(job.warnings) == 1)
 
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    def test_start_job_claimed_meanwhile(self, mock_invoke):
+        """Leave job2 alone when another invocation started it after we read it."""
+        with mock.patch.object(self.tx_manager.job_db_handler, 'update_item_if', return_value=False) as mock_claim:
+            job_data = self.tx_manager.start_job('job2')
+
+        mock_claim.assert_called_once_with({'job_id': 'job2'}, {'status': 'started', 'started_at': mock.ANY},
+                                           {'status': 'requested'})
+        self.assertFalse(mock_invoke.called)
+        self.assertEqual(job_data['status'], 'requested')
+        self.assertIsNone(job_data['started_at'])
+
     # noinspection PyUnusedLocal
     @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_start_job2(self, mock_request_post, mock_invoke):
         """
         Call start_job in job 2 from mock data.
@@ -424,10 +460,10 @@ class ManagerTest(unittest.TestCase):
             'warnings': [],
             'errors': [],
             'success': True,
-            'message': 'All good'
+            'message': 'All good',
+            'timings': {'download': 120, 'convert': 1500}
         }
         mock_invoke.return_value = self.create_mock_payload(payload)
-        mock_request_post.return_value = None
 
         self.tx_manager.start_job('job3')
 
@@ -435,10 +471,16 @@ class ManagerTest(unittest.TestCase):
         job = TxJob(db_handler=self.tx_manager.job_db_handler).load({'job_id': 'job3'})
         self.assertEqual(job.job_id, 'job3')
         self.assertEqual(len(job.errors), 0)
+        self.assertEqual(job.timings, {'download': 120, 'convert': 1500})
+        # and the callback made
+        args, kwargs = mock_request_post.call_args
+        self.assertEqual(args[0], ManagerTest.MOCK_CALLBACK_URL)
+        self.assertEqual(kwargs['json']['status'], 'success')
+        self.assertEqual(kwargs['timeout'], CallbackDispatcher.TIMEOUT)
 
     # noinspection PyUnusedLocal
     @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_start_job3(self, mock_request_post, mock_invoke):
         """
         Call start_job on job 3 from mock data.
@@ -487,7 +529,7 @@ class ManagerTest(unittest.TestCase):
 
     # noinspection PyUnusedLocal
     @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_start_job_bad_error(self, mock_requests_post, mock_invoke):
         """
         Call start_job in job 6 from mock data.
@@ -507,7 +549,7 @@ class ManagerTest(unittest.TestCase):
 
     # noinspection PyUnusedLocal
     @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.post')
     def test_start_job_with_errors(self, mock_requests_post, mock_invoke):
         """
         Call start_job on job 7 from mock data.
@@ -535,6 +577,212 @@ class ManagerTest(unittest.TestCase):
         self.assertEqual(job.job_id, 'job8')
         self.assertEqual(len(job.errors), 2)
 
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_start_job_async(self, mock_request_post, mock_invoke):
+        """Start job3 without waiting for the converter."""
+        tx_manager = TxManager(async_dispatch=True, **self.tx_manager_env_vars)
+        tx_manager.start_job('job3')
+
+        self.assertEqual(mock_invoke.call_count, 1)
+        args, kwargs = mock_invoke.call_args
+        self.assertEqual(kwargs['invocation_type'], 'Event')
+        completion = args[1]['data']['completion']
+        self.assertEqual(completion['function_name'], 'tx_complete_job')
+        self.assertEqual(completion['job_table_name'], ManagerTest.MOCK_JOB_TABLE_NAME)
+        self.assertFalse(mock_request_post.called)
+        job = TxJob(db_handler=tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'started')
+        self.assertEqual(job.convert_module, 'module2')
+        self.assertIsNone(job.ended_at)
+
+    def add_converter_fields(self, job_id, source):
+        job = TxJob(job_id, db_handler=self.tx_manager.job_db_handler)
+        job.update({'source': source, 'cdn_bucket': ManagerTest.MOCK_CDN_BUCKET, 'cdn_file': 'tx/job/1.zip'})
+
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_start_job_local(self, mock_request_post, mock_invoke):
+        """Convert job3 and job4 in worker processes instead of Lambda functions."""
+        self.add_converter_fields('job3', 'https://test.com/3.zip')
+        self.add_converter_fields('job4', 'https://test.com/broken.zip')
+        executor = LocalConverterExecutor(workers=1, converter_classes={'module2': MockConverter,
+                                                                        'module3': MockConverter})
+        tx_manager = TxManager(converter_executor=executor, **self.tx_manager_env_vars)
+        try:
+            tx_manager.start_job('job3')
+            tx_manager.start_job('job4')
+        finally:
+            executor.close()
+
+        self.assertFalse(mock_invoke.called)
+        job = TxJob(db_handler=tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'success')
+        self.assertIn('Converted https://test.com/3.zip', job.log)
+        self.assertIn('Telling module local module2 to convert https://test.com/3.zip and put at None', job.log)
+        self.assertEqual(mock_request_post.call_args[0][0], ManagerTest.MOCK_CALLBACK_URL)
+        job = TxJob(db_handler=tx_manager.job_db_handler).load({'job_id': 'job4'})
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Failed to download https://test.com/broken.zip', job.errors)
+
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_start_job_local_async(self, mock_request_post, mock_invoke):
+        """Dispatch job3 to a worker process, which finishes it when it's done."""
+        self.add_converter_fields('job3', 'https://test.com/3.zip')
+        executor = LocalConverterExecutor(workers=1, converter_classes={'module2': MockConverter})
+        tx_manager = TxManager(async_dispatch=True, converter_executor=executor, **self.tx_manager_env_vars)
+        job_data = tx_manager.start_job('job3')
+        executor.close()
+
+        self.assertEqual(job_data['status'], 'started')
+        self.assertFalse(mock_invoke.called)
+        job = TxJob(db_handler=tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'success')
+        self.assertIn('Converted https://test.com/3.zip', job.log)
+        self.assertEqual(mock_request_post.call_count, 1)
+
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_start_job_paused(self, mock_request_post, mock_invoke):
+        """Leave job3 running when its converter continues in another invocation."""
+        payload = {
+            'info': ['Converted 60-JAS.usfm to 60-JAS.html.'],
+            'warnings': [],
+            'errors': [],
+            'success': False,
+            'paused': True
+        }
+        mock_invoke.return_value = self.create_mock_payload(payload)
+        self.tx_manager.start_job('job3')
+
+        continuation = mock_invoke.call_args[0][1]['data']['continuation']
+        self.assertEqual(continuation['function_name'], 'tx_complete_job')
+        self.assertNotIn('completion', mock_invoke.call_args[0][1]['data'])
+        job = TxJob(db_handler=self.tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'started')
+        self.assertIsNone(job.ended_at)
+        self.assertFalse(mock_request_post.called)
+
+        self.tx_manager.complete_job('job3', {'info': [], 'warnings': [], 'errors': [], 'success': True})
+        job = TxJob(db_handler=self.tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'success')
+        self.assertEqual(mock_request_post.call_count, 1)
+
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_complete_job(self, mock_request_post, mock_invoke):
+        """Finish job3 with the result its converter reported."""
+        tx_manager = TxManager(async_dispatch=True, **self.tx_manager_env_vars)
+        tx_manager.start_job('job3')
+        result = {
+            'info': ['Converted!'],
+            'warnings': ['Missing something'],
+            'errors': [],
+            'success': True
+        }
+        tx_manager.complete_job('job3', result)
+
+        job = TxJob(db_handler=tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'warnings')
+        self.assertTrue(job.success)
+        self.assertIsNotNone(job.ended_at)
+        self.assertIn('module2 function returned with warnings.', job.log)
+        self.assertEqual(mock_request_post.call_count, 1)
+        self.assertEqual(mock_request_post.call_args[0][0], ManagerTest.MOCK_CALLBACK_URL)
+
+        # a repeated completion event leaves the job alone
+        tx_manager.complete_job('job3', {'errorMessage': 'Bad Request: too late'})
+        job = TxJob(db_handler=tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'warnings')
+        self.assertEqual(mock_request_post.call_count, 1)
+
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_complete_job_error(self, mock_request_post, mock_invoke):
+        """Finish job3 when its converter raised an exception."""
+        tx_manager = TxManager(async_dispatch=True, **self.tx_manager_env_vars)
+        tx_manager.start_job('job3')
+        tx_manager.complete_job('job3', {'errorMessage': 'Bad Request: could not download'})
+
+        job = TxJob(db_handler=tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'failed')
+        self.assertFalse(job.success)
+        self.assertIn('could not download', job.errors)
+
+    @mock.patch('requests.Session.post')
+    def test_expire_stale_jobs(self, mock_request_post):
+        """Fail the jobs whose converter never reported back."""
+        three_hours_ago = (datetime.utcnow() - timedelta(hours=3)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        a_minute_ago = (datetime.utcnow() - timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        TxJob('job3', db_handler=self.tx_manager.job_db_handler).update({'status': 'started',
+                                                                         'started_at': three_hours_ago})
+        TxJob('job4', db_handler=self.tx_manager.job_db_handler).update({'status': 'started',
+                                                                         'started_at': a_minute_ago})
+
+        expired = self.tx_manager.expire_stale_jobs()
+
+        self.assertEqual([job_data['job_id'] for job_data in expired], ['job3'])
+        job = TxJob(db_handler=self.tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('module1 did not finish within 120 minutes, it may have run out of time or memory', job.errors)
+        self.assertEqual(mock_request_post.call_args[0][0], ManagerTest.MOCK_CALLBACK_URL)
+        self.assertEqual(TxJob(db_handler=self.tx_manager.job_db_handler).load({'job_id': 'job4'}).status, 'started')
+
+        # a late report from the converter leaves the job alone
+        self.tx_manager.complete_job('job3', {'success': True, 'info': [], 'warnings': [], 'errors': []})
+        self.assertEqual(TxJob(db_handler=self.tx_manager.job_db_handler).load({'job_id': 'job3'}).status, 'failed')
+        self.assertEqual(self.tx_manager.expire_stale_jobs(), [])
+
+    def test_complete_job_not_found(self):
+        job_data = self.tx_manager.complete_job('job99', {'success': True})
+        self.assertFalse(job_data['success'])
+
+    @mock.patch('libraries.manager.conversion_cache.ConversionCache.setup_resources')
+    @mock.patch('libraries.manager.conversion_cache.ConversionCache.get_key')
+    @mock.patch('libraries.manager.conversion_cache.ConversionCache.fetch')
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_start_job_cached(self, mock_request_post, mock_invoke, mock_fetch, mock_get_key, mock_setup_resources):
+        """Start job3 when the same source was converted before."""
+        mock_get_key.return_value = 'cache_key'
+        mock_fetch.return_value = {'success': True, 'info': ['Converted!'], 'warnings': [], 'errors': []}
+        tx_manager = TxManager(cache_conversions=True, **self.tx_manager_env_vars)
+        tx_manager.start_job('job3')
+
+        self.assertFalse(mock_invoke.called)
+        mock_fetch.assert_called_once_with('cache_key', None)
+        job = TxJob(db_handler=tx_manager.job_db_handler).load({'job_id': 'job3'})
+        self.assertEqual(job.status, 'success')
+        self.assertIn('Converted!', job.log)
+        self.assertEqual(mock_request_post.call_count, 1)
+
+    @mock.patch('libraries.manager.conversion_cache.ConversionCache.setup_resources')
+    @mock.patch('libraries.manager.conversion_cache.ConversionCache.get_key')
+    @mock.patch('libraries.manager.conversion_cache.ConversionCache.store')
+    @mock.patch('libraries.manager.conversion_cache.ConversionCache.fetch')
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_start_job_caches_conversion(self, mock_request_post, mock_invoke, mock_fetch, mock_store, mock_get_key,
+                                         mock_setup_resources):
+        """Start job3 and keep its output for the next job with the same source."""
+        mock_get_key.return_value = 'cache_key'
+        mock_fetch.return_value = None
+        payload = {'success': True, 'info': ['Converted!'], 'warnings': [], 'errors': []}
+        mock_invoke.return_value = self.create_mock_payload(payload)
+        tx_manager = TxManager(cache_conversions=True, **self.tx_manager_env_vars)
+        tx_manager.start_job('job3')
+
+        self.assertEqual(mock_invoke.call_count, 1)
+        mock_store.assert_called_once_with('cache_key', None, payload)
+
+        # failed conversions aren't kept
+        mock_store.reset_mock()
+        payload['errors'] = ['Bad']
+        mock_invoke.return_value = self.create_mock_payload(payload)
+        tx_manager.start_job('job4')
+        self.assertFalse(mock_store.called)
+
     def test_list_jobs(self):
         """Test list_jobs and list_endpoint methods."""
         tx_manager = TxManager(**self.tx_manager_env_vars)
@@ -581,6 +829,38 @@ class ManagerTest(unittest.TestCase):
             del missing[key]
             self.assertRaises(Exception, self.tx_manager.register_module, missing)
 
+    def test_get_converter_module(self):
+        job = TxJob({'resource_type': 'ulb', 'input_format': 'usfm', 'output_format': 'html'})
+        self.assertEqual(self.tx_manager.get_converter_module(job).name, 'module2')
+        job = TxJob({'resource_type': 'yet_another', 'input_format': 'md', 'output_format': 'html'})
+        self.assertEqual(self.tx_manager.get_converter_module(job).name, 'module3')
+        job = TxJob({'resource_type': 'obs', 'input_format': 'usfm', 'output_format': 'html'})
+        self.assertIsNone(self.tx_manager.get_converter_module(job))
+
+    def test_module_registry_loaded_once(self):
+        job = TxJob({'resource_type': 'ulb', 'input_format': 'usfm', 'output_format': 'html'})
+        with mock.patch.object(TxModule, 'query', wraps=TxModule(db_handler=self.tx_manager.module_db_handler).query) \
+                as mock_query:
+            self.tx_manager.get_converter_module(job)
+            TxManager(**self.tx_manager_env_vars).get_converter_module(job)
+            self.assertEqual(mock_query.call_count, 1)
+            # once the TTL is up the table is read again
+            ModuleRegistry.get_registry(self.tx_manager.module_db_handler).loaded_at -= ModuleRegistry.TTL_SECONDS
+            self.tx_manager.get_converter_module(job)
+            self.assertEqual(mock_query.call_count, 2)
+
+    def test_register_module_refreshes_registry(self):
+        job = TxJob({'resource_type': 'tn', 'input_format': 'md', 'output_format': 'pdf'})
+        self.assertIsNone(self.tx_manager.get_converter_module(job))
+        self.tx_manager.register_module({
+            'name': 'module4',
+            'type': 'conversion',
+            'resource_types': ['tn'],
+            'input_format': 'md',
+            'output_format': 'pdf'
+        })
+        self.assertEqual(self.tx_manager.get_converter_module(job).name, 'module4')
+
     def test_generate_dashboard(self):
         dashboard = self.tx_manager.generate_dashboard()
         # the title should be tX-Manager Dashboard
@@ -635,6 +915,42 @@ class ManagerTest(unittest.TestCase):
         expected_failure_count = 3
         self.validateFailureTable(failure_table, expected_failure_count)
 
+    @mock.patch('libraries.aws_tools.lambda_handler.LambdaHandler.invoke')
+    @mock.patch('requests.Session.post')
+    def test_generate_dashboard_from_stats(self, mock_request_post, mock_invoke):
+        """The dashboard reads the counts kept as jobs finish instead of reading the jobs."""
+        tx_manager = TxManager(stats_table_name='mock-job-stats', **self.tx_manager_env_vars)
+        tx_manager.job_stats.stats_db_handler.resource.create_table(
+            TableName='mock-job-stats',
+            KeySchema=[{'AttributeName': 'name', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'name', 'AttributeType': 'S'}],
+            ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5},
+        )
+        mock_invoke.return_value = self.create_mock_payload({'success': True, 'info': [], 'warnings': ['Warning'],
+                                                             'errors': []})
+        tx_manager.start_job('job3')
+        mock_invoke.return_value = self.create_mock_payload({'success': True, 'info': [], 'warnings': [],
+                                                             'errors': []})
+        tx_manager.start_job('job4')
+        tx_manager.start_job('job2')  # already has an error
+        with mock.patch.object(TxJob, 'iter_query') as mock_iter_query:
+            dashboard = tx_manager.generate_dashboard()
+            self.assertFalse(mock_iter_query.called)
+
+        soup = BeautifulSoup(dashboard['body'], 'html.parser')
+        status_table = soup.find('table', id='status')
+        self.validateModule(status_table, 'module1', 12, 0, 1, 0)
+        self.validateModule(status_table, 'module2', 11, 0, 0, 1)
+        self.validateModule(status_table, 'module3', 9, 0, 0, 1)  # job4 already has a warning
+        self.validateModule(status_table, 'totals', 5, 0, 1, 2, 7)
+        self.validateFailureTable(soup.find('table', id='failed'), 1)
+
+        # rebuilding from the job table gives the same counts
+        counts = tx_manager.rebuild_job_stats()
+        self.assertEqual(counts['module2'], {'success': 0, 'warnings': 1, 'failures': 0, 'total': 1})
+        self.assertEqual(counts['module3'], {'success': 0, 'warnings': 1, 'failures': 0, 'total': 1})
+        self.assertEqual(counts['module1'], {'success': 0, 'warnings': 0, 'failures': 1, 'total': 1})
+
     def test_generate_dashboard_max_two(self):
         expected_max_failures = 2
         dashboard = self.tx_manager.generate_dashboard(expected_max_failures)
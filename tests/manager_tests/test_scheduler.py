@@ -0,0 +1,192 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import mock
+from unittest import TestCase
+from datetime import datetime
+from datetime import timedelta
+from moto import mock_dynamodb2
+from libraries.manager.manager import TxManager
+from libraries.manager.scheduler import JobScheduler, InProcessExecutor
+from libraries.models.job import TxJob
+from libraries.models.queued_job import TxQueuedJob
+
+
+@mock_dynamodb2
+class JobSchedulerTests(TestCase):
+    JOB_TABLE_NAME = 'test-job'
+    QUEUE_TABLE_NAME = 'test-job-queue'
+
+    def setUp(self):
+        self.tx_manager = TxManager(job_table_name=JobSchedulerTests.JOB_TABLE_NAME, module_table_name='test-module')
+        self.create_table(self.tx_manager.job_db_handler, JobSchedulerTests.JOB_TABLE_NAME)
+        self.started_jobs = []
+        self.job_status = 'started'
+        self.executor = InProcessExecutor(self.run_job)
+        self.scheduler = JobScheduler(self.tx_manager, queue_table_name=JobSchedulerTests.QUEUE_TABLE_NAME,
+                                      limits={'md2html': 3}, executor=self.executor, reserved_interactive=2)
+        self.create_table(self.scheduler.queue_db_handler, JobSchedulerTests.QUEUE_TABLE_NAME)
+
+    def create_table(self, db_handler, table_name):
+        try:
+            db_handler.table.delete()
+        except:
+            pass
+        db_handler.resource.create_table(
+            TableName=table_name,
+            KeySchema=[
+                {
+                    'AttributeName': 'job_id',
+                    'KeyType': 'HASH'
+                },
+            ],
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'job_id',
+                    'AttributeType': 'S'
+                },
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            },
+        )
+
+    def run_job(self, job_id):
+        self.started_jobs.append(job_id)
+        return {'job_id': job_id, 'status': self.job_status}
+
+    def add_job(self, job_id, priority=None, module='md2html'):
+        TxJob({
+            'job_id': job_id,
+            'status': 'requested',
+            'convert_module': module,
+            'priority': priority
+        }, db_handler=self.tx_manager.job_db_handler).insert()
+        return self.scheduler.submit(job_id)
+
+    def queue_statuses(self):
+        queued_jobs = TxQueuedJob(db_handler=self.scheduler.queue_db_handler).query()
+        return dict((queued_job.job_id, queued_job.status) for queued_job in queued_jobs
+                    if not queued_job.job_id.startswith(JobScheduler.SLOT_PREFIX))
+
+    def slot_holders(self):
+        items = self.scheduler.queue_db_handler.query_items() or []
+        return dict((item['job_id'], item['holder']) for item in items
+                    if item['job_id'].startswith(JobScheduler.SLOT_PREFIX))
+
+    def test_module_limit(self):
+        for i in range(4):
+            self.add_job('job{0}'.format(i))
+        self.assertEqual(self.started_jobs, ['job0', 'job1', 'job2'])
+        self.assertEqual(self.queue_statuses()['job3'], 'queued')
+
+        # other modules have their own slots
+        self.assertEqual(self.add_job('usfm_job', module='usfm2html'), ['usfm_job'])
+
+        self.assertEqual(self.scheduler.job_finished('job1'), ['job3'])
+        self.assertNotIn('job1', self.queue_statuses())
+        self.assertEqual(self.queue_statuses()['job3'], 'running')
+        self.assertEqual(self.slot_holders(), {
+            JobScheduler.get_slot_name('md2html', 0): 'job0',
+            JobScheduler.get_slot_name('md2html', 1): 'job3',
+            JobScheduler.get_slot_name('md2html', 2): 'job2',
+            JobScheduler.get_slot_name('usfm2html', 0): 'usfm_job'
+        })
+
+    def test_slot_taken_by_another_dispatcher(self):
+        update_item_if = self.scheduler.queue_db_handler.update_item_if
+        slot0 = JobScheduler.get_slot_name('md2html', 0)
+
+        def taken_elsewhere(keys, data, expected):
+            # the conditional write of slot 0 fails, like it does when another dispatcher took it in the meantime
+            if keys['job_id'] == slot0:
+                return False
+            return update_item_if(keys, data, expected)
+
+        with mock.patch.object(self.scheduler.queue_db_handler, 'update_item_if', side_effect=taken_elsewhere):
+            self.assertEqual(self.add_job('job0'), ['job0'])
+            self.assertEqual(self.add_job('job1'), ['job1'])
+            # slots 1 and 2 are ours, slot 0 is someone else's, so the limit of 3 is reached
+            self.assertEqual(self.add_job('job2'), [])
+        self.assertEqual(self.queue_statuses()['job2'], 'queued')
+
+    def test_sync_jobs_hand_over_waiting_jobs(self):
+        self.job_status = 'success'
+        on_waiting = mock.MagicMock()
+        self.scheduler.on_waiting = on_waiting
+        with mock.patch.object(self.scheduler, 'dispatch', return_value=[]):
+            self.add_job('job0')
+            self.add_job('job1')
+        # only one job that runs to the end is waited for, the other is left to another invocation
+        self.assertEqual(self.scheduler.dispatch(), ['job0'])
+        self.assertEqual(self.queue_statuses(), {'job1': 'queued'})
+        on_waiting.assert_called_once_with()
+
+        on_waiting.reset_mock()
+        self.assertEqual(self.scheduler.dispatch(), ['job1'])
+        self.assertFalse(on_waiting.called)
+
+    def test_bulk_jobs_leave_slots_for_interactive_jobs(self):
+        self.add_job('bulk1', priority='bulk')
+        self.add_job('bulk2', priority='bulk')
+        self.assertEqual(self.started_jobs, ['bulk1'])
+        self.add_job('push1')
+        self.add_job('push2')
+        self.add_job('push3')
+        self.assertEqual(self.started_jobs, ['bulk1', 'push1', 'push2'])
+
+        # the interactive job goes first even though the bulk job was queued before it
+        self.assertEqual(self.scheduler.job_finished('bulk1'), ['push3'])
+        # bulk jobs only get one of the three slots
+        self.assertEqual(self.scheduler.job_finished('push1'), [])
+        self.assertEqual(self.scheduler.job_finished('push2'), [])
+        self.assertEqual(self.scheduler.job_finished('push3'), ['bulk2'])
+
+    def test_jobs_that_finish_while_running(self):
+        self.job_status = 'success'
+        for i in range(5):
+            self.add_job('job{0}'.format(i))
+        self.assertEqual(len(self.started_jobs), 5)
+        self.assertEqual(self.queue_statuses(), {})
+
+    def test_failing_job_frees_its_slot(self):
+        self.executor.run_job = mock.MagicMock(side_effect=Exception('boom'))
+        self.add_job('job0')
+        self.assertEqual(self.queue_statuses(), {})
+
+    def add_running_jobs(self, started_at):
+        for i in range(3):
+            TxQueuedJob({
+                'job_id': 'running{0}'.format(i),
+                'lane': JobScheduler.INTERACTIVE,
+                'convert_module': 'md2html',
+                'status': 'running',
+                'started_at': started_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                'slot': JobScheduler.get_slot_name('md2html', i)
+            }, db_handler=self.scheduler.queue_db_handler).insert()
+            self.scheduler.queue_db_handler.insert_item({
+                'job_id': JobScheduler.get_slot_name('md2html', i),
+                'holder': 'running{0}'.format(i),
+                'taken_at': started_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            })
+
+    def test_stale_jobs_are_dropped(self):
+        self.add_running_jobs(datetime.utcnow() - timedelta(seconds=self.scheduler.stale_seconds + 1))
+        self.assertEqual(self.add_job('job0'), ['job0'])
+        self.assertEqual(self.queue_statuses(), {'job0': 'running'})
+        self.assertEqual(self.slot_holders(), {JobScheduler.get_slot_name('md2html', 0): 'job0'})
+
+    def test_continued_jobs_keep_their_slots(self):
+        # a conversion that went on in another invocation of its converter, long after a Lambda function times out
+        self.assertEqual(self.scheduler.stale_seconds, TxManager.STALE_JOB_SECONDS)
+        self.add_running_jobs(datetime.utcnow() - timedelta(minutes=30))
+        self.assertEqual(self.add_job('job0'), [])
+        self.assertEqual(self.queue_statuses()['job0'], 'queued')
+
+    def test_job_claimed_by_someone_else(self):
+        with mock.patch.object(self.scheduler.queue_db_handler, 'update_item_if', return_value=False):
+            self.assertEqual(self.add_job('job0'), [])
+        self.assertEqual(self.started_jobs, [])
+
+    def test_missing_job(self):
+        self.assertEqual(self.scheduler.submit('nope'), [])
+        self.assertEqual(self.queue_statuses(), {})
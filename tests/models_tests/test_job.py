@@ -1,5 +1,6 @@
 from __future__ import absolute_import, unicode_literals, print_function
 from unittest import TestCase
+import mock
 from moto import mock_dynamodb2
 from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
 from libraries.models.job import TxJob
@@ -103,6 +104,23 @@ class TxJobTests(TestCase):
         job.load()
         self.assertEqual(job.status, 'finished')
 
+    def test_update_job_appends_to_log(self):
+        job = TxJob(db_handler=self.db_handler).load({'job_id': self.items['job2']['job_id']})
+        job.status = 'failed'
+        job.error_message('another error')
+        job.log_message('failed')
+        with mock.patch.object(self.db_handler.table, 'update_item') as update_item:
+            job.update()
+        _, kwargs = update_item.call_args
+        expression = kwargs['UpdateExpression'].replace(' ', '')
+        self.assertIn('#item_status=:status', expression)
+        self.assertIn('errors=list_append(errors,:errors)', expression)
+        # there was no log to append to
+        self.assertIn('#item_log=:log', expression)
+        self.assertEqual(kwargs['ExpressionAttributeValues'][':errors'], ['another error'])
+        self.assertEqual(kwargs['ExpressionAttributeValues'][':log'], ['failed'])
+        self.assertEqual(kwargs['ExpressionAttributeNames'], {'#item_status': 'status', '#item_log': 'log'})
+
     def test_delete_job(self):
         job = TxJob(db_handler=self.db_handler).load({'job_id': self.items['job1']['job_id']})
         self.assertIsNotNone(job.job_id)
@@ -1,5 +1,6 @@
 from __future__ import absolute_import, unicode_literals, print_function
 import unittest
+import mock
 from moto import mock_dynamodb2
 from libraries.models.module import Model
 from libraries.aws_tools.dynamodb_handler import DynamoDBHandler
@@ -92,6 +93,19 @@ class ModelTests(unittest.TestCase):
         for model in models:
             self.assertEqual(model.get_db_data(), MyModel(self.items[model.field1]).get_db_data())
 
+    def test_iter_query(self):
+        models = MyModel(db_handler=self.db_handler).iter_query(fields=['field1'], page_size=1)
+        self.assertNotIsInstance(models, list)
+        models = list(models)
+        self.assertEqual(len(models), len(self.items))
+        for model in models:
+            self.assertIn(model.field1, self.items)
+
+    def test_query_by_key(self):
+        models = MyModel(db_handler=self.db_handler).query({'field1': 'mymodel2'})
+        self.assertEqual(len(models), 1)
+        self.assertEqual(models[0].get_db_data(), MyModel(self.items['mymodel2']).get_db_data())
+
     def test_load(self):
         model = MyModel(db_handler=self.db_handler).load({'field1': 'mymodel2'})
         self.assertEqual(model.get_db_data(), MyModel(self.items['mymodel2']).get_db_data())
@@ -121,6 +135,45 @@ class ModelTests(unittest.TestCase):
         model = MyModel(db_handler=self.db_handler).load({'field1': 'mymodel1'})
         self.assertEqual(model.field2, 'can change')
 
+    def test_bulk_insert(self):
+        data = [{'field1': 'bulk{0}'.format(i), 'field2': 'value{0}'.format(i)} for i in range(30)]
+        models = MyModel(db_handler=self.db_handler).bulk_insert(data)
+        self.assertEqual(len(models), 30)
+        self.assertEqual(len(MyModel(db_handler=self.db_handler).query()), 30 + len(self.items))
+        model = MyModel(db_handler=self.db_handler).load({'field1': 'bulk29'})
+        self.assertEqual(model.field2, 'value29')
+
+    def test_load_many(self):
+        models = MyModel(db_handler=self.db_handler).load_many(['mymodel2', {'field1': 'missing'}, 'mymodel1'])
+        self.assertEqual([model.field1 for model in models], ['mymodel2', 'mymodel1'])
+        self.assertEqual(models[0].get_db_data(), MyModel(self.items['mymodel2']).get_db_data())
+
+    def test_update_only_changed_fields(self):
+        model = MyModel(db_handler=self.db_handler).load({'field1': 'mymodel1'})
+        with mock.patch.object(self.db_handler, 'update_item', wraps=self.db_handler.update_item) as update_item:
+            model.update()  # nothing changed
+            update_item.assert_not_called()
+            model.field2 = 'change'
+            model.update()
+            update_item.assert_called_once_with({'field1': 'mymodel1'}, {'field2': 'change'}, {})
+            model.update()
+            self.assertEqual(update_item.call_count, 1)
+        model = MyModel(db_handler=self.db_handler).load({'field1': 'mymodel1'})
+        self.assertEqual(model.field2, 'change')
+
+    def test_update_appends_to_lists(self):
+        db_handler = mock.MagicMock()
+        db_handler.use_list_append = True
+        db_handler.get_item.return_value = {'field1': 'mymodel1', 'field2': ['one']}
+        model = MyModel(db_handler=db_handler).load({'field1': 'mymodel1'})
+        model.field2.append('two')
+        model.update()
+        db_handler.update_item.assert_called_once_with({'field1': 'mymodel1'}, {}, {'field2': ['two']})
+        # not just appended to, so the whole list is set
+        model.field2 = ['three']
+        model.update()
+        db_handler.update_item.assert_called_with({'field1': 'mymodel1'}, {'field2': ['three']}, {})
+
     def test_delete_model(self):
         MyModel('model2', db_handler=self.db_handler).delete()
         model = MyModel('model2', db_handler=self.db_handler)